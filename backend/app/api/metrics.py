@@ -0,0 +1,96 @@
+"""Prometheus scrape endpoint (/metrics) and collectors for the service counters behind /api/stats."""
+from fastapi import APIRouter
+from fastapi.responses import Response
+from app.core.executors import io_executor, run_blocking
+from app.core.metrics import CONTENT_TYPE, REGISTRY, MetricFamily
+from app.services.cache_svc import get_analysis_cache
+from app.services.embedding_batcher import get_embedding_batcher
+from app.services.embedding_cache import get_embedding_cache
+from app.services.fast_path import get_fast_path_scorer
+from app.services.job_queue import get_job_queue
+from app.services.llm_svc import get_llm_service
+from app.services.reranker import get_reranker
+from typing import Iterator
+
+router = APIRouter()
+
+CIRCUIT_STATES = ("closed", "open", "half_open")
+
+
+def service_metrics() -> Iterator[MetricFamily]:
+    """
+    Counters the services already keep, read at scrape time.
+    
+    Services that have not been constructed yet are skipped rather than
+    created by the scrape.
+    """
+    if get_analysis_cache.initialized:
+        stats = get_analysis_cache().stats()
+        yield ("patentguard_analysis_cache_lookups_total", "counter", "Analysis cache lookups by result", [
+            ({"result": "exact_hit"}, stats["exact_hits"]),
+            ({"result": "similar_hit"}, stats["similar_hits"]),
+            ({"result": "miss"}, stats["misses"])
+        ])
+        yield ("patentguard_analysis_cache_entries", "gauge", "Analyses held in the cache", [({}, stats["entries"])])
+    if get_embedding_cache.initialized:
+        stats = get_embedding_cache().stats()
+        yield ("patentguard_embedding_cache_lookups_total", "counter", "Embedding cache lookups by result", [
+            ({"result": "hit"}, stats["hits"]),
+            ({"result": "miss"}, stats["misses"])
+        ])
+    if get_embedding_batcher.initialized:
+        stats = get_embedding_batcher().stats()
+        yield ("patentguard_embedding_queue_depth", "gauge", "Texts waiting for the embedding model",
+               [({}, stats["queue_depth"])])
+    if get_fast_path_scorer.initialized:
+        stats = get_fast_path_scorer().stats()
+        yield ("patentguard_fast_path_total", "counter", "Retrievals evaluated by the fast path by outcome", [
+            ({"outcome": "skipped_low"}, stats["skipped_low"]),
+            ({"outcome": "skipped_high"}, stats["skipped_high"]),
+            ({"outcome": "sent_to_llm"}, stats["sent_to_llm"])
+        ])
+    if get_llm_service.initialized:
+        stats = get_llm_service().stats()
+        if "prompt_tokens" in stats:
+            yield ("patentguard_llm_tokens_total", "counter", "Tokens reported by the LLM provider", [
+                ({"kind": "prompt"}, stats["prompt_tokens"]),
+                ({"kind": "completion"}, stats["completion_tokens"])
+            ])
+        transport = stats.get("transport")
+        if transport:
+            yield ("patentguard_llm_transport_events_total", "counter", "LLM transport calls, retries and failures", [
+                ({"event": event}, transport[event]) for event in ("calls", "retries", "rate_limited", "failures")
+            ])
+            yield ("patentguard_llm_circuit_state", "gauge", "LLM circuit breaker state (1 for the current one)", [
+                ({"state": state}, int(transport["circuit"] == state)) for state in CIRCUIT_STATES
+            ])
+    if get_reranker.initialized:
+        stats = get_reranker().stats()
+        yield ("patentguard_rerank_candidates_total", "counter", "Rerank candidates by how they were scored", [
+            ({"source": "model"}, stats["scored"]),
+            ({"source": "cache"}, stats["cache_hits"]),
+            ({"source": "unscored"}, stats["candidates"] - stats["scored"] - stats["cache_hits"])
+        ])
+        yield ("patentguard_rerank_over_budget_total", "counter", "Reranks cut short by the latency budget",
+               [({}, stats["over_budget"])])
+
+
+def shared_metrics() -> Iterator[MetricFamily]:
+    """State kept in SQLite, which every worker reads alike (reported once, without a worker label)."""
+    if get_job_queue.initialized:
+        stats = get_job_queue().stats()
+        yield ("patentguard_jobs", "gauge", "Jobs in the queue by status", [
+            ({"status": status}, stats[status]) for status in ("queued", "running", "done", "failed")
+        ])
+
+
+REGISTRY.add_collector(service_metrics)
+REGISTRY.add_collector(shared_metrics, shared=True)
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus text exposition of all metrics (of every worker under app.server)."""
+    # Collectors may touch SQLite (job counts) and worker snapshots are files, so render off the event loop
+    body = await run_blocking(io_executor, REGISTRY.render)
+    return Response(content=body, media_type=CONTENT_TYPE)
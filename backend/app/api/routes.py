@@ -1,19 +1,63 @@
 """API routes for PatentGuard."""
-from fastapi import APIRouter, HTTPException
+from contextlib import aclosing
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
-from app.services.pinecone_svc import pinecone_service
-from app.services.llm_svc import llm_service
-from app.services.embedding_svc import embedding_service
+from typing import Optional, List, Dict, Any, Tuple
+from datetime import date
+from app.core.config import settings
+from app.core.executors import io_executor, run_blocking
+from app.core.metrics import STAGE_SECONDS, worker_id
+from app.core.readiness import readiness
+from app.services.vector_store import VectorStore, get_vector_store
+from app.services.llm_svc import LLMService, get_llm_service
+from app.services.llm_transport import LLMUnavailableError
+from app.services.embedding_batcher import EmbeddingBatcher, EmbeddingQueueFullError, get_embedding_batcher
+from app.services.cache_svc import AnalysisCache, get_analysis_cache
+from app.services.fast_path import FastPathScorer, get_fast_path_scorer
+from app.services.hybrid_search import hybrid_query_async, retrieved_patent
+from app.services.claim_chunks import get_claim_chunk_retriever
+from app.services.reranker import get_reranker
+from app.services.lexical_index import get_lexical_index
+from app.services.metadata_filter import MetadataFilter, cache_text
+from app.services.embedding_cache import get_embedding_cache
+from app.services.embedding_svc import EmbeddingService, get_embedding_service
+from app.services.batch_analysis import BatchAnalyzer, BatchCapacityError, get_batch_analyzer
+from app.services.job_queue import JobQueue, QueueFullError, get_job_queue
+import asyncio
+import json
 import logging
+import math
+
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+_EMBED_SECONDS = STAGE_SECONDS.labels("embed")
+
+
+class SearchFilters(BaseModel):
+    """
+    Restricts retrieval to matching patents; all given conditions must hold.
+    
+    Dates are inclusive. CPC values are a section ("H"), class ("H04") or
+    subclass ("H04L"); a patent matches if any of its CPC codes falls under
+    one of them. Assignee names match case- and punctuation-insensitively.
+    """
+    published_from: Optional[date] = None
+    published_to: Optional[date] = None
+    cpc: List[str] = []
+    exclude_cpc: List[str] = []
+    assignees: List[str] = []
+    exclude_assignees: List[str] = []
+
 
 class AnalyzeRequest(BaseModel):
     """Request model for patent analysis."""
     invention_idea: str
+    filters: Optional[SearchFilters] = None
 
 
 class AnalyzeResponse(BaseModel):
@@ -23,77 +67,543 @@ class AnalyzeResponse(BaseModel):
     conflicting_patents: list
     recommendations: str
     retrieved_patents: list
+    cache_hit: Optional[str] = None
+    # True when the risk was scored from retrieval alone, without the LLM
+    fast_path: bool = False
 
 
-@router.post("/analyze", response_model=AnalyzeResponse)
-async def analyze_invention(request: AnalyzeRequest):
+class BatchAnalyzeRequest(BaseModel):
+    """Request model for batch patent analysis."""
+    invention_ideas: List[str]
+    filters: Optional[SearchFilters] = None
+
+
+def _validate_idea(invention_idea: str):
+    """Reject ideas too short to search for."""
+    if not invention_idea or len(invention_idea.strip()) < 10:
+        raise HTTPException(
+            status_code=400, 
+            detail="Invention idea must be at least 10 characters long"
+        )
+
+
+def _metadata_filter(filters: Optional[SearchFilters]) -> Optional[MetadataFilter]:
+    """Validate request filters (None when there are no conditions)."""
+    if filters is None:
+        return None
+    try:
+        return MetadataFilter.create(**filters.model_dump())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+async def _retrieve_patents(
+    invention_idea: str,
+    batcher: EmbeddingBatcher,
+    vector_store: VectorStore,
+    metadata_filter: Optional[MetadataFilter] = None
+) -> Tuple[np.ndarray, List[Dict[str, Any]]]:
+    """
+    Embed the idea and fetch the most similar patents (vector and BM25, fused).
+    
+    Args:
+        invention_idea: The user's invention description
+        batcher: Embedding front end
+        vector_store: Vector index to search
+        metadata_filter: Restricts the search to matching patents
+        
+    Returns:
+        Tuple of (query embedding, retrieved patents)
+    """
+    # Step 1: Generate embedding for user's idea
+    logger.debug("Generating embedding...")
+    with _EMBED_SECONDS.time():
+        query_embedding = await batcher.embed(invention_idea)
+    
+    # Step 2: Query the vector store (and lexical index) for similar patents
+    logger.debug("Querying vector store for similar patents...")
+    results = await hybrid_query_async(
+        invention_idea, query_embedding, vector_store, get_lexical_index(), top_k=5, metadata_filter=metadata_filter
+    )
+    
+    if not results.get('matches'):
+        if metadata_filter is not None:
+            raise HTTPException(status_code=404, detail="No patents match the given filters.")
+        raise HTTPException(
+            status_code=404,
+            detail="No similar patents found. Please ensure the database has been populated."
+        )
+    
+    # Extract patent information
+    retrieved_patents = [retrieved_patent(match) for match in results['matches']]
+    
+    return query_embedding, retrieved_patents
+
+
+def _build_response(
+    analysis_result: Dict[str, Any],
+    retrieved_patents: List[Dict[str, Any]],
+    fast_path: bool = False
+) -> AnalyzeResponse:
+    """Combine the LLM (or fast-path) analysis with the retrieved patents."""
+    return AnalyzeResponse(
+        risk_level=analysis_result.get('risk_level', 'Medium'),
+        analysis=analysis_result.get('analysis', ''),
+        conflicting_patents=analysis_result.get('conflicting_patents', []),
+        recommendations=analysis_result.get('recommendations', ''),
+        retrieved_patents=retrieved_patents,
+        fast_path=fast_path
+    )
+
+
+async def _cached_similar(
+    cache: AnalysisCache,
+    query_embedding: np.ndarray,
+    retrieved_patents: List[Dict[str, Any]]
+) -> Optional[AnalyzeResponse]:
+    """Reuse the analysis of a near-duplicate idea that retrieved the same prior art."""
+    if not settings.analysis_cache_enabled:
+        return None
+    # Lookups may purge expired entries (SQLite writes) and rebuild the matrix
+    cached = await run_blocking(
+        io_executor, cache.get_similar, query_embedding, [p['id'] for p in retrieved_patents]
+    )
+    if cached is None:
+        return None
+    logger.info("Returning cached analysis (near-duplicate match)")
+    return AnalyzeResponse(
+        **{**cached, 'retrieved_patents': retrieved_patents},
+        cache_hit="similar"
+    )
+
+
+async def _store_result(
+    cache: AnalysisCache,
+    invention_idea: str,
+    query_embedding: np.ndarray,
+    response: AnalyzeResponse
+):
+    """Remember a fresh analysis for later resubmissions."""
+    if settings.analysis_cache_enabled:
+        await run_blocking(
+            io_executor,
+            cache.put,
+            invention_idea,
+            query_embedding,
+            [p['id'] for p in response.retrieved_patents],
+            response.model_dump(exclude={'cache_hit'})
+        )
+
+
+async def _cached_exact(cache: AnalysisCache, invention_idea: str) -> Optional[AnalyzeResponse]:
+    """Return the analysis of an exact resubmission, if cached."""
+    if not settings.analysis_cache_enabled:
+        return None
+    cached = await run_blocking(io_executor, cache.get_exact, invention_idea)
+    if cached is None:
+        return None
+    logger.info("Returning cached analysis (exact match)")
+    return AnalyzeResponse(**cached, cache_hit="exact")
+
+
+async def run_analysis(
+    invention_idea: str,
+    batcher: EmbeddingBatcher,
+    vector_store: VectorStore,
+    llm_service: LLMService,
+    cache: AnalysisCache,
+    scorer: FastPathScorer,
+    metadata_filter: Optional[MetadataFilter] = None
+) -> AnalyzeResponse:
     """
     Analyze an invention idea against prior art patents.
     
     1. Generate embedding for user's idea
-    2. Query Pinecone for similar patents
-    3. Use LLM to analyze and generate risk assessment
+    2. Query the vector store for similar patents (matching ``metadata_filter``)
+    3. Score the risk from retrieval alone if that is decisive (fast path)
+    4. Otherwise use LLM to analyze and generate risk assessment
+    
+    Shared by /analyze and the job queue worker.
     """
+    logger.info(f"Analyzing invention idea: {invention_idea[:100]}...")
+    
+    cached = await _cached_exact(cache, cache_text(invention_idea, metadata_filter))
+    if cached is not None:
+        return cached
+    
+    query_embedding, retrieved_patents = await _retrieve_patents(
+        invention_idea, batcher, vector_store, metadata_filter
+    )
+    
+    cached = await _cached_similar(cache, query_embedding, retrieved_patents)
+    if cached is not None:
+        return cached
+    
+    # Step 3: Skip the LLM when the scores alone settle it
+    fast = scorer.assess(invention_idea, retrieved_patents)
+    if fast is not None:
+        return _build_response(fast, retrieved_patents, fast_path=True)
+    
+    # Step 4: Use LLM to analyze
+    logger.debug("Analyzing with LLM...")
+    analysis_result = await llm_service.analyze_patents_async(
+        user_idea=invention_idea,
+        retrieved_patents=retrieved_patents
+    )
+    
+    # Prepare response
+    response = _build_response(analysis_result, retrieved_patents)
+    await _store_result(cache, cache_text(invention_idea, metadata_filter), query_embedding, response)
+    
+    logger.info(f"Analysis complete. Risk level: {response.risk_level}")
+    return response
+
+
+def _llm_unavailable(e: LLMUnavailableError) -> HTTPException:
+    """503 for an LLM call that could not complete in time, with a Retry-After hint."""
+    logger.warning(f"LLM unavailable: {e}")
+    retry_after = e.retry_after if e.retry_after is not None else settings.llm_backoff_max_seconds
+    return HTTPException(
+        status_code=503,
+        detail="Analysis service is busy, please retry shortly",
+        headers={"Retry-After": str(max(math.ceil(retry_after), 1))}
+    )
+
+
+@router.post("/analyze", response_model=AnalyzeResponse)
+async def analyze_invention(
+    request: AnalyzeRequest,
+    batcher: EmbeddingBatcher = Depends(get_embedding_batcher),
+    vector_store: VectorStore = Depends(get_vector_store),
+    llm_service: LLMService = Depends(get_llm_service),
+    cache: AnalysisCache = Depends(get_analysis_cache),
+    scorer: FastPathScorer = Depends(get_fast_path_scorer)
+):
+    """Analyze an invention idea against prior art patents (see ``run_analysis``)."""
     try:
-        if not request.invention_idea or len(request.invention_idea.strip()) < 10:
-            raise HTTPException(
-                status_code=400, 
-                detail="Invention idea must be at least 10 characters long"
-            )
-        
-        logger.info(f"Analyzing invention idea: {request.invention_idea[:100]}...")
-        
-        # Step 1: Generate embedding for user's idea
-        logger.info("Generating embedding...")
-        query_embedding = embedding_service.generate_embedding(request.invention_idea)
-        
-        # Step 2: Query Pinecone for similar patents
-        logger.info("Querying Pinecone for similar patents...")
-        results = pinecone_service.query_similar(query_embedding, top_k=5)
-        
-        if not results.get('matches'):
-            raise HTTPException(
-                status_code=404,
-                detail="No similar patents found. Please ensure the database has been populated."
-            )
-        
-        # Extract patent information
-        retrieved_patents = []
-        for match in results['matches']:
-            patent_info = {
-                'id': match['id'],
-                'score': match['score'],
-                'metadata': match.get('metadata', {})
-            }
-            retrieved_patents.append(patent_info)
-        
-        # Step 3: Use LLM to analyze
-        logger.info("Analyzing with LLM...")
-        analysis_result = llm_service.analyze_patents(
-            user_idea=request.invention_idea,
-            retrieved_patents=retrieved_patents
+        _validate_idea(request.invention_idea)
+        metadata_filter = _metadata_filter(request.filters)
+        return await run_analysis(
+            request.invention_idea, batcher, vector_store, llm_service, cache, scorer, metadata_filter
         )
-        
-        # Prepare response
-        response = AnalyzeResponse(
-            risk_level=analysis_result.get('risk_level', 'Medium'),
-            analysis=analysis_result.get('analysis', ''),
-            conflicting_patents=analysis_result.get('conflicting_patents', []),
-            recommendations=analysis_result.get('recommendations', ''),
-            retrieved_patents=retrieved_patents
+    
+    except HTTPException:
+        raise
+    except EmbeddingQueueFullError as e:
+        logger.warning(f"Rejecting analysis: {e}")
+        raise HTTPException(status_code=503, detail="Server is busy, please retry shortly")
+    except LLMUnavailableError as e:
+        raise _llm_unavailable(e)
+    except Exception as e:
+        logger.error(f"Error during analysis: {e}")
+        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+
+
+async def analysis_job(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Job queue handler for "analyze" jobs: run the /analyze pipeline for one idea."""
+    vector_store, llm_service, cache = await asyncio.gather(
+        run_blocking(io_executor, get_vector_store),
+        run_blocking(io_executor, get_llm_service),
+        run_blocking(io_executor, get_analysis_cache)
+    )
+    try:
+        response = await run_analysis(
+            payload['invention_idea'], get_embedding_batcher(), vector_store, llm_service, cache,
+            get_fast_path_scorer(), MetadataFilter.from_dict(payload.get('filters'))
+        )
+    except HTTPException as e:
+        raise RuntimeError(e.detail)
+    return response.model_dump()
+
+
+# Job kind -> handler, run by the workers started in main.py
+JOB_HANDLERS = {"analyze": analysis_job}
+
+
+@router.post("/jobs", status_code=202)
+async def submit_job(
+    request: AnalyzeRequest,
+    queue: JobQueue = Depends(get_job_queue)
+):
+    """
+    Queue an invention analysis and return its job ID immediately.
+    
+    Poll GET /jobs/{job_id} for the status ("queued", "running", "done" or
+    "failed") and, once done, the result (same shape as /analyze). Returns 503
+    with Retry-After when JOB_MAX_QUEUE_DEPTH jobs are already waiting.
+    """
+    _validate_idea(request.invention_idea)
+    payload = {"invention_idea": request.invention_idea}
+    metadata_filter = _metadata_filter(request.filters)
+    if metadata_filter is not None:
+        payload["filters"] = metadata_filter.to_dict()
+    try:
+        return await run_blocking(io_executor, queue.enqueue, "analyze", payload)
+    except QueueFullError as e:
+        logger.warning(f"Rejecting job: {e}")
+        raise HTTPException(
+            status_code=503,
+            detail="Job queue is full, please retry shortly",
+            headers={"Retry-After": str(settings.job_retry_after_seconds)}
         )
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(
+    job_id: str,
+    queue: JobQueue = Depends(get_job_queue)
+):
+    """Status of a queued analysis, with its result once done."""
+    job = await run_blocking(io_executor, queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found (unknown or expired)")
+    return job
+
+
+def _sse(event: str, data: Any, event_id: Optional[int] = None) -> str:
+    """Format one server-sent event."""
+    prefix = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{prefix}event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/analyze/stream")
+async def analyze_invention_stream(
+    request: AnalyzeRequest,
+    batcher: EmbeddingBatcher = Depends(get_embedding_batcher),
+    vector_store: VectorStore = Depends(get_vector_store),
+    llm_service: LLMService = Depends(get_llm_service),
+    cache: AnalysisCache = Depends(get_analysis_cache),
+    scorer: FastPathScorer = Depends(get_fast_path_scorer)
+):
+    """
+    Analyze an invention idea, streaming results as server-sent events.
+    
+    Events, in order:
+    - retrieved_patents: similar patents, sent as soon as retrieval finishes
+    - token: each piece of LLM output as it arrives (none for cached or
+      fast-path answers)
+    - risk_level: the risk level, as soon as the model has written it
+    - analysis: the final parsed response (same shape as /analyze)
+    - error: sent instead of analysis if the LLM call fails mid-stream
+    """
+    try:
+        _validate_idea(request.invention_idea)
+        metadata_filter = _metadata_filter(request.filters)
+        cache_key = cache_text(request.invention_idea, metadata_filter)
         
-        logger.info(f"Analysis complete. Risk level: {response.risk_level}")
-        return response
+        logger.info(f"Streaming analysis for invention idea: {request.invention_idea[:100]}...")
         
+        cached = await _cached_exact(cache, cache_key)
+        if cached is not None:
+            query_embedding, retrieved_patents = None, cached.retrieved_patents
+        else:
+            query_embedding, retrieved_patents = await _retrieve_patents(
+                request.invention_idea, batcher, vector_store, metadata_filter
+            )
+            cached = await _cached_similar(cache, query_embedding, retrieved_patents)
+            if cached is None:
+                fast = scorer.assess(request.invention_idea, retrieved_patents)
+                if fast is not None:
+                    cached = _build_response(fast, retrieved_patents, fast_path=True)
+    
     except HTTPException:
         raise
+    except EmbeddingQueueFullError as e:
+        logger.warning(f"Rejecting analysis: {e}")
+        raise HTTPException(status_code=503, detail="Server is busy, please retry shortly")
     except Exception as e:
-        logger.error(f"Error during analysis: {e}")
+        logger.error(f"Error during retrieval: {e}")
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+    
+    async def events():
+        yield _sse("retrieved_patents", retrieved_patents)
+        
+        if cached is not None:
+            yield _sse("analysis", cached.model_dump())
+            return
+        
+        try:
+            # Closed with this generator, so a client disconnect stops the LLM call at once
+            async with aclosing(llm_service.analyze_patents_stream(
+                user_idea=request.invention_idea,
+                retrieved_patents=retrieved_patents
+            )) as analysis_stream:
+                async for kind, data in analysis_stream:
+                    if kind == "token":
+                        yield _sse("token", {"text": data})
+                    elif kind == "field" and data[0] == "risk_level":
+                        yield _sse("risk_level", {"risk_level": data[1]})
+                    elif kind == "analysis":
+                        response = _build_response(data, retrieved_patents)
+                        await _store_result(cache, cache_key, query_embedding, response)
+                        logger.info(f"Streamed analysis complete. Risk level: {response.risk_level}")
+                        yield _sse("analysis", response.model_dump())
+        except LLMUnavailableError as e:
+            logger.warning(f"LLM unavailable during streamed analysis: {e}")
+            yield _sse("error", {"detail": "Analysis service is busy, please retry shortly", "retry_after": e.retry_after})
+        except Exception as e:
+            logger.error(f"Error during streamed analysis: {e}")
+            yield _sse("error", {"detail": f"Analysis failed: {str(e)}"})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def _batch_events(analyzer: BatchAnalyzer, summary: Dict[str, Any], after: int):
+    """Server-sent events for a batch job, starting after the given item position."""
+    async def events():
+        yield _sse("job", summary)
+        async for item in analyzer.follow(summary['job_id'], after):
+            yield _sse("item", item, event_id=item['position'])
+        final, _ = await analyzer.get(summary['job_id'])
+        yield _sse("done", final or summary)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def _get_job(analyzer: BatchAnalyzer, job_id: str, after: Optional[int] = None):
+    summary, items = await analyzer.get(job_id, after)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Batch job not found (unknown or expired)")
+    return summary, items
+
+
+@router.post("/analyze/batch")
+async def analyze_batch(
+    request: BatchAnalyzeRequest,
+    stream: bool = True,
+    embedding_service: EmbeddingService = Depends(get_embedding_service),
+    vector_store: VectorStore = Depends(get_vector_store),
+    llm_service: LLMService = Depends(get_llm_service),
+    cache: AnalysisCache = Depends(get_analysis_cache),
+    scorer: FastPathScorer = Depends(get_fast_path_scorer),
+    analyzer: BatchAnalyzer = Depends(get_batch_analyzer)
+):
+    """
+    Analyze many invention ideas as one background job.
+    
+    All ideas are embedded in one batch, searched concurrently and analyzed
+    with a bounded number of concurrent LLM calls. By default the response
+    streams server-sent events:
+    - job: the job summary, including ``job_id``, sent first
+    - item: one per idea as it finishes (``index``, ``status`` "done" or
+      "error", and ``result`` or ``error``), with the SSE id set to its
+      position in completion order
+    - done: the final job summary
+    
+    With ``stream=false`` the job summary is returned right away (202). The
+    job keeps running if the client disconnects; use
+    GET /analyze/batch/{job_id} to poll or /analyze/batch/{job_id}/stream
+    to resume.
+    """
+    ideas = request.invention_ideas
+    if not ideas:
+        raise HTTPException(status_code=400, detail="No invention ideas given")
+    if len(ideas) > settings.batch_max_items:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.batch_max_items} invention ideas per batch"
+        )
+    for index, idea in enumerate(ideas):
+        try:
+            _validate_idea(idea)
+        except HTTPException as e:
+            raise HTTPException(status_code=400, detail=f"Invention idea {index}: {e.detail}")
+    metadata_filter = _metadata_filter(request.filters)
+    
+    try:
+        summary = await analyzer.submit(
+            ideas, embedding_service, vector_store, llm_service, cache, scorer, metadata_filter
+        )
+    except BatchCapacityError as e:
+        logger.warning(f"Rejecting batch: {e}")
+        raise HTTPException(status_code=503, detail="Too many batch jobs running, please retry shortly")
+    
+    if not stream:
+        return JSONResponse(status_code=202, content=summary)
+    return _batch_events(analyzer, summary, 0)
+
+
+@router.get("/analyze/batch/{job_id}")
+async def get_batch(
+    job_id: str,
+    after: int = 0,
+    analyzer: BatchAnalyzer = Depends(get_batch_analyzer)
+):
+    """
+    Poll a batch job.
+    
+    Returns the job summary plus the items finished after position ``after``
+    in completion order; pass the previous response's ``completed`` count to
+    fetch only new results.
+    """
+    summary, items = await _get_job(analyzer, job_id, after)
+    return {**summary, 'items': items}
+
+
+@router.get("/analyze/batch/{job_id}/stream")
+async def resume_batch_stream(
+    job_id: str,
+    after: int = 0,
+    last_event_id: Optional[str] = Header(default=None),
+    analyzer: BatchAnalyzer = Depends(get_batch_analyzer)
+):
+    """
+    Resume a batch job's event stream.
+    
+    Replays items finished after position ``after`` (or after the
+    ``Last-Event-ID`` header an EventSource sends on reconnect), then
+    follows the job until it ends.
+    """
+    summary, _ = await _get_job(analyzer, job_id)
+    if last_event_id is not None and last_event_id.isdigit():
+        after = int(last_event_id) + 1
+    return _batch_events(analyzer, summary, after)
+
+
+@router.delete("/analyze/batch/{job_id}")
+async def cancel_batch(
+    job_id: str,
+    analyzer: BatchAnalyzer = Depends(get_batch_analyzer)
+):
+    """Cancel a running batch job. Finished items keep their results."""
+    await _get_job(analyzer, job_id)
+    return await analyzer.cancel(job_id)
 
 
 @router.get("/health")
 async def health_check():
     """Health check endpoint."""
     return {"status": "healthy", "service": "PatentGuard API"}
+
+
+@router.get("/ready")
+async def readiness_check():
+    """Readiness endpoint: 200 once the model and index connection are warm, 503 until then."""
+    snapshot = readiness.snapshot()
+    return JSONResponse(status_code=200 if snapshot["ready"] else 503, content=snapshot)
+
+
+@router.get("/stats")
+async def service_stats():
+    """Runtime counters for the request pipeline (of the worker that answers, under app.server)."""
+    return {
+        "worker": worker_id(),
+        "embedding_batcher": get_embedding_batcher().stats(),
+        "analysis_cache": get_analysis_cache().stats(),
+        "fast_path": get_fast_path_scorer().stats(),
+        "lexical_index": get_lexical_index().stats() if settings.hybrid_search_enabled else {"enabled": False},
+        "claim_chunks": get_claim_chunk_retriever().stats() if settings.claim_chunks_per_patent else {"enabled": False},
+        "reranker": get_reranker().stats() if settings.rerank_enabled else {"enabled": False},
+        "batch_analysis": get_batch_analyzer().stats(),
+        "jobs": get_job_queue().stats(),
+        "llm": get_llm_service().stats() if get_llm_service.initialized else {"requests": 0},
+        "embedding_cache": get_embedding_cache().stats() if settings.embedding_cache_enabled else {"enabled": False}
+    }
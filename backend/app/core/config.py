@@ -4,6 +4,14 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+# backend/ directory; relative data paths in settings are resolved against it
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def resolve_data_path(path: str) -> str:
+    """Resolve a settings path relative to the backend directory."""
+    return path if os.path.isabs(path) else os.path.join(BACKEND_DIR, path)
+
 
 class Settings(BaseSettings):
     """Application configuration settings."""
@@ -12,22 +20,222 @@ class Settings(BaseSettings):
     pinecone_api_key: str = os.getenv("PINECONE_API_KEY", "")
     pinecone_index_name: str = os.getenv("PINECONE_INDEX_NAME", "patentguard")
     
+    # Vector store backend: "pinecone" or "local" (memory-mapped index on disk)
+    vector_store_backend: str = os.getenv("VECTOR_STORE_BACKEND", "pinecone")
+    local_index_path: str = os.getenv("LOCAL_INDEX_PATH", "data/local_index")
+    
+    # Local index search: "exact" (brute force) or "ivfpq" (approximate, see
+    # scripts/build_ann_index.py). nprobe and refine_factor trade recall for latency.
+    local_index_type: str = os.getenv("LOCAL_INDEX_TYPE", "exact")
+    ann_nlist: int = int(os.getenv("ANN_NLIST", "1024"))
+    ann_pq_m: int = int(os.getenv("ANN_PQ_M", "48"))
+    ann_nprobe: int = int(os.getenv("ANN_NPROBE", "16"))
+    ann_refine_factor: int = int(os.getenv("ANN_REFINE_FACTOR", "8"))
+    ann_train_sample: int = int(os.getenv("ANN_TRAIN_SAMPLE", "100000"))
+    # On-disk vector format for the local index: "float32", "float16" (half the
+    # size, but slower exact scans on CPU) or "int8" (per-vector scale, about a
+    # quarter of the size); fixed when the index is created
+    local_index_dtype: str = os.getenv("LOCAL_INDEX_DTYPE", "float32")
+    # Filtered local queries score up to this many passing rows exactly; larger
+    # sets use the ANN index (when built) with the filter applied per list
+    filter_exact_rows: int = int(os.getenv("FILTER_EXACT_ROWS", "20000"))
+    # Open the local index read-only: the API never writes it, and app/server.py
+    # always opens it this way so its workers can share one index directory
+    local_index_read_only: bool = os.getenv("LOCAL_INDEX_READ_ONLY", "false").lower() == "true"
+    
     # Groq
     groq_api_key: str = os.getenv("GROQ_API_KEY", "")
     groq_model: str = "llama-3.3-70b-versatile"  # Latest Llama 3.3 model (Dec 2024)
     
+    # LLM prompt budgeting (token counts are estimates, see core/context_packer.py).
+    # Patents share what is left of the prompt budget after the instructions and
+    # the idea; max_tokens = base + per_patent * patents included, capped
+    llm_context_window: int = int(os.getenv("LLM_CONTEXT_WINDOW", "131072"))
+    llm_prompt_token_budget: int = int(os.getenv("LLM_PROMPT_TOKEN_BUDGET", "2000"))
+    llm_max_idea_tokens: int = int(os.getenv("LLM_MAX_IDEA_TOKENS", "600"))
+    llm_min_abstract_tokens: int = int(os.getenv("LLM_MIN_ABSTRACT_TOKENS", "40"))
+    llm_completion_base_tokens: int = int(os.getenv("LLM_COMPLETION_BASE_TOKENS", "600"))
+    llm_completion_tokens_per_patent: int = int(os.getenv("LLM_COMPLETION_TOKENS_PER_PATENT", "150"))
+    llm_max_completion_tokens: int = int(os.getenv("LLM_MAX_COMPLETION_TOKENS", "2000"))
+    
+    # LLM transport (services/llm_transport.py). Calls share one connection pool,
+    # are admitted by token buckets matched to the Groq quota (requests and
+    # tokens per minute; 0 disables a limit) and retried with jittered
+    # exponential backoff on 429/5xx/timeouts until the per-call deadline.
+    # After llm_breaker_failures consecutive failures calls fail fast for
+    # llm_breaker_reset_seconds. LLM_BASE_URL points the client at another
+    # OpenAI-compatible server, e.g. benchmarks/fake_llm_server.py
+    llm_base_url: str = os.getenv("LLM_BASE_URL", "")
+    llm_max_connections: int = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+    llm_max_concurrency: int = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+    llm_requests_per_minute: float = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "30"))
+    llm_tokens_per_minute: float = float(os.getenv("LLM_TOKENS_PER_MINUTE", "12000"))
+    llm_attempt_timeout_seconds: float = float(os.getenv("LLM_ATTEMPT_TIMEOUT_SECONDS", "30"))
+    llm_deadline_seconds: float = float(os.getenv("LLM_DEADLINE_SECONDS", "60"))
+    llm_max_retries: int = int(os.getenv("LLM_MAX_RETRIES", "4"))
+    llm_backoff_base_seconds: float = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "0.5"))
+    llm_backoff_max_seconds: float = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "8"))
+    llm_breaker_failures: int = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+    llm_breaker_reset_seconds: float = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+    
     # Google Cloud
     google_credentials: str = os.getenv("GOOGLE_APPLICATION_CREDENTIALS", "")
     google_cloud_project: str = os.getenv("GOOGLE_CLOUD_PROJECT", "")
+    # Earliest publication_date (YYYYMMDD) fetched when there is no high-water mark
+    bigquery_min_publication_date: int = int(os.getenv("BIGQUERY_MIN_PUBLICATION_DATE", "20230101"))
     
     # Embedding Model
     embedding_model_name: str = "sentence-transformers/all-MiniLM-L6-v2"
     embedding_dimension: int = 384
     
+    # Inference backend: "torch", "torch-int8" (dynamic quantization), "onnx" or
+    # "onnx-int8" (ONNX Runtime, exported on first use). Non-reference backends
+    # fall back to torch if their min cosine vs. the reference is below the guard
+    embedding_backend: str = os.getenv("EMBEDDING_BACKEND", "torch")
+    embedding_onnx_dir: str = os.getenv("EMBEDDING_ONNX_DIR", "data/onnx")
+    embedding_min_cosine: float = float(os.getenv("EMBEDDING_MIN_COSINE", "0.98"))
+    
+    # Embedding micro-batching: concurrent single-text requests are coalesced
+    # into one encode call of up to max_batch_size texts
+    embedding_batching_enabled: bool = os.getenv("EMBEDDING_BATCHING_ENABLED", "true").lower() == "true"
+    embedding_batch_window_ms: float = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "5"))
+    embedding_max_batch_size: int = int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "32"))
+    embedding_max_queue_depth: int = int(os.getenv("EMBEDDING_MAX_QUEUE_DEPTH", "1024"))
+    
+    # Persistent embedding cache keyed by (model name, sha256(text)); a full
+    # re-ingest of an unchanged corpus then needs no model forward passes
+    embedding_cache_enabled: bool = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+    embedding_cache_path: str = os.getenv("EMBEDDING_CACHE_PATH", "data/embedding_cache")
+    embedding_cache_max_entries: int = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+    # "float32", "float16" or "int8": smaller entries, slightly lossy hits
+    embedding_cache_dtype: str = os.getenv("EMBEDDING_CACHE_DTYPE", "float32")
+    
+    # Analysis result cache (exact text hit, then near-duplicate query hit)
+    analysis_cache_enabled: bool = os.getenv("ANALYSIS_CACHE_ENABLED", "true").lower() == "true"
+    analysis_cache_max_entries: int = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "1024"))
+    analysis_cache_max_bytes: int = int(os.getenv("ANALYSIS_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    analysis_cache_ttl_seconds: float = float(os.getenv("ANALYSIS_CACHE_TTL_SECONDS", "86400"))
+    analysis_cache_similarity_threshold: float = float(os.getenv("ANALYSIS_CACHE_SIMILARITY_THRESHOLD", "0.97"))
+    analysis_cache_sqlite_path: str = os.getenv("ANALYSIS_CACHE_SQLITE_PATH", "")
+    
+    # Fast path: answer without the LLM when retrieval is decisive (see
+    # services/fast_path.py). Low risk: every match scores at most low_max_score
+    # and shares at most low_max_overlap of the idea's key terms. High risk: the
+    # best match scores at least high_min_score and shares high_min_overlap
+    fast_path_enabled: bool = os.getenv("FAST_PATH_ENABLED", "true").lower() == "true"
+    fast_path_low_max_score: float = float(os.getenv("FAST_PATH_LOW_MAX_SCORE", "0.30"))
+    fast_path_low_max_overlap: float = float(os.getenv("FAST_PATH_LOW_MAX_OVERLAP", "0.15"))
+    fast_path_high_min_score: float = float(os.getenv("FAST_PATH_HIGH_MIN_SCORE", "0.95"))
+    fast_path_high_min_overlap: float = float(os.getenv("FAST_PATH_HIGH_MIN_OVERLAP", "0.60"))
+    
+    # Hybrid retrieval: the top hybrid_candidates vector matches and BM25 matches
+    # (local inverted index over title, abstract and claims, built by ingestion)
+    # are fused by reciprocal rank fusion, score 1 / (hybrid_rrf_k + rank).
+    # The index writes a segment every lexical_flush_docs documents and merges
+    # them once there are more than lexical_max_segments
+    hybrid_search_enabled: bool = os.getenv("HYBRID_SEARCH_ENABLED", "true").lower() == "true"
+    lexical_index_path: str = os.getenv("LEXICAL_INDEX_PATH", "data/lexical_index")
+    hybrid_candidates: int = int(os.getenv("HYBRID_CANDIDATES", "50"))
+    hybrid_rrf_k: int = int(os.getenv("HYBRID_RRF_K", "60"))
+    bm25_k1: float = float(os.getenv("BM25_K1", "1.2"))
+    bm25_b: float = float(os.getenv("BM25_B", "0.75"))
+    lexical_flush_docs: int = int(os.getenv("LEXICAL_FLUSH_DOCS", "50000"))
+    lexical_max_segments: int = int(os.getenv("LEXICAL_MAX_SEGMENTS", "8"))
+    
+    # Claims chunking: with claim_chunks_per_patent > 0, ingestion also embeds
+    # up to that many claims per patent (independent claims first, long ones
+    # split at claim_chunk_chars) as vectors naming their parent patent.
+    # Queries then fetch chunk_candidates matches, group them by patent (best
+    # match wins, up to chunk_hits_per_patent claims kept) and log queries
+    # slower than chunk_query_budget_ms. Changing the count needs a re-ingest
+    claim_chunks_per_patent: int = int(os.getenv("CLAIM_CHUNKS_PER_PATENT", "0"))
+    claim_chunk_chars: int = int(os.getenv("CLAIM_CHUNK_CHARS", "1000"))
+    chunk_candidates: int = int(os.getenv("CHUNK_CANDIDATES", "100"))
+    chunk_hits_per_patent: int = int(os.getenv("CHUNK_HITS_PER_PATENT", "3"))
+    chunk_query_budget_ms: float = float(os.getenv("CHUNK_QUERY_BUDGET_MS", "150"))
+    
+    # Reranking: with rerank_enabled, retrieval fetches rerank_candidates
+    # patents and a cross-encoder (sentence-transformers CrossEncoder, CPU)
+    # rescores (idea, title + abstract) pairs in batches of rerank_batch_size,
+    # best retrieval rank first. Scoring stops once rerank_budget_ms is spent;
+    # unscored candidates keep their retrieval order behind the scored ones.
+    # Scores are cached per (idea hash, patent id), up to rerank_cache_entries
+    rerank_enabled: bool = os.getenv("RERANK_ENABLED", "false").lower() == "true"
+    rerank_model_name: str = os.getenv("RERANK_MODEL_NAME", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+    rerank_candidates: int = int(os.getenv("RERANK_CANDIDATES", "50"))
+    rerank_batch_size: int = int(os.getenv("RERANK_BATCH_SIZE", "16"))
+    rerank_budget_ms: float = float(os.getenv("RERANK_BUDGET_MS", "400"))
+    rerank_max_chars: int = int(os.getenv("RERANK_MAX_CHARS", "1500"))
+    rerank_cache_entries: int = int(os.getenv("RERANK_CACHE_ENTRIES", "50000"))
+    
+    # Concurrency: blocking service calls run in bounded thread pools so the
+    # event loop stays responsive while a request waits on the model or network
+    embedding_max_workers: int = int(os.getenv("EMBEDDING_MAX_WORKERS", "2"))
+    io_max_workers: int = int(os.getenv("IO_MAX_WORKERS", "16"))
+    
+    # Batch analysis (/api/analyze/batch): LLM calls in flight across all jobs,
+    # ideas per batch, and how many jobs (and for how long) results are kept.
+    # Job state lives in the job queue's SQLite file; streams of jobs another
+    # server process runs poll it every batch_poll_interval_seconds
+    batch_llm_concurrency: int = int(os.getenv("BATCH_LLM_CONCURRENCY", "4"))
+    batch_max_items: int = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+    batch_max_jobs: int = int(os.getenv("BATCH_MAX_JOBS", "100"))
+    batch_job_ttl_seconds: float = float(os.getenv("BATCH_JOB_TTL_SECONDS", "3600"))
+    batch_poll_interval_seconds: float = float(os.getenv("BATCH_POLL_INTERVAL_SECONDS", "0.5"))
+    
+    # Job queue (/api/jobs): SQLite-backed, drained by in-process async workers.
+    # Enqueues are rejected with 503 once job_max_queue_depth jobs are waiting
+    job_queue_path: str = os.getenv("JOB_QUEUE_PATH", "data/jobs.sqlite")
+    job_workers: int = int(os.getenv("JOB_WORKERS", "2"))
+    job_max_queue_depth: int = int(os.getenv("JOB_MAX_QUEUE_DEPTH", "1000"))
+    job_max_attempts: int = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+    job_lease_seconds: float = float(os.getenv("JOB_LEASE_SECONDS", "600"))
+    job_poll_interval_seconds: float = float(os.getenv("JOB_POLL_INTERVAL_SECONDS", "1.0"))
+    job_result_ttl_seconds: float = float(os.getenv("JOB_RESULT_TTL_SECONDS", "86400"))
+    job_retry_after_seconds: int = int(os.getenv("JOB_RETRY_AFTER_SECONDS", "30"))
+    
+    # Bulk ingestion pipeline (scripts/ingest_patents.py): rows are fetched in
+    # pages, embedded and upserted in batches, with bounded queues between stages
+    ingest_page_size: int = int(os.getenv("INGEST_PAGE_SIZE", "1000"))
+    ingest_embed_batch_size: int = int(os.getenv("INGEST_EMBED_BATCH_SIZE", "64"))
+    ingest_upsert_batch_size: int = int(os.getenv("INGEST_UPSERT_BATCH_SIZE", "100"))
+    ingest_queue_depth: int = int(os.getenv("INGEST_QUEUE_DEPTH", "8"))
+    ingest_checkpoint_path: str = os.getenv("INGEST_CHECKPOINT_PATH", "data/ingest_checkpoint.json")
+    # Delta ingestion: what is already in the vector store, and with which model
+    ingest_manifest_path: str = os.getenv("INGEST_MANIFEST_PATH", "data/ingest_manifest.sqlite")
+    
+    # Ingestion embedding workers: 0 embeds in-process; N > 0 starts N worker
+    # processes (each loads the model) with threads_per_worker torch threads
+    ingest_embed_workers: int = int(os.getenv("INGEST_EMBED_WORKERS", "0"))
+    ingest_embed_threads_per_worker: int = int(os.getenv("INGEST_EMBED_THREADS_PER_WORKER", "1"))
+    ingest_encode_batch_size: int = int(os.getenv("INGEST_ENCODE_BATCH_SIZE", "64"))
+    
+    # Startup: warm the model and index connection in the background
+    warmup_on_startup: bool = os.getenv("WARMUP_ON_STARTUP", "true").lower() == "true"
+    
+    # Prometheus metrics at /metrics (stage latencies, HTTP requests, cache and
+    # upstream counters); disabling turns every record call into a no-op
+    metrics_enabled: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    # Under app.server each worker writes its metrics to metrics_dir every
+    # metrics_publish_interval_seconds (and when scraped), and /metrics on any
+    # worker serves all workers' metrics with a "worker" label
+    metrics_dir: str = os.getenv("METRICS_DIR", "data/metrics")
+    metrics_publish_interval_seconds: float = float(os.getenv("METRICS_PUBLISH_INTERVAL_SECONDS", "5"))
+    
     # Server
     host: str = os.getenv("HOST", "0.0.0.0")
     port: int = int(os.getenv("PORT", "8000"))
     
+    # Production server (python -m app.server): server_workers uvicorn worker
+    # processes (0 = one per CPU) forked from a parent that has loaded the
+    # models and local indexes, so their memory pages are shared. Torch gets
+    # server_worker_threads threads per worker (0 = CPUs / workers). Workers
+    # get server_graceful_timeout_seconds to finish requests on shutdown
+    server_workers: int = int(os.getenv("SERVER_WORKERS", "1"))
+    server_preload: bool = os.getenv("SERVER_PRELOAD", "true").lower() == "true"
+    server_worker_threads: int = int(os.getenv("SERVER_WORKER_THREADS", "0"))
+    server_graceful_timeout_seconds: float = float(os.getenv("SERVER_GRACEFUL_TIMEOUT_SECONDS", "30"))
+    
     # CORS
     cors_origins: list = ["http://localhost:5173", "http://localhost:5174", "http://localhost:3000"]
     
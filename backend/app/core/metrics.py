@@ -0,0 +1,446 @@
+"""
+Prometheus-style metrics: counters, gauges and histograms in the text exposition format.
+
+Recording is a lock-protected add on a pre-resolved child (``labels`` is
+looked up once, at import time, for the fixed label sets of the hot path),
+so instrumentation costs well under a microsecond per event (see
+benchmarks/bench_metrics_overhead.py). Counters that services already keep
+for /api/stats are not duplicated: collectors read them when /metrics is
+scraped.
+
+Under the production server (app/server.py) every worker keeps its own
+counters. Each worker writes them to a shared directory, labeled with its
+worker number, every METRICS_PUBLISH_INTERVAL_SECONDS and whenever it is
+scraped, so /metrics served by any worker covers all of them (other
+workers' values are at most one interval old). Collectors marked
+``shared`` read state every worker sees alike, such as the SQLite job
+queue, and are reported once, without a worker label.
+"""
+from app.core.config import settings
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds, from sub-millisecond index lookups to LLM calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# (metric name, type, help, [(labels, value), ...]) as returned by collectors
+MetricFamily = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+# (metric name, type, help, [sample line, ...]) ready to render
+_RenderedFamily = Tuple[str, str, str, List[str]]
+
+_enabled = settings.metrics_enabled
+
+# Worker number and shared directory, set by configure_worker_metrics in server workers
+_worker: Optional[str] = None
+_worker_dir: Optional[str] = None
+
+
+def metrics_enabled() -> bool:
+    return _enabled
+
+
+def set_metrics_enabled(enabled: bool):
+    """Turn recording on or off process-wide (off makes every record call a no-op)."""
+    global _enabled
+    _enabled = enabled
+
+
+def worker_id() -> Optional[str]:
+    """This process's worker number under the production server, None otherwise."""
+    return _worker
+
+
+def reset_worker_metrics(directory: str):
+    """Remove the snapshots of a previous server run (called by the parent before forking)."""
+    os.makedirs(directory, exist_ok=True)
+    for filename in os.listdir(directory):
+        if filename.startswith("worker-"):
+            os.remove(os.path.join(directory, filename))
+
+
+def configure_worker_metrics(index: int, directory: str, interval: float = settings.metrics_publish_interval_seconds):
+    """
+    Label this worker's metrics with its number and publish them to ``directory``.
+    
+    Args:
+        index: Worker number
+        directory: Directory shared by the workers of one server
+        interval: Seconds between snapshots
+    """
+    global _worker, _worker_dir
+    _worker, _worker_dir = str(index), directory
+    os.makedirs(directory, exist_ok=True)
+    threading.Thread(target=_publish_loop, args=(interval,), name="metrics-publisher", daemon=True).start()
+
+
+def _publish_loop(interval: float):
+    while True:
+        time.sleep(interval)
+        try:
+            REGISTRY.publish()
+        except Exception as e:
+            logger.warning(f"Error publishing worker metrics: {e}")
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _CounterChild:
+    __slots__ = ("_value", "_lock")
+    
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+    
+    def inc(self, amount: float = 1.0):
+        if _enabled:
+            with self._lock:
+                self._value += amount
+    
+    def samples(self, name: str, labels: Dict[str, str]) -> List[str]:
+        return [f"{name}{_format_labels(labels)} {_format_value(self._value)}"]
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+    
+    def dec(self, amount: float = 1.0):
+        if _enabled:
+            with self._lock:
+                self._value -= amount
+    
+    def set(self, value: float):
+        if _enabled:
+            self._value = value
+
+
+class _Timer:
+    """Context manager observing the elapsed time of its block (also when it raises)."""
+    __slots__ = ("_child", "_start")
+    
+    def __init__(self, child: "_HistogramChild"):
+        self._child = child
+    
+    def __enter__(self) -> "_Timer":
+        self._start = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self._child.observe(time.perf_counter() - self._start)
+
+
+class _NullTimer:
+    """Stands in for ``_Timer`` while metrics are disabled, skipping the clock reads."""
+    __slots__ = ()
+    
+    def __enter__(self) -> "_NullTimer":
+        return self
+    
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _HistogramChild:
+    __slots__ = ("_bounds", "_counts", "_sum", "_lock")
+    
+    def __init__(self, bounds: Tuple[float, ...]):
+        self._bounds = bounds
+        self._counts = [0] * (len(bounds) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+    
+    def observe(self, value: float):
+        if _enabled:
+            index = bisect_left(self._bounds, value)
+            with self._lock:
+                self._counts[index] += 1
+                self._sum += value
+    
+    def time(self) -> _Timer:
+        return _Timer(self) if _enabled else _NULL_TIMER
+    
+    def samples(self, name: str, labels: Dict[str, str]) -> List[str]:
+        with self._lock:
+            counts, total = list(self._counts), self._sum
+        lines, cumulative = [], 0
+        for bound, count in zip(self._bounds + (float("inf"),), counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_format_labels({**labels, 'le': _format_value(bound)})} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+        lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+        return lines
+
+
+class _Metric:
+    """A named metric with a fixed set of label names; each label combination is a child."""
+    
+    kind = ""
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 registry: Optional["MetricsRegistry"] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+        (registry or REGISTRY).register(self)
+    
+    def _new_child(self):
+        raise NotImplementedError
+    
+    def labels(self, *values: str):
+        """The child for these label values (resolve once and keep it on hot paths)."""
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {values}")
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+    
+    def samples(self, labels: Dict[str, str]) -> List[str]:
+        """Sample lines of every child, with ``labels`` added to each."""
+        lines = []
+        for values, child in list(self._children.items()):
+            lines += child.samples(self.name, {**labels, **dict(zip(self.labelnames, values))})
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonically increasing count (name it ``*_total``)."""
+    
+    kind = "counter"
+    
+    def _new_child(self):
+        return _CounterChild()
+    
+    def inc(self, amount: float = 1.0):
+        self._children[()].inc(amount)
+
+
+class Gauge(_Metric):
+    """A value that goes up and down, such as requests in flight."""
+    
+    kind = "gauge"
+    
+    def _new_child(self):
+        return _GaugeChild()
+    
+    def inc(self, amount: float = 1.0):
+        self._children[()].inc(amount)
+    
+    def dec(self, amount: float = 1.0):
+        self._children[()].dec(amount)
+    
+    def set(self, value: float):
+        self._children[()].set(value)
+
+
+class Histogram(_Metric):
+    """Distribution of observed values (durations in seconds) over fixed buckets."""
+    
+    kind = "histogram"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, registry: Optional["MetricsRegistry"] = None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+    
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+    
+    def observe(self, value: float):
+        self._children[()].observe(value)
+    
+    def time(self) -> _Timer:
+        return self._children[()].time()
+
+
+class MetricsRegistry:
+    """Metrics and scrape-time collectors, rendered together by ``render``."""
+    
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Tuple[Callable[[], Iterable[MetricFamily]], bool]] = []
+        self._lock = threading.Lock()
+    
+    def register(self, metric: _Metric):
+        with self._lock:
+            if any(existing.name == metric.name for existing in self._metrics):
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics.append(metric)
+    
+    def add_collector(self, collector: Callable[[], Iterable[MetricFamily]], shared: bool = False):
+        """
+        Register a function returning metric families read at scrape time.
+        
+        Args:
+            collector: The function
+            shared: It reads state that is the same in every worker (e.g.
+                SQLite tables), so it is reported once, without a worker label
+        """
+        with self._lock:
+            self._collectors.append((collector, shared))
+    
+    def collect(self, labels: Optional[Dict[str, str]] = None, local: bool = True,
+                shared: bool = True) -> List[_RenderedFamily]:
+        """
+        Metric families as sample lines.
+        
+        Args:
+            labels: Added to the samples of this process's own metrics
+            local: Include this process's metrics and collectors
+            shared: Include the shared collectors
+        """
+        labels = labels or {}
+        families: List[_RenderedFamily] = []
+        if local:
+            families += [(m.name, m.kind, m.documentation, m.samples(labels)) for m in list(self._metrics)]
+        for collector, is_shared in list(self._collectors):
+            if not (shared if is_shared else local):
+                continue
+            extra = {} if is_shared else labels
+            for name, kind, documentation, samples in collector():
+                families.append((name, kind, documentation, [
+                    f"{name}{_format_labels({**extra, **sample_labels})} {_format_value(value)}"
+                    for sample_labels, value in samples
+                ]))
+        return families
+    
+    def publish(self) -> List[_RenderedFamily]:
+        """Write this worker's own metrics to the shared directory and return them."""
+        families = self.collect({"worker": _worker}, shared=False)
+        path = os.path.join(_worker_dir, f"worker-{_worker}.json")
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(families, f)
+        os.replace(temp_path, path)
+        return families
+    
+    def _collect_workers(self) -> List[_RenderedFamily]:
+        """This worker's metrics, the other workers' latest snapshots and the shared collectors."""
+        merged: Dict[str, _RenderedFamily] = {}
+        snapshots = [self.publish()]
+        own = f"worker-{_worker}.json"
+        for filename in sorted(os.listdir(_worker_dir)):
+            if filename == own or not (filename.startswith("worker-") and filename.endswith(".json")):
+                continue
+            try:
+                with open(os.path.join(_worker_dir, filename)) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping metrics snapshot {filename}: {e}")
+        for families in snapshots:
+            for name, kind, documentation, samples in families:
+                merged.setdefault(name, (name, kind, documentation, []))[3].extend(samples)
+        return list(merged.values()) + self.collect(local=False)
+    
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        families = self.collect() if _worker is None else self._collect_workers()
+        lines: List[str] = []
+        for name, kind, documentation, samples in families:
+            lines += [f"# HELP {name} {documentation}", f"# TYPE {name} {kind}"] + samples
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# Starlette appends "; charset=utf-8"
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+# HTTP (recorded by MetricsMiddleware)
+HTTP_REQUESTS = Counter(
+    "patentguard_http_requests_total", "HTTP requests by route and status", ["method", "route", "status"]
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "patentguard_http_request_duration_seconds", "HTTP request duration until the last body byte",
+    ["method", "route"]
+)
+HTTP_IN_FLIGHT = Gauge("patentguard_http_requests_in_flight", "HTTP requests being handled")
+
+# Analysis pipeline
+STAGE_SECONDS = Histogram(
+    "patentguard_stage_duration_seconds",
+    "Time spent per analysis stage (embed, vector_query, lexical_query, rerank, prompt_build, llm_call, json_parse)",
+    ["stage"]
+)
+UPSTREAM_ERRORS = Counter(
+    "patentguard_upstream_errors_total", "Failed calls to the LLM provider and vector store", ["service"]
+)
+LLM_JSON_FALLBACKS = Counter(
+    "patentguard_llm_json_fallbacks_total", "LLM responses that were not valid JSON and were wrapped as text"
+)
+LLM_IN_FLIGHT = Gauge("patentguard_llm_calls_in_flight", "LLM calls waiting for a response")
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware counting and timing HTTP requests.
+    
+    Requests are labeled by route template ("/api/jobs/{job_id}"), not raw
+    path, to keep label cardinality bounded; unmatched paths share one
+    label. Streaming responses are timed until their last byte.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+        self._routes: Optional[Dict[Any, str]] = None
+    
+    def _route(self, scope) -> str:
+        if self._routes is None:
+            self._routes = {
+                route.endpoint: route.path
+                for route in getattr(scope.get("app"), "routes", [])
+                if hasattr(route, "endpoint")
+            }
+        return self._routes.get(scope.get("endpoint"), "unmatched")
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _enabled:
+            await self.app(scope, receive, send)
+            return
+        
+        status = 500
+        
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+        
+        start = time.perf_counter()
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            route = self._route(scope)
+            HTTP_REQUESTS.labels(scope["method"], route, str(status)).inc()
+            HTTP_REQUEST_SECONDS.labels(scope["method"], route).observe(time.perf_counter() - start)
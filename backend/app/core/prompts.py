@@ -1,11 +1,13 @@
 """Prompts for LLM analysis."""
 
+SYSTEM_MESSAGE = "You are an expert Patent Attorney. Always respond with valid JSON."
+
 PATENT_ANALYSIS_PROMPT = """You are an expert Patent Attorney with deep knowledge of intellectual property law and prior art analysis.
 
 USER'S INVENTION IDEA:
 {user_idea}
 
-RETRIEVED PRIOR ART (Top 5 Most Similar Patents):
+RETRIEVED PRIOR ART (Most Similar Patents, Best Match First):
 {retrieved_patents}
 
 TASK:
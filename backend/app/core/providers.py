@@ -0,0 +1,54 @@
+"""Lazily constructed, thread-safe service singletons."""
+from typing import Callable, Generic, Optional, TypeVar
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class LazyProvider(Generic[T]):
+    """
+    Builds a service on first use and hands out the same instance afterwards.
+    
+    Instances are callable with no arguments, so they can be used directly as
+    FastAPI dependencies (``Depends(get_llm_service)``). FastAPI runs sync
+    dependencies in its thread pool, so a slow first construction (loading a
+    model, opening a network client) never blocks the event loop.
+    """
+    
+    def __init__(self, factory: Callable[[], T], name: str):
+        self._factory = factory
+        self.name = name
+        self._instance: Optional[T] = None
+        self._lock = threading.Lock()
+        self.load_seconds: Optional[float] = None
+    
+    def __call__(self) -> T:
+        instance = self._instance
+        if instance is not None:
+            return instance
+        with self._lock:
+            if self._instance is None:
+                start = time.perf_counter()
+                self._instance = self._factory()
+                self.load_seconds = time.perf_counter() - start
+                logger.info(f"Initialized {self.name} in {self.load_seconds:.2f}s")
+            return self._instance
+    
+    @property
+    def initialized(self) -> bool:
+        """Whether the service has been constructed."""
+        return self._instance is not None
+    
+    def override(self, instance: Optional[T]):
+        """
+        Replace the service, e.g. with a local stand-in for benchmarks.
+        
+        Args:
+            instance: Service to hand out, or None to go back to lazy construction
+        """
+        with self._lock:
+            self._instance = instance
@@ -0,0 +1,39 @@
+"""Tracks which services have finished warming up."""
+from typing import Any, Dict, Iterable
+import time
+
+
+class Readiness:
+    """Per-component warmup status behind the /api/ready endpoint."""
+    
+    def __init__(self):
+        self.started_at = time.time()
+        self.components: Dict[str, Dict[str, Any]] = {}
+    
+    def expect(self, names: Iterable[str]):
+        """Register components that must warm up before the API is ready."""
+        for name in names:
+            self.components[name] = {"status": "pending"}
+    
+    def mark_ready(self, name: str, seconds: float):
+        self.components[name] = {"status": "ready", "seconds": round(seconds, 3)}
+    
+    def mark_failed(self, name: str, error: Exception, seconds: float):
+        self.components[name] = {"status": "failed", "error": str(error), "seconds": round(seconds, 3)}
+    
+    @property
+    def ready(self) -> bool:
+        """True once every expected component has warmed up successfully."""
+        return all(c["status"] == "ready" for c in self.components.values())
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """Return overall and per-component status."""
+        return {
+            "ready": self.ready,
+            "uptime_seconds": round(time.time() - self.started_at, 3),
+            "components": dict(self.components)
+        }
+
+
+# Process-wide readiness state
+readiness = Readiness()
@@ -0,0 +1,30 @@
+"""Word tokenization shared by lexical search and the fast-path scorer."""
+from typing import List
+import re
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+# Words too common in invention descriptions and patent text to carry meaning
+STOPWORDS = frozenset("""
+    a an and are as at be by can comprising comprises configured device each for from has have in
+    including into is it its least method more of on one or said such system that the their these this
+    to used using via wherein which with within
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into search terms, in order.
+    
+    Terms are lower-cased alphanumeric runs of two or more characters that
+    are not stopwords; a plural ``s`` is stripped from longer words so that
+    "sensors" and "sensor" match.
+    """
+    terms = []
+    for word in _WORD.findall(text.lower()):
+        if len(word) < 2 or word in STOPWORDS:
+            continue
+        if len(word) > 4 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        terms.append(word)
+    return terms
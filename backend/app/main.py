@@ -1,10 +1,23 @@
 """Main FastAPI application."""
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.routes import router
+from app.api.routes import router, JOB_HANDLERS
+from app.api.metrics import router as metrics_router
 from app.core.config import settings
-from app.services.pinecone_svc import pinecone_service
+from app.core.executors import embedding_executor, io_executor, run_blocking, shutdown_executors
+from app.core.metrics import MetricsMiddleware
+from app.core.readiness import readiness
+from app.services.embedding_svc import get_embedding_service
+from app.services.vector_store import get_vector_store
+from app.services.lexical_index import get_lexical_index
+from app.services.llm_svc import get_llm_service
+from app.services.reranker import get_reranker
+from app.services.cache_svc import get_analysis_cache
+from app.services.embedding_cache import get_embedding_cache
+from app.services.job_queue import JobWorkers, get_job_queue
+import asyncio
 import logging
+import time
 
 # Configure logging
 logging.basicConfig(
@@ -30,23 +43,69 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request counts and latencies per route (served at /metrics)
+app.add_middleware(MetricsMiddleware)
+
 # Include API routes
 app.include_router(router, prefix="/api")
+app.include_router(metrics_router)
 
+# Components warmed in parallel at startup: (name, executor, warmup callable)
+WARMUP_TASKS = [
+    ("embedding_model", embedding_executor, lambda: get_embedding_service().warmup()),
+    ("vector_index", io_executor, lambda: get_vector_store().initialize_index()),
+    ("lexical_index", io_executor, lambda: get_lexical_index().refresh()),
+    ("llm_client", io_executor, get_llm_service),
+    ("analysis_cache", io_executor, get_analysis_cache),
+]
+if settings.rerank_enabled:
+    WARMUP_TASKS.append(("rerank_model", embedding_executor, lambda: get_reranker().warmup()))
 
-@app.on_event("startup")
-async def startup_event():
-    """Initialize services on startup."""
-    logger.info("Starting PatentGuard API...")
+
+async def _warm(name, executor, func):
+    """Warm one component and record the outcome."""
+    start = time.perf_counter()
     try:
-        # Initialize Pinecone connection
-        pinecone_service.initialize_index()
-        logger.info("Pinecone initialized successfully")
+        await run_blocking(executor, func)
+        readiness.mark_ready(name, time.perf_counter() - start)
+        logger.info(f"{name} ready in {time.perf_counter() - start:.2f}s")
     except Exception as e:
-        logger.error(f"Error during startup: {e}")
+        readiness.mark_failed(name, e, time.perf_counter() - start)
+        logger.error(f"Error warming up {name}: {e}")
         logger.warning("Some services may not be available")
 
 
+async def warm_up_services():
+    """Load the model and connect to the index concurrently."""
+    start = time.perf_counter()
+    await asyncio.gather(*[_warm(name, executor, func) for name, executor, func in WARMUP_TASKS])
+    logger.info(f"Warmup finished in {time.perf_counter() - start:.2f}s (ready={readiness.ready})")
+
+
+@app.on_event("startup")
+async def startup_event():
+    """Start warming services in the background so the server accepts connections right away."""
+    logger.info("Starting PatentGuard API...")
+    if settings.warmup_on_startup:
+        readiness.expect(name for name, _, _ in WARMUP_TASKS)
+        app.state.warmup_task = asyncio.create_task(warm_up_services())
+    if settings.job_workers > 0:
+        queue = await run_blocking(io_executor, get_job_queue)
+        app.state.job_workers = JobWorkers(queue, JOB_HANDLERS)
+        app.state.job_workers.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Hand running jobs back to the queue, persist the embedding cache and release worker threads."""
+    job_workers = getattr(app.state, "job_workers", None)
+    if job_workers is not None:
+        await job_workers.stop()
+    if get_embedding_cache.initialized:
+        get_embedding_cache().flush()
+    shutdown_executors()
+
+
 @app.get("/")
 async def root():
     """Root endpoint."""
@@ -0,0 +1,273 @@
+"""
+Production server: uvicorn workers forked from a parent that has loaded the models.
+
+Usage (from backend/):
+    python -m app.server --workers 4
+
+``main.py`` runs a single auto-reloading process for development. Here the
+parent binds the listening socket, loads what the workers can share (the
+embedding and rerank model weights, the local vector index with its ANN
+lists, the lexical index) and then forks ``workers`` processes that each run
+uvicorn on the inherited socket; the kernel spreads connections over them.
+Forked pages stay shared until written, and ``gc.freeze`` keeps the
+collector from touching (and so copying) the preloaded objects. The local
+index files are mapped read-only, so their page cache copy is shared too.
+
+What is not shared is opened in each worker after the fork: SQLite
+connections, the Pinecone and Groq clients, thread pools, and the first
+model forward pass (warmup), since neither threads nor SQLite handles
+survive a fork. Per worker:
+- the Groq request and token quotas are divided by the number of workers
+- only worker 0 uses the embedding cache, whose directory one process must own
+- JOB_WORKERS job workers drain the shared SQLite job queue (claims are
+  leases, so workers in several processes never run the same job)
+- a batch job (/api/analyze/batch) runs in the worker that accepted it,
+  but its status and results are kept in the job queue's SQLite file, so
+  any worker can answer polls, resumed streams and cancels for it
+- each worker labels its metrics with worker="<index>" and writes them to
+  METRICS_DIR, so /metrics on any worker serves every worker's series;
+  /api/stats reports the counters of the worker that answered (its
+  "worker" field)
+
+The parent restarts workers that exit and, on SIGTERM or SIGINT, stops them
+with SIGTERM (uvicorn drains open requests) and SIGKILL after
+SERVER_GRACEFUL_TIMEOUT_SECONDS.
+"""
+from app.core.config import resolve_data_path, settings
+from app.core.metrics import configure_worker_metrics, reset_worker_metrics
+from typing import Callable, Dict, Optional, Tuple
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def preload_services():
+    """
+    Load the models and local indexes the workers will share.
+    
+    Runs in the parent on its main thread and only builds objects that
+    survive a fork: model weights without running them, memory mappings,
+    and no thread pools or open SQLite connections.
+    """
+    from app.services.embedding_svc import get_embedding_service
+    from app.services.lexical_index import get_lexical_index
+    from app.services.reranker import get_reranker
+    from app.services.vector_store import get_vector_store
+    
+    steps = [("embedding_model", get_embedding_service)]
+    if settings.rerank_enabled:
+        steps.append(("rerank_model", lambda: get_reranker().model))
+    if settings.vector_store_backend.lower() == "local":
+        steps.append(("vector_index", lambda: _preload_local_index(get_vector_store())))
+    if settings.hybrid_search_enabled:
+        steps.append(("lexical_index", lambda: get_lexical_index().refresh()))
+    
+    for name, func in steps:
+        start = time.perf_counter()
+        try:
+            func()
+            logger.info(f"Preloaded {name} in {time.perf_counter() - start:.2f}s")
+        except Exception as e:
+            # The workers try again during their warmup and report it in /api/ready
+            logger.error(f"Error preloading {name}: {e}")
+
+
+def _preload_local_index(store):
+    store.initialize_index()
+    if hasattr(store, "close"):
+        store.close()
+
+
+def configure_worker(index: int, workers: int):
+    """
+    Per-process settings, applied in a worker right after the fork.
+    
+    Args:
+        index: Worker number, 0 to ``workers`` - 1
+        workers: Number of workers
+    """
+    threads = settings.server_worker_threads or max(1, (os.cpu_count() or 1) // workers)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    
+    # Quotas are per API key, so each worker may use its share
+    settings.llm_requests_per_minute /= workers
+    settings.llm_tokens_per_minute /= workers
+    if index > 0:
+        # One process owns the embedding cache directory (see EmbeddingCache)
+        settings.embedding_cache_enabled = False
+    if settings.metrics_enabled:
+        configure_worker_metrics(index, resolve_data_path(settings.metrics_dir))
+
+
+class PreforkServer:
+    """
+    Runs ``workers`` uvicorn processes forked from this one on a shared socket.
+    
+    Args:
+        app: ASGI app, or an "module:attribute" import string
+        workers: Number of worker processes (0 = one per CPU)
+        host: Address to bind
+        port: Port to bind
+        preload: Load the shared models and indexes before forking
+        post_fork: Called in each worker with (index, workers) after
+            ``configure_worker``, before uvicorn starts
+        graceful_timeout: Seconds workers get to finish on shutdown
+    """
+    
+    # A worker that exits sooner than this after starting is restarted after a pause
+    MIN_UPTIME_SECONDS = 5.0
+    
+    def __init__(
+        self,
+        app="app.main:app",
+        workers: int = settings.server_workers,
+        host: str = settings.host,
+        port: int = settings.port,
+        preload: bool = settings.server_preload,
+        post_fork: Optional[Callable[[int, int], None]] = None,
+        graceful_timeout: float = settings.server_graceful_timeout_seconds
+    ):
+        self.app = app
+        self.workers = workers or os.cpu_count() or 1
+        self.host = host
+        self.port = port
+        self.preload = preload
+        self.post_fork = post_fork
+        self.graceful_timeout = graceful_timeout
+        self._socket: Optional[socket.socket] = None
+        self._children: Dict[int, Tuple[int, float]] = {}
+        self._stopping = False
+    
+    def _bind(self) -> socket.socket:
+        sock = socket.socket(socket.AF_INET6 if ":" in self.host else socket.AF_INET)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(2048)
+        sock.set_inheritable(True)
+        return sock
+    
+    def _load_app(self):
+        if not isinstance(self.app, str):
+            return self.app
+        module_name, attribute = self.app.split(":")
+        module = __import__(module_name, fromlist=[attribute])
+        return getattr(module, attribute)
+    
+    def _spawn(self, index: int):
+        pid = os.fork()
+        if pid:
+            self._children[pid] = (index, time.monotonic())
+            return
+        code = 1
+        try:
+            self._run_worker(index)
+            code = 0
+        except BaseException:
+            logger.exception(f"Worker {index} failed")
+        finally:
+            os._exit(code)
+    
+    def _run_worker(self, index: int):
+        import uvicorn
+        
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        configure_worker(index, self.workers)
+        if self.post_fork is not None:
+            self.post_fork(index, self.workers)
+        logger.info(f"Worker {index} started (pid {os.getpid()})")
+        config = uvicorn.Config(self.app, lifespan="on", timeout_graceful_shutdown=self.graceful_timeout)
+        uvicorn.Server(config).run(sockets=[self._socket])
+    
+    def _handle_stop(self, signum, frame):
+        self._stopping = True
+    
+    def run(self):
+        """Bind, preload, fork the workers and supervise them until SIGTERM or SIGINT."""
+        self._socket = self._bind()
+        # The index is only read while serving, by every worker
+        settings.local_index_read_only = True
+        self.app = self._load_app()
+        if settings.metrics_enabled:
+            reset_worker_metrics(resolve_data_path(settings.metrics_dir))
+        if self.preload:
+            preload_services()
+        if threading.active_count() > 1:
+            logger.warning(
+                f"{threading.active_count() - 1} threads running before fork; workers will not have them"
+            )
+        # Objects allocated so far are never collected, so the collector leaves their pages shared
+        gc.collect()
+        gc.freeze()
+        
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+        logger.info(f"Serving on {self.host}:{self.port} with {self.workers} workers (pid {os.getpid()})")
+        for index in range(self.workers):
+            self._spawn(index)
+        
+        while not self._stopping:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if not pid:
+                time.sleep(0.2)
+                continue
+            index, started = self._children.pop(pid, (None, 0.0))
+            if index is None or self._stopping:
+                continue
+            logger.warning(f"Worker {index} (pid {pid}) exited with status {os.waitstatus_to_exitcode(status)}")
+            if time.monotonic() - started < self.MIN_UPTIME_SECONDS:
+                time.sleep(1.0)
+            self._spawn(index)
+        self.stop()
+    
+    def stop(self):
+        """Stop the workers gracefully, killing those still running after the graceful timeout."""
+        for pid in self._children:
+            os.kill(pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.graceful_timeout
+        while self._children and time.monotonic() < deadline:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+            if pid:
+                self._children.pop(pid, None)
+            else:
+                time.sleep(0.1)
+        for pid in self._children:
+            logger.warning(f"Worker pid {pid} did not stop in {self.graceful_timeout:.0f}s; killing it")
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        self._children.clear()
+        if self._socket is not None:
+            self._socket.close()
+        logger.info("Server stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the API with several worker processes")
+    parser.add_argument("--workers", type=int, default=settings.server_workers, help="Worker processes (0 = one per CPU)")
+    parser.add_argument("--host", default=settings.host)
+    parser.add_argument("--port", type=int, default=settings.port)
+    parser.add_argument("--no-preload", action="store_true", help="Load models in each worker instead of before forking")
+    args = parser.parse_args()
+    
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(process)d - %(name)s - %(levelname)s - %(message)s'
+    )
+    PreforkServer(
+        workers=args.workers, host=args.host, port=args.port, preload=settings.server_preload and not args.no_preload
+    ).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+"""Inverted-file index with product quantization (IVF-PQ) for approximate search."""
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _assign(data: np.ndarray, centroids: np.ndarray, spherical: bool, chunk: int = 65536) -> np.ndarray:
+    """Nearest centroid per row (max inner product if spherical, else min L2)."""
+    out = np.empty(len(data), dtype=np.int64)
+    centroid_norms = None if spherical else (centroids ** 2).sum(axis=1)
+    for start in range(0, len(data), chunk):
+        block = data[start:start + chunk] @ centroids.T
+        if spherical:
+            out[start:start + chunk] = block.argmax(axis=1)
+        else:
+            out[start:start + chunk] = (centroid_norms - 2 * block).argmin(axis=1)
+    return out
+
+
+def kmeans(data: np.ndarray, k: int, iterations: int, rng: np.random.Generator,
+           spherical: bool = False) -> np.ndarray:
+    """
+    Lloyd's k-means.
+    
+    Args:
+        data: Training rows, float32
+        k: Number of centroids
+        iterations: Number of assign/update rounds
+        rng: Random generator for seeding and empty-cluster reseeding
+        spherical: Keep centroids on the unit sphere (cosine k-means)
+        
+    Returns:
+        (k, dim) float32 centroids
+    """
+    centroids = data[rng.choice(len(data), k, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = _assign(data, centroids, spherical)
+        order = np.argsort(assignment, kind="stable")
+        counts = np.bincount(assignment, minlength=k)
+        nonempty = np.flatnonzero(counts)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[nonempty]
+        centroids[nonempty] = np.add.reduceat(data[order], starts, axis=0) / counts[nonempty, None]
+        
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            centroids[empty] = data[rng.choice(len(data), len(empty), replace=False)]
+        if spherical:
+            centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+    return centroids.astype(np.float32)
+
+
+class IVFPQIndex:
+    """
+    Approximate inner-product search over L2-normalized vectors.
+    
+    Vectors are partitioned by a coarse spherical k-means quantizer into
+    ``nlist`` inverted lists. With ``pq_m > 0`` each vector's residual from its
+    list centroid is compressed to ``pq_m`` one-byte codes, and lists are
+    scored with per-query lookup tables (asymmetric distance computation).
+    A query scans the ``nprobe`` closest lists; optionally the best
+    ``k * refine_factor`` candidates are re-scored exactly against the
+    original vectors.
+    
+    Entries are identified by integer row numbers (rows of the vector store).
+    Re-adding a row replaces its previous entry.
+    """
+    
+    PQ_CODEBOOK_SIZE = 256
+    
+    def __init__(self, dimension: int, nlist: int = 1024, pq_m: int = 48):
+        if pq_m and dimension % pq_m:
+            raise ValueError(f"pq_m={pq_m} must divide the dimension {dimension}")
+        self.dimension = dimension
+        self.nlist = nlist
+        self.pq_m = pq_m
+        self.centroids: Optional[np.ndarray] = None
+        self.codebooks: Optional[np.ndarray] = None
+        
+        self._rows: List[np.ndarray] = []
+        self._codes: List[np.ndarray] = []
+        self._pending: Dict[int, List[Tuple[np.ndarray, np.ndarray]]] = {}
+        self._row_list = np.full(0, -1, dtype=np.int32)
+    
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+    
+    @property
+    def ntotal(self) -> int:
+        return int((self._row_list >= 0).sum())
+    
+    def train(self, vectors: np.ndarray, iterations: int = 15, seed: int = 0):
+        """
+        Learn the coarse quantizer and PQ codebooks.
+        
+        Args:
+            vectors: Training sample of normalized float32 vectors
+            iterations: k-means iterations for each quantizer
+            seed: Random seed
+        """
+        rng = np.random.default_rng(seed)
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        nlist = min(self.nlist, len(vectors))
+        if nlist < self.nlist:
+            logger.warning(f"Only {len(vectors)} training vectors; using nlist={nlist}")
+            self.nlist = nlist
+        
+        self.centroids = kmeans(vectors, self.nlist, iterations, rng, spherical=True)
+        
+        if self.pq_m:
+            residuals = vectors - self.centroids[_assign(vectors, self.centroids, spherical=True)]
+            dsub = self.dimension // self.pq_m
+            ksub = min(self.PQ_CODEBOOK_SIZE, len(vectors))
+            self.codebooks = np.stack([
+                kmeans(np.ascontiguousarray(residuals[:, j * dsub:(j + 1) * dsub]), ksub, iterations, rng)
+                for j in range(self.pq_m)
+            ])
+        
+        self._rows = [np.empty(0, dtype=np.int64) for _ in range(self.nlist)]
+        self._codes = [np.empty((0, self.pq_m), dtype=np.uint8) for _ in range(self.nlist)]
+        self._pending = {}
+        self._row_list = np.full(0, -1, dtype=np.int32)
+    
+    def _encode(self, residuals: np.ndarray) -> np.ndarray:
+        dsub = self.dimension // self.pq_m
+        codes = np.empty((len(residuals), self.pq_m), dtype=np.uint8)
+        for j in range(self.pq_m):
+            codes[:, j] = _assign(residuals[:, j * dsub:(j + 1) * dsub], self.codebooks[j], spherical=False)
+        return codes
+    
+    def _remove(self, rows: np.ndarray):
+        """Drop existing entries for rows that are being re-added."""
+        known = rows[rows < len(self._row_list)]
+        lists = self._row_list[known]
+        for list_id in np.unique(lists[lists >= 0]):
+            self._consolidate(int(list_id))
+            keep = ~np.isin(self._rows[list_id], known)
+            self._rows[list_id] = self._rows[list_id][keep]
+            self._codes[list_id] = self._codes[list_id][keep]
+        self._row_list[known] = -1
+    
+    def remove(self, rows: np.ndarray):
+        """Drop the entries for these rows, if present."""
+        self._remove(np.asarray(rows, dtype=np.int64))
+    
+    def add(self, rows: np.ndarray, vectors: np.ndarray):
+        """
+        Add (or replace) entries.
+        
+        Args:
+            rows: Row numbers identifying the vectors
+            vectors: Normalized float32 vectors, one per row
+        """
+        if not self.is_trained:
+            raise RuntimeError("Index must be trained before vectors are added")
+        rows = np.asarray(rows, dtype=np.int64)
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if len(rows) == 0:
+            return
+        
+        if rows.max() >= len(self._row_list):
+            grown = np.full(max(int(rows.max()) + 1, 2 * len(self._row_list)), -1, dtype=np.int32)
+            grown[:len(self._row_list)] = self._row_list
+            self._row_list = grown
+        self._remove(rows)
+        
+        lists = _assign(vectors, self.centroids, spherical=True)
+        if self.pq_m:
+            codes = self._encode(vectors - self.centroids[lists])
+        else:
+            codes = np.empty((len(rows), 0), dtype=np.uint8)
+        
+        order = np.argsort(lists, kind="stable")
+        unique_lists, starts = np.unique(lists[order], return_index=True)
+        ends = np.append(starts[1:], len(order))
+        for list_id, start, end in zip(unique_lists, starts, ends):
+            idx = order[start:end]
+            self._pending.setdefault(int(list_id), []).append((rows[idx], codes[idx]))
+        self._row_list[rows] = lists
+    
+    def _consolidate(self, list_id: int):
+        """Merge buffered appends into a list's contiguous arrays."""
+        chunks = self._pending.pop(list_id, None)
+        if chunks:
+            self._rows[list_id] = np.concatenate([self._rows[list_id]] + [r for r, _ in chunks])
+            self._codes[list_id] = np.concatenate([self._codes[list_id]] + [c for _, c in chunks])
+    
+    def search(
+        self,
+        query: np.ndarray,
+        k: int,
+        nprobe: int = 16,
+        vectors: Optional[np.ndarray] = None,
+        refine_factor: int = 0,
+        allowed: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Approximate top-k by inner product.
+        
+        Args:
+            query: Normalized float32 query vector
+            k: Number of results
+            nprobe: Number of inverted lists to scan
+            vectors: Full-precision vectors indexed by row; required without PQ
+                and for refinement
+            refine_factor: Re-score the best k * refine_factor PQ candidates
+                exactly (0 disables)
+            allowed: Boolean mask over rows; rows outside it (or past its end)
+                are dropped before scoring
+                
+        Returns:
+            Tuple of (rows, scores), best first
+        """
+        query = np.asarray(query, dtype=np.float32)
+        coarse = self.centroids @ query
+        nprobe = min(nprobe, self.nlist)
+        probe = np.argpartition(-coarse, nprobe - 1)[:nprobe] if nprobe < self.nlist else np.arange(self.nlist)
+        
+        for list_id in probe:
+            self._consolidate(int(list_id))
+        rows = np.concatenate([self._rows[l] for l in probe])
+        keep_rows = None
+        if allowed is not None:
+            keep_rows = np.zeros(len(rows), dtype=bool)
+            in_range = rows < len(allowed)
+            keep_rows[in_range] = allowed[rows[in_range]]
+            rows = rows[keep_rows]
+        if len(rows) == 0:
+            return rows, np.empty(0, dtype=np.float32)
+        
+        if self.pq_m:
+            dsub = self.dimension // self.pq_m
+            lut = np.einsum("mkd,md->mk", self.codebooks, query.reshape(self.pq_m, dsub))
+            codes = np.concatenate([self._codes[l] for l in probe])
+            base = np.repeat(coarse[probe], [len(self._rows[l]) for l in probe])
+            if keep_rows is not None:
+                codes, base = codes[keep_rows], base[keep_rows]
+            scores = base + lut[np.arange(self.pq_m), codes].sum(axis=1)
+            refine = k * refine_factor if (refine_factor and vectors is not None) else 0
+        else:
+            if vectors is None:
+                raise ValueError("IVF without PQ needs the original vectors to score candidates")
+            rows = np.sort(rows)
+            scores = vectors[rows] @ query
+            refine = 0
+        
+        keep = max(k, refine)
+        if len(scores) > keep:
+            top = np.argpartition(-scores, keep - 1)[:keep]
+            rows, scores = rows[top], scores[top]
+        
+        if refine:
+            order = np.argsort(rows)
+            rows = rows[order]
+            scores = vectors[rows] @ query
+        
+        best = np.argsort(-scores)[:k]
+        return rows[best], scores[best].astype(np.float32)
+    
+    def save(self, path: str):
+        """Write the trained quantizers and all inverted lists to an .npz file."""
+        for list_id in list(self._pending):
+            self._consolidate(list_id)
+        sizes = np.array([len(r) for r in self._rows], dtype=np.int64)
+        np.savez(
+            path,
+            header=np.frombuffer(json.dumps({
+                "dimension": self.dimension, "nlist": self.nlist, "pq_m": self.pq_m
+            }).encode("utf-8"), dtype=np.uint8),
+            centroids=self.centroids,
+            codebooks=self.codebooks if self.codebooks is not None else np.empty(0, dtype=np.float32),
+            sizes=sizes,
+            rows=np.concatenate(self._rows) if self._rows else np.empty(0, dtype=np.int64),
+            codes=np.concatenate(self._codes) if self._codes else np.empty((0, self.pq_m), dtype=np.uint8),
+            row_list=self._row_list
+        )
+    
+    @classmethod
+    def load(cls, path: str) -> "IVFPQIndex":
+        """Read an index written by ``save``."""
+        data = np.load(path)
+        header = json.loads(data["header"].tobytes().decode("utf-8"))
+        index = cls(header["dimension"], header["nlist"], header["pq_m"])
+        index.centroids = data["centroids"]
+        index.codebooks = data["codebooks"] if header["pq_m"] else None
+        bounds = np.concatenate(([0], np.cumsum(data["sizes"])))
+        rows, codes = data["rows"], data["codes"]
+        index._rows = [rows[bounds[i]:bounds[i + 1]] for i in range(index.nlist)]
+        index._codes = [codes[bounds[i]:bounds[i + 1]] for i in range(index.nlist)]
+        index._row_list = data["row_list"]
+        return index
@@ -0,0 +1,571 @@
+"""Batch analysis jobs: many invention ideas embedded, searched and analyzed together."""
+from app.core.config import settings, resolve_data_path
+from app.core.executors import io_executor, run_blocking
+from app.core.providers import LazyProvider
+from app.services.cache_svc import normalize_idea
+from app.services.hybrid_search import hybrid_query_async, retrieved_patent
+from app.services.lexical_index import get_lexical_index
+from app.services.metadata_filter import MetadataFilter, cache_text
+from typing import List, Dict, Any, AsyncIterator, Optional, Tuple
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+class BatchCapacityError(Exception):
+    """Raised when every job slot is held by a job that is still running."""
+
+
+def analysis_response(
+    analysis_result: Dict[str, Any],
+    retrieved_patents: List[Dict[str, Any]],
+    cache_hit: Optional[str] = None,
+    fast_path: bool = False
+) -> Dict[str, Any]:
+    """Same shape as the /analyze response body."""
+    return {
+        'risk_level': analysis_result.get('risk_level', 'Medium'),
+        'analysis': analysis_result.get('analysis', ''),
+        'conflicting_patents': analysis_result.get('conflicting_patents', []),
+        'recommendations': analysis_result.get('recommendations', ''),
+        'retrieved_patents': retrieved_patents,
+        'cache_hit': cache_hit,
+        'fast_path': fast_path
+    }
+
+
+class BatchStore:
+    """
+    Batch job status and finished items in SQLite, shared by every server process.
+    
+    The process running a job writes each finished item as it completes,
+    numbered by completion order, and the job's final status. Any process
+    can read them, so polls, resumed streams and cancels work whichever
+    worker the request reaches. A cancel from another process is a flag the
+    running process picks up with its heartbeat; a job whose heartbeat is
+    older than ``lost_after_seconds`` was lost with its process and is
+    marked failed.
+    
+    Args:
+        path: SQLite file (the job queue's database)
+        max_jobs: Jobs kept at once; the oldest finished ones make room
+        job_ttl_seconds: How long finished jobs are kept
+        lost_after_seconds: Heartbeat age after which a running job is lost
+    """
+    
+    def __init__(
+        self,
+        path: str,
+        max_jobs: int = settings.batch_max_jobs,
+        job_ttl_seconds: float = settings.batch_job_ttl_seconds,
+        lost_after_seconds: float = 30.0
+    ):
+        self.path = path
+        self.max_jobs = max_jobs
+        self.job_ttl_seconds = job_ttl_seconds
+        self.lost_after_seconds = lost_after_seconds
+        self._lock = threading.Lock()
+        
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS batch_jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                total INTEGER NOT NULL,
+                error TEXT,
+                cancel_requested INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                finished_at REAL,
+                heartbeat_at REAL NOT NULL
+            )
+            """
+        )
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS batch_items (
+                job_id TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                item TEXT NOT NULL,
+                PRIMARY KEY (job_id, position)
+            )
+            """
+        )
+    
+    def _transaction(self, immediate: bool = False):
+        """BEGIN (IMMEDIATE for writes); the caller holds ``_lock``."""
+        self._db.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+    
+    def _mark_lost(self, now: float):
+        self._db.execute(
+            "UPDATE batch_jobs SET status = 'failed', error = 'Server process running the job was lost', "
+            "finished_at = ? WHERE status = 'running' AND heartbeat_at < ?",
+            (now, now - self.lost_after_seconds)
+        )
+    
+    def _delete(self, job_ids: List[str]):
+        for job_id in job_ids:
+            self._db.execute("DELETE FROM batch_items WHERE job_id = ?", (job_id,))
+            self._db.execute("DELETE FROM batch_jobs WHERE id = ?", (job_id,))
+    
+    def add(self, job_id: str, total: int, created_at: float):
+        """
+        Record a new running job, dropping expired and then the oldest finished jobs to make room.
+        
+        Raises:
+            BatchCapacityError: If ``max_jobs`` jobs are still running
+        """
+        now = time.time()
+        with self._lock:
+            self._transaction(immediate=True)
+            try:
+                self._mark_lost(now)
+                self._delete([row[0] for row in self._db.execute(
+                    "SELECT id FROM batch_jobs WHERE status != 'running' AND finished_at < ?",
+                    (now - self.job_ttl_seconds,)
+                ).fetchall()])
+                held = self._db.execute("SELECT COUNT(*) FROM batch_jobs").fetchone()[0]
+                if held >= self.max_jobs:
+                    self._delete([row[0] for row in self._db.execute(
+                        "SELECT id FROM batch_jobs WHERE status != 'running' ORDER BY finished_at LIMIT ?",
+                        (held - self.max_jobs + 1,)
+                    ).fetchall()])
+                running = self._db.execute("SELECT COUNT(*) FROM batch_jobs WHERE status = 'running'").fetchone()[0]
+                if running >= self.max_jobs:
+                    raise BatchCapacityError(f"{running} batch jobs are still running")
+                self._db.execute(
+                    "INSERT INTO batch_jobs (id, status, total, created_at, heartbeat_at) VALUES (?, 'running', ?, ?, ?)",
+                    (job_id, total, created_at, now)
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+    
+    def _insert_items(self, job_id: str, items: List[Dict[str, Any]]):
+        self._db.executemany(
+            "INSERT OR IGNORE INTO batch_items (job_id, position, status, item) VALUES (?, ?, ?, ?)",
+            [(job_id, item['position'], item['status'], json.dumps(item)) for item in items]
+        )
+    
+    def add_items(self, job_id: str, items: List[Dict[str, Any]]):
+        """Store finished items (each with its ``position``); positions already stored are kept."""
+        with self._lock:
+            self._transaction(immediate=True)
+            try:
+                self._insert_items(job_id, items)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+    
+    def finish(self, job_id: str, status: str, error: Optional[str], items: List[Dict[str, Any]]):
+        """Store any of ``items`` not yet written, then the job's final status."""
+        with self._lock:
+            self._transaction(immediate=True)
+            try:
+                self._insert_items(job_id, items)
+                self._db.execute(
+                    "UPDATE batch_jobs SET status = ?, error = ?, finished_at = ? WHERE id = ? AND status = 'running'",
+                    (status, error, time.time(), job_id)
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+    
+    def heartbeat(self, job_ids: List[str]) -> List[str]:
+        """Refresh the heartbeat of jobs running in this process; returns those asked to cancel."""
+        if not job_ids:
+            return []
+        marks = ",".join("?" * len(job_ids))
+        with self._lock:
+            self._db.execute(
+                f"UPDATE batch_jobs SET heartbeat_at = ? WHERE id IN ({marks}) AND status = 'running'",
+                (time.time(), *job_ids)
+            )
+            return [row[0] for row in self._db.execute(
+                f"SELECT id FROM batch_jobs WHERE id IN ({marks}) AND cancel_requested = 1", job_ids
+            ).fetchall()]
+    
+    def request_cancel(self, job_id: str):
+        with self._lock:
+            self._db.execute(
+                "UPDATE batch_jobs SET cancel_requested = 1 WHERE id = ? AND status = 'running'", (job_id,)
+            )
+    
+    def _summary(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._db.execute(
+            "SELECT id, status, total, error, created_at, finished_at FROM batch_jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        completed, failed = self._db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(status = 'error'), 0) FROM batch_items WHERE job_id = ?", (job_id,)
+        ).fetchone()
+        return {
+            'job_id': row[0],
+            'status': row[1],
+            'total': row[2],
+            'completed': completed,
+            'failed': failed,
+            'error': row[3],
+            'created_at': row[4],
+            'finished_at': row[5]
+        }
+    
+    def read(self, job_id: str, after: Optional[int] = None) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        A job's summary and, unless ``after`` is None, its items from position ``after`` on.
+        
+        Both come from one snapshot. Only consecutive positions are returned,
+        so an item still being written never lets a reader skip past it.
+        """
+        with self._lock:
+            self._mark_lost(time.time())
+            self._transaction()
+            try:
+                summary = self._summary(job_id)
+                rows = [] if summary is None or after is None else self._db.execute(
+                    "SELECT position, item FROM batch_items WHERE job_id = ? AND position >= ? ORDER BY position",
+                    (job_id, max(after, 0))
+                ).fetchall()
+            finally:
+                self._db.execute("COMMIT")
+        items = []
+        for position, item in rows:
+            if position != max(after, 0) + len(items):
+                break
+            items.append(json.loads(item))
+        return summary, items
+    
+    def stats(self) -> Dict[str, int]:
+        """Return job counts by status."""
+        with self._lock:
+            counts = dict(self._db.execute("SELECT status, COUNT(*) FROM batch_jobs GROUP BY status").fetchall())
+        return {"jobs": sum(counts.values()), "running": counts.get("running", 0)}
+    
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class BatchJob:
+    """
+    In-process state of a batch this process is running.
+    
+    Items finish in any order. ``completed`` records them as they finish,
+    numbered by position in completion order, so a client that has seen the
+    first N item events can resume by asking for everything after position
+    N. What clients read comes from the ``BatchStore``.
+    """
+    
+    def __init__(self, ideas: List[str], metadata_filter: Optional[MetadataFilter] = None):
+        self.id = uuid.uuid4().hex
+        self.ideas = ideas
+        self.metadata_filter = metadata_filter
+        self.status = ['pending'] * len(ideas)
+        self.completed: List[Dict[str, Any]] = []
+        self.created_at = time.time()
+        self.task: Optional[asyncio.Task] = None
+        self.changed = asyncio.Event()
+    
+    def notify(self):
+        # Wake every waiter, then arm a fresh event for the next change
+        self.changed.set()
+        self.changed = asyncio.Event()
+    
+    def finish_item(
+        self, indices: List[int], result: Optional[Dict[str, Any]] = None, error: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Record the outcome shared by one or more items (duplicates of the same idea); returns the new items."""
+        finished = []
+        for index in indices:
+            if self.status[index] != 'pending':
+                continue
+            item = {'position': len(self.completed), 'index': index}
+            if error is None:
+                item.update(status='done', result=result)
+            else:
+                item.update(status='error', error=error)
+            self.status[index] = item['status']
+            self.completed.append(item)
+            finished.append(item)
+        return finished
+    
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'job_id': self.id,
+            'status': 'running',
+            'total': len(self.ideas),
+            'completed': len(self.completed),
+            'failed': sum(1 for item in self.completed if item['status'] == 'error'),
+            'error': None,
+            'created_at': self.created_at,
+            'finished_at': None
+        }
+
+
+class BatchAnalyzer:
+    """
+    Runs batch analysis jobs in the background and keeps their results.
+    
+    A job embeds every idea with one ``generate_embeddings`` call, runs the
+    vector queries concurrently on the I/O pool, then sends the LLM calls
+    through a semaphore shared by all jobs, so a large batch cannot flood
+    the LLM provider. Exact and near-duplicate analysis cache hits and
+    fast-path answers skip the LLM, as on /analyze, and ideas repeated within a batch (after
+    whitespace/case normalization) are analyzed once.
+    
+    Jobs run independently of the request that started them: a client can
+    disconnect and later poll or resume the stream. Status and results are
+    kept in a ``BatchStore`` next to the job queue, so with several server
+    processes any of them can answer for a job another one runs; followers
+    in other processes poll it every ``poll_interval`` seconds. Finished jobs
+    are kept for ``job_ttl_seconds`` and at most ``max_jobs`` jobs are held
+    at once.
+    """
+    
+    def __init__(
+        self,
+        llm_concurrency: int = settings.batch_llm_concurrency,
+        max_jobs: int = settings.batch_max_jobs,
+        job_ttl_seconds: float = settings.batch_job_ttl_seconds,
+        poll_interval: float = settings.batch_poll_interval_seconds,
+        top_k: int = 5,
+        store: Optional[BatchStore] = None
+    ):
+        self.llm_concurrency = llm_concurrency
+        self.poll_interval = poll_interval
+        self.top_k = top_k
+        self.store = store or BatchStore(
+            resolve_data_path(settings.job_queue_path), max_jobs, job_ttl_seconds,
+            lost_after_seconds=max(30.0, 20 * poll_interval)
+        )
+        # Jobs running in this process
+        self._jobs: Dict[str, BatchJob] = {}
+        self._llm_slots: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._watcher: Optional[asyncio.Task] = None
+    
+    def _ensure_started(self):
+        """Create the LLM semaphore on the running event loop."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._llm_slots = asyncio.Semaphore(self.llm_concurrency)
+            self._watcher = None
+    
+    async def submit(self, ideas: List[str], embedding_service, vector_store, llm_service, cache, scorer,
+                     metadata_filter: Optional[MetadataFilter] = None) -> Dict[str, Any]:
+        """
+        Start a batch job.
+        
+        Args:
+            ideas: Invention ideas to analyze
+            embedding_service: Service with ``generate_embeddings_async``
+            vector_store: Vector index to search
+            llm_service: Service with ``analyze_patents_async``
+            cache: Analysis result cache
+            scorer: Fast-path scorer consulted before the LLM
+            metadata_filter: Restricts retrieval for every idea
+            
+        Returns:
+            The summary of the job, already running
+            
+        Raises:
+            BatchCapacityError: If ``max_jobs`` jobs are still running
+        """
+        self._ensure_started()
+        job = BatchJob(ideas, metadata_filter)
+        await run_blocking(io_executor, self.store.add, job.id, len(ideas), job.created_at)
+        self._jobs[job.id] = job
+        job.task = self._loop.create_task(self._run(job, embedding_service, vector_store, llm_service, cache, scorer))
+        if self._watcher is None or self._watcher.done():
+            self._watcher = self._loop.create_task(self._watch())
+        logger.info(f"Started batch job {job.id} with {len(ideas)} ideas")
+        return job.summary()
+    
+    async def get(self, job_id: str, after: Optional[int] = None) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+        """A job's summary (None if unknown or expired) and, if ``after`` is given, the items after that position."""
+        return await run_blocking(io_executor, self.store.read, job_id, after)
+    
+    async def follow(self, job_id: str, after: int = 0) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield a job's finished items in completion order, starting after ``after``.
+        
+        Waits for new items until the job ends; items that finished while
+        nobody was listening are replayed first.
+        """
+        position = max(after, 0)
+        while True:
+            job = self._jobs.get(job_id)
+            changed = job.changed if job is not None else None
+            summary, items = await self.get(job_id, position)
+            for item in items:
+                yield item
+            position += len(items)
+            if summary is None or summary['status'] != 'running':
+                return
+            if items:
+                continue
+            if changed is None:
+                await asyncio.sleep(self.poll_interval)
+                continue
+            try:
+                await asyncio.wait_for(changed.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+    
+    async def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Stop a running job, in whichever process runs it; items already finished keep their results."""
+        job = self._jobs.get(job_id)
+        if job is not None and job.task is not None:
+            job.task.cancel()
+        else:
+            await run_blocking(io_executor, self.store.request_cancel, job_id)
+        summary, _ = await self.get(job_id)
+        return summary
+    
+    async def _watch(self):
+        """Heartbeat this process's running jobs and cancel those cancelled from other processes."""
+        while self._jobs:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                cancelled = await run_blocking(io_executor, self.store.heartbeat, list(self._jobs))
+            except Exception as e:
+                logger.error(f"Error refreshing batch jobs: {e}")
+                continue
+            for job_id in cancelled:
+                job = self._jobs.get(job_id)
+                if job is not None and job.task is not None:
+                    job.task.cancel()
+    
+    async def _record(self, job: BatchJob, indices: List[int], result: Optional[Dict[str, Any]] = None,
+                      error: Optional[str] = None):
+        """Finish items and store them before waking this process's followers."""
+        items = job.finish_item(indices, result, error)
+        if items:
+            await run_blocking(io_executor, self.store.add_items, job.id, items)
+        job.notify()
+    
+    async def _finish(self, job: BatchJob, status: str, error: Optional[str] = None):
+        try:
+            # Shielded: a cancelled job still records its final status
+            await asyncio.shield(run_blocking(io_executor, self.store.finish, job.id, status, error, job.completed))
+        except Exception as e:
+            logger.error(f"Error storing batch job {job.id}: {e}")
+        finally:
+            self._jobs.pop(job.id, None)
+            job.notify()
+    
+    async def _run(self, job: BatchJob, embedding_service, vector_store, llm_service, cache, scorer):
+        start = time.perf_counter()
+        try:
+            groups: Dict[str, List[int]] = {}
+            for index, idea in enumerate(job.ideas):
+                groups.setdefault(normalize_idea(idea), []).append(index)
+            
+            pending = []
+            cached_results = [None] * len(groups)
+            if settings.analysis_cache_enabled:
+                # One trip to the I/O pool for all lookups (they may write to SQLite)
+                keys = [cache_text(job.ideas[indices[0]], job.metadata_filter) for indices in groups.values()]
+                cached_results = await run_blocking(io_executor, lambda: [cache.get_exact(key) for key in keys])
+            for indices, cached in zip(groups.values(), cached_results):
+                if cached is not None:
+                    job.finish_item(indices, {**cached, 'cache_hit': 'exact'})
+                else:
+                    pending.append(indices)
+            if job.completed:
+                await run_blocking(io_executor, self.store.add_items, job.id, job.completed)
+                job.notify()
+            
+            if pending:
+                embeddings = await embedding_service.generate_embeddings_async([job.ideas[g[0]] for g in pending])
+                await asyncio.gather(*[
+                    self._analyze_item(job, indices, embedding, vector_store, llm_service, cache, scorer)
+                    for indices, embedding in zip(pending, embeddings)
+                ])
+            await self._finish(job, 'completed')
+            logger.info(f"Batch job {job.id} finished {len(job.ideas)} ideas in {time.perf_counter() - start:.2f}s")
+        except asyncio.CancelledError:
+            await self._finish(job, 'cancelled')
+            logger.info(f"Batch job {job.id} cancelled after {len(job.completed)} items")
+        except Exception as e:
+            logger.error(f"Batch job {job.id} failed: {e}")
+            job.finish_item(
+                [index for index, status in enumerate(job.status) if status == 'pending'],
+                error=f"Analysis failed: {str(e)}"
+            )
+            await self._finish(job, 'failed', str(e))
+    
+    async def _analyze_item(self, job: BatchJob, indices: List[int], embedding, vector_store, llm_service, cache,
+                            scorer):
+        """Retrieve, then analyze one idea; failures are recorded on its items only."""
+        idea = job.ideas[indices[0]]
+        try:
+            results = await hybrid_query_async(
+                idea, embedding, vector_store, get_lexical_index(), top_k=self.top_k,
+                metadata_filter=job.metadata_filter
+            )
+            retrieved_patents = [retrieved_patent(match) for match in results.get('matches', [])]
+            if not retrieved_patents:
+                await self._record(job, indices, error="No similar patents found")
+                return
+            
+            if settings.analysis_cache_enabled:
+                cached = await run_blocking(
+                    io_executor, cache.get_similar, embedding, [p['id'] for p in retrieved_patents]
+                )
+                if cached is not None:
+                    await self._record(
+                        job, indices, {**cached, 'retrieved_patents': retrieved_patents, 'cache_hit': 'similar'}
+                    )
+                    return
+            
+            fast = scorer.assess(idea, retrieved_patents)
+            if fast is not None:
+                await self._record(job, indices, analysis_response(fast, retrieved_patents, fast_path=True))
+                return
+            
+            async with self._llm_slots:
+                analysis_result = await llm_service.analyze_patents_async(
+                    user_idea=idea,
+                    retrieved_patents=retrieved_patents
+                )
+            result = analysis_response(analysis_result, retrieved_patents)
+            if settings.analysis_cache_enabled:
+                stored = {key: value for key, value in result.items() if key != 'cache_hit'}
+                await run_blocking(
+                    io_executor, cache.put, cache_text(idea, job.metadata_filter), embedding,
+                    [p['id'] for p in retrieved_patents], stored
+                )
+            await self._record(job, indices, result)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Batch job {job.id} item {indices[0]} failed: {e}")
+            await self._record(job, indices, error=f"Analysis failed: {str(e)}")
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return job counts (all processes) and the jobs running here."""
+        return {
+            **self.store.stats(),
+            "running_here": len(self._jobs),
+            "llm_concurrency": self.llm_concurrency
+        }
+
+
+# Lazily constructed singleton
+get_batch_analyzer = LazyProvider(BatchAnalyzer, "batch analyzer")
@@ -1,7 +1,7 @@
 """Google BigQuery service for patent data."""
-from google.cloud import bigquery
 from app.core.config import settings
-from typing import List, Dict, Any
+from app.core.providers import LazyProvider
+from typing import List, Dict, Any, Iterator, Optional
 import logging
 import os
 
@@ -12,6 +12,8 @@ class BigQueryService:
     """Service for querying patent data from Google BigQuery."""
     
     def __init__(self):
+        from google.cloud import bigquery
+        
         # Try to initialize BigQuery client with available credentials
         # Priority: 1) Service account file, 2) Application default credentials
         
@@ -71,61 +73,111 @@ class BigQueryService:
             logger.error(f"❌ Failed to initialize BigQuery: {e}")
             logger.info("💡 Options: 1) Add service-account.json, 2) Run: gcloud auth application-default login")
     
-    def fetch_recent_patents(self, limit: int = 50) -> List[Dict[str, Any]]:
-        """
-        Fetch recent US patents from BigQuery public dataset.
-        
-        Args:
-            limit: Number of patents to fetch
-            
-        Returns:
-            List of patent dictionaries
-        """
-        query = f"""
+    PATENT_QUERY = """
         SELECT 
             publication_number,
             title_localized[SAFE_OFFSET(0)].text as title,
             abstract_localized[SAFE_OFFSET(0)].text as abstract,
             claims_localized[SAFE_OFFSET(0)].text as claims,
-            publication_date
+            publication_date,
+            ARRAY(SELECT c.code FROM UNNEST(cpc) AS c ORDER BY c.first DESC, c.code) as cpc,
+            ARRAY(SELECT a.name FROM UNNEST(assignee_harmonized) AS a) as assignees
         FROM 
             `patents-public-data.patents.publications`
         WHERE 
             country_code = 'US'
             AND ARRAY_LENGTH(title_localized) > 0
             AND ARRAY_LENGTH(abstract_localized) > 0
-            AND publication_date >= 20230101
+            AND publication_date >= @since
+            {cursor_filter}
         ORDER BY 
-            publication_date DESC
-        LIMIT {limit}
+            publication_date DESC, publication_number DESC
+        {limit_clause}
         """
-        
+    
+    @staticmethod
+    def _row_to_patent(row) -> Dict[str, Any]:
+        return {
+            "publication_number": row.publication_number,
+            "title": row.title or "",
+            "abstract": row.abstract or "",
+            "claims": row.claims or "",
+            "publication_date": str(row.publication_date) if row.publication_date else "",
+            "cpc": list(row.cpc or []),
+            "assignees": list(row.assignees or [])
+        }
+    
+    def _require_client(self):
         if not self.client:
             logger.error("BigQuery client is not available. Cannot fetch patents.")
             raise Exception("BigQuery is not configured. Please set up Google Cloud credentials.")
+    
+    def fetch_recent_patents(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        Fetch recent US patents from BigQuery public dataset.
         
-        try:
-            query_job = self.client.query(query)
-            results = query_job.result()
-            
-            patents = []
-            for row in results:
-                patent = {
-                    "publication_number": row.publication_number,
-                    "title": row.title or "",
-                    "abstract": row.abstract or "",
-                    "claims": row.claims or "",
-                    "publication_date": str(row.publication_date) if row.publication_date else ""
-                }
-                patents.append(patent)
+        Args:
+            limit: Number of patents to fetch
             
-            logger.info(f"Fetched {len(patents)} patents from BigQuery")
-            return patents
+        Returns:
+            List of patent dictionaries
+        """
+        patents = [patent for page in self.iter_patent_pages(limit=limit) for patent in page]
+        logger.info(f"Fetched {len(patents)} patents from BigQuery")
+        return patents
+    
+    def iter_patent_pages(
+        self,
+        limit: Optional[int] = None,
+        page_size: int = 1000,
+        after: Optional[Dict[str, str]] = None,
+        since: int = settings.bigquery_min_publication_date
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Stream recent US patents page by page, newest first.
+        
+        Only one page of rows is held in memory at a time. Results are ordered
+        by (publication_date, publication_number) descending, so a run can be
+        resumed from the last record it processed.
+        
+        Args:
+            limit: Maximum number of patents (None for no limit)
+            page_size: Rows per page
+            after: Last record already processed; only rows after it are returned
+            since: Earliest publication_date to include, as YYYYMMDD
             
+        Yields:
+            Lists of patent dictionaries
+        """
+        from google.cloud import bigquery
+        
+        self._require_client()
+        
+        params = [bigquery.ScalarQueryParameter("since", "INT64", int(since))]
+        cursor_filter = ""
+        if after:
+            cursor_filter = (
+                "AND (publication_date < @after_date "
+                "OR (publication_date = @after_date AND publication_number < @after_number))"
+            )
+            params += [
+                bigquery.ScalarQueryParameter("after_date", "INT64", int(after["publication_date"])),
+                bigquery.ScalarQueryParameter("after_number", "STRING", after["publication_number"]),
+            ]
+        query = self.PATENT_QUERY.format(
+            cursor_filter=cursor_filter,
+            limit_clause=f"LIMIT {int(limit)}" if limit else ""
+        )
+        
+        try:
+            query_job = self.client.query(query, job_config=bigquery.QueryJobConfig(query_parameters=params))
+            for page in query_job.result(page_size=page_size).pages:
+                yield [self._row_to_patent(row) for row in page]
+        
         except Exception as e:
             logger.error(f"Error fetching patents from BigQuery: {e}")
             raise
 
 
-# Singleton instance
-bigquery_service = BigQueryService()
+# Lazily constructed singleton
+get_bigquery_service = LazyProvider(BigQueryService, "BigQuery service")
@@ -0,0 +1,302 @@
+"""Two-tier result cache for invention analyses."""
+from app.core.config import settings
+from app.core.providers import LazyProvider
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Iterable
+import numpy as np
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_idea(text: str) -> str:
+    """Normalize invention text so trivial edits map to the same cache key."""
+    return " ".join(text.lower().split())
+
+
+class _CacheEntry:
+    """A cached analysis plus what is needed to match near-duplicates."""
+    
+    __slots__ = ("key", "vector", "patent_ids", "result", "created_at", "size")
+    
+    def __init__(self, key: str, vector: np.ndarray, patent_ids: frozenset,
+                 result: Dict[str, Any], created_at: float, size: int):
+        self.key = key
+        self.vector = vector
+        self.patent_ids = patent_ids
+        self.result = result
+        self.created_at = created_at
+        self.size = size
+
+
+class AnalysisCache:
+    """
+    LRU/TTL cache in front of the LLM analysis.
+    
+    Tier one is an exact hit on the normalized invention text. Tier two is a
+    near-duplicate hit: a cached query whose vector has cosine similarity above
+    the threshold and whose retrieved patent ID set is identical. Entries are
+    bounded by count and by approximate memory footprint, and can optionally be
+    mirrored to SQLite so they survive restarts.
+    """
+    
+    def __init__(
+        self,
+        max_entries: int = settings.analysis_cache_max_entries,
+        max_bytes: int = settings.analysis_cache_max_bytes,
+        ttl_seconds: float = settings.analysis_cache_ttl_seconds,
+        similarity_threshold: float = settings.analysis_cache_similarity_threshold,
+        sqlite_path: str = settings.analysis_cache_sqlite_path
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.RLock()
+        
+        # Stacked vectors for the near-duplicate scan, rebuilt lazily
+        self._matrix: Optional[np.ndarray] = None
+        self._matrix_keys: List[str] = []
+        
+        # Metrics
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        
+        self._db: Optional[sqlite3.Connection] = None
+        if sqlite_path:
+            self._open_db(sqlite_path)
+    
+    def _open_db(self, path: str):
+        """Open the SQLite mirror and load the most recent entries."""
+        try:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS analysis_cache (
+                    key TEXT PRIMARY KEY,
+                    created_at REAL NOT NULL,
+                    vector BLOB NOT NULL,
+                    patent_ids TEXT NOT NULL,
+                    result TEXT NOT NULL
+                )
+                """
+            )
+            self._db.commit()
+            
+            rows = self._db.execute(
+                "SELECT key, created_at, vector, patent_ids, result FROM analysis_cache "
+                "ORDER BY created_at DESC LIMIT ?",
+                (self.max_entries,)
+            ).fetchall()
+            now = time.time()
+            for key, created_at, vector, patent_ids, result in reversed(rows):
+                if now - created_at > self.ttl_seconds:
+                    continue
+                self._insert(
+                    key,
+                    np.frombuffer(vector, dtype=np.float32),
+                    frozenset(json.loads(patent_ids)),
+                    json.loads(result),
+                    created_at,
+                    persist=False
+                )
+            self._db.execute(
+                "DELETE FROM analysis_cache WHERE created_at < ?", (now - self.ttl_seconds,)
+            )
+            self._db.commit()
+            logger.info(f"Analysis cache loaded {len(self._entries)} entries from {path}")
+        except Exception as e:
+            logger.error(f"Could not open analysis cache database {path}: {e}")
+            self._db = None
+    
+    def _db_write(self, entry: _CacheEntry):
+        if not self._db:
+            return
+        try:
+            self._db.execute(
+                "INSERT OR REPLACE INTO analysis_cache VALUES (?, ?, ?, ?, ?)",
+                (entry.key, entry.created_at, entry.vector.tobytes(),
+                 json.dumps(sorted(entry.patent_ids)), json.dumps(entry.result))
+            )
+            self._db.commit()
+        except Exception as e:
+            logger.warning(f"Analysis cache write failed: {e}")
+    
+    def _db_delete(self, keys: Iterable[str]):
+        keys = list(keys)
+        if not self._db or not keys:
+            return
+        try:
+            self._db.executemany(
+                "DELETE FROM analysis_cache WHERE key = ?", [(k,) for k in keys]
+            )
+            self._db.commit()
+        except Exception as e:
+            logger.warning(f"Analysis cache delete failed: {e}")
+    
+    @staticmethod
+    def _key(text: str) -> str:
+        return hashlib.sha256(normalize_idea(text).encode("utf-8")).hexdigest()
+    
+    def _expired(self, entry: _CacheEntry, now: float) -> bool:
+        return now - entry.created_at > self.ttl_seconds
+    
+    def _remove(self, key: str) -> _CacheEntry:
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        self._matrix = None
+        return entry
+    
+    def _insert(self, key: str, vector: np.ndarray, patent_ids: frozenset,
+                result: Dict[str, Any], created_at: float, persist: bool = True):
+        if key in self._entries:
+            self._remove(key)
+        
+        size = vector.nbytes + len(json.dumps(result)) + 64 * (len(patent_ids) + 1)
+        entry = _CacheEntry(key, vector, patent_ids, result, created_at, size)
+        self._entries[key] = entry
+        self._bytes += size
+        self._matrix = None
+        
+        evicted = []
+        while self._entries and (
+            len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+        ):
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            evicted.append(oldest_key)
+        self.evictions += len(evicted)
+        
+        if persist:
+            self._db_write(entry)
+            self._db_delete(evicted)
+    
+    def _purge_expired(self, now: float):
+        expired = [k for k, e in self._entries.items() if self._expired(e, now)]
+        for key in expired:
+            self._remove(key)
+        self._db_delete(expired)
+    
+    def get_exact(self, invention_idea: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached analysis for the same (normalized) invention text.
+        
+        Args:
+            invention_idea: Raw invention text
+            
+        Returns:
+            Cached result dict, or None on a miss
+        """
+        key = self._key(invention_idea)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry, time.time()):
+                self._remove(key)
+                self._db_delete([key])
+                return None
+            self._entries.move_to_end(key)
+            self.exact_hits += 1
+            return entry.result
+    
+    def get_similar(self, query_vector: np.ndarray, patent_ids: Iterable[str]) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached analysis for a near-duplicate query.
+        
+        Args:
+            query_vector: Embedding of the new invention text
+            patent_ids: IDs of the patents retrieved for the new query
+            
+        Returns:
+            Cached result dict, or None on a miss
+        """
+        vector = self._normalize(query_vector)
+        wanted = frozenset(patent_ids)
+        with self._lock:
+            self._purge_expired(time.time())
+            if not self._entries:
+                self.misses += 1
+                return None
+            
+            if self._matrix is None:
+                self._matrix_keys = list(self._entries.keys())
+                self._matrix = np.stack([self._entries[k].vector for k in self._matrix_keys])
+            
+            scores = self._matrix @ vector
+            for idx in np.argsort(-scores):
+                if scores[idx] < self.similarity_threshold:
+                    break
+                entry = self._entries[self._matrix_keys[idx]]
+                if entry.patent_ids == wanted:
+                    self._entries.move_to_end(entry.key)
+                    self.similar_hits += 1
+                    return entry.result
+            
+            self.misses += 1
+            return None
+    
+    def put(self, invention_idea: str, query_vector: np.ndarray,
+            patent_ids: Iterable[str], result: Dict[str, Any]):
+        """
+        Store an analysis result.
+        
+        Args:
+            invention_idea: Raw invention text
+            query_vector: Embedding of the invention text
+            patent_ids: IDs of the patents the analysis was based on
+            result: Analysis result to cache
+        """
+        with self._lock:
+            self._insert(
+                self._key(invention_idea),
+                self._normalize(query_vector),
+                frozenset(patent_ids),
+                result,
+                time.time()
+            )
+    
+    @staticmethod
+    def _normalize(vector: np.ndarray) -> np.ndarray:
+        arr = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(arr)
+        return arr / norm if norm > 0 else arr
+    
+    def clear(self):
+        """Drop every entry from memory and disk."""
+        with self._lock:
+            keys = list(self._entries.keys())
+            self._entries.clear()
+            self._bytes = 0
+            self._matrix = None
+            self._db_delete(keys)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and current size."""
+        lookups = self.exact_hits + self.similar_hits + self.misses
+        return {
+            "enabled": settings.analysis_cache_enabled,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "exact_hits": self.exact_hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round((self.exact_hits + self.similar_hits) / lookups, 3) if lookups else 0.0,
+            "persistent": self._db is not None
+        }
+
+
+# Lazily constructed singleton
+get_analysis_cache = LazyProvider(AnalysisCache, "analysis cache")
@@ -0,0 +1,241 @@
+"""Claims-level chunks: per-claim vectors at ingestion, grouped back into patents at query time."""
+from app.core.config import settings
+from app.core.executors import io_executor, run_blocking
+from app.core.providers import LazyProvider
+from app.services.metadata_filter import MetadataFilter, filter_metadata
+from typing import Any, Dict, List, Optional
+import logging
+import re
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# "1. A device ..." / "2) The device of claim 1 ..." inside flattened claims text
+_CLAIM_START = re.compile(r"(?:^|(?<=\s))(\d{1,3})\s*[.)]\s+(?=[A-Z])")
+_DEPENDENT = re.compile(r"\b(?:of|in|to|by|with) claims?\s+\d", re.IGNORECASE)
+
+
+def chunk_id(publication_number: str, index: int) -> str:
+    """Vector ID of a patent's ``index``-th claim chunk."""
+    return f"{publication_number}#claim-{index}"
+
+
+def split_claims(claims: str, max_chars: int = settings.claim_chunk_chars) -> List[Dict[str, Any]]:
+    """
+    Split a patent's claims text into per-claim chunks.
+    
+    Claims are found by their sequential numbering ("1. ...", "2. ...");
+    text without numbering is treated as one claim. Independent claims come
+    first, since they define the invention and dependent ones only narrow
+    them; a claim longer than ``max_chars`` is cut into several chunks at
+    word boundaries.
+    
+    Returns:
+        List of {'claim': claim number, 'text': chunk text}
+    """
+    text = " ".join(claims.split())
+    if not text:
+        return []
+    starts, expected = [], 1
+    for match in _CLAIM_START.finditer(text):
+        if int(match.group(1)) == expected:
+            starts.append((expected, match.start(), match.end()))
+            expected += 1
+    if starts:
+        ends = [start for _, start, _ in starts[1:]] + [len(text)]
+        claims_found = [(number, text[body:end].strip()) for (number, _, body), end in zip(starts, ends)]
+    else:
+        claims_found = [(1, text)]
+    claims_found.sort(key=lambda claim: bool(_DEPENDENT.search(claim[1][:200])))
+    
+    chunks = []
+    for number, body in claims_found:
+        while body:
+            if len(body) <= max_chars:
+                piece, body = body, ""
+            else:
+                cut = body.rfind(" ", 0, max_chars)
+                cut = cut if cut > 0 else max_chars
+                piece, body = body[:cut], body[cut:].lstrip()
+            chunks.append({'claim': number, 'text': piece})
+    return chunks
+
+
+def claim_chunks(patent: Dict[str, Any], max_chunks: int) -> List[Dict[str, Any]]:
+    """The first ``max_chunks`` claim chunks of a patent, with their vector IDs and embedded text."""
+    chunks = split_claims(patent.get('claims') or "")[:max_chunks]
+    return [
+        {
+            'id': chunk_id(patent['publication_number'], i),
+            'claim': chunk['claim'],
+            'text': chunk['text'],
+            'embed_text': f"{patent['title']} {chunk['text']}"
+        }
+        for i, chunk in enumerate(chunks)
+    ]
+
+
+def chunk_to_vector(patent: Dict[str, Any], chunk: Dict[str, Any], embedding: np.ndarray) -> Dict[str, Any]:
+    """
+    Build the vector store record for an embedded claim chunk.
+    
+    Metadata is kept small (no abstract): it names the parent patent, whose
+    own record is fetched when a patent is found only through its claims,
+    and carries the patent's filter fields so filtered queries see chunks.
+    """
+    return {
+        'id': chunk['id'],
+        'values': embedding,
+        'metadata': {
+            'parent': patent['publication_number'],
+            'publication_number': patent['publication_number'],
+            'title': patent['title'][:200],
+            'claim': chunk['claim'],
+            'text': chunk['text'],
+            'publication_date': patent['publication_date'],
+            **filter_metadata(patent)
+        }
+    }
+
+
+def aggregate_chunks(matches: List[Dict[str, Any]], top_k: int, hits_per_patent: int) -> List[Dict[str, Any]]:
+    """
+    Group chunk and patent matches by parent patent.
+    
+    A patent scores as its best match (title/abstract vector or any claim);
+    up to ``hits_per_patent`` matching claims are kept, best first, in
+    ``matched_claims``, so one patent with many similar claims cannot push
+    the others out of the candidate list.
+    
+    Args:
+        matches: Vector matches, best first
+        top_k: Patents to return
+        hits_per_patent: Matched claims kept per patent
+        
+    Returns:
+        Patent-level matches, best first
+    """
+    patents: Dict[str, Dict[str, Any]] = {}
+    for match in matches:
+        metadata = match.get('metadata', {}) or {}
+        parent = metadata.get('parent') or match['id']
+        patent = patents.get(parent)
+        if patent is None:
+            if len(patents) == top_k:
+                continue
+            patent = patents[parent] = {'id': parent, 'score': match['score'], 'metadata': {}, 'matched_claims': []}
+        if 'parent' not in metadata:
+            patent['metadata'] = metadata
+        elif len(patent['matched_claims']) < hits_per_patent:
+            patent['matched_claims'].append(
+                {'claim': metadata.get('claim'), 'text': metadata.get('text', ''), 'score': match['score']}
+            )
+            if not patent['metadata']:
+                patent['metadata'] = {
+                    key: metadata[key] for key in ('publication_number', 'title', 'publication_date') if key in metadata
+                }
+    return list(patents.values())
+
+
+class ClaimChunkRetriever:
+    """
+    Patent retrieval over an index holding per-claim vectors.
+    
+    Fetches ``candidates`` chunk matches (more when many patents are wanted),
+    aggregates them into patents, and fills in the abstract of patents that
+    matched only through claims from their patent-level record. Queries
+    slower than ``budget_ms`` are logged and counted; the candidate count is
+    the lever that keeps the index query inside the budget (see
+    benchmarks/bench_claim_chunks.py).
+    """
+    
+    def __init__(
+        self,
+        candidates: int = settings.chunk_candidates,
+        hits_per_patent: int = settings.chunk_hits_per_patent,
+        budget_ms: float = settings.chunk_query_budget_ms
+    ):
+        self.candidates = candidates
+        self.hits_per_patent = hits_per_patent
+        self.budget_ms = budget_ms
+        self._lock = threading.Lock()
+        
+        # Metrics
+        self.queries = 0
+        self.over_budget = 0
+        self.query_seconds = 0.0
+        self.chunks_scanned = 0
+    
+    def query(
+        self,
+        vector_store,
+        query_vector: np.ndarray,
+        top_k: int = 5,
+        metadata_filter: Optional[MetadataFilter] = None
+    ) -> Dict[str, Any]:
+        """
+        Query chunks and return patent-level matches.
+        
+        Args:
+            vector_store: Vector index holding patent and claim vectors
+            query_vector: The embedding vector to search for
+            top_k: Number of patents to return
+            metadata_filter: Only match patents (and their chunks) that pass it
+            
+        Returns:
+            Query results with a 'matches' list; claim hits are in each match's ``matched_claims``
+        """
+        start = time.perf_counter()
+        fetch = max(self.candidates, top_k * (self.hits_per_patent + 1))
+        results = vector_store.query_similar(query_vector, top_k=fetch, metadata_filter=metadata_filter)
+        matches = [
+            {'id': match['id'], 'score': match['score'], 'metadata': match.get('metadata', {})}
+            for match in results.get('matches', [])
+        ]
+        patents = aggregate_chunks(matches, top_k, self.hits_per_patent)
+        claim_only = {p['id']: p for p in patents if 'abstract' not in p['metadata']}
+        if claim_only:
+            for patent_id, item in vector_store.fetch_vectors(list(claim_only)).items():
+                claim_only[patent_id]['metadata'] = item.get('metadata') or claim_only[patent_id]['metadata']
+        elapsed = time.perf_counter() - start
+        
+        with self._lock:
+            self.queries += 1
+            self.query_seconds += elapsed
+            self.chunks_scanned += len(matches)
+            if elapsed * 1000 > self.budget_ms:
+                self.over_budget += 1
+        if elapsed * 1000 > self.budget_ms:
+            logger.warning(
+                f"Claim chunk query took {elapsed * 1000:.0f} ms ({len(matches)} chunks), "
+                f"over the {self.budget_ms:.0f} ms budget"
+            )
+        return {"matches": patents}
+    
+    async def query_async(
+        self,
+        vector_store,
+        query_vector: np.ndarray,
+        top_k: int = 5,
+        metadata_filter: Optional[MetadataFilter] = None
+    ) -> Dict[str, Any]:
+        """``query`` on the shared I/O pool."""
+        return await run_blocking(io_executor, self.query, vector_store, query_vector, top_k, metadata_filter)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return query counts and latency against the budget."""
+        with self._lock:
+            return {
+                "queries": self.queries,
+                "over_budget": self.over_budget,
+                "budget_ms": self.budget_ms,
+                "avg_ms": round(self.query_seconds / self.queries * 1000, 2) if self.queries else 0.0,
+                "avg_chunks": round(self.chunks_scanned / self.queries, 1) if self.queries else 0.0
+            }
+
+
+# Lazily constructed singleton
+get_claim_chunk_retriever = LazyProvider(ClaimChunkRetriever, "claim chunk retriever")
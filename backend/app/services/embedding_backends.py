@@ -0,0 +1,276 @@
+"""Inference backends for the embedding model (PyTorch, dynamic int8, ONNX Runtime)."""
+from app.core.config import settings, resolve_data_path
+from typing import Any, List, Dict, Optional, Union
+import numpy as np
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("torch", "torch-int8", "onnx", "onnx-int8")
+
+# Patent-style sentences the accuracy guard embeds with both the candidate
+# backend and the reference model
+GUARD_SAMPLE_TEXTS = [
+    "A portable water bottle with sensors that track intake and LED hydration indicators.",
+    "A wearable device that monitors heart rate and blood pressure and alerts caregivers.",
+    "Method for compressing video frames using learned motion vectors.",
+    "A foldable guitar amplifier with a collapsible speaker cabinet and rechargeable battery.",
+    "Self-watering flower pot with a soil moisture sensor and water reservoir.",
+    "Vehicle seat with occupant detection that displays targeted advertising.",
+    "Lithium-ion battery cathode comprising a nickel-rich layered oxide coating.",
+    "System for detecting fraudulent card transactions with a gradient boosted model.",
+    "Drone landing gear that absorbs impact using a magnetorheological damper.",
+    "A surgical stapler with a rotating anvil and force feedback.",
+    "Indoor air quality monitor measuring CO2, VOCs and particulate matter.",
+    "Method of brewing coffee by cold extraction under vacuum.",
+    "Blockchain ledger for tracking pharmaceutical supply chains.",
+    "Solar panel cleaning robot that moves along the frame using suction cups.",
+    "A keyboard with per-key haptic actuators for typing feedback.",
+    "Gene editing composition comprising a Cas9 variant with reduced off-target activity.",
+    "Smart thermostat that learns occupancy schedules from motion sensors.",
+    "A bicycle helmet with integrated turn signals controlled from the handlebar.",
+    "Process for recycling PET plastic into food-grade pellets by depolymerization.",
+    "Augmented reality glasses projecting navigation arrows onto the road ahead.",
+    "short query",
+    "A" * 2000,
+]
+
+
+def cosine_agreement(candidate, reference, texts: List[str]) -> Dict[str, float]:
+    """
+    Compare a backend's embeddings with the reference model's.
+    
+    Args:
+        candidate: Model under test (anything with ``encode``)
+        reference: Full-precision SentenceTransformer
+        texts: Sample corpus
+        
+    Returns:
+        Mean, min and 1st-percentile cosine similarity between paired embeddings
+    """
+    a = np.asarray(candidate.encode(texts, convert_to_numpy=True), dtype=np.float32)
+    b = np.asarray(reference.encode(texts, convert_to_numpy=True), dtype=np.float32)
+    a /= np.maximum(np.linalg.norm(a, axis=1, keepdims=True), 1e-12)
+    b /= np.maximum(np.linalg.norm(b, axis=1, keepdims=True), 1e-12)
+    cosines = (a * b).sum(axis=1)
+    return {
+        "mean": float(cosines.mean()),
+        "min": float(cosines.min()),
+        "p01": float(np.percentile(cosines, 1)),
+        "texts": len(texts)
+    }
+
+
+def _passes_guard(backend: str, agreement: Dict[str, float]) -> bool:
+    if agreement["min"] >= settings.embedding_min_cosine:
+        logger.info(f"{backend} embeddings agree with the reference model (min cosine {agreement['min']:.4f})")
+        return True
+    logger.error(
+        f"{backend} embeddings diverge from the reference model (min cosine {agreement['min']:.4f} < "
+        f"{settings.embedding_min_cosine}); falling back to torch"
+    )
+    return False
+
+
+def _load_reference(model_name: str):
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name, device="cpu")
+
+
+def _load_torch_int8(model_name: str):
+    """Dynamically quantize the model's Linear layers to int8."""
+    import torch
+    
+    reference = _load_reference(model_name)
+    quantized = torch.quantization.quantize_dynamic(reference, {torch.nn.Linear}, dtype=torch.qint8)
+    if not _passes_guard("torch-int8", cosine_agreement(quantized, reference, GUARD_SAMPLE_TEXTS)):
+        return reference
+    return quantized
+
+
+def _last_hidden_state_module(model):
+    """Wrap a Hugging Face model so ONNX export sees a single tensor output."""
+    import torch
+    
+    class LastHiddenState(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.model = model
+        
+        def forward(self, input_ids, attention_mask, token_type_ids=None):
+            return self.model(
+                input_ids=input_ids, attention_mask=attention_mask, token_type_ids=token_type_ids
+            ).last_hidden_state
+    
+    return LastHiddenState()
+
+
+def export_onnx(model_name: str, model_dir: str):
+    """
+    Export the transformer to ONNX (fp32 and dynamically quantized int8).
+    
+    Writes model.onnx, model_int8.onnx, the tokenizer files, and config.json
+    with the pooling settings and each file's agreement with the reference.
+    config.json is written last, in one step, so an interrupted export has
+    none and is redone on the next start. Only mean pooling (what
+    all-MiniLM-L6-v2 uses) is supported.
+    """
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    
+    reference = _load_reference(model_name)
+    transformer, pooling = reference[0], reference[1]
+    if not getattr(pooling, "pooling_mode_mean_tokens", False):
+        raise ValueError(f"{model_name} does not use mean pooling; the ONNX backend cannot reproduce it")
+    
+    os.makedirs(model_dir, exist_ok=True)
+    tokenizer = transformer.tokenizer
+    tokenizer.save_pretrained(model_dir)
+    dummy = tokenizer(["export"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in dummy]
+    
+    fp32_path = os.path.join(model_dir, "model.onnx")
+    logger.info(f"Exporting {model_name} to {fp32_path}...")
+    with torch.no_grad():
+        torch.onnx.export(
+            _last_hidden_state_module(transformer.auto_model).eval(),
+            tuple(dummy[name] for name in input_names),
+            fp32_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes={name: {0: "batch", 1: "sequence"} for name in input_names + ["last_hidden_state"]},
+            opset_version=14
+        )
+    quantize_dynamic(fp32_path, os.path.join(model_dir, "model_int8.onnx"), weight_type=QuantType.QInt8)
+    
+    config = {
+        "model_name": model_name,
+        "max_seq_length": transformer.max_seq_length,
+        "normalize": any(type(module).__name__ == "Normalize" for module in reference),
+        "agreement": {}
+    }
+    for file_name in ("model.onnx", "model_int8.onnx"):
+        config["agreement"][file_name] = cosine_agreement(
+            OnnxEmbeddingModel(model_dir, file_name, config=config), reference, GUARD_SAMPLE_TEXTS
+        )
+    config_path = os.path.join(model_dir, "config.json")
+    tmp_path = f"{config_path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(config, f, indent=2)
+    os.replace(tmp_path, config_path)
+    logger.info(f"ONNX export complete: {config['agreement']}")
+
+
+class OnnxEmbeddingModel:
+    """
+    Sentence embeddings from an exported ONNX transformer.
+    
+    Mirrors ``SentenceTransformer.encode`` for the subset this app uses:
+    tokenize, run the transformer, mean-pool over the attention mask and
+    L2-normalize. Needs onnxruntime and the tokenizer, but not torch.
+    
+    ``config`` defaults to the export's config.json.
+    """
+    
+    def __init__(self, model_dir: str, file_name: str = "model.onnx", threads: int = 0,
+                 config: Optional[Dict[str, Any]] = None):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+        
+        self.config = config if config is not None else _read_export_config(model_dir)
+        if self.config is None:
+            raise FileNotFoundError(f"No ONNX export config.json in {model_dir}")
+        self.max_seq_length = self.config["max_seq_length"]
+        self.normalize = self.config["normalize"]
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        # Worker processes pin OMP_NUM_THREADS; honour it as the intra-op pool size
+        threads = threads or int(os.environ.get("OMP_NUM_THREADS", "0"))
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, file_name), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.dimension = self.session.get_outputs()[0].shape[-1]
+    
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32, **kwargs) -> np.ndarray:
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+        
+        out = np.empty((len(sentences), self.dimension), dtype=np.float32)
+        # Longest first, like SentenceTransformer, so batches pad less
+        order = np.argsort([-len(s) for s in sentences], kind="stable")
+        for start in range(0, len(sentences), batch_size):
+            idx = order[start:start + batch_size]
+            encoded = self.tokenizer(
+                [sentences[i] for i in idx], padding=True, truncation=True,
+                max_length=self.max_seq_length, return_tensors="np"
+            )
+            feeds = {name: value.astype(np.int64) for name, value in encoded.items() if name in self.input_names}
+            hidden = self.session.run(None, feeds)[0]
+            mask = encoded["attention_mask"][..., None].astype(np.float32)
+            embeddings = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+            if self.normalize:
+                embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+            out[idx] = embeddings
+        return out[0] if single else out
+
+
+def _read_export_config(model_dir: str) -> Optional[Dict[str, Any]]:
+    """The export's config.json, or None if there is none (no export, or an interrupted one)."""
+    config_path = os.path.join(model_dir, "config.json")
+    if not os.path.exists(config_path):
+        return None
+    with open(config_path, 'r') as f:
+        return json.load(f)
+
+
+def _load_onnx(model_name: str, quantized: bool):
+    backend = "onnx-int8" if quantized else "onnx"
+    model_dir = os.path.join(resolve_data_path(settings.embedding_onnx_dir), model_name.replace("/", "__"))
+    file_name = "model_int8.onnx" if quantized else "model.onnx"
+    config = _read_export_config(model_dir)
+    if not os.path.exists(os.path.join(model_dir, file_name)) or file_name not in (config or {}).get("agreement", {}):
+        export_onnx(model_name, model_dir)
+        config = _read_export_config(model_dir)
+    
+    agreement = (config or {}).get("agreement", {}).get(file_name)
+    if agreement is None:
+        logger.error(f"{backend} export in {model_dir} has no accuracy check for {file_name}; falling back to torch")
+        return _load_reference(model_name)
+    model = OnnxEmbeddingModel(model_dir, file_name, config=config)
+    if not _passes_guard(backend, agreement):
+        return _load_reference(model_name)
+    return model
+
+
+def load_embedding_model(backend: str = settings.embedding_backend, model_name: str = settings.embedding_model_name):
+    """
+    Load the embedding model on the selected inference backend.
+    
+    Args:
+        backend: "torch" (full precision), "torch-int8" (dynamic int8
+            quantization of Linear layers), "onnx" or "onnx-int8" (ONNX
+            Runtime; exported once into EMBEDDING_ONNX_DIR)
+        model_name: SentenceTransformer model name
+        
+    Returns:
+        A model with a SentenceTransformer-compatible ``encode``. Quantized or
+        exported backends are checked against the reference model and the
+        reference is returned instead if they disagree (see EMBEDDING_MIN_COSINE).
+    """
+    backend = backend.lower()
+    if backend == "torch":
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_name)
+    if backend == "torch-int8":
+        return _load_torch_int8(model_name)
+    if backend in ("onnx", "onnx-int8"):
+        return _load_onnx(model_name, quantized=backend == "onnx-int8")
+    raise ValueError(f"Unknown embedding backend: {backend} (expected one of {', '.join(BACKENDS)})")
@@ -0,0 +1,166 @@
+"""Request-coalescing front end for the embedding model."""
+from app.core.config import settings
+from app.core.executors import embedding_executor, run_blocking
+from app.core.providers import LazyProvider
+from app.services.embedding_svc import get_embedding_service
+from typing import List, Dict, Any, Optional, Tuple
+import asyncio
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingQueueFullError(Exception):
+    """Raised when the embedding queue is at its configured depth limit."""
+
+
+class EmbeddingBatcher:
+    """
+    Collects concurrent single-text embedding requests into batched encodes.
+    
+    The first request to arrive opens a batch window; requests that arrive
+    before the window closes (or until the batch is full) are encoded together
+    with one ``generate_embeddings`` call. Each caller awaits its own future.
+    """
+    
+    def __init__(
+        self,
+        service=None,
+        batch_window_ms: float = settings.embedding_batch_window_ms,
+        max_batch_size: int = settings.embedding_max_batch_size,
+        max_queue_depth: int = settings.embedding_max_queue_depth,
+        max_concurrent_batches: int = settings.embedding_max_workers
+    ):
+        # None means "resolve the shared embedding service on first encode",
+        # so constructing the batcher never loads the model
+        self._service = service
+        self.batch_window = batch_window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self.max_queue_depth = max_queue_depth
+        self.max_concurrent_batches = max_concurrent_batches
+        
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._batch_slots: Optional[asyncio.Semaphore] = None
+        
+        # Metrics
+        self.requests = 0
+        self.batches = 0
+        self.batched_texts = 0
+        self.rejected = 0
+        self.max_observed_depth = 0
+    
+    def _ensure_started(self):
+        """Create the queue and worker task on the running event loop."""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._worker and not self._worker.done():
+            return
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        self._batch_slots = asyncio.Semaphore(self.max_concurrent_batches)
+        self._worker = loop.create_task(self._collect_batches())
+    
+    async def embed(self, text: str) -> np.ndarray:
+        """
+        Embed a single text, sharing an encode call with concurrent requests.
+        
+        Args:
+            text: Input text to embed
+            
+        Returns:
+            Embedding vector as a float32 array (a row of the batch's result)
+        """
+        if not settings.embedding_batching_enabled:
+            return await run_blocking(embedding_executor, self._encode_one, text)
+        
+        self._ensure_started()
+        depth = self._queue.qsize()
+        if depth >= self.max_queue_depth:
+            self.rejected += 1
+            raise EmbeddingQueueFullError(
+                f"Embedding queue is full ({depth} pending requests)"
+            )
+        
+        future = self._loop.create_future()
+        self._queue.put_nowait((text, future))
+        self.requests += 1
+        self.max_observed_depth = max(self.max_observed_depth, depth + 1)
+        return await future
+    
+    async def _collect_batches(self):
+        """Worker loop: gather a batch, hand it off, repeat."""
+        while True:
+            batch = [await self._queue.get()]
+            deadline = self._loop.time() + self.batch_window
+            
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - self._loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            
+            # Bound the number of batches in flight; while we wait for a slot
+            # the queue keeps filling, so the next batch is naturally larger.
+            await self._batch_slots.acquire()
+            self._loop.create_task(self._encode_batch(batch))
+    
+    async def _encode_batch(self, batch: List[Tuple[str, asyncio.Future]]):
+        """Encode one batch and resolve each caller's future."""
+        try:
+            live = [(text, future) for text, future in batch if not future.done()]
+            if not live:
+                return
+            
+            self.batches += 1
+            self.batched_texts += len(live)
+            try:
+                vectors = await run_blocking(
+                    embedding_executor,
+                    self._encode_many,
+                    [text for text, _ in live]
+                )
+            except Exception as e:
+                logger.error(f"Error encoding batch of {len(live)} texts: {e}")
+                for _, future in live:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+            
+            for (_, future), vector in zip(live, vectors):
+                if not future.done():
+                    future.set_result(vector)
+        finally:
+            self._batch_slots.release()
+    
+    @property
+    def service(self):
+        """The embedding service, constructed on first use."""
+        return self._service or get_embedding_service()
+    
+    def _encode_one(self, text: str) -> np.ndarray:
+        return self.service.generate_embedding(text)
+    
+    def _encode_many(self, texts: List[str]) -> np.ndarray:
+        return self.service.generate_embeddings(texts)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return queue and batching counters."""
+        return {
+            "enabled": settings.embedding_batching_enabled,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "max_queue_depth": self.max_queue_depth,
+            "max_observed_depth": self.max_observed_depth,
+            "requests": self.requests,
+            "batches": self.batches,
+            "rejected": self.rejected,
+            "avg_batch_size": round(self.batched_texts / self.batches, 2) if self.batches else 0.0
+        }
+
+
+# Lazily constructed singleton
+get_embedding_batcher = LazyProvider(EmbeddingBatcher, "embedding batcher")
@@ -0,0 +1,328 @@
+"""Persistent, content-addressed cache of computed embeddings."""
+from app.core.config import settings, resolve_data_path
+from app.core.providers import LazyProvider
+from app.services.vector_storage import VectorMatrix
+from collections import OrderedDict, deque
+from typing import Callable, List, Dict, Any, Optional, Tuple
+import numpy as np
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def text_hash(text: str) -> bytes:
+    """SHA-256 of the exact text that would be embedded."""
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    """
+    Embeddings keyed by (model name, sha256(text)), kept across restarts.
+    
+    Layout of the cache directory:
+    - vectors.f32: memory-mapped float32 matrix with one row per entry,
+      grown geometrically up to ``max_entries`` rows; vectors.f16 or
+      vectors.i8 + vectors.scale with a quantized ``dtype``, in which case
+      hits return the decoded (slightly lossy) vector
+    - index.sqlite: (model, text hash) -> row, plus a last-used sequence number
+    - header.json: dimension, dtype and the rows currently allocated
+    
+    The index for the configured model is held in memory as an LRU-ordered
+    dict, so lookups never touch SQLite. When the cache is full, rows held by
+    other models (e.g. after a model switch) are reclaimed first, least
+    recently used first, then this model's least recently used entry's row
+    is reused. Lowering ``max_entries`` keeps the most recently used entries.
+    Recency changes from hits are written back lazily (on the next put, or
+    ``flush``).
+    
+    One process should own a cache directory at a time.
+    """
+    
+    TOUCH_FLUSH_THRESHOLD = 10000
+    MIN_CAPACITY = 1024
+    
+    def __init__(
+        self,
+        path: str,
+        model_name: str = settings.embedding_model_name,
+        dimension: int = settings.embedding_dimension,
+        max_entries: int = settings.embedding_cache_max_entries,
+        dtype: str = settings.embedding_cache_dtype
+    ):
+        self.path = path
+        self.model_name = model_name
+        self.dimension = dimension
+        self.max_entries = max_entries
+        self.dtype = dtype
+        
+        self._rows: "OrderedDict[bytes, int]" = OrderedDict()
+        self._free_rows: List[int] = []
+        # (model, text hash, row) of other models' entries, least recently used first
+        self._foreign: "deque[Tuple[str, bytes, int]]" = deque()
+        self._next_row = 0
+        self._touched: Dict[bytes, int] = {}
+        self._seq = 0
+        self._lock = threading.RLock()
+        
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        
+        self._open()
+    
+    @property
+    def _header_path(self) -> str:
+        return os.path.join(self.path, "header.json")
+    
+    def _open(self):
+        os.makedirs(self.path, exist_ok=True)
+        vectors_prefix = os.path.join(self.path, "vectors")
+        index_path = os.path.join(self.path, "index.sqlite")
+        
+        header = {"dimension": self.dimension, "dtype": self.dtype}
+        capacity = 0
+        if os.path.exists(self._header_path):
+            with open(self._header_path, 'r') as f:
+                stored = json.load(f)
+            if {key: stored.get(key) for key in header} != header:
+                logger.warning(f"Embedding cache at {self.path} has a different shape; starting it afresh")
+                VectorMatrix.remove_files(vectors_prefix)
+                if os.path.exists(index_path):
+                    os.remove(index_path)
+            else:
+                capacity = stored.get("capacity", 0)
+        
+        self._db = sqlite3.connect(index_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                model TEXT NOT NULL,
+                text_hash BLOB NOT NULL,
+                row INTEGER NOT NULL UNIQUE,
+                last_used INTEGER NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            )
+            """
+        )
+        # Rows past the allocated size were never written
+        self._db.execute("DELETE FROM entries WHERE row >= ?", (capacity,))
+        entries = self._db.execute(
+            "SELECT model, text_hash, row, last_used FROM entries ORDER BY last_used"
+        ).fetchall()
+        
+        self._vectors = VectorMatrix(
+            vectors_prefix, self.dimension, capacity or min(self.MIN_CAPACITY, self.max_entries), self.dtype
+        )
+        if capacity > self.max_entries:
+            entries = self._shrink(entries)
+        self._db.commit()
+        self._write_header()
+        
+        used = np.zeros(self._vectors.capacity, dtype=bool)
+        for model, key, row, last_used in entries:
+            used[row] = True
+            self._seq = max(self._seq, last_used)
+            if model == self.model_name:
+                self._rows[key] = row
+            else:
+                self._foreign.append((model, key, row))
+        # Rows are handed out from the high-water mark, then from holes left by
+        # cleared entries; rows held by other models are reclaimed once full
+        self._next_row = int(np.flatnonzero(used)[-1]) + 1 if used.any() else 0
+        self._free_rows = np.flatnonzero(~used[:self._next_row]).tolist()
+        logger.info(f"Embedding cache loaded {len(self._rows)} entries from {self.path}")
+    
+    def _shrink(self, entries: List[Tuple[str, bytes, int, int]]) -> List[Tuple[str, bytes, int, int]]:
+        """Keep the ``max_entries`` most recently used entries, moved into the first ``max_entries`` rows."""
+        dropped, entries = entries[:-self.max_entries], entries[-self.max_entries:]
+        self._db.executemany("DELETE FROM entries WHERE model = ? AND text_hash = ?", [e[:2] for e in dropped])
+        used = np.zeros(self.max_entries, dtype=bool)
+        for entry in entries:
+            if entry[2] < self.max_entries:
+                used[entry[2]] = True
+        free = iter(np.flatnonzero(~used).tolist())
+        kept = []
+        for model, key, row, last_used in entries:
+            if row >= self.max_entries:
+                new_row = next(free)
+                self._vectors.copy_row(row, new_row)
+                self._db.execute(
+                    "UPDATE entries SET row = ? WHERE model = ? AND text_hash = ?", (new_row, model, key)
+                )
+                row = new_row
+            kept.append((model, key, row, last_used))
+        self._vectors.resize(self.max_entries)
+        logger.info(f"Embedding cache shrunk to {self.max_entries} entries ({len(dropped)} dropped)")
+        return kept
+    
+    def _write_header(self):
+        with open(self._header_path, 'w') as f:
+            json.dump({"dimension": self.dimension, "dtype": self.dtype, "capacity": self._vectors.capacity}, f)
+    
+    def _next_seq(self) -> int:
+        self._seq += 1
+        return self._seq
+    
+    def _allocate_row(self) -> Optional[int]:
+        """A free row, a new one, or the row of the least recently used entry (evicting it)."""
+        if self._free_rows:
+            return self._free_rows.pop()
+        capacity = self._vectors.capacity
+        if self._next_row >= capacity and capacity < self.max_entries:
+            # Geometric growth, as the local vector store does, so rows stay amortized O(1)
+            self._vectors.resize(min(self.max_entries, max(self.MIN_CAPACITY, capacity * 2)))
+            self._write_header()
+        if self._next_row < self._vectors.capacity:
+            self._next_row += 1
+            return self._next_row - 1
+        if self._foreign:
+            # Other models' entries (e.g. after a model switch) go before this model's own
+            model, key, row = self._foreign.popleft()
+            self._db.execute("DELETE FROM entries WHERE model = ? AND text_hash = ?", (model, key))
+            self.evictions += 1
+            return row
+        if not self._rows:
+            return None
+        key, row = self._rows.popitem(last=False)
+        self._touched.pop(key, None)
+        self._db.execute("DELETE FROM entries WHERE model = ? AND text_hash = ?", (self.model_name, key))
+        self.evictions += 1
+        return row
+    
+    def _flush_touched(self):
+        if self._touched:
+            self._db.executemany(
+                "UPDATE entries SET last_used = ? WHERE model = ? AND text_hash = ?",
+                [(seq, self.model_name, key) for key, seq in self._touched.items()]
+            )
+            self._touched.clear()
+    
+    def get_many(self, texts: List[str]) -> Dict[int, np.ndarray]:
+        """
+        Look up cached embeddings.
+        
+        Args:
+            texts: Texts to look up
+            
+        Returns:
+            Mapping of position in ``texts`` -> float32 embedding, for hits only
+        """
+        found = {}
+        with self._lock:
+            for i, text in enumerate(texts):
+                key = text_hash(text)
+                row = self._rows.get(key)
+                if row is None:
+                    continue
+                self._rows.move_to_end(key)
+                self._touched[key] = self._next_seq()
+                found[i] = np.array(self._vectors[row])
+            self.hits += len(found)
+            self.misses += len(texts) - len(found)
+            if len(self._touched) >= self.TOUCH_FLUSH_THRESHOLD:
+                self._flush_touched()
+                self._db.commit()
+        return found
+    
+    def put_many(self, texts: List[str], embeddings: np.ndarray):
+        """
+        Store embeddings.
+        
+        Args:
+            texts: Texts that were embedded
+            embeddings: (len(texts), dimension) array of their embeddings
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        with self._lock:
+            records = []
+            for text, embedding in zip(texts, embeddings):
+                key = text_hash(text)
+                row = self._rows.get(key)
+                if row is None:
+                    row = self._allocate_row()
+                    if row is None:
+                        break
+                self._vectors[row] = embedding
+                self._rows[key] = row
+                self._rows.move_to_end(key)
+                self._touched.pop(key, None)
+                records.append((self.model_name, key, row, self._next_seq()))
+            self._flush_touched()
+            self._db.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)", records)
+            self._db.commit()
+    
+    def embed(self, texts: List[str], encode: Callable[[List[str]], Any]) -> np.ndarray:
+        """
+        Embed texts, calling ``encode`` only for those not already cached.
+        
+        Duplicate texts within the batch are encoded once.
+        
+        Args:
+            texts: Texts to embed
+            encode: Function mapping a list of texts to their embeddings
+            
+        Returns:
+            (len(texts), dimension) float32 array
+        """
+        out = np.empty((len(texts), self.dimension), dtype=np.float32)
+        found = self.get_many(texts)
+        for i, vector in found.items():
+            out[i] = vector
+        
+        missing: Dict[str, List[int]] = {}
+        for i, text in enumerate(texts):
+            if i not in found:
+                missing.setdefault(text, []).append(i)
+        if missing:
+            unique = list(missing.keys())
+            computed = np.asarray(encode(unique), dtype=np.float32).reshape(len(unique), self.dimension)
+            for text, vector in zip(unique, computed):
+                out[missing[text]] = vector
+            self.put_many(unique, computed)
+        return out
+    
+    def flush(self):
+        """Write pending recency updates and sync the vectors file."""
+        with self._lock:
+            self._flush_touched()
+            self._db.commit()
+            self._vectors.flush()
+    
+    def clear(self):
+        """Drop every entry for this model."""
+        with self._lock:
+            self._free_rows.extend(self._rows.values())
+            self._rows.clear()
+            self._touched.clear()
+            self._db.execute("DELETE FROM entries WHERE model = ?", (self.model_name,))
+            self._db.commit()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and current size."""
+        lookups = self.hits + self.misses
+        return {
+            "enabled": settings.embedding_cache_enabled,
+            "entries": len(self._rows),
+            "capacity": self.max_entries,
+            "dtype": self.dtype,
+            "bytes_per_entry": self._vectors.bytes_per_row,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+        }
+
+
+def create_embedding_cache() -> EmbeddingCache:
+    return EmbeddingCache(resolve_data_path(settings.embedding_cache_path))
+
+
+# Lazily constructed singleton
+get_embedding_cache = LazyProvider(create_embedding_cache, "embedding cache")
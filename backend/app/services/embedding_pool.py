@@ -0,0 +1,196 @@
+"""Multi-process embedding for bulk ingestion, returning results through shared memory."""
+from app.core.config import settings
+from app.services.embedding_backends import load_embedding_model
+from app.services.embedding_cache import EmbeddingCache
+from multiprocessing import shared_memory
+from typing import Callable, List, Optional
+import multiprocessing
+import logging
+import os
+import queue
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def _worker_main(conn, shm_name: str, capacity: int, dimension: int, threads: int,
+                 encode_batch_size: int, model_factory: Callable):
+    """
+    Worker process loop: load the model once, then embed whatever arrives.
+    
+    Each request is a list of texts; the embeddings are written as float32
+    into this worker's shared-memory block and only the row count is sent
+    back, so no vectors are pickled.
+    """
+    # Each worker gets a fixed slice of the machine rather than every core
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    
+    shm = shared_memory.SharedMemory(name=shm_name)
+    out = np.ndarray((capacity, dimension), dtype=np.float32, buffer=shm.buf)
+    try:
+        model = model_factory()
+        model.encode(["warmup"], batch_size=1, convert_to_numpy=True)
+        conn.send(("ready", None))
+        
+        while True:
+            texts = conn.recv()
+            if texts is None:
+                break
+            try:
+                embeddings = model.encode(texts, batch_size=encode_batch_size, convert_to_numpy=True)
+                out[:len(texts)] = embeddings
+                conn.send(("ok", len(texts)))
+            except Exception as e:
+                conn.send(("error", repr(e)))
+    except Exception as e:
+        conn.send(("error", repr(e)))
+    finally:
+        del out
+        shm.close()
+        conn.close()
+
+
+class _Worker:
+    """Parent-side handle: process, pipe and the shared output block."""
+    
+    def __init__(self, ctx, capacity: int, dimension: int, threads: int,
+                 encode_batch_size: int, model_factory: Callable):
+        self.capacity = capacity
+        self.shm = shared_memory.SharedMemory(create=True, size=capacity * dimension * 4)
+        self.out = np.ndarray((capacity, dimension), dtype=np.float32, buffer=self.shm.buf)
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(child_conn, self.shm.name, capacity, dimension, threads, encode_batch_size, model_factory),
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+    
+    def _receive(self):
+        try:
+            status, value = self.conn.recv()
+        except EOFError:
+            raise RuntimeError(f"Embedding worker exited unexpectedly (exit code {self.process.exitcode})")
+        if status == "error":
+            raise RuntimeError(f"Embedding worker failed: {value}")
+        return value
+    
+    def encode(self, texts: List[str]) -> np.ndarray:
+        self.conn.send(texts)
+        count = self._receive()
+        return self.out[:count].copy()
+    
+    def close(self):
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout=10)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.conn.close()
+        del self.out
+        self.shm.close()
+        self.shm.unlink()
+
+
+class EmbeddingProcessPool:
+    """
+    Embeds text batches on a pool of worker processes.
+    
+    Every worker loads the model once at start-up and runs torch with
+    ``threads_per_worker`` intra-op threads, so N workers use about
+    N * threads_per_worker cores without oversubscribing. Results come back
+    as float32 arrays through a shared-memory block per worker.
+    
+    ``generate_embeddings`` is thread-safe and blocks until a worker is free,
+    so calling it from several threads keeps all workers busy; the ingestion
+    pipeline does that when given ``embed_concurrency > 1``. Use as a context
+    manager, or call ``close()`` to stop the workers. With a ``cache``, only
+    texts it does not already hold are sent to the workers.
+    """
+    
+    def __init__(
+        self,
+        workers: int = settings.ingest_embed_workers,
+        threads_per_worker: int = settings.ingest_embed_threads_per_worker,
+        max_batch_size: int = 1024,
+        encode_batch_size: int = settings.ingest_encode_batch_size,
+        dimension: int = settings.embedding_dimension,
+        model_factory: Callable = load_embedding_model,
+        cache: Optional[EmbeddingCache] = None
+    ):
+        self.workers = workers
+        self.max_batch_size = max_batch_size
+        self.dimension = dimension
+        self.cache = cache
+        self._closed = False
+        self._lock = threading.Lock()
+        
+        # spawn: forking a parent that has touched torch can deadlock
+        ctx = multiprocessing.get_context("spawn")
+        self._workers: List[_Worker] = []
+        self._idle: queue.Queue = queue.Queue()
+        try:
+            for _ in range(workers):
+                self._workers.append(
+                    _Worker(ctx, max_batch_size, dimension, threads_per_worker, encode_batch_size, model_factory)
+                )
+            # Models load in parallel; wait for all of them
+            for worker in self._workers:
+                worker._receive()
+                self._idle.put(worker)
+        except Exception:
+            self.close()
+            raise
+        logger.info(f"Started {workers} embedding workers ({threads_per_worker} threads each)")
+    
+    def generate_embeddings(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed texts on the next free worker.
+        
+        Args:
+            texts: Input texts; batches larger than max_batch_size are split
+            
+        Returns:
+            (len(texts), dimension) float32 array
+        """
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+        if self.cache is not None:
+            return self.cache.embed(texts, self._encode)
+        return self._encode(texts)
+    
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        worker = self._idle.get()
+        try:
+            return np.concatenate([
+                worker.encode(texts[i:i + self.max_batch_size])
+                for i in range(0, len(texts), self.max_batch_size)
+            ])
+        finally:
+            self._idle.put(worker)
+    
+    def close(self):
+        """Stop the workers and release their shared memory."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            for worker in self._workers:
+                worker.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
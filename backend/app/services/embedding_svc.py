@@ -1,21 +1,49 @@
 """Embedding service using sentence-transformers."""
-from sentence_transformers import SentenceTransformer
 from app.core.config import settings
-from typing import List, Union
+from app.core.executors import embedding_executor, run_blocking
+from app.core.providers import LazyProvider
+from app.services.embedding_backends import load_embedding_model
+from app.services.embedding_cache import EmbeddingCache, get_embedding_cache
+from typing import List, Optional
+import numpy as np
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+def embedding_model_version() -> str:
+    """Identifies the vectors the current configuration produces; a change means re-embedding."""
+    return f"{settings.embedding_model_name}:{settings.embedding_dimension}"
+
+
 class EmbeddingService:
     """Service for generating embeddings using sentence-transformers."""
     
-    def __init__(self):
-        logger.info(f"Loading embedding model: {settings.embedding_model_name}")
-        self.model = SentenceTransformer(settings.embedding_model_name)
-        logger.info("Embedding model loaded successfully")
+    def __init__(self, model=None):
+        """
+        Args:
+            model: A loaded model with a SentenceTransformer-compatible
+                ``encode`` (by default the configured model is loaded)
+        """
+        if model is None:
+            logger.info(f"Loading embedding model: {settings.embedding_model_name} ({settings.embedding_backend})")
+            model = load_embedding_model()
+            logger.info("Embedding model loaded successfully")
+        self.model = model
+    
+    @property
+    def cache(self) -> Optional[EmbeddingCache]:
+        """The persistent cache, opened on first use (a model loaded before fork must not carry it)."""
+        return get_embedding_cache() if settings.embedding_cache_enabled else None
     
-    def generate_embedding(self, text: str) -> List[float]:
+    def warmup(self):
+        """Run one encode so the first real request doesn't pay for lazy kernel setup."""
+        self.model.encode("warmup", convert_to_tensor=False)
+    
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        return np.asarray(self.model.encode(texts, convert_to_tensor=False), dtype=np.float32)
+    
+    def generate_embedding(self, text: str) -> np.ndarray:
         """
         Generate embedding for a single text.
         
@@ -23,16 +51,17 @@ class EmbeddingService:
             text: Input text to embed
             
         Returns:
-            Embedding vector as list of floats
+            Embedding vector as a float32 array
         """
         try:
-            embedding = self.model.encode(text, convert_to_tensor=False)
-            return embedding.tolist()
+            if self.cache is not None:
+                return self.cache.embed([text], self._encode)[0]
+            return self._encode([text])[0]
         except Exception as e:
             logger.error(f"Error generating embedding: {e}")
             raise
     
-    def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
+    def generate_embeddings(self, texts: List[str]) -> np.ndarray:
         """
         Generate embeddings for multiple texts.
         
@@ -40,15 +69,40 @@ class EmbeddingService:
             texts: List of input texts to embed
             
         Returns:
-            List of embedding vectors
+            (len(texts), dimension) float32 array, one row per text
         """
         try:
-            embeddings = self.model.encode(texts, convert_to_tensor=False)
-            return [emb.tolist() for emb in embeddings]
+            if self.cache is not None:
+                return self.cache.embed(texts, self._encode)
+            return self._encode(texts)
         except Exception as e:
             logger.error(f"Error generating embeddings: {e}")
             raise
+    
+    async def generate_embedding_async(self, text: str) -> np.ndarray:
+        """
+        Generate embedding for a single text without blocking the event loop.
+        
+        Args:
+            text: Input text to embed
+            
+        Returns:
+            Embedding vector as a float32 array
+        """
+        return await run_blocking(embedding_executor, self.generate_embedding, text)
+    
+    async def generate_embeddings_async(self, texts: List[str]) -> np.ndarray:
+        """
+        Generate embeddings for multiple texts without blocking the event loop.
+        
+        Args:
+            texts: List of input texts to embed
+            
+        Returns:
+            (len(texts), dimension) float32 array
+        """
+        return await run_blocking(embedding_executor, self.generate_embeddings, texts)
 
 
-# Singleton instance
-embedding_service = EmbeddingService()
+# Lazily constructed singleton
+get_embedding_service = LazyProvider(EmbeddingService, "embedding service")
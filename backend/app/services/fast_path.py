@@ -0,0 +1,155 @@
+"""Heuristic risk scoring that answers without the LLM when retrieval is decisive."""
+from app.core.config import settings
+from app.core.providers import LazyProvider
+from app.core.tokenizer import tokenize
+from typing import Any, Dict, List, Optional, Set
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def key_terms(text: str) -> Set[str]:
+    """Distinct search terms of a text (see ``tokenize``)."""
+    return set(tokenize(text))
+
+
+def term_overlap(idea_terms: Set[str], patent: Dict[str, Any]) -> float:
+    """
+    Fraction of the idea's key terms found in a patent's title, abstract and
+    matched claims.
+    
+    Claims are not stored in the patent metadata, so the claim text is that
+    of the ``matched_claims`` claim-chunk retrieval attaches (none unless
+    CLAIM_CHUNKS_PER_PATENT is set); the abstract is as stored, truncated.
+    """
+    if not idea_terms:
+        return 0.0
+    metadata = patent.get('metadata', {})
+    texts = [metadata.get('title', ""), metadata.get('abstract', "")]
+    texts += [claim.get('text', "") for claim in patent.get('matched_claims') or []]
+    patent_terms = key_terms(" ".join(text or "" for text in texts))
+    return len(idea_terms & patent_terms) / len(idea_terms)
+
+
+class FastPathScorer:
+    """
+    Decides from the retrieval results alone whether an LLM call is needed.
+    
+    Two signals: the similarity scores of the retrieved patents and the share
+    of the idea's key terms each patent contains (see ``term_overlap``; with
+    claim chunks, the claims that matched count too). An answer is only given
+    when both agree clearly:
+    
+    - Low: every patent scores at most ``low_max_score`` and none contains
+      more than ``low_max_overlap`` of the key terms
+    - High: the best patent scores at least ``high_min_score`` and contains
+      at least ``high_min_overlap`` of the key terms (a near-duplicate)
+    
+    Everything in between goes to the LLM.
+    """
+    
+    def __init__(
+        self,
+        enabled: bool = settings.fast_path_enabled,
+        low_max_score: float = settings.fast_path_low_max_score,
+        low_max_overlap: float = settings.fast_path_low_max_overlap,
+        high_min_score: float = settings.fast_path_high_min_score,
+        high_min_overlap: float = settings.fast_path_high_min_overlap
+    ):
+        self.enabled = enabled
+        self.low_max_score = low_max_score
+        self.low_max_overlap = low_max_overlap
+        self.high_min_score = high_min_score
+        self.high_min_overlap = high_min_overlap
+        self._lock = threading.Lock()
+        
+        # Metrics
+        self.evaluated = 0
+        self.skipped_low = 0
+        self.skipped_high = 0
+    
+    def assess(self, invention_idea: str, retrieved_patents: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        Score an idea against its retrieved patents.
+        
+        Args:
+            invention_idea: The user's invention description
+            retrieved_patents: Retrieved patents (``score`` and ``metadata``)
+            
+        Returns:
+            An analysis dict shaped like the LLM's, or None when the LLM is needed
+        """
+        if not self.enabled or not retrieved_patents:
+            return None
+        ranked = sorted(retrieved_patents, key=lambda p: p.get('score', 0), reverse=True)
+        idea_terms = key_terms(invention_idea)
+        overlaps = [term_overlap(idea_terms, p) for p in ranked]
+        top_score = ranked[0].get('score', 0)
+        
+        analysis = None
+        if top_score <= self.low_max_score and max(overlaps) <= self.low_max_overlap:
+            analysis = {
+                "risk_level": "Low",
+                "analysis": (
+                    f"Fast-path assessment (no LLM review): the closest patent found has a similarity "
+                    f"of {top_score:.2f} and none of the {len(ranked)} retrieved patents shares more "
+                    f"than {max(overlaps):.0%} of the idea's key terms, so no meaningful overlap "
+                    f"with the indexed prior art was found."
+                ),
+                "conflicting_patents": [],
+                "recommendations": (
+                    "No close prior art was found in the indexed patents. Search beyond this index "
+                    "and consult a patent attorney before filing."
+                )
+            }
+        elif top_score >= self.high_min_score and overlaps[0] >= self.high_min_overlap:
+            conflicting = [
+                p.get('metadata', {}).get('publication_number', p.get('id', ''))
+                for p, overlap in zip(ranked, overlaps)
+                if p.get('score', 0) >= self.high_min_score and overlap >= self.high_min_overlap
+            ]
+            analysis = {
+                "risk_level": "High",
+                "analysis": (
+                    f"Fast-path assessment (no LLM review): {conflicting[0]} is a near-duplicate of "
+                    f"this idea, with a similarity of {top_score:.2f} and {overlaps[0]:.0%} of the "
+                    f"idea's key terms in its text."
+                ),
+                "conflicting_patents": conflicting,
+                "recommendations": (
+                    "Review the listed patents closely; the idea as described appears to be already "
+                    "patented. Consult a patent attorney about differentiating features."
+                )
+            }
+        
+        with self._lock:
+            self.evaluated += 1
+            if analysis is not None:
+                if analysis["risk_level"] == "Low":
+                    self.skipped_low += 1
+                else:
+                    self.skipped_high += 1
+        if analysis is not None:
+            logger.info(
+                f"Fast path: {analysis['risk_level']} risk (top score {top_score:.3f}, "
+                f"term overlap {max(overlaps):.2f}); skipping the LLM"
+            )
+        return analysis
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return how often the LLM was skipped."""
+        with self._lock:
+            skipped = self.skipped_low + self.skipped_high
+            return {
+                "enabled": self.enabled,
+                "evaluated": self.evaluated,
+                "skipped_low": self.skipped_low,
+                "skipped_high": self.skipped_high,
+                "sent_to_llm": self.evaluated - skipped,
+                "skip_rate": round(skipped / self.evaluated, 3) if self.evaluated else 0.0
+            }
+
+
+# Lazily constructed singleton
+get_fast_path_scorer = LazyProvider(FastPathScorer, "fast-path scorer")
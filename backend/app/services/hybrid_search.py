@@ -0,0 +1,183 @@
+"""Hybrid retrieval: vector and BM25 results fused by reciprocal rank fusion."""
+from app.core.config import settings
+from app.core.executors import io_executor, run_blocking
+from app.core.metrics import STAGE_SECONDS, UPSTREAM_ERRORS
+from app.services.claim_chunks import get_claim_chunk_retriever
+from app.services.metadata_filter import MetadataFilter
+from app.services.reranker import get_reranker
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import asyncio
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Retrieval details passed through to the retrieved patents when present
+MATCH_DETAILS = ('bm25', 'rrf_score', 'matched_claims', 'rerank_score')
+
+_VECTOR_QUERY_SECONDS = STAGE_SECONDS.labels("vector_query")
+_LEXICAL_QUERY_SECONDS = STAGE_SECONDS.labels("lexical_query")
+_RERANK_SECONDS = STAGE_SECONDS.labels("rerank")
+_VECTOR_STORE_ERRORS = UPSTREAM_ERRORS.labels("vector_store")
+
+
+def retrieved_patent(match: Dict[str, Any]) -> Dict[str, Any]:
+    """A vector store match as a retrieved-patent dict (``id``, ``score``, ``metadata`` and details)."""
+    return {
+        'id': match['id'],
+        'score': match['score'],
+        'metadata': match.get('metadata', {}),
+        **{key: match[key] for key in MATCH_DETAILS if key in match}
+    }
+
+
+def reciprocal_rank_fusion(rankings: Iterable[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """
+    Fuse ranked ID lists: each list adds 1 / (k + rank) to the IDs it contains.
+    
+    Only ranks are used, so scores on different scales (cosine, BM25) need no
+    calibration; an ID ranked well by both lists beats one ranked first by one.
+    
+    Returns:
+        List of (id, fused score), best first
+    """
+    fused: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, 1):
+            fused[item] = fused.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
+
+
+def _cosine(query: np.ndarray, values: Any) -> float:
+    values = np.asarray(values, dtype=np.float32)
+    norm = float(np.linalg.norm(query) * np.linalg.norm(values))
+    return float(np.dot(query, values) / norm) if norm else 0.0
+
+
+def fuse_results(
+    query_vector: np.ndarray,
+    vector_results: Dict[str, Any],
+    lexical_results: List[Tuple[str, float]],
+    vector_store,
+    top_k: int,
+    rrf_k: int = settings.hybrid_rrf_k,
+    metadata_filter: Optional[MetadataFilter] = None
+) -> Dict[str, Any]:
+    """
+    Merge vector matches and BM25 hits into one Pinecone-shaped result.
+    
+    Patents only the lexical index found are fetched from the vector store for
+    their metadata and scored by cosine similarity like the rest, so ``score``
+    keeps its meaning for the fast path and cache; ``bm25`` and ``rrf_score``
+    are added to each match. The lexical index does not evaluate metadata
+    filters, so lexical-only hits are checked against ``metadata_filter``
+    once their metadata is fetched.
+    """
+    matches = {match['id']: retrieved_patent(match) for match in vector_results.get('matches', [])}
+    bm25 = dict(lexical_results)
+    fused = reciprocal_rank_fusion([list(matches), [doc_id for doc_id, _ in lexical_results]], rrf_k)
+    
+    # Fetch a few spare lexical-only hits in case some are not in the vector store
+    missing = [doc_id for doc_id, _ in fused[:top_k * 2] if doc_id not in matches]
+    if missing:
+        query = np.asarray(query_vector, dtype=np.float32)
+        for doc_id, item in vector_store.fetch_vectors(missing).items():
+            if metadata_filter is not None and not metadata_filter.matches(item.get('metadata', {})):
+                continue
+            matches[doc_id] = {
+                'id': doc_id,
+                'score': _cosine(query, item['values']),
+                'metadata': item.get('metadata', {})
+            }
+    
+    results = []
+    for doc_id, rrf_score in fused:
+        match = matches.get(doc_id)
+        if match is None:
+            continue
+        results.append({**match, 'bm25': bm25.get(doc_id, 0.0), 'rrf_score': rrf_score})
+        if len(results) == top_k:
+            break
+    return {"matches": results}
+
+
+async def vector_query_async(
+    query_vector: np.ndarray,
+    vector_store,
+    top_k: int,
+    metadata_filter: Optional[MetadataFilter] = None
+) -> Dict[str, Any]:
+    """Vector query, grouped by patent when the index holds claim chunks."""
+    try:
+        with _VECTOR_QUERY_SECONDS.time():
+            if settings.claim_chunks_per_patent > 0:
+                return await get_claim_chunk_retriever().query_async(vector_store, query_vector, top_k, metadata_filter)
+            return await vector_store.query_similar_async(query_vector, top_k, metadata_filter)
+    except Exception:
+        _VECTOR_STORE_ERRORS.inc()
+        raise
+
+
+async def _lexical_query_async(lexical_index, text: str, top_k: int) -> List[Tuple[str, float]]:
+    with _LEXICAL_QUERY_SECONDS.time():
+        return await run_blocking(io_executor, lexical_index.search, text, top_k)
+
+
+async def _rerank_async(text: str, results: Dict[str, Any], top_k: int) -> Dict[str, Any]:
+    """Rerank the candidates; if the cross-encoder fails, fall back to retrieval order."""
+    try:
+        with _RERANK_SECONDS.time():
+            return await get_reranker().rerank_async(text, results, top_k)
+    except Exception as e:
+        logger.error(f"Reranking failed, keeping retrieval order: {e}")
+        return {**results, 'matches': results.get('matches', [])[:top_k]}
+
+
+async def hybrid_query_async(
+    text: str,
+    query_vector: np.ndarray,
+    vector_store,
+    lexical_index,
+    top_k: int = 5,
+    metadata_filter: Optional[MetadataFilter] = None
+) -> Dict[str, Any]:
+    """
+    Retrieve patents by vector similarity and, when the lexical index has documents, BM25.
+    
+    The vector query and the BM25 search run concurrently on the I/O pool and
+    the top ``hybrid_candidates`` of each are fused. With hybrid search
+    disabled or an empty lexical index this is a plain vector query (grouped
+    by patent when claims are chunked). With reranking enabled the top
+    ``rerank_candidates`` are retrieved and a cross-encoder picks ``top_k``
+    of them (see services/reranker.py).
+    
+    Args:
+        text: Query text
+        query_vector: Its embedding
+        vector_store: Vector index to search
+        lexical_index: ``LexicalIndex`` (or None)
+        top_k: Number of results to return
+        metadata_filter: Only return patents whose metadata passes it; pushed
+            down into the vector store query
+            
+    Returns:
+        Query results with a 'matches' list
+    """
+    fetch = max(settings.rerank_candidates, top_k) if settings.rerank_enabled else top_k
+    if not settings.hybrid_search_enabled or lexical_index is None or lexical_index.num_docs == 0:
+        results = await vector_query_async(query_vector, vector_store, fetch, metadata_filter)
+    else:
+        candidates = max(settings.hybrid_candidates, fetch)
+        vector_results, lexical_results = await asyncio.gather(
+            vector_query_async(query_vector, vector_store, candidates, metadata_filter),
+            _lexical_query_async(lexical_index, text, candidates)
+        )
+        results = await run_blocking(
+            io_executor, fuse_results, query_vector, vector_results, lexical_results, vector_store, fetch,
+            settings.hybrid_rrf_k, metadata_filter
+        )
+    
+    if settings.rerank_enabled and results.get('matches'):
+        results = await _rerank_async(text, results, top_k)
+    return results
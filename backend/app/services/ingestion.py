@@ -0,0 +1,761 @@
+"""Streaming ingestion pipeline: paged patent fetch -> batched embedding -> batched upsert."""
+from abc import ABC, abstractmethod
+from app.core.config import settings
+from app.services.claim_chunks import chunk_id, chunk_to_vector, claim_chunks
+from app.services.metadata_filter import MAX_ASSIGNEES, MAX_CPC_CODES, date_key, filter_metadata
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Deque, Iterable, Iterator, Optional
+import hashlib
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of a stage's output
+_DONE = object()
+
+
+def patent_text(patent: Dict[str, Any]) -> str:
+    """Text that is embedded for a patent."""
+    return f"{patent['title']} {patent['abstract']}"
+
+
+def patent_to_vector(patent: Dict[str, Any], embedding: np.ndarray) -> Dict[str, Any]:
+    """Build the vector store record for an embedded patent (with its filter fields, see ``filter_metadata``)."""
+    metadata = {
+        'publication_number': patent['publication_number'],
+        'title': patent['title'][:500],  # Limit metadata size
+        'abstract': patent['abstract'][:1000],
+        'publication_date': patent['publication_date'],
+        **filter_metadata(patent)
+    }
+    if patent.get('cpc'):
+        metadata['cpc'] = patent['cpc'][:MAX_CPC_CODES]
+    if patent.get('assignees'):
+        metadata['assignees'] = patent['assignees'][:MAX_ASSIGNEES]
+    return {'id': patent['publication_number'], 'values': embedding, 'metadata': metadata}
+
+
+def content_hash(patent: Dict[str, Any], include_claims: bool = False) -> str:
+    """Hash of the fields that go into a patent's vectors and metadata (claims only when they are chunked)."""
+    fields = [patent['title'], patent['abstract'], patent['publication_date']]
+    if patent.get('cpc') or patent.get('assignees'):
+        # Left out when absent, so records from sources without them keep their hash
+        fields += ["\x1e".join(patent.get('cpc') or []), "\x1e".join(patent.get('assignees') or [])]
+    if include_claims:
+        fields.append(patent.get('claims') or "")
+    content = "\x1f".join(fields)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def _normalize_patent(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Coerce a raw source record into the dict shape BigQueryService returns."""
+    return {
+        "publication_number": str(record["publication_number"]),
+        "title": record.get("title") or "",
+        "abstract": record.get("abstract") or "",
+        "claims": record.get("claims") or "",
+        "publication_date": str(record.get("publication_date") or ""),
+        "cpc": _string_list(record.get("cpc")),
+        "assignees": _string_list(record.get("assignees"))
+    }
+
+
+def _string_list(value: Any) -> List[str]:
+    """A list field of a source record, given as a list or as one ";"-separated string."""
+    if value is None:
+        return []
+    if isinstance(value, str):
+        value = value.split(";")
+    return [str(item).strip() for item in value if item is not None and str(item).strip()]
+
+
+class PatentSource(ABC):
+    """
+    A resumable, paged stream of patent records.
+    
+    ``iter_pages`` receives the saved checkpoint (or None) and yields pages
+    that start right after the last record the checkpoint covers.
+    """
+    
+    @property
+    @abstractmethod
+    def name(self) -> str:
+        """Identifies the source, so a checkpoint is only resumed against the same one."""
+    
+    @property
+    def complete_since(self) -> bool:
+        """
+        Whether the records just iterated are every publication from the
+        source's start date up to the newest of them, so a finished run may
+        move the manifest's high-water mark there. Only an unlimited
+        BigQuery fetch is; files and samples are not date-ranged.
+        """
+        return False
+    
+    @abstractmethod
+    def iter_pages(self, checkpoint: Optional[Dict[str, Any]] = None) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Yield pages of patent dicts.
+        
+        Args:
+            checkpoint: State saved by a previous, interrupted run
+        """
+
+
+class IterablePatentSource(PatentSource):
+    """Patents from an in-memory iterable (sample data, tests)."""
+    
+    def __init__(self, patents: Iterable[Dict[str, Any]], name: str = "memory", page_size: int = settings.ingest_page_size):
+        self._patents = patents
+        self._name = name
+        self.page_size = page_size
+    
+    @property
+    def name(self) -> str:
+        return self._name
+    
+    def _records(self) -> Iterator[Dict[str, Any]]:
+        return iter(self._patents)
+    
+    def iter_pages(self, checkpoint: Optional[Dict[str, Any]] = None) -> Iterator[List[Dict[str, Any]]]:
+        # Records arrive in a fixed order, so resuming is skipping what was done
+        skip = checkpoint["records"] if checkpoint else 0
+        page = []
+        for position, record in enumerate(self._records()):
+            if position < skip:
+                continue
+            page.append(_normalize_patent(record))
+            if len(page) >= self.page_size:
+                yield page
+                page = []
+        if page:
+            yield page
+
+
+class JSONLPatentSource(IterablePatentSource):
+    """Patents from a JSON Lines file, one record per line."""
+    
+    def __init__(self, path: str, page_size: int = settings.ingest_page_size):
+        super().__init__((), name=f"jsonl:{os.path.abspath(path)}", page_size=page_size)
+        self.path = path
+    
+    def _records(self) -> Iterator[Dict[str, Any]]:
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+class ParquetPatentSource(PatentSource):
+    """Patents from a Parquet file, read one record batch at a time (requires pyarrow)."""
+    
+    def __init__(self, path: str, page_size: int = settings.ingest_page_size):
+        self.path = path
+        self.page_size = page_size
+    
+    @property
+    def name(self) -> str:
+        return f"parquet:{os.path.abspath(self.path)}"
+    
+    def iter_pages(self, checkpoint: Optional[Dict[str, Any]] = None) -> Iterator[List[Dict[str, Any]]]:
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("Reading Parquet sources requires pyarrow (pip install pyarrow)") from e
+        
+        skip = checkpoint["records"] if checkpoint else 0
+        for batch in pq.ParquetFile(self.path).iter_batches(batch_size=self.page_size):
+            if skip >= batch.num_rows:
+                skip -= batch.num_rows
+                continue
+            rows = batch.slice(skip).to_pylist()
+            skip = 0
+            yield [_normalize_patent(row) for row in rows]
+
+
+class BigQueryPatentSource(PatentSource):
+    """Recent US patents from the BigQuery public dataset, paged server-side."""
+    
+    def __init__(
+        self,
+        bigquery_service,
+        limit: Optional[int] = None,
+        page_size: int = settings.ingest_page_size,
+        since: int = settings.bigquery_min_publication_date
+    ):
+        self.bigquery_service = bigquery_service
+        self.limit = limit
+        self.page_size = page_size
+        self.since = since
+        self._truncated = bool(limit)
+    
+    @property
+    def name(self) -> str:
+        return f"bigquery:limit={self.limit}:since={self.since}"
+    
+    @property
+    def complete_since(self) -> bool:
+        # Rows come newest first, so a fetch cut off by the limit misses the
+        # oldest publications after ``since``
+        return not self._truncated
+    
+    def iter_pages(self, checkpoint: Optional[Dict[str, Any]] = None) -> Iterator[List[Dict[str, Any]]]:
+        # Rows are ordered, so resume from the last record with a keyset cursor
+        after = checkpoint.get("last") if checkpoint else None
+        limit = self.limit
+        self._truncated = bool(limit)
+        if limit and checkpoint:
+            limit = max(limit - checkpoint["records"], 0)
+            if limit == 0:
+                return
+        fetched = 0
+        for page in self.bigquery_service.iter_patent_pages(
+            limit=limit, page_size=self.page_size, after=after, since=self.since
+        ):
+            fetched += len(page)
+            yield page
+        self._truncated = bool(limit) and fetched >= limit
+
+
+def open_patent_source(path: str, page_size: int = settings.ingest_page_size) -> PatentSource:
+    """Pick a local file source by extension (.jsonl/.ndjson or .parquet)."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".jsonl", ".ndjson"):
+        return JSONLPatentSource(path, page_size)
+    if extension in (".parquet", ".pq"):
+        return ParquetPatentSource(path, page_size)
+    raise ValueError(f"Unsupported patent source file: {path} (expected .jsonl or .parquet)")
+
+
+class IngestionCheckpoint:
+    """
+    Progress of an ingestion run, saved to a small JSON file after every upsert.
+    
+    Holds the source name, how many source records have been processed and
+    the last of them, and the id of the run (so a resumed run keeps it).
+    Writes go to a temporary file that is renamed over the old one, so a
+    crash never leaves a half-written checkpoint.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+    
+    def load(self, source_name: str) -> Optional[Dict[str, Any]]:
+        """Return the saved state for this source, or None to start from the beginning."""
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, 'r') as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable checkpoint {self.path}: {e}")
+            return None
+        if state.get("source") != source_name:
+            logger.warning(f"Ignoring checkpoint for a different source ({state.get('source')})")
+            return None
+        return state
+    
+    def save(self, source_name: str, records: int, last: Dict[str, Any], run_id: Optional[int] = None):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                "source": source_name,
+                "records": records,
+                "run_id": run_id,
+                "last": {
+                    "publication_number": last["publication_number"],
+                    "publication_date": last["publication_date"]
+                },
+                "updated_at": time.time()
+            }, f)
+        os.replace(tmp_path, self.path)
+    
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class StageStats:
+    """Items processed and time spent by one pipeline stage."""
+    
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.batches = 0
+        self.busy_seconds = 0.0
+    
+    def record(self, items: int, seconds: float):
+        self.items += items
+        self.batches += 1
+        self.busy_seconds += seconds
+    
+    def summary(self) -> str:
+        rate = self.items / self.busy_seconds if self.busy_seconds else 0.0
+        return f"{self.name}: {self.items:,} in {self.batches:,} batches, {self.busy_seconds:.1f}s busy ({rate:,.0f}/s)"
+
+
+class IngestionManifest:
+    """
+    What the vector store currently holds, for delta ingestion (SQLite file).
+    
+    One row per ingested patent: publication_number -> hash of the embedded
+    content, the embedding model version that produced its vector, its
+    publication date, the last run that saw it in the source, and how many
+    claim chunk vectors it has. A meta table keeps the high-water
+    publication_date of completed runs. With ``include_claims`` (claims
+    chunking) a change to the claims text also counts as a change.
+    """
+    
+    SQLITE_BATCH = 500
+    
+    def __init__(self, path: str, include_claims: bool = False):
+        self.path = path
+        self.include_claims = include_claims
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+    
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS patents ("
+                "publication_number TEXT PRIMARY KEY, content_hash TEXT NOT NULL, "
+                "model_version TEXT NOT NULL, publication_date TEXT NOT NULL, seen_run INTEGER NOT NULL, "
+                "chunks INTEGER NOT NULL DEFAULT 0)"
+            )
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(patents)")}
+            if "chunks" not in columns:
+                self._db.execute("ALTER TABLE patents ADD COLUMN chunks INTEGER NOT NULL DEFAULT 0")
+            self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self._db.commit()
+        return self._db
+    
+    def _chunks(self, items: List[Any]) -> Iterator[List[Any]]:
+        for i in range(0, len(items), self.SQLITE_BATCH):
+            yield items[i:i + self.SQLITE_BATCH]
+    
+    def changed(self, patents: List[Dict[str, Any]], model_version: str, run_id: int) -> List[Dict[str, Any]]:
+        """
+        Return the patents that are new, edited, or embedded with another model.
+        
+        Unchanged patents are marked as seen by ``run_id`` so pruning keeps them.
+        """
+        with self._lock:
+            db = self._connect()
+            known = {}
+            for chunk in self._chunks([p['publication_number'] for p in patents]):
+                placeholders = ",".join("?" * len(chunk))
+                for number, stored_hash, version in db.execute(
+                    f"SELECT publication_number, content_hash, model_version FROM patents "
+                    f"WHERE publication_number IN ({placeholders})", chunk
+                ):
+                    known[number] = (stored_hash, version)
+            
+            changed, unchanged = [], []
+            for patent in patents:
+                if known.get(patent['publication_number']) == (content_hash(patent, self.include_claims), model_version):
+                    unchanged.append(patent['publication_number'])
+                else:
+                    changed.append(patent)
+            for chunk in self._chunks(unchanged):
+                placeholders = ",".join("?" * len(chunk))
+                db.execute(f"UPDATE patents SET seen_run = ? WHERE publication_number IN ({placeholders})", [run_id, *chunk])
+            db.commit()
+            return changed
+    
+    def record(
+        self,
+        patents: List[Dict[str, Any]],
+        model_version: str,
+        run_id: int,
+        chunk_counts: Optional[Dict[str, int]] = None
+    ):
+        """Remember patents that were just upserted, with their number of claim chunks."""
+        chunk_counts = chunk_counts or {}
+        with self._lock:
+            db = self._connect()
+            db.executemany(
+                "INSERT OR REPLACE INTO patents "
+                "(publication_number, content_hash, model_version, publication_date, seen_run, chunks) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        p['publication_number'], content_hash(p, self.include_claims), model_version,
+                        p['publication_date'], run_id, chunk_counts.get(p['publication_number'], 0)
+                    )
+                    for p in patents
+                ]
+            )
+            db.commit()
+    
+    def chunk_counts(self, publication_numbers: List[str]) -> Dict[str, int]:
+        """Claim chunk vectors stored per patent (patents without chunks are left out)."""
+        counts = {}
+        with self._lock:
+            db = self._connect()
+            for chunk in self._chunks(publication_numbers):
+                placeholders = ",".join("?" * len(chunk))
+                for number, chunks in db.execute(
+                    f"SELECT publication_number, chunks FROM patents "
+                    f"WHERE publication_number IN ({placeholders}) AND chunks > 0", chunk
+                ):
+                    counts[number] = chunks
+        return counts
+    
+    def unseen(self, run_id: int) -> List[str]:
+        """Patents not seen by ``run_id``, i.e. gone from a full source snapshot."""
+        with self._lock:
+            return [
+                number for (number,) in self._connect().execute(
+                    "SELECT publication_number FROM patents WHERE seen_run != ?", (run_id,)
+                )
+            ]
+    
+    def remove(self, publication_numbers: List[str]):
+        with self._lock:
+            db = self._connect()
+            for chunk in self._chunks(publication_numbers):
+                placeholders = ",".join("?" * len(chunk))
+                db.execute(f"DELETE FROM patents WHERE publication_number IN ({placeholders})", chunk)
+            db.commit()
+    
+    def high_water(self) -> Optional[str]:
+        """Latest publication_date (YYYYMMDD) up to which a completed run fetched everything, if any."""
+        with self._lock:
+            row = self._connect().execute("SELECT value FROM meta WHERE key = 'high_water_date'").fetchone()
+            return row[0] if row else None
+    
+    def set_high_water(self, publication_date: str):
+        with self._lock:
+            db = self._connect()
+            db.execute("INSERT OR REPLACE INTO meta VALUES ('high_water_date', ?)", (publication_date,))
+            db.commit()
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM patents").fetchone()[0]
+    
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+class IngestionPipeline:
+    """
+    Fetch, embed and upsert patents as three concurrent stages.
+    
+    Fetching and embedding run on their own threads; upserting runs on the
+    caller's thread. Stages are connected by bounded queues, so at most
+    ``queue_depth`` batches are in flight between any two stages and memory
+    stays flat regardless of how many patents the source yields. A slow stage
+    shows up as high busy time in the per-stage logs while the others wait.
+    With ``embed_concurrency > 1`` several embed batches are encoded at once,
+    which only helps if ``embedding_service`` can run them in parallel (an
+    ``EmbeddingProcessPool``).
+    
+    With a manifest, only new or changed patents are embedded and upserted
+    (``skip_unchanged=False`` re-embeds everything but still updates the
+    manifest), and ``prune=True`` deletes patents the source no longer returns (only
+    meaningful when the source is a full snapshot).
+    
+    With ``claim_chunks > 0`` each patent is also embedded per claim (up to
+    that many chunks, see services/claim_chunks.py); with a manifest, chunks
+    a patent no longer has are deleted when it is re-ingested or pruned.
+    
+    With a ``lexical_index``, upserted patents are also indexed for BM25
+    search (and pruned ones removed); it is flushed when the run finishes.
+    
+    Upserts happen in source order, and after each one the checkpoint records
+    how far through the source the run has got. An interrupted run resumes
+    from there; a run that finishes removes its checkpoint.
+    """
+    
+    DELETE_BATCH = 1000
+    
+    def __init__(
+        self,
+        source: PatentSource,
+        embedding_service,
+        vector_store,
+        checkpoint: Optional[IngestionCheckpoint] = None,
+        manifest: Optional[IngestionManifest] = None,
+        model_version: str = "",
+        skip_unchanged: bool = True,
+        prune: bool = False,
+        embed_batch_size: int = settings.ingest_embed_batch_size,
+        upsert_batch_size: int = settings.ingest_upsert_batch_size,
+        queue_depth: int = settings.ingest_queue_depth,
+        embed_concurrency: int = 1,
+        log_interval: float = 10.0,
+        lexical_index=None,
+        claim_chunks: int = 0
+    ):
+        if prune and manifest is None:
+            raise ValueError("prune=True needs a manifest")
+        self.source = source
+        self.embedding_service = embedding_service
+        self.vector_store = vector_store
+        self.checkpoint = checkpoint
+        self.manifest = manifest
+        self.model_version = model_version
+        self.skip_unchanged = skip_unchanged
+        self.prune = prune
+        self.embed_batch_size = embed_batch_size
+        self.upsert_batch_size = upsert_batch_size
+        self.embed_concurrency = max(1, embed_concurrency)
+        self.log_interval = log_interval
+        self.lexical_index = lexical_index
+        self.claim_chunks = claim_chunks
+        
+        self._fetched: queue.Queue = queue.Queue(maxsize=queue_depth)
+        self._embedded: queue.Queue = queue.Queue(maxsize=queue_depth)
+        self._stop = threading.Event()
+        self._error: Optional[BaseException] = None
+        self._run_id = 0
+        self._max_date = 0
+        self.skipped = 0
+        self.stats = {name: StageStats(name) for name in ("fetch", "embed", "upsert")}
+    
+    def _put(self, q: queue.Queue, item) -> bool:
+        """Blocking put that gives up once the pipeline is stopping."""
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def _get(self, q: queue.Queue):
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+    
+    def _fail(self, e: BaseException):
+        if self._error is None:
+            self._error = e
+        self._stop.set()
+    
+    def _fetch_stage(self, resume: Optional[Dict[str, Any]], position: int):
+        # Batches carry the source position after their last record, so the
+        # checkpoint advances past skipped (unchanged) patents too
+        stats = self.stats["fetch"]
+        try:
+            pages = self.source.iter_pages(resume)
+            while True:
+                start = time.perf_counter()
+                page = next(pages, None)
+                if page is None:
+                    break
+                stats.record(len(page), time.perf_counter() - start)
+                for i in range(0, len(page), self.embed_batch_size):
+                    chunk = page[i:i + self.embed_batch_size]
+                    position += len(chunk)
+                    self._max_date = max([self._max_date] + [date_key(p['publication_date']) for p in chunk])
+                    patents = chunk
+                    if self.manifest is not None and self.skip_unchanged:
+                        patents = self.manifest.changed(chunk, self.model_version, self._run_id)
+                        self.skipped += len(chunk) - len(patents)
+                    if not self._put(self._fetched, (patents, position, chunk[-1])):
+                        return
+        except BaseException as e:
+            logger.error(f"Fetch stage failed: {e}")
+            self._fail(e)
+        finally:
+            self._put(self._fetched, _DONE)
+    
+    def _embed_stage(self):
+        stats = self.stats["embed"]
+        # Up to embed_concurrency batches are encoded at once (one per pool
+        # worker); results are still handed on in source order
+        in_flight: Deque = deque()
+        executor = ThreadPoolExecutor(max_workers=self.embed_concurrency, thread_name_prefix="ingest-embed")
+        
+        def encode(patents):
+            start = time.perf_counter()
+            chunks = [claim_chunks(p, self.claim_chunks) if self.claim_chunks else [] for p in patents]
+            texts = [patent_text(p) for p in patents] + [c['embed_text'] for cs in chunks for c in cs]
+            embeddings = self.embedding_service.generate_embeddings(texts)
+            vectors = [patent_to_vector(p, e) for p, e in zip(patents, embeddings)]
+            chunk_embeddings = iter(embeddings[len(patents):])
+            for patent, patent_chunks in zip(patents, chunks):
+                vectors.extend(chunk_to_vector(patent, c, next(chunk_embeddings)) for c in patent_chunks)
+            return vectors, time.perf_counter() - start
+        
+        def emit_oldest() -> bool:
+            (patents, position, last), future = in_flight.popleft()
+            vectors, seconds = future.result() if future is not None else ([], 0.0)
+            if patents:
+                stats.record(len(patents), seconds)
+            return self._put(self._embedded, (patents, vectors, position, last))
+        
+        try:
+            while True:
+                batch = self._get(self._fetched)
+                if batch is _DONE:
+                    break
+                future = executor.submit(encode, batch[0]) if batch[0] else None
+                in_flight.append((batch, future))
+                if len(in_flight) >= self.embed_concurrency and not emit_oldest():
+                    return
+            while in_flight:
+                if not emit_oldest():
+                    return
+        except BaseException as e:
+            logger.error(f"Embed stage failed: {e}")
+            self._fail(e)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            self._put(self._embedded, _DONE)
+    
+    def _upsert(self, patents: List[Dict[str, Any]], vectors: List[Dict[str, Any]], position: int, last: Dict[str, Any]):
+        if vectors:
+            start = time.perf_counter()
+            chunk_counts = Counter(v['metadata']['parent'] for v in vectors if 'parent' in v['metadata'])
+            if self.manifest is not None:
+                # A re-ingested patent may have fewer claim chunks than before
+                previous = self.manifest.chunk_counts([p['publication_number'] for p in patents])
+                stale = [
+                    chunk_id(number, i)
+                    for number, count in previous.items()
+                    for i in range(chunk_counts.get(number, 0), count)
+                ]
+                if stale:
+                    self.vector_store.delete_vectors(stale)
+            self.vector_store.upsert_vectors(vectors)
+            if self.lexical_index is not None:
+                self.lexical_index.add_documents(patents)
+            self.stats["upsert"].record(len(vectors), time.perf_counter() - start)
+            if self.manifest is not None:
+                self.manifest.record(patents, self.model_version, self._run_id, chunk_counts)
+        if self.checkpoint is not None:
+            self.checkpoint.save(self.source.name, position, last, self._run_id)
+    
+    def _prune(self) -> int:
+        """Delete patents the source no longer returns from the store and the manifest."""
+        gone = self.manifest.unseen(self._run_id)
+        for i in range(0, len(gone), self.DELETE_BATCH):
+            chunk = gone[i:i + self.DELETE_BATCH]
+            chunk_vectors = [
+                chunk_id(number, j) for number, count in self.manifest.chunk_counts(chunk).items() for j in range(count)
+            ]
+            self.vector_store.delete_vectors(chunk + chunk_vectors)
+            if self.lexical_index is not None:
+                self.lexical_index.delete(chunk)
+            self.manifest.remove(chunk)
+        if gone:
+            logger.info(f"Deleted {len(gone):,} withdrawn patents")
+        return len(gone)
+    
+    def _log_progress(self, position: int, started: float):
+        elapsed = time.perf_counter() - started
+        logger.info(
+            f"  {position:,} source patents processed ({position / elapsed:,.0f}/s overall, "
+            f"{self.skipped:,} unchanged); queues fetched={self._fetched.qsize()} embedded={self._embedded.qsize()}"
+        )
+        for stage in self.stats.values():
+            logger.info(f"    {stage.summary()}")
+    
+    def run(self) -> Dict[str, Any]:
+        """
+        Ingest everything the source yields.
+        
+        Returns:
+            Summary with the number of patents upserted (and vectors, claim
+            chunks included), skipped as unchanged and deleted in this run,
+            where the run resumed from, elapsed seconds and per-stage
+            statistics
+        """
+        resume = self.checkpoint.load(self.source.name) if self.checkpoint is not None else None
+        position = resume["records"] if resume else 0
+        if resume:
+            logger.info(f"Resuming after {position:,} patents (last: {resume['last']['publication_number']})")
+        resumed_from = position
+        self._run_id = resume.get("run_id") if resume and resume.get("run_id") else time.time_ns()
+        
+        started = time.perf_counter()
+        last_log = started
+        threads = [
+            threading.Thread(target=self._fetch_stage, args=(resume, position), name="ingest-fetch", daemon=True),
+            threading.Thread(target=self._embed_stage, name="ingest-embed", daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+        
+        upserted = 0
+        vector_count = 0
+        try:
+            patents: List[Dict[str, Any]] = []
+            vectors: List[Dict[str, Any]] = []
+            last = None
+            while True:
+                item = self._get(self._embedded)
+                if item is _DONE:
+                    break
+                batch, batch_vectors, position, last = item
+                patents.extend(batch)
+                vectors.extend(batch_vectors)
+                if len(vectors) >= self.upsert_batch_size or not batch:
+                    upserted += len(patents)
+                    vector_count += len(vectors)
+                    self._upsert(patents, vectors, position, last)
+                    patents, vectors = [], []
+                if time.perf_counter() - last_log >= self.log_interval:
+                    self._log_progress(position, started)
+                    last_log = time.perf_counter()
+            
+            if self._error is not None:
+                raise self._error
+            if vectors:
+                upserted += len(patents)
+                vector_count += len(vectors)
+                self._upsert(patents, vectors, position, last)
+            
+            deleted = self._prune() if self.prune else 0
+            self.vector_store.flush()
+            if self.lexical_index is not None:
+                self.lexical_index.flush()
+            if self.manifest is not None and self._max_date and self.source.complete_since:
+                self.manifest.set_high_water(str(max(self._max_date, date_key(self.manifest.high_water()))))
+        
+        except BaseException as e:
+            self._fail(e)
+            raise
+        finally:
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+        
+        if self.checkpoint is not None:
+            self.checkpoint.clear()
+        
+        elapsed = time.perf_counter() - started
+        self._log_progress(position, started)
+        return {
+            "ingested": upserted,
+            "vectors": vector_count,
+            "skipped": self.skipped,
+            "deleted": deleted,
+            "resumed_from": resumed_from,
+            "seconds": elapsed,
+            "stages": {
+                name: {"items": s.items, "batches": s.batches, "busy_seconds": s.busy_seconds}
+                for name, s in self.stats.items()
+            }
+        }
@@ -0,0 +1,365 @@
+"""Persistent SQLite job queue and the asyncio workers that drain it."""
+from app.core.config import settings, resolve_data_path
+from app.core.executors import io_executor, run_blocking
+from app.core.providers import LazyProvider
+from typing import Awaitable, Callable, Dict, Any, List, Optional
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """Raised when the number of queued jobs is at the configured limit."""
+
+
+class JobQueue:
+    """
+    Jobs stored in SQLite, so they survive restarts and need no broker.
+    
+    A job moves queued -> running -> done | failed. ``claim`` takes the
+    oldest queued job inside an immediate transaction, so several worker
+    processes can share one database file. A claim is a lease: a job still
+    running ``lease_seconds`` after it started is assumed lost with a crashed
+    worker and can be claimed again, until it has been attempted
+    ``max_attempts`` times. Workers that stop cleanly hand their jobs back
+    with ``release``. ``complete``, ``fail`` and ``release`` take the claim's
+    ``attempts`` and only apply while that claim still holds the job, so a
+    worker whose lease expired cannot overwrite the outcome of the newer one.
+    Finished jobs are deleted ``result_ttl_seconds`` after they finish, by
+    the first ``enqueue`` or ``claim`` every ``PURGE_INTERVAL_SECONDS``.
+    """
+    
+    PURGE_INTERVAL_SECONDS = 60.0
+    
+    def __init__(
+        self,
+        path: str,
+        max_depth: int = settings.job_max_queue_depth,
+        max_attempts: int = settings.job_max_attempts,
+        lease_seconds: float = settings.job_lease_seconds,
+        result_ttl_seconds: float = settings.job_result_ttl_seconds
+    ):
+        self.path = path
+        self.max_depth = max_depth
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.result_ttl_seconds = result_ttl_seconds
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+        # Called (from the enqueueing thread) after each enqueue
+        self.listeners: List[Callable[[], None]] = []
+        
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                status TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL
+            )
+            """
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+    
+    def enqueue(self, kind: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Add a job.
+        
+        Args:
+            kind: Handler name the job is dispatched to
+            payload: JSON-serializable job input
+            
+        Returns:
+            The job's status record
+            
+        Raises:
+            QueueFullError: If ``max_depth`` jobs are already queued
+        """
+        self._purge_if_due()
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                depth = self._db.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+                if depth >= self.max_depth:
+                    raise QueueFullError(f"Job queue is full ({depth} queued jobs)")
+                self._db.execute(
+                    "INSERT INTO jobs (id, kind, status, payload, created_at) VALUES (?, ?, 'queued', ?, ?)",
+                    (job_id, kind, json.dumps(payload), time.time())
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        for listener in self.listeners:
+            listener()
+        return {"job_id": job_id, "status": "queued", "queue_position": depth + 1}
+    
+    def claim(self) -> Optional[Dict[str, Any]]:
+        """Mark the oldest queued (or lease-expired) job running and return it, or None."""
+        self._purge_if_due()
+        now = time.time()
+        expired = now - self.lease_seconds
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                abandoned = self._db.execute(
+                    "UPDATE jobs SET status = 'failed', error = 'Worker lost too many times', finished_at = ? "
+                    "WHERE status = 'running' AND started_at < ? AND attempts >= ?",
+                    (now, expired, self.max_attempts)
+                ).rowcount
+                row = self._db.execute(
+                    "SELECT id, kind, payload, status, attempts FROM jobs "
+                    "WHERE status = 'queued' OR (status = 'running' AND started_at < ?) "
+                    "ORDER BY created_at LIMIT 1",
+                    (expired,)
+                ).fetchone()
+                if row is not None:
+                    self._db.execute(
+                        "UPDATE jobs SET status = 'running', started_at = ?, attempts = attempts + 1 WHERE id = ?",
+                        (now, row[0])
+                    )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        if abandoned:
+            logger.warning(f"Failed {abandoned} jobs whose workers were lost {self.max_attempts} times")
+        if row is None:
+            return None
+        if row[3] == "running":
+            logger.warning(f"Job {row[0]} lease expired; running it again")
+        return {"id": row[0], "kind": row[1], "payload": json.loads(row[2]), "attempts": row[4] + 1}
+    
+    def complete(self, job_id: str, attempts: int, result: Dict[str, Any]) -> bool:
+        """Store a job's result; False if the claim was lost."""
+        with self._lock:
+            return self._db.execute(
+                "UPDATE jobs SET status = 'done', result = ?, finished_at = ? "
+                "WHERE id = ? AND status = 'running' AND attempts = ?",
+                (json.dumps(result), time.time(), job_id, attempts)
+            ).rowcount > 0
+    
+    def fail(self, job_id: str, attempts: int, error: str) -> bool:
+        """Mark a job failed; False if the claim was lost."""
+        with self._lock:
+            return self._db.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, finished_at = ? "
+                "WHERE id = ? AND status = 'running' AND attempts = ?",
+                (error, time.time(), job_id, attempts)
+            ).rowcount > 0
+    
+    def release(self, job_id: str, attempts: int) -> bool:
+        """Put a running job back in the queue (worker stopped before finishing it)."""
+        with self._lock:
+            return self._db.execute(
+                "UPDATE jobs SET status = 'queued', started_at = NULL "
+                "WHERE id = ? AND status = 'running' AND attempts = ?",
+                (job_id, attempts)
+            ).rowcount > 0
+    
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Status record of a job, with its result once done."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, kind, status, result, error, attempts, created_at, started_at, finished_at "
+                "FROM jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            position = None
+            if row[2] == "queued":
+                position = self._db.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND created_at <= ?", (row[6],)
+                ).fetchone()[0]
+        return {
+            "job_id": row[0],
+            "kind": row[1],
+            "status": row[2],
+            "result": json.loads(row[3]) if row[3] else None,
+            "error": row[4],
+            "attempts": row[5],
+            "queue_position": position,
+            "created_at": row[6],
+            "started_at": row[7],
+            "finished_at": row[8]
+        }
+    
+    def depth(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+    
+    def purge(self) -> int:
+        """Delete finished jobs older than the result TTL."""
+        with self._lock:
+            return self._db.execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?",
+                (time.time() - self.result_ttl_seconds,)
+            ).rowcount
+    
+    def _purge_if_due(self):
+        now = time.monotonic()
+        if self._last_purge and now - self._last_purge < self.PURGE_INTERVAL_SECONDS:
+            return
+        self._last_purge = now
+        try:
+            purged = self.purge()
+        except sqlite3.Error as e:
+            # Not worth failing an enqueue or claim over; tried again next interval
+            logger.warning(f"Error purging expired jobs: {e}")
+            return
+        if purged:
+            logger.info(f"Purged {purged} expired jobs")
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return job counts by status."""
+        with self._lock:
+            counts = dict(self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        return {
+            "queued": counts.get("queued", 0),
+            "running": counts.get("running", 0),
+            "done": counts.get("done", 0),
+            "failed": counts.get("failed", 0),
+            "max_queue_depth": self.max_depth
+        }
+    
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class JobWorkers:
+    """
+    asyncio tasks that claim jobs from a ``JobQueue`` and run their handlers.
+    
+    Handlers are coroutines registered per job kind; each takes the payload
+    and returns a JSON-serializable result. ``concurrency`` jobs run at a
+    time. Idle workers wake as soon as this process enqueues a job and
+    otherwise poll every ``poll_interval`` seconds, which is how jobs
+    enqueued by other processes are picked up. Queue errors (e.g. a locked
+    database) are logged and retried with exponential backoff.
+    """
+    
+    MAX_BACKOFF_SECONDS = 30.0
+    
+    def __init__(
+        self,
+        queue: JobQueue,
+        handlers: Dict[str, Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]],
+        concurrency: int = settings.job_workers,
+        poll_interval: float = settings.job_poll_interval_seconds
+    ):
+        self.queue = queue
+        self.handlers = handlers
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        
+        # Metrics
+        self.completed = 0
+        self.failed = 0
+    
+    def start(self):
+        """Start the worker tasks on the running event loop."""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._tasks = [self._loop.create_task(self._work(i)) for i in range(self.concurrency)]
+        self.queue.listeners.append(self.notify)
+        logger.info(f"Started {self.concurrency} job workers")
+    
+    async def stop(self):
+        """Cancel the workers; jobs they were running go back to the queue."""
+        if self.notify in self.queue.listeners:
+            self.queue.listeners.remove(self.notify)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+    
+    def notify(self):
+        """Wake idle workers; safe to call from any thread."""
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+    
+    async def _work(self, worker_id: int):
+        errors = 0
+        while True:
+            try:
+                # Cleared before claiming, so an enqueue that lands after an empty
+                # claim still wakes this worker
+                self._wakeup.clear()
+                job = await run_blocking(io_executor, self.queue.claim)
+                if job is None:
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                    except asyncio.TimeoutError:
+                        pass
+                else:
+                    await self._run(job)
+                errors = 0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # e.g. "database is locked" with several server processes; the
+                # worker keeps going so job concurrency is not lost until restart
+                errors += 1
+                delay = min(self.poll_interval * 2 ** errors, self.MAX_BACKOFF_SECONDS)
+                logger.error(f"Job worker {worker_id} error (retrying in {delay:.1f}s): {e}")
+                await asyncio.sleep(delay)
+    
+    async def _run(self, job: Dict[str, Any]):
+        start = time.perf_counter()
+        handler = self.handlers.get(job["kind"])
+        try:
+            if handler is None:
+                raise ValueError(f"No handler for job kind {job['kind']!r}")
+            result = await handler(job["payload"])
+        except asyncio.CancelledError:
+            await asyncio.shield(run_blocking(io_executor, self.queue.release, job["id"], job["attempts"]))
+            raise
+        except Exception as e:
+            logger.error(f"Job {job['id']} failed: {e}")
+            self.failed += 1
+            if not await run_blocking(io_executor, self.queue.fail, job["id"], job["attempts"], str(e)):
+                logger.warning(f"Job {job['id']} was claimed again after its lease expired; dropping the failure")
+            return
+        if not await run_blocking(io_executor, self.queue.complete, job["id"], job["attempts"], result):
+            logger.warning(f"Job {job['id']} was claimed again after its lease expired; dropping this result")
+            return
+        self.completed += 1
+        logger.info(f"Job {job['id']} ({job['kind']}) done in {time.perf_counter() - start:.2f}s")
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return worker counters."""
+        return {
+            "workers": len(self._tasks),
+            "completed": self.completed,
+            "failed": self.failed
+        }
+
+
+def create_job_queue() -> JobQueue:
+    return JobQueue(resolve_data_path(settings.job_queue_path))
+
+
+# Lazily constructed singleton
+get_job_queue = LazyProvider(create_job_queue, "job queue")
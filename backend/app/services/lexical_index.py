@@ -0,0 +1,677 @@
+"""BM25 inverted index over patent text with block-compressed posting lists."""
+from app.core.config import settings, resolve_data_path
+from app.core.providers import LazyProvider
+from app.core.tokenizer import tokenize
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+import json
+import logging
+import math
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Postings per compressed block; each block has a skip entry (its last doc id)
+BLOCK_SIZE = 128
+
+
+def _vbyte_lengths(values: np.ndarray) -> np.ndarray:
+    """Bytes needed to VByte-encode each value."""
+    lengths = np.ones(len(values), dtype=np.uint8)
+    for bits in (7, 14, 21, 28):
+        lengths += values >= (1 << bits)
+    return lengths
+
+
+def vbyte_encode(values: np.ndarray) -> np.ndarray:
+    """
+    Variable-byte encode non-negative integers below 2**32.
+    
+    Seven bits per byte, low bits first; every byte but the last of a value
+    has its high bit set. Small doc-id gaps (the common case) take one byte.
+    """
+    values = np.asarray(values, dtype=np.uint32)
+    lengths = _vbyte_lengths(values)
+    starts = np.cumsum(lengths, dtype=np.int64) - lengths
+    out = np.empty(int(starts[-1] + lengths[-1]) if len(values) else 0, dtype=np.uint8)
+    out[starts] = (values & 127).astype(np.uint8) | np.where(lengths > 1, 128, 0).astype(np.uint8)
+    for k in range(1, 5):
+        longer = np.flatnonzero(lengths > k)
+        if not len(longer):
+            break
+        byte = ((values[longer] >> np.uint32(7 * k)) & 127).astype(np.uint8)
+        byte[lengths[longer] > k + 1] |= 128
+        out[starts[longer] + k] = byte
+    return out
+
+
+def vbyte_decode(data: np.ndarray) -> np.ndarray:
+    """Decode a ``vbyte_encode`` byte array back to uint32 values (vectorized)."""
+    data = np.asarray(data, dtype=np.uint8)
+    ends = np.flatnonzero(data < 128)
+    if len(ends) == len(data):
+        return data.astype(np.uint32)
+    starts = np.empty_like(ends)
+    starts[0] = 0
+    starts[1:] = ends[:-1] + 1
+    shifts = np.arange(len(data), dtype=np.int64) - np.repeat(starts, ends - starts + 1)
+    values = (data & 127).astype(np.uint32) << (7 * shifts).astype(np.uint32)
+    return np.add.reduceat(values, starts, dtype=np.uint32)
+
+
+def _gather(array: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """Concatenate ``array[starts[i]:ends[i]]`` for all i without a Python loop."""
+    lengths = ends - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return array[:0]
+    offsets = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+    return array[offsets + np.arange(total)]
+
+
+class Segment:
+    """
+    An immutable part of the inverted index: a directory of .npy arrays.
+    
+    Per term (sorted by term): ``terms`` (UTF-8), ``df``, ``max_tf`` and
+    ``min_length`` (which bound the BM25 score any of its postings can
+    reach), ``postings`` (start in ``tfs``) and ``blocks`` (first block),
+    both with a trailing end entry. Per block of up to BLOCK_SIZE postings:
+    ``block_last`` (last doc id, used to skip blocks) and ``block_offset``
+    (start in ``gaps``, plus an end entry). Per posting: ``gaps``, VByte doc-id
+    deltas (the first of a term is the doc id itself), and ``tfs`` (uint8,
+    capped at 255). Opened arrays are memory-mapped.
+    """
+    
+    ARRAYS = ("terms", "df", "max_tf", "min_length", "postings", "blocks", "block_last", "block_offset", "gaps", "tfs")
+    
+    def __init__(self, path: str, arrays: Dict[str, np.ndarray]):
+        self.path = path
+        self.name = os.path.basename(path)
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+    
+    @classmethod
+    def open(cls, path: str) -> "Segment":
+        return cls(path, {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in cls.ARRAYS})
+    
+    @classmethod
+    def build(
+        cls,
+        path: str,
+        docs: np.ndarray,
+        term_ids: np.ndarray,
+        tfs: np.ndarray,
+        vocabulary: np.ndarray,
+        lengths: np.ndarray
+    ) -> "Segment":
+        """
+        Write a segment from (doc, term, tf) postings in any order.
+        
+        Args:
+            path: Directory to create
+            docs: Doc id per posting
+            term_ids: Index into ``vocabulary`` per posting
+            tfs: Term frequency per posting
+            vocabulary: Distinct terms as UTF-8 bytes (numpy ``S`` array)
+            lengths: Token count per doc id
+        """
+        order = np.argsort(vocabulary, kind="stable")
+        rank = np.empty(len(order), dtype=np.int32)
+        rank[order] = np.arange(len(order), dtype=np.int32)
+        keys = rank[term_ids]
+        perm = np.lexsort((docs, keys))
+        keys = keys[perm]
+        docs = np.asarray(docs)[perm].astype(np.uint32)
+        tfs = np.asarray(tfs)[perm]
+        del perm
+        
+        n = len(docs)
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if n else np.empty(0, dtype=np.int64)
+        terms = vocabulary[order][keys[starts]]
+        del keys
+        df = np.diff(np.r_[starts, n]).astype(np.uint32)
+        
+        # Blocks: every BLOCK_SIZE postings of a term, starting at its first
+        block_counts = (df + BLOCK_SIZE - 1) // BLOCK_SIZE
+        blocks = np.r_[0, np.cumsum(block_counts)].astype(np.int64)
+        first = np.repeat(starts, block_counts) + BLOCK_SIZE * (
+            np.arange(blocks[-1], dtype=np.int64) - np.repeat(blocks[:-1], block_counts)
+        )
+        last = np.r_[first[1:] - 1, n - 1] if n else first
+        
+        # Gaps from the previous posting of the same term; since blocks follow
+        # one another, a block's first gap is relative to the previous block
+        gaps = docs.copy()
+        gaps[1:] -= docs[:-1]
+        gaps[starts] = docs[starts]
+        byte_ends = np.cumsum(_vbyte_lengths(gaps), dtype=np.int64)
+        block_offset = np.r_[byte_ends[first] - _vbyte_lengths(gaps[first]), byte_ends[-1] if n else 0]
+        
+        arrays = {
+            "terms": terms,
+            "df": df,
+            "max_tf": np.maximum.reduceat(tfs, starts).astype(np.uint16) if n else np.empty(0, np.uint16),
+            "min_length": np.minimum.reduceat(lengths[docs], starts).astype(np.uint32) if n else np.empty(0, np.uint32),
+            "postings": np.r_[starts, n].astype(np.int64),
+            "blocks": blocks,
+            "block_last": docs[last],
+            "block_offset": block_offset.astype(np.int64),
+            "gaps": vbyte_encode(gaps),
+            "tfs": np.minimum(tfs, 255).astype(np.uint8)
+        }
+        os.makedirs(path, exist_ok=True)
+        for name, array in arrays.items():
+            np.save(os.path.join(path, f"{name}.npy"), array)
+        return cls.open(path)
+    
+    @property
+    def num_postings(self) -> int:
+        return int(self.postings[-1])
+    
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in self.ARRAYS)
+    
+    def find(self, term: bytes) -> int:
+        """Index of ``term``, or -1."""
+        i = int(np.searchsorted(self.terms, term))
+        return i if i < len(self.terms) and self.terms[i] == term else -1
+    
+    def decode(self, t: int) -> Tuple[np.ndarray, np.ndarray]:
+        """All (doc ids, tfs) of term ``t``."""
+        gaps = vbyte_decode(self.gaps[self.block_offset[self.blocks[t]]:self.block_offset[self.blocks[t + 1]]])
+        return np.cumsum(gaps, dtype=np.int64), self.tfs[self.postings[t]:self.postings[t + 1]]
+    
+    def lookup(self, t: int, candidates: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Which sorted ``candidates`` appear in term ``t``, decoding only the blocks that may hold them.
+        
+        Returns:
+            Tuple of (boolean mask over candidates, tfs of the found ones)
+        """
+        b0, b1 = int(self.blocks[t]), int(self.blocks[t + 1])
+        p0, df = int(self.postings[t]), int(self.df[t])
+        block = np.searchsorted(self.block_last[b0:b1], candidates)
+        wanted = np.unique(block[block < b1 - b0])
+        if not len(wanted):
+            return np.zeros(len(candidates), dtype=bool), self.tfs[:0]
+        
+        counts = np.minimum(BLOCK_SIZE, df - BLOCK_SIZE * wanted)
+        gaps = vbyte_decode(_gather(self.gaps, self.block_offset[b0 + wanted], self.block_offset[b0 + wanted + 1]))
+        # Restart the running sum at each block from the previous block's last doc
+        bases = np.where(wanted > 0, self.block_last[b0 + wanted - 1].astype(np.int64), 0)
+        sums = np.cumsum(gaps, dtype=np.int64)
+        block_starts = np.cumsum(counts) - counts
+        docs = sums + np.repeat(bases - (sums[block_starts] - gaps[block_starts]), counts)
+        tfs = _gather(self.tfs, p0 + BLOCK_SIZE * wanted, p0 + BLOCK_SIZE * wanted + counts)
+        
+        position = np.minimum(np.searchsorted(docs, candidates), len(docs) - 1)
+        found = docs[position] == candidates
+        return found, tfs[position[found]]
+    
+    def decode_all(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Every posting as (term index, doc id, tf), for merging."""
+        gaps = vbyte_decode(self.gaps)
+        starts = self.postings[:-1]
+        sums = np.cumsum(gaps, dtype=np.int64)
+        docs = sums - np.repeat(sums[starts] - gaps[starts], self.df)
+        terms = np.repeat(np.arange(len(self.terms), dtype=np.int32), self.df)
+        return terms, docs, np.asarray(self.tfs)
+
+
+class LexicalIndex:
+    """
+    BM25 search over patent title, abstract and claims.
+    
+    Built like a log-structured merge tree. Documents added by ingestion are
+    buffered in memory (and appended to ``wal.jsonl``, so a crash loses
+    nothing) and written as an immutable, memory-mapped segment every
+    ``flush_docs`` documents or on ``flush()``; beyond ``max_segments``
+    segments they are merged into one, dropping deleted and replaced
+    documents. Readers (the API) pick up a new flush on their next query.
+    One writer process at a time.
+    
+    Layout of the index directory:
+    - index.json: generation, segment names, document counts
+    - segments/<name>/: one ``Segment`` each
+    - docs.<gen>.npy, lengths.<gen>.npy, live.<gen>.npy: publication number,
+      token count and liveness per internal doc id
+    - wal.jsonl: changes not yet in a segment
+    
+    Queries are exact top-k with MaxScore pruning: terms are taken in order
+    of their best possible contribution; once the terms left could not lift
+    a new document past the current k-th score, they are only looked up for
+    documents already found, decoding just the blocks that can hold them.
+    """
+    
+    def __init__(
+        self,
+        path: str,
+        k1: float = settings.bm25_k1,
+        b: float = settings.bm25_b,
+        flush_docs: int = settings.lexical_flush_docs,
+        max_segments: int = settings.lexical_max_segments
+    ):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.flush_docs = flush_docs
+        self.max_segments = max_segments
+        self._lock = threading.RLock()
+        self._opened = False
+        self._manifest_mtime: Optional[int] = None
+        
+        self.generation = 0
+        self.segments: List[Segment] = []
+        self.doc_ids = np.empty(0, dtype="S1")
+        self.lengths = np.empty(0, dtype=np.uint32)
+        self.live = np.empty(0, dtype=bool)
+        self.live_docs = 0
+        self.total_length = 0
+        self._avgdl = 1.0
+        self._norms = np.empty(0, dtype=np.float32)
+        
+        # Writer state, set up on the first change
+        self._writing = False
+        self._doc_of: Dict[str, int] = {}
+        self._new_ids: List[str] = []
+        self._pending: List[Tuple[int, np.ndarray, np.ndarray]] = []
+        self._pending_vocab: Dict[str, int] = {}
+        self._dirty = False
+        self._wal = None
+        
+        # Metrics
+        self.queries = 0
+        self.query_seconds = 0.0
+    
+    @property
+    def _manifest_path(self) -> str:
+        return os.path.join(self.path, "index.json")
+    
+    @property
+    def _wal_path(self) -> str:
+        return os.path.join(self.path, "wal.jsonl")
+    
+    def _array_path(self, name: str, generation: int) -> str:
+        return os.path.join(self.path, f"{name}.{generation}.npy")
+    
+    @property
+    def num_docs(self) -> int:
+        """Live documents in the index."""
+        self.refresh()
+        return self.live_docs
+    
+    def refresh(self):
+        """Load the latest flushed state if another process has flushed since (readers only)."""
+        with self._lock:
+            if self._writing:
+                return
+            try:
+                mtime = os.stat(self._manifest_path).st_mtime_ns
+            except FileNotFoundError:
+                self._opened = True
+                return
+            if self._opened and mtime == self._manifest_mtime:
+                return
+            for attempt in range(3):
+                try:
+                    self._load()
+                    break
+                except FileNotFoundError:
+                    # A writer replaced the files between reading index.json and opening them
+                    if attempt == 2:
+                        raise
+                    time.sleep(0.05)
+            self._manifest_mtime = mtime
+            self._opened = True
+    
+    def _load(self):
+        with open(self._manifest_path, "r") as f:
+            manifest = json.load(f)
+        generation = manifest["generation"]
+        segments = [Segment.open(os.path.join(self.path, "segments", name)) for name in manifest["segments"]]
+        self.doc_ids = np.load(self._array_path("docs", generation), mmap_mode="r")
+        self.lengths = np.load(self._array_path("lengths", generation), mmap_mode="r")
+        self.live = np.load(self._array_path("live", generation), mmap_mode="r")
+        self.segments = segments
+        self.generation = generation
+        self.live_docs = manifest["live_docs"]
+        self.total_length = manifest["total_length"]
+        self._update_norms()
+        logger.info(
+            f"Opened lexical index at {self.path} ({self.live_docs:,} documents, {len(segments)} segments)"
+        )
+    
+    def _update_norms(self):
+        # BM25 length normalization k1 * (1 - b + b * length / avgdl), per doc
+        self._avgdl = self.total_length / self.live_docs if self.live_docs else 1.0
+        lengths = np.asarray(self.lengths[:len(self.doc_ids)], dtype=np.float32)
+        self._norms = (self.k1 * (1 - self.b + self.b * lengths / self._avgdl)).astype(np.float32)
+    
+    # Writing
+    
+    def _start_writing(self):
+        """Switch to writer mode: writable copies of the doc tables, then replay the WAL."""
+        if self._writing:
+            return
+        self.refresh()
+        self._writing = True
+        self._doc_of = {doc_id.decode("utf-8"): i for i, doc_id in enumerate(self.doc_ids) if self.live[i]}
+        self._new_ids = []
+        self.lengths = np.array(self.lengths, dtype=np.uint32)
+        self.live = np.array(self.live, dtype=bool)
+        os.makedirs(self.path, exist_ok=True)
+        if os.path.exists(self._wal_path):
+            replayed = 0
+            with open(self._wal_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break  # torn last line from a crash
+                    for doc_id, counts in entry.get("add", []):
+                        self._add(doc_id, counts)
+                    for doc_id in entry.get("delete", []):
+                        self._delete(doc_id)
+                    replayed += 1
+            if replayed:
+                logger.info(f"Replayed {replayed} lexical index log entries ({len(self._pending):,} pending documents)")
+        self._wal = open(self._wal_path, "a", encoding="utf-8")
+    
+    def _grow(self, size: int):
+        if size > len(self.lengths):
+            capacity = max(1024, len(self.lengths) * 2, size)
+            self.lengths = np.concatenate([self.lengths, np.zeros(capacity - len(self.lengths), dtype=np.uint32)])
+            self.live = np.concatenate([self.live, np.zeros(capacity - len(self.live), dtype=bool)])
+    
+    @property
+    def _next_doc(self) -> int:
+        return len(self.doc_ids) + len(self._new_ids)
+    
+    def _add(self, doc_id: str, counts: Dict[str, int]):
+        self._delete(doc_id)
+        doc = self._next_doc
+        self._grow(doc + 1)
+        self._new_ids.append(doc_id)
+        self._doc_of[doc_id] = doc
+        length = sum(counts.values())
+        self.lengths[doc] = length
+        self.live[doc] = True
+        self._dirty = True
+        self.live_docs += 1
+        self.total_length += length
+        vocab = self._pending_vocab
+        term_ids = np.fromiter((vocab.setdefault(term, len(vocab)) for term in counts), dtype=np.int32, count=len(counts))
+        self._pending.append((doc, term_ids, np.fromiter(counts.values(), dtype=np.uint16, count=len(counts))))
+    
+    def _delete(self, doc_id: str):
+        doc = self._doc_of.pop(doc_id, None)
+        if doc is not None and self.live[doc]:
+            self.live[doc] = False
+            self.live_docs -= 1
+            self.total_length -= int(self.lengths[doc])
+            self._dirty = True
+    
+    @staticmethod
+    def document_text(patent: Dict[str, Any]) -> str:
+        """Text indexed for a patent."""
+        return " ".join(patent.get(field) or "" for field in ("title", "abstract", "claims"))
+    
+    def add_documents(self, patents: List[Dict[str, Any]]):
+        """
+        Index (or re-index) patents by publication number.
+        
+        Args:
+            patents: Patent dicts with publication_number, title, abstract and claims
+        """
+        if not patents:
+            return
+        with self._lock:
+            self._start_writing()
+            entries = [
+                (p['publication_number'], dict(Counter(tokenize(self.document_text(p)))))
+                for p in patents
+            ]
+            self._wal.write(json.dumps({"add": entries}, separators=(",", ":")) + "\n")
+            self._wal.flush()
+            for doc_id, counts in entries:
+                self._add(doc_id, counts)
+            if len(self._pending) >= self.flush_docs:
+                self.flush()
+    
+    def delete(self, ids: List[str]):
+        """Remove patents by publication number; unknown IDs are ignored."""
+        if not ids:
+            return
+        with self._lock:
+            self._start_writing()
+            self._wal.write(json.dumps({"delete": list(ids)}) + "\n")
+            self._wal.flush()
+            for doc_id in ids:
+                self._delete(doc_id)
+    
+    def flush(self):
+        """Write buffered documents as a segment, merge if needed, and publish a new generation."""
+        with self._lock:
+            if not self._writing or not self._dirty:
+                return
+            start = time.perf_counter()
+            generation = self.generation + 1
+            doc_count = self._next_doc
+            segments = list(self.segments)
+            if self._pending:
+                vocabulary = np.array([term.encode("utf-8") for term in self._pending_vocab], dtype=bytes)
+                segments.append(Segment.build(
+                    os.path.join(self.path, "segments", f"seg-{generation:06d}"),
+                    np.concatenate([np.full(len(t), d, dtype=np.int64) for d, t, _ in self._pending]),
+                    np.concatenate([t for _, t, _ in self._pending]),
+                    np.concatenate([f for _, _, f in self._pending]),
+                    vocabulary,
+                    self.lengths
+                ))
+            retired = []
+            if len(segments) > self.max_segments:
+                retired = segments
+                segments = [self._merge(segments, os.path.join(self.path, "segments", f"merged-{generation:06d}"))]
+            
+            doc_ids = np.concatenate([
+                np.asarray(self.doc_ids), np.array([doc_id.encode("utf-8") for doc_id in self._new_ids], dtype=bytes)
+            ])
+            np.save(self._array_path("docs", generation), doc_ids)
+            np.save(self._array_path("lengths", generation), self.lengths[:doc_count])
+            np.save(self._array_path("live", generation), self.live[:doc_count])
+            tmp_path = f"{self._manifest_path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({
+                    "generation": generation,
+                    "segments": [segment.name for segment in segments],
+                    "live_docs": self.live_docs,
+                    "total_length": self.total_length,
+                    "k1": self.k1,
+                    "b": self.b
+                }, f)
+            os.replace(tmp_path, self._manifest_path)
+            
+            # Published: the WAL and the previous generation are no longer needed
+            self._wal.truncate(0)
+            for name in ("docs", "lengths", "live"):
+                if os.path.exists(self._array_path(name, self.generation)):
+                    os.remove(self._array_path(name, self.generation))
+            for segment in retired:
+                shutil.rmtree(segment.path, ignore_errors=True)
+            
+            self.generation = generation
+            self.segments = segments
+            self.doc_ids = doc_ids
+            self._new_ids = []
+            self._pending = []
+            self._pending_vocab = {}
+            self._dirty = False
+            self._update_norms()
+            logger.info(
+                f"Flushed lexical index generation {generation}: {self.live_docs:,} documents in "
+                f"{len(segments)} segments{' (merged)' if retired else ''} in {time.perf_counter() - start:.1f}s"
+            )
+    
+    def _merge(self, segments: List[Segment], path: str) -> Segment:
+        """Rewrite segments as one, keeping only live documents."""
+        terms, docs, tfs = [], [], []
+        offset = 0
+        for segment in segments:
+            t, d, f = segment.decode_all()
+            keep = self.live[d]
+            terms.append(t[keep] + offset)
+            docs.append(d[keep])
+            tfs.append(f[keep])
+            offset += len(segment.terms)
+        vocabulary, inverse = np.unique(np.concatenate([segment.terms for segment in segments]), return_inverse=True)
+        return Segment.build(
+            path,
+            np.concatenate(docs),
+            inverse[np.concatenate(terms)],
+            np.concatenate(tfs),
+            vocabulary,
+            self.lengths
+        )
+    
+    def optimize(self):
+        """Merge all segments into one (after a bulk load)."""
+        with self._lock:
+            self._start_writing()
+            max_segments, self.max_segments = self.max_segments, 0
+            self._dirty = self._dirty or len(self.segments) > 1
+            try:
+                self.flush()
+            finally:
+                self.max_segments = max_segments
+    
+    def close(self):
+        with self._lock:
+            if self._wal is not None:
+                self._wal.close()
+                self._wal = None
+    
+    # Searching
+    
+    def _idf(self, df: int) -> float:
+        # Segment document frequencies still count deleted documents until a merge
+        df = min(df, self.live_docs)
+        return math.log(1 + (self.live_docs - df + 0.5) / (df + 0.5))
+    
+    def search(self, text: str, top_k: int = 10, prune: bool = True) -> List[Tuple[str, float]]:
+        """
+        Top documents by BM25.
+        
+        Args:
+            text: Query text
+            top_k: Number of results
+            prune: Use MaxScore pruning (False scores every posting; same results)
+            
+        Returns:
+            List of (publication number, score), best first
+        """
+        start = time.perf_counter()
+        self.refresh()
+        with self._lock:
+            segments, live, norms, doc_ids, avgdl = self.segments, self.live, self._norms, self.doc_ids, self._avgdl
+            doc_count = len(doc_ids)
+        query = Counter(tokenize(text))
+        if not segments or not query or top_k <= 0:
+            return []
+        
+        # Global document frequencies, so scores are comparable across segments
+        found = {term: [segment.find(term.encode("utf-8")) for segment in segments] for term in query}
+        weights = {
+            term: self._idf(sum(int(s.df[t]) for s, t in zip(segments, where) if t >= 0)) * query[term]
+            for term, where in found.items()
+        }
+        k1 = self.k1
+        scores = np.zeros(doc_count, dtype=np.float32)
+        best = np.empty(0, dtype=np.int64)
+        threshold = 0.0
+        
+        for i, segment in enumerate(segments):
+            terms = [(weights[term], where[i]) for term, where in found.items() if where[i] >= 0]
+            if not terms:
+                continue
+            # Highest score a posting of the term can reach in this segment
+            bounds = np.array([
+                weight * (k1 + 1) * int(segment.max_tf[t]) / (
+                    int(segment.max_tf[t]) + k1 * (1 - self.b + self.b * int(segment.min_length[t]) / avgdl)
+                )
+                for weight, t in terms
+            ]) if prune else np.full(len(terms), np.inf)
+            order = np.argsort(-bounds)
+            terms = [terms[j] for j in order]
+            remaining = np.cumsum(bounds[order][::-1])[::-1]
+            
+            # Essential terms: any document in them could still make the top k
+            found_docs = []
+            j = 0
+            while j < len(terms) and remaining[j] > threshold:
+                weight, t = terms[j]
+                docs, tfs = segment.decode(t)
+                keep = live[docs]
+                docs, tfs = docs[keep], tfs[keep].astype(np.float32)
+                scores[docs] += weight * tfs * (k1 + 1) / (tfs + norms[docs])
+                found_docs.append(docs)
+                if prune and len(docs) >= top_k:
+                    threshold = max(threshold, float(np.partition(scores[docs], -top_k)[-top_k]))
+                j += 1
+            if not found_docs:
+                continue
+            candidates = np.unique(np.concatenate(found_docs))
+            
+            # Non-essential terms: only score documents that can still qualify
+            while j < len(terms) and len(candidates):
+                candidates = candidates[scores[candidates] + remaining[j] >= threshold]
+                if not len(candidates):
+                    break
+                weight, t = terms[j]
+                present, tfs = segment.lookup(t, candidates)
+                docs = candidates[present]
+                tfs = tfs.astype(np.float32)
+                scores[docs] += weight * tfs * (k1 + 1) / (tfs + norms[docs])
+                j += 1
+            
+            pool = np.concatenate([best, candidates])
+            if len(pool) > top_k:
+                pool = pool[np.argpartition(-scores[pool], top_k - 1)[:top_k]]
+            best = pool
+            if len(best) >= top_k:
+                threshold = max(threshold, float(scores[best].min()))
+        
+        best = best[np.argsort(-scores[best], kind="stable")]
+        results = [(doc_ids[d].decode("utf-8"), float(scores[d])) for d in best if scores[d] > 0]
+        with self._lock:
+            self.queries += 1
+            self.query_seconds += time.perf_counter() - start
+        return results
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return index size and query counters."""
+        self.refresh()
+        with self._lock:
+            return {
+                "documents": self.live_docs,
+                "segments": len(self.segments),
+                "postings": sum(segment.num_postings for segment in self.segments),
+                "bytes": sum(segment.nbytes for segment in self.segments),
+                "pending": len(self._pending),
+                "queries": self.queries,
+                "avg_query_ms": round(self.query_seconds / self.queries * 1000, 2) if self.queries else 0.0
+            }
+
+
+def create_lexical_index() -> LexicalIndex:
+    return LexicalIndex(resolve_data_path(settings.lexical_index_path))
+
+
+# Lazily constructed singleton
+get_lexical_index = LazyProvider(create_lexical_index, "lexical index")
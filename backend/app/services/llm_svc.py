@@ -1,48 +1,192 @@
 """LLM service using Groq API."""
-from groq import Groq
 from app.core.config import settings
-from app.core.prompts import PATENT_ANALYSIS_PROMPT
-from typing import List, Dict, Any
-import json
+from app.core.providers import LazyProvider
+from app.core.prompts import PATENT_ANALYSIS_PROMPT, SYSTEM_MESSAGE
+from app.core.context_packer import estimate_tokens, pack_patents, truncate_to_tokens
+from app.core.json_stream import IncrementalJSONExtractor, extract_json_object, strip_code_fences
+from app.core.metrics import LLM_IN_FLIGHT, LLM_JSON_FALLBACKS, STAGE_SECONDS, UPSTREAM_ERRORS
+from app.services.llm_transport import LLMTransport
+from contextlib import aclosing
+from typing import List, Dict, Any, AsyncIterator, Optional, Tuple
 import logging
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
+# Metric children resolved once, off the request path
+_PROMPT_BUILD_SECONDS = STAGE_SECONDS.labels("prompt_build")
+_LLM_CALL_SECONDS = STAGE_SECONDS.labels("llm_call")
+_JSON_PARSE_SECONDS = STAGE_SECONDS.labels("json_parse")
+_LLM_ERRORS = UPSTREAM_ERRORS.labels("llm")
+
 
 class LLMService:
-    """Service for LLM inference using Groq."""
+    """
+    Service for LLM inference using Groq.
+    
+    Calls go through an ``LLMTransport`` (pooled connections, rate limiting,
+    retries, circuit breaker); ``LLMUnavailableError`` means the call could
+    not be completed in time and is worth retrying later.
+    """
     
-    def __init__(self):
-        self.client = Groq(api_key=settings.groq_api_key)
+    def __init__(self, transport: Optional[LLMTransport] = None):
+        # The quota is read here rather than at import: server workers each get a share of it
+        self.transport = transport or LLMTransport(
+            requests_per_minute=settings.llm_requests_per_minute,
+            tokens_per_minute=settings.llm_tokens_per_minute
+        )
         self.model = settings.groq_model
+        
+        # Token usage totals
+        self._usage_lock = threading.Lock()
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.estimated_prompt_tokens = 0
+        self.truncated_completions = 0
     
-    def _clean_json_response(self, response_text: str) -> str:
-        """Clean markdown code blocks from LLM response.
+    def _build_messages(
+        self,
+        user_idea: str,
+        retrieved_patents: List[Dict[str, Any]]
+    ) -> Tuple[List[Dict[str, str]], Dict[str, Any]]:
+        """
+        Build the chat messages for an analysis request.
+        
+        The patents are packed into whatever is left of LLM_PROMPT_TOKEN_BUDGET
+        after the instructions and the idea, and max_tokens is sized to the
+        number of patents included.
         
         Args:
-            response_text: Raw response from LLM
+            user_idea: The user's invention description
+            retrieved_patents: List of similar patents from Pinecone
             
         Returns:
-            Cleaned JSON string
+            Tuple of (messages for the chat completion call, request budget:
+            estimated prompt tokens, max_tokens and packing stats)
         """
-        # Remove markdown code blocks
-        cleaned = response_text.strip()
+        user_idea = truncate_to_tokens(user_idea, settings.llm_max_idea_tokens)
+        template_tokens = estimate_tokens(
+            SYSTEM_MESSAGE + PATENT_ANALYSIS_PROMPT.format(user_idea=user_idea, retrieved_patents="")
+        )
+        patents_text, packing = pack_patents(
+            retrieved_patents,
+            max(settings.llm_prompt_token_budget - template_tokens, 0),
+            min_abstract_tokens=settings.llm_min_abstract_tokens
+        )
         
-        # Remove ```json at start
-        if cleaned.startswith('```json'):
-            cleaned = cleaned[7:]
-        elif cleaned.startswith('```'):
-            cleaned = cleaned[3:]
+        # Create the prompt
+        prompt = PATENT_ANALYSIS_PROMPT.format(
+            user_idea=user_idea,
+            retrieved_patents=patents_text
+        )
         
-        # Remove ``` at end
-        if cleaned.endswith('```'):
-            cleaned = cleaned[:-3]
+        prompt_tokens = template_tokens + packing["tokens"]
+        max_tokens = min(
+            settings.llm_max_completion_tokens,
+            settings.llm_completion_base_tokens + settings.llm_completion_tokens_per_patent * packing["included"],
+            settings.llm_context_window - prompt_tokens
+        )
+        budget = {"prompt_tokens_estimate": prompt_tokens, "max_tokens": max_tokens, "packing": packing}
+        # What the call reserves from the tokens-per-minute quota until its usage is known
+        budget["reserved_tokens"] = prompt_tokens + max_tokens
         
-        return cleaned.strip()
+        messages = [
+            {
+                "role": "system",
+                "content": SYSTEM_MESSAGE
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ]
+        return messages, budget
+    
+    def _record_usage(self, budget: Dict[str, Any], usage: Any, finish_reason: Optional[str], seconds: float):
+        """Log and count the token usage of one completion (the transport settles the quota with it)."""
+        prompt_tokens = getattr(usage, "prompt_tokens", None)
+        completion_tokens = getattr(usage, "completion_tokens", None)
+        packing = budget["packing"]
+        logger.info(
+            f"LLM usage: prompt_tokens={prompt_tokens} (estimated {budget['prompt_tokens_estimate']}) "
+            f"completion_tokens={completion_tokens} max_tokens={budget['max_tokens']} "
+            f"patents={packing['included']} (truncated {packing['truncated']}, dropped {packing['dropped']}) "
+            f"finish_reason={finish_reason} seconds={seconds:.2f}"
+        )
+        if finish_reason == "length":
+            logger.warning(f"LLM completion hit max_tokens={budget['max_tokens']}; the JSON may be cut off")
+        with self._usage_lock:
+            self.requests += 1
+            self.prompt_tokens += prompt_tokens or 0
+            self.completion_tokens += completion_tokens or 0
+            self.estimated_prompt_tokens += budget["prompt_tokens_estimate"]
+            self.truncated_completions += finish_reason == "length"
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return token usage totals and transport counters."""
+        with self._usage_lock:
+            return {
+                "requests": self.requests,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "estimated_prompt_tokens": self.estimated_prompt_tokens,
+                "truncated_completions": self.truncated_completions,
+                "avg_prompt_tokens": round(self.prompt_tokens / self.requests, 1) if self.requests else 0.0,
+                "avg_completion_tokens": round(self.completion_tokens / self.requests, 1) if self.requests else 0.0,
+                "transport": self.transport.stats()
+            }
+    
+    def _parse_analysis(
+        self,
+        response_text: str,
+        retrieved_patents: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """
+        Parse the LLM completion into an analysis dict.
+        
+        Args:
+            response_text: Raw response from LLM
+            retrieved_patents: Patents the analysis was based on
+            
+        Returns:
+            Analysis results with risk level and recommendations
+        """
+        # Raw completions can echo the user's idea; keep them out of INFO logs
+        logger.debug(f"Raw LLM response: {response_text[:200]}...")
+        
+        try:
+            with _JSON_PARSE_SECONDS.time():
+                analysis = extract_json_object(response_text)
+            logger.debug(f"Successfully parsed JSON. Risk level: {analysis.get('risk_level')}")
+        except ValueError as e:
+            analysis = self._fallback_analysis(response_text, retrieved_patents, e)
+        
+        return analysis
+    
+    def _fallback_analysis(
+        self,
+        response_text: str,
+        retrieved_patents: List[Dict[str, Any]],
+        error: Exception
+    ) -> Dict[str, Any]:
+        """Wrap a response that isn't valid JSON in the expected structure."""
+        cleaned_response = strip_code_fences(response_text)
+        LLM_JSON_FALLBACKS.inc()
+        logger.warning(f"LLM response was not valid JSON ({len(cleaned_response)} chars): {error}")
+        logger.debug(f"Response text: {cleaned_response}")
+        return {
+            "risk_level": "Medium",
+            "analysis": cleaned_response,
+            "conflicting_patents": [p.get('metadata', {}).get('publication_number', '')
+                                  for p in retrieved_patents[:3]],
+            "recommendations": "Please consult with a patent attorney for detailed analysis."
+        }
     
     def analyze_patents(
-        self, 
-        user_idea: str, 
+        self,
+        user_idea: str,
         retrieved_patents: List[Dict[str, Any]]
     ) -> Dict[str, Any]:
         """
@@ -55,69 +199,139 @@ class LLMService:
         Returns:
             Analysis results with risk level and recommendations
         """
+        with _PROMPT_BUILD_SECONDS.time():
+            messages, budget = self._build_messages(user_idea, retrieved_patents)
+        start = time.perf_counter()
         try:
-            # Format retrieved patents for the prompt
-            patents_text = ""
-            for i, patent in enumerate(retrieved_patents, 1):
-                metadata = patent.get('metadata', {})
-                patents_text += f"\n--- Patent {i} ---\n"
-                patents_text += f"Number: {metadata.get('publication_number', 'N/A')}\n"
-                patents_text += f"Title: {metadata.get('title', 'N/A')}\n"
-                patents_text += f"Abstract: {metadata.get('abstract', 'N/A')[:500]}...\n"
-                patents_text += f"Similarity Score: {patent.get('score', 0):.3f}\n"
-            
-            # Create the prompt
-            prompt = PATENT_ANALYSIS_PROMPT.format(
-                user_idea=user_idea,
-                retrieved_patents=patents_text
-            )
-            
-            # Call Groq API
-            chat_completion = self.client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are an expert Patent Attorney. Always respond with valid JSON."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                model=self.model,
-                temperature=0.3,
-                max_tokens=2000
-            )
-            
-            response_text = chat_completion.choices[0].message.content
-            logger.info(f"Raw LLM response: {response_text[:200]}...")
+            LLM_IN_FLIGHT.inc()
+            try:
+                with _LLM_CALL_SECONDS.time():
+                    chat_completion = self.transport.create(
+                        budget["reserved_tokens"],
+                        messages=messages,
+                        model=self.model,
+                        temperature=0.3,
+                        max_tokens=budget["max_tokens"]
+                    )
+            finally:
+                LLM_IN_FLIGHT.dec()
             
-            # Clean the response: remove markdown code blocks if present
-            cleaned_response = self._clean_json_response(response_text)
-            logger.info(f"Cleaned response: {cleaned_response[:200]}...")
+            choice = chat_completion.choices[0]
+            self._record_usage(budget, chat_completion.usage, choice.finish_reason, time.perf_counter() - start)
+            return self._parse_analysis(choice.message.content, retrieved_patents)
+        
+        except Exception as e:
+            _LLM_ERRORS.inc()
+            logger.error(f"Error calling Groq API: {e}")
+            raise
+    
+    async def analyze_patents_async(
+        self,
+        user_idea: str,
+        retrieved_patents: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """
+        Analyze user's invention idea using the async Groq client.
+        
+        Args:
+            user_idea: The user's invention description
+            retrieved_patents: List of similar patents from Pinecone
             
-            # Try to parse JSON response
+        Returns:
+            Analysis results with risk level and recommendations
+        """
+        with _PROMPT_BUILD_SECONDS.time():
+            messages, budget = self._build_messages(user_idea, retrieved_patents)
+        start = time.perf_counter()
+        try:
+            LLM_IN_FLIGHT.inc()
             try:
-                analysis = json.loads(cleaned_response)
-                logger.info(f"Successfully parsed JSON. Risk level: {analysis.get('risk_level')}")
-            except json.JSONDecodeError as e:
-                # If not valid JSON, create structured response
-                logger.warning(f"LLM response was not valid JSON: {e}")
-                logger.warning(f"Response text: {cleaned_response}")
-                analysis = {
-                    "risk_level": "Medium",
-                    "analysis": cleaned_response,
-                    "conflicting_patents": [p.get('metadata', {}).get('publication_number', '') 
-                                          for p in retrieved_patents[:3]],
-                    "recommendations": "Please consult with a patent attorney for detailed analysis."
-                }
-            
-            return analysis
+                with _LLM_CALL_SECONDS.time():
+                    chat_completion = await self.transport.create_async(
+                        budget["reserved_tokens"],
+                        messages=messages,
+                        model=self.model,
+                        temperature=0.3,
+                        max_tokens=budget["max_tokens"]
+                    )
+            finally:
+                LLM_IN_FLIGHT.dec()
             
+            choice = chat_completion.choices[0]
+            self._record_usage(budget, chat_completion.usage, choice.finish_reason, time.perf_counter() - start)
+            return self._parse_analysis(choice.message.content, retrieved_patents)
+        
         except Exception as e:
+            _LLM_ERRORS.inc()
             logger.error(f"Error calling Groq API: {e}")
             raise
+    
+    async def analyze_patents_stream(
+        self,
+        user_idea: str,
+        retrieved_patents: List[Dict[str, Any]]
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Stream an analysis as the model writes it.
+        
+        Args:
+            user_idea: The user's invention description
+            retrieved_patents: List of similar patents from Pinecone
+            
+        Yields:
+            ("token", text) for each content delta, ("field", (key, value))
+            for each top-level JSON field as soon as it is complete, and
+            finally ("analysis", dict) with the parsed result
+        """
+        extractor = IncrementalJSONExtractor()
+        with _PROMPT_BUILD_SECONDS.time():
+            messages, budget = self._build_messages(user_idea, retrieved_patents)
+        usage = finish_reason = None
+        start = time.perf_counter()
+        LLM_IN_FLIGHT.inc()
+        try:
+            # Closed as soon as this generator is, so an early exit frees the upstream call
+            async with aclosing(self.transport.stream_async(
+                budget["reserved_tokens"],
+                messages=messages,
+                model=self.model,
+                temperature=0.3,
+                max_tokens=budget["max_tokens"]
+            )) as stream:
+                async for chunk in stream:
+                    # Groq reports usage on the final chunk under x_groq
+                    usage = (
+                        getattr(getattr(chunk, "x_groq", None), "usage", None) or getattr(chunk, "usage", None) or usage
+                    )
+                    if not chunk.choices:
+                        continue
+                    finish_reason = chunk.choices[0].finish_reason or finish_reason
+                    delta: Optional[str] = chunk.choices[0].delta.content
+                    if not delta:
+                        continue
+                    yield "token", delta
+                    for field in extractor.feed(delta):
+                        yield "field", field
+        
+        except Exception as e:
+            _LLM_ERRORS.inc()
+            logger.error(f"Error streaming from Groq API: {e}")
+            raise
+        finally:
+            LLM_IN_FLIGHT.dec()
+        
+        # The stream is parsed incrementally as it arrives, so its JSON time is part of llm_call
+        _LLM_CALL_SECONDS.observe(time.perf_counter() - start)
+        self._record_usage(budget, usage, finish_reason, time.perf_counter() - start)
+        if extractor.result is not None:
+            analysis = extractor.result
+            logger.debug(f"Successfully parsed streamed JSON. Risk level: {analysis.get('risk_level')}")
+        else:
+            analysis = self._fallback_analysis(
+                extractor.text, retrieved_patents, ValueError("Stream ended before a complete JSON object")
+            )
+        yield "analysis", analysis
 
 
-# Singleton instance
-llm_service = LLMService()
+# Lazily constructed singleton
+get_llm_service = LazyProvider(LLMService, "LLM service")
@@ -0,0 +1,492 @@
+"""Rate limiting, retries and circuit breaking for LLM API calls."""
+from app.core.config import settings
+from typing import Any, AsyncIterator, Dict, Optional
+import asyncio
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Status codes worth retrying: timeouts, conflicts, rate limits, server errors
+RETRYABLE_STATUS = {408, 409, 429}
+
+
+class LLMUnavailableError(Exception):
+    """
+    Raised when an LLM call cannot be made within its deadline.
+    
+    The circuit is open, the rate limit would hold the call past its
+    deadline, or every retry failed. ``retry_after`` (seconds) is a hint for
+    the client, when known.
+    """
+    
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket that refills ``rate_per_minute`` tokens a minute.
+    
+    ``reserve`` takes the tokens immediately and returns how long the caller
+    must wait before using them; the balance may go negative, so callers are
+    served in the order they reserved and nobody spins.
+    """
+    
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+    
+    def reserve(self, amount: float) -> float:
+        """Take ``amount`` tokens (at most the capacity); return the seconds to wait."""
+        amount = min(amount, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= amount
+            return max(-self._tokens / self.rate, 0.0)
+    
+    def refund(self, amount: float):
+        """Give back tokens reserved but not used."""
+        if amount <= 0:
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self.capacity, self._tokens + amount)
+    
+    @property
+    def available(self) -> float:
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens
+
+
+class CircuitBreaker:
+    """
+    Fails calls fast after ``failure_threshold`` consecutive failures.
+    
+    closed: calls go through. open: calls are rejected for ``reset_seconds``.
+    half_open: one probe call goes through; success closes the circuit,
+    failure opens it again.
+    """
+    
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+        
+        # Metrics
+        self.opened = 0
+        self.rejected = 0
+    
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state(time.monotonic())
+    
+    def _state(self, now: float) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if now - self._opened_at < self.reset_seconds:
+            return "open"
+        return "half_open"
+    
+    def allow(self) -> Optional[float]:
+        """Admit a call: None if it may proceed, else seconds until the circuit may close."""
+        with self._lock:
+            now = time.monotonic()
+            state = self._state(now)
+            if state == "closed":
+                return None
+            if state == "half_open" and not self._probing:
+                self._probing = True
+                return None
+            self.rejected += 1
+            if state == "open":
+                return self.reset_seconds - (now - self._opened_at)
+            return self.reset_seconds
+    
+    def record_success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                logger.info("LLM circuit closed")
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+    
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            reopen = self._probing
+            self._probing = False
+            if reopen or (self._opened_at is None and self._failures >= self.failure_threshold):
+                self._opened_at = time.monotonic()
+                self.opened += 1
+                logger.warning(f"LLM circuit open for {self.reset_seconds:.0f}s after {self._failures} failures")
+    
+    def release(self):
+        """End a call that says nothing about the provider's health (client error, cancellation)."""
+        with self._lock:
+            self._probing = False
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    return getattr(error, "status_code", None)
+
+
+def _used_tokens(response: Any) -> Optional[int]:
+    """Total tokens a completion or stream chunk reports (Groq puts a stream's usage on its last chunk, under x_groq)."""
+    usage = getattr(getattr(response, "x_groq", None), "usage", None) or getattr(response, "usage", None)
+    prompt_tokens = getattr(usage, "prompt_tokens", None)
+    completion_tokens = getattr(usage, "completion_tokens", None)
+    if prompt_tokens is None or completion_tokens is None:
+        return None
+    return prompt_tokens + completion_tokens
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Seconds the provider asked us to wait (retry-after-ms / retry-after headers), if any."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000.0
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        pass
+    return None
+
+
+class LLMTransport:
+    """
+    Groq chat completions behind a shared connection pool and admission control.
+    
+    Every call, in order: is rejected at once while the circuit breaker is
+    open; reserves one request and its estimated tokens from token buckets
+    sized to the provider quota (waiting for them, unless that would pass the
+    deadline); takes one of ``max_concurrency`` slots; then runs with a timeout
+    of the smaller of ``attempt_timeout`` and the time left. Timeouts,
+    connection errors, 408/409/429 and 5xx responses are retried with full
+    jitter exponential backoff (or the provider's Retry-After) until
+    ``max_retries`` or the deadline; a 429 also pauses every caller for its
+    Retry-After. Other errors are raised unchanged, anything else that ends
+    the call early becomes ``LLMUnavailableError``.
+    
+    The sync and async clients each keep one pooled HTTP client for the life
+    of the process, so calls reuse warm TLS connections.
+    
+    Each attempt's token reservation is given back if the attempt fails
+    (with its request too, if it failed before being sent). A successful
+    call is settled against the usage the provider reports; a stream that
+    ends early without reporting usage gives its reservation back.
+    """
+    
+    def __init__(
+        self,
+        api_key: str = settings.groq_api_key,
+        base_url: str = settings.llm_base_url,
+        max_connections: int = settings.llm_max_connections,
+        max_concurrency: int = settings.llm_max_concurrency,
+        requests_per_minute: float = settings.llm_requests_per_minute,
+        tokens_per_minute: float = settings.llm_tokens_per_minute,
+        attempt_timeout: float = settings.llm_attempt_timeout_seconds,
+        deadline: float = settings.llm_deadline_seconds,
+        max_retries: int = settings.llm_max_retries,
+        backoff_base: float = settings.llm_backoff_base_seconds,
+        backoff_max: float = settings.llm_backoff_max_seconds,
+        breaker_failures: int = settings.llm_breaker_failures,
+        breaker_reset_seconds: float = settings.llm_breaker_reset_seconds
+    ):
+        from groq import Groq, AsyncGroq, APIConnectionError
+        import httpx
+        
+        limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        timeout = httpx.Timeout(attempt_timeout, connect=min(attempt_timeout, 10.0))
+        # The SDK's own retries are off: they would ignore the rate limiter and deadline
+        self.client = Groq(
+            api_key=api_key,
+            base_url=base_url or None,
+            max_retries=0,
+            timeout=timeout,
+            http_client=httpx.Client(limits=limits, timeout=timeout)
+        )
+        self.async_client = AsyncGroq(
+            api_key=api_key,
+            base_url=base_url or None,
+            max_retries=0,
+            timeout=timeout,
+            http_client=httpx.AsyncClient(limits=limits, timeout=timeout)
+        )
+        self._connection_errors = (APIConnectionError, httpx.TransportError)
+        
+        self.max_concurrency = max_concurrency
+        self.attempt_timeout = attempt_timeout
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self.breaker = CircuitBreaker(breaker_failures, breaker_reset_seconds)
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self._sync_slots = threading.BoundedSemaphore(max_concurrency)
+        self._async_slots: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        
+        # Metrics
+        self.calls = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.failures = 0
+        self.rate_limit_wait_seconds = 0.0
+    
+    def _slots(self) -> asyncio.Semaphore:
+        """Concurrency slots for async calls, bound to the running event loop."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._async_slots = asyncio.Semaphore(self.max_concurrency)
+        return self._async_slots
+    
+    def _admit(self, deadline: float, estimated_tokens: int) -> float:
+        """
+        Admission checks before an attempt.
+        
+        Returns:
+            Seconds to wait for the rate limit before sending
+            
+        Raises:
+            LLMUnavailableError: If the circuit is open or the wait would pass the deadline
+        """
+        reset_in = self.breaker.allow()
+        if reset_in is not None:
+            raise LLMUnavailableError("LLM provider is unavailable (circuit open)", retry_after=reset_in)
+        now = time.monotonic()
+        wait = max(self._paused_until - now, 0.0)
+        if self.requests is not None:
+            wait = max(wait, self.requests.reserve(1))
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.reserve(estimated_tokens))
+        if now + wait >= deadline:
+            self._refund(1, estimated_tokens)
+            self.breaker.release()
+            raise LLMUnavailableError(f"LLM rate limit: next slot in {wait:.1f}s", retry_after=wait)
+        if wait > 0:
+            with self._lock:
+                self.rate_limit_wait_seconds += wait
+        return wait
+    
+    def _refund(self, requests: int, tokens: int):
+        if self.requests is not None:
+            self.requests.refund(requests)
+        if self.tokens is not None:
+            self.tokens.refund(tokens)
+    
+    def _on_error(self, error: Exception, attempt: int, deadline: float) -> float:
+        """
+        Classify a failed attempt and decide whether to retry it.
+        
+        Returns:
+            Seconds to back off before the next attempt
+            
+        Raises:
+            The original error if it is not retryable, or LLMUnavailableError
+            when retries or time run out
+        """
+        status = _status_code(error)
+        retryable = (
+            isinstance(error, self._connection_errors)
+            or status in RETRYABLE_STATUS
+            or (status is not None and status >= 500)
+        )
+        if not retryable:
+            self.breaker.release()
+            raise error
+        
+        retry_after = _retry_after(error)
+        if status == 429:
+            # Quota exceeded: not a sign the provider is down, but everyone should slow down
+            self.breaker.release()
+            with self._lock:
+                self.rate_limited += 1
+                if retry_after:
+                    self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+        else:
+            self.breaker.record_failure()
+        
+        delay = retry_after if retry_after is not None else random.uniform(
+            0, min(self.backoff_max, self.backoff_base * 2 ** attempt)
+        )
+        if attempt >= self.max_retries or time.monotonic() + delay >= deadline:
+            with self._lock:
+                self.failures += 1
+            raise LLMUnavailableError(
+                f"LLM call failed after {attempt + 1} attempts: {error}",
+                retry_after=retry_after
+            ) from error
+        with self._lock:
+            self.retries += 1
+        logger.warning(f"LLM attempt {attempt + 1} failed ({status or type(error).__name__}); retrying in {delay:.2f}s")
+        return delay
+    
+    def _timeout(self, deadline: float) -> float:
+        return max(min(self.attempt_timeout, deadline - time.monotonic()), 0.001)
+    
+    def create(self, estimated_tokens: int, **params: Any) -> Any:
+        """
+        Blocking ``chat.completions.create`` with admission control and retries.
+        
+        Args:
+            estimated_tokens: Prompt plus completion tokens to reserve from the quota
+            **params: Passed to ``chat.completions.create``
+        """
+        deadline = time.monotonic() + self.deadline
+        with self._lock:
+            self.calls += 1
+        attempt = 0
+        while True:
+            time.sleep(self._admit(deadline, estimated_tokens))
+            if not self._sync_slots.acquire(timeout=max(deadline - time.monotonic(), 0)):
+                self._refund(1, estimated_tokens)
+                self.breaker.release()
+                raise LLMUnavailableError("Timed out waiting for an LLM slot")
+            try:
+                response = self.client.chat.completions.create(timeout=self._timeout(deadline), **params)
+            except Exception as e:
+                self._refund(0, estimated_tokens)
+                delay = self._on_error(e, attempt, deadline)
+            else:
+                self.breaker.record_success()
+                self.settle(estimated_tokens, _used_tokens(response))
+                return response
+            finally:
+                self._sync_slots.release()
+            time.sleep(delay)
+            attempt += 1
+    
+    async def _open(self, deadline: float, estimated_tokens: int, **params: Any) -> Any:
+        """
+        Admit and send one call, retrying as needed.
+        
+        Returns holding a concurrency slot and the successful attempt's
+        token reservation, which the caller settles.
+        """
+        slots = self._slots()
+        with self._lock:
+            self.calls += 1
+        attempt = 0
+        while True:
+            reserved = sent = False
+            try:
+                wait = self._admit(deadline, estimated_tokens)
+                reserved = True
+                await asyncio.sleep(wait)
+                try:
+                    await asyncio.wait_for(slots.acquire(), max(deadline - time.monotonic(), 0))
+                except asyncio.TimeoutError:
+                    self._refund(1, estimated_tokens)
+                    self.breaker.release()
+                    raise LLMUnavailableError("Timed out waiting for an LLM slot")
+                try:
+                    sent = True
+                    return await self.async_client.chat.completions.create(timeout=self._timeout(deadline), **params)
+                except asyncio.CancelledError:
+                    slots.release()
+                    raise
+                except Exception as e:
+                    slots.release()
+                    reserved = False
+                    self._refund(0, estimated_tokens)
+                    delay = self._on_error(e, attempt, deadline)
+            except asyncio.CancelledError:
+                if reserved:
+                    self._refund(0 if sent else 1, estimated_tokens)
+                self.breaker.release()
+                raise
+            await asyncio.sleep(delay)
+            attempt += 1
+    
+    async def create_async(self, estimated_tokens: int, **params: Any) -> Any:
+        """Async version of ``create``."""
+        deadline = time.monotonic() + self.deadline
+        response = await self._open(deadline, estimated_tokens, **params)
+        self._slots().release()
+        self.breaker.record_success()
+        self.settle(estimated_tokens, _used_tokens(response))
+        return response
+    
+    async def stream_async(self, estimated_tokens: int, **params: Any) -> AsyncIterator[Any]:
+        """
+        Streaming ``create_async``: yields chunks, holding a concurrency slot until the stream ends.
+        
+        Only opening the stream is retried; once chunks have been yielded a
+        failure is raised to the caller. However the stream ends (finished,
+        failed, or closed early by the consumer, e.g. on client disconnect),
+        the upstream response is closed, the slot released and the token
+        reservation settled; consume it with ``contextlib.aclosing`` so an
+        early exit takes effect at once rather than at garbage collection.
+        """
+        deadline = time.monotonic() + self.deadline
+        stream = await self._open(deadline, estimated_tokens, stream=True, **params)
+        healthy = False
+        used = None
+        try:
+            async for chunk in stream:
+                used = _used_tokens(chunk) or used
+                yield chunk
+            healthy = True
+        except self._connection_errors:
+            self.breaker.record_failure()
+            raise
+        finally:
+            try:
+                # Stops the upstream completion and returns the pooled connection
+                await stream.close()
+            finally:
+                self._slots().release()
+                if healthy:
+                    self.breaker.record_success()
+                else:
+                    self.breaker.release()
+                self.settle(estimated_tokens, used if used is not None or healthy else 0)
+    
+    def settle(self, reserved_tokens: int, used_tokens: Optional[int]):
+        """Return the part of a call's token reservation it did not use (None: unknown, keep it all)."""
+        if used_tokens is not None and self.tokens is not None:
+            self.tokens.refund(reserved_tokens - used_tokens)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return call, retry and rate-limit counters."""
+        with self._lock:
+            counters = {
+                "calls": self.calls,
+                "retries": self.retries,
+                "rate_limited": self.rate_limited,
+                "failures": self.failures,
+                "rate_limit_wait_seconds": round(self.rate_limit_wait_seconds, 2)
+            }
+        return {
+            **counters,
+            "circuit": self.breaker.state,
+            "circuit_opened": self.breaker.opened,
+            "circuit_rejected": self.breaker.rejected,
+            "requests_available": round(self.requests.available, 1) if self.requests else None,
+            "tokens_available": round(self.tokens.available) if self.tokens else None
+        }
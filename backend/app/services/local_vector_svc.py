@@ -0,0 +1,467 @@
+"""In-process vector index backed by a memory-mapped vector matrix."""
+from app.core.config import settings
+from app.services.ann_index import IVFPQIndex
+from app.services.metadata_filter import MetadataFilter, date_key
+from app.services.metadata_index import MetadataIndex
+from app.services.vector_storage import VectorMatrix
+from app.services.vector_store import VectorStore
+from typing import List, Dict, Any, Optional
+import numpy as np
+import json
+import logging
+import os
+import pathlib
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class LocalVectorStore(VectorStore):
+    """
+    Exact cosine search over vectors kept in a memory-mapped file.
+    
+    Layout of the index directory:
+    - vectors.f32: row-major matrix of L2-normalized rows; vectors.f16, or
+      vectors.i8 plus per-row scales in vectors.scale, with a quantized
+      ``storage_dtype`` (see ``VectorMatrix``)
+    - items.sqlite: row number -> id and JSON metadata, plus the metadata
+      filter index (see ``MetadataIndex``)
+    - header.json: dimension, storage dtype, row count and allocated capacity
+    - ivfpq.npz: optional approximate index (see ``build_ann_index``)
+    
+    Only the top-k rows of a query ever touch the metadata store. Exact search
+    is one matrix-vector product plus an argpartition; with
+    ``index_type="ivfpq"`` and a built ANN index, queries scan only the
+    closest inverted lists instead.
+    
+    A ``metadata_filter`` is evaluated to a bitmap of passing rows before
+    anything is scored. Up to ``filter_exact_rows`` passing rows are scored
+    exactly; larger sets go through the ANN index with the bitmap applied to
+    each probed list, falling back to exact scoring if that finds fewer
+    than top_k.
+    
+    With ``read_only`` an existing index is opened without write access
+    (vectors mapped read-only, SQLite in ``mode=ro``) and changes raise, so
+    several server processes can serve one index directory.
+    """
+    
+    MIN_CAPACITY = 1024
+    SQLITE_BATCH = 500
+    
+    def __init__(
+        self,
+        path: str,
+        dimension: int = settings.embedding_dimension,
+        index_type: str = settings.local_index_type,
+        storage_dtype: str = settings.local_index_dtype,
+        read_only: bool = False
+    ):
+        self.path = path
+        self.dimension = dimension
+        self.index_type = index_type
+        self.storage_dtype = storage_dtype
+        self.read_only = read_only
+        self.nprobe = settings.ann_nprobe
+        self.refine_factor = settings.ann_refine_factor
+        self.filter_exact_rows = settings.filter_exact_rows
+        self.ann: Optional[IVFPQIndex] = None
+        self._ann_dirty = False
+        self.count = 0
+        self.capacity = 0
+        self._vectors: Optional[VectorMatrix] = None
+        self._db: Optional[sqlite3.Connection] = None
+        self._metadata: Optional[MetadataIndex] = None
+        self._lock = threading.RLock()
+    
+    @property
+    def _header_path(self) -> str:
+        return os.path.join(self.path, "header.json")
+    
+    @property
+    def _ann_path(self) -> str:
+        return os.path.join(self.path, "ivfpq.npz")
+    
+    def initialize_index(self):
+        """Open the index directory, creating an empty index if needed."""
+        with self._lock:
+            if self._db is not None:
+                return True
+            try:
+                if self.read_only and not os.path.exists(self._header_path):
+                    raise FileNotFoundError(f"No local vector index at {self.path} to open read-only")
+                if not self.read_only:
+                    os.makedirs(self.path, exist_ok=True)
+                if os.path.exists(self._header_path):
+                    with open(self._header_path, 'r') as f:
+                        header = json.load(f)
+                    if header["dimension"] != self.dimension:
+                        raise ValueError(
+                            f"Index at {self.path} has dimension {header['dimension']}, "
+                            f"expected {self.dimension}"
+                        )
+                    self.count = header["count"]
+                    self.capacity = header["capacity"]
+                    stored_dtype = header.get("dtype", "float32")
+                    if stored_dtype != self.storage_dtype:
+                        logger.warning(
+                            f"Index at {self.path} stores {stored_dtype} vectors; ignoring "
+                            f"LOCAL_INDEX_DTYPE={self.storage_dtype} (re-ingest to change it)"
+                        )
+                        self.storage_dtype = stored_dtype
+                
+                db_path = os.path.join(self.path, "items.sqlite")
+                if self.read_only:
+                    self._db = sqlite3.connect(f"{pathlib.Path(db_path).absolute().as_uri()}?mode=ro", uri=True,
+                                               check_same_thread=False)
+                    self._metadata = MetadataIndex(self._db)
+                else:
+                    self._db = sqlite3.connect(db_path, check_same_thread=False)
+                    self._db.execute(
+                        "CREATE TABLE IF NOT EXISTS items ("
+                        "row INTEGER PRIMARY KEY, id TEXT NOT NULL UNIQUE, metadata TEXT NOT NULL)"
+                    )
+                    self._metadata = MetadataIndex(self._db)
+                    self._metadata.create()
+                
+                if self.capacity:
+                    self._open_vectors()
+                
+                # Kept across close(), so a process forked after loading it shares its pages
+                if self.index_type == "ivfpq" and self.ann is None:
+                    if os.path.exists(self._ann_path):
+                        self.ann = IVFPQIndex.load(self._ann_path)
+                        logger.info(f"Loaded IVF-PQ index ({self.ann.ntotal} vectors, nlist={self.ann.nlist})")
+                    else:
+                        logger.warning("LOCAL_INDEX_TYPE=ivfpq but no ANN index built yet; using exact search")
+                logger.info(f"Opened local vector index at {self.path} ({self.count} vectors)")
+                return True
+            
+            except Exception as e:
+                logger.error(f"Error initializing local vector index: {e}")
+                raise
+    
+    def _open_vectors(self):
+        self._vectors = VectorMatrix(
+            os.path.join(self.path, "vectors"), self.dimension, self.capacity, self.storage_dtype, self.read_only
+        )
+    
+    def close(self):
+        """
+        Close the SQLite connection, e.g. before forking; the next call reopens it.
+        
+        The vector mapping and the ANN index stay loaded.
+        """
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+                self._metadata = None
+    
+    def _check_writable(self):
+        if self.read_only:
+            raise RuntimeError(f"Local vector index at {self.path} is open read-only")
+    
+    def _ensure_capacity(self, needed: int):
+        """Grow the vectors file geometrically so appends stay amortized O(1)."""
+        if needed <= self.capacity:
+            return
+        new_capacity = max(self.MIN_CAPACITY, self.capacity * 2)
+        while new_capacity < needed:
+            new_capacity *= 2
+        self.capacity = new_capacity
+        if self._vectors is None:
+            self._open_vectors()
+        else:
+            self._vectors.resize(new_capacity)
+    
+    def _write_header(self):
+        with open(self._header_path, 'w') as f:
+            json.dump({
+                "dimension": self.dimension,
+                "dtype": self.storage_dtype,
+                "count": self.count,
+                "capacity": self.capacity
+            }, f)
+    
+    def _existing_rows(self, ids: List[str]) -> Dict[str, int]:
+        rows = {}
+        for i in range(0, len(ids), self.SQLITE_BATCH):
+            chunk = ids[i:i + self.SQLITE_BATCH]
+            placeholders = ",".join("?" * len(chunk))
+            for row, vector_id in self._db.execute(
+                f"SELECT row, id FROM items WHERE id IN ({placeholders})", chunk
+            ):
+                rows[vector_id] = row
+        return rows
+    
+    @staticmethod
+    def _normalize(matrix: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+    
+    def upsert_vectors(self, vectors: List[Dict[str, Any]]):
+        """
+        Insert or replace vectors.
+        
+        Args:
+            vectors: List of dicts with 'id', 'values', and 'metadata'
+        """
+        if not vectors:
+            return
+        self._check_writable()
+        try:
+            if self._db is None:
+                self.initialize_index()
+            
+            # Last write wins for duplicate IDs within a batch
+            latest = {v['id']: v for v in vectors}
+            ids = list(latest.keys())
+            values = self._normalize(np.asarray([latest[i]['values'] for i in ids], dtype=np.float32))
+            
+            with self._lock:
+                rows_by_id = self._existing_rows(ids)
+                new_ids = [i for i in ids if i not in rows_by_id]
+                for offset, vector_id in enumerate(new_ids):
+                    rows_by_id[vector_id] = self.count + offset
+                
+                self._ensure_capacity(self.count + len(new_ids))
+                rows = np.fromiter((rows_by_id[i] for i in ids), dtype=np.int64, count=len(ids))
+                self._vectors[rows] = values
+                self._vectors.flush()
+                
+                if self.ann is not None:
+                    self.ann.add(rows, values)
+                    self._ann_dirty = True
+                
+                metadata = {i: latest[i].get('metadata', {}) for i in ids}
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO items (row, id, metadata, pub_date) VALUES (?, ?, ?, ?)",
+                    [
+                        (
+                            rows_by_id[i], i, json.dumps(metadata[i], separators=(",", ":")),
+                            metadata[i].get('pub_date') or date_key(metadata[i].get('publication_date'))
+                        )
+                        for i in ids
+                    ]
+                )
+                self._metadata.write([(rows_by_id[i], metadata[i]) for i in ids])
+                self._db.commit()
+                self.count += len(new_ids)
+                self._write_header()
+            
+            logger.info(f"Upserted {len(ids)} vectors to local index")
+        
+        except Exception as e:
+            logger.error(f"Error upserting vectors: {e}")
+            raise
+    
+    def delete_vectors(self, ids: List[str]):
+        """
+        Delete vectors by ID. Unknown IDs are ignored.
+        
+        The last row is moved into each freed slot, so the matrix stays dense
+        and exact search never scans deleted rows.
+        
+        Args:
+            ids: IDs of the vectors to delete
+        """
+        if not ids:
+            return
+        self._check_writable()
+        try:
+            if self._db is None:
+                self.initialize_index()
+            
+            with self._lock:
+                rows = sorted(self._existing_rows(list(set(ids))).values(), reverse=True)
+                for row in rows:
+                    last = self.count - 1
+                    self._db.execute("DELETE FROM items WHERE row = ?", (row,))
+                    self._metadata.move(row, last)
+                    if self.ann is not None:
+                        self.ann.remove([last])
+                    if row != last:
+                        self._vectors.copy_row(last, row)
+                        self._db.execute("UPDATE items SET row = ? WHERE row = ?", (row, last))
+                        if self.ann is not None:
+                            self.ann.add([row], self._vectors[row:row + 1])
+                    self.count -= 1
+                if rows:
+                    self._vectors.flush()
+                    self._ann_dirty = self.ann is not None
+                self._db.commit()
+                self._write_header()
+            
+            logger.info(f"Deleted {len(rows)} vectors from local index")
+        
+        except Exception as e:
+            logger.error(f"Error deleting vectors: {e}")
+            raise
+    
+    def _top_k(self, scores: np.ndarray, top_k: int) -> np.ndarray:
+        """Indices of the top_k scores, best first."""
+        if top_k >= len(scores):
+            return np.argsort(-scores)
+        candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+        return candidates[np.argsort(-scores[candidates])]
+    
+    def _fetch_metadata(self, rows: List[int]) -> Dict[int, tuple]:
+        placeholders = ",".join("?" * len(rows))
+        with self._lock:
+            return {
+                row: (vector_id, metadata)
+                for row, vector_id, metadata in self._db.execute(
+                    f"SELECT row, id, metadata FROM items WHERE row IN ({placeholders})", rows
+                )
+            }
+    
+    def _exact_filtered(self, vectors: VectorMatrix, query: np.ndarray, count: int, candidates: np.ndarray,
+                        top_k: int):
+        """Exact top-k over the candidate rows only."""
+        if len(candidates) * 4 < count:
+            scores = vectors.scores_rows(query, candidates)
+        else:
+            # Most rows pass: a sequential scan beats gathering rows
+            scores = vectors.scores(query, count)[candidates]
+        top = self._top_k(scores, top_k)
+        return candidates[top], scores[top]
+    
+    def query_similar(
+        self,
+        query_vector: np.ndarray,
+        top_k: int = 5,
+        metadata_filter: Optional[MetadataFilter] = None
+    ) -> Dict[str, Any]:
+        """
+        Query for similar vectors.
+        
+        Args:
+            query_vector: The embedding vector to search for
+            top_k: Number of results to return
+            metadata_filter: Only return vectors whose metadata passes it
+            
+        Returns:
+            Query results with a 'matches' list
+        """
+        try:
+            if self._db is None:
+                self.initialize_index()
+            
+            with self._lock:
+                vectors, count = self._vectors, self.count
+                allowed = self._metadata.mask(metadata_filter, count) if metadata_filter and count else None
+            candidates = np.flatnonzero(allowed) if allowed is not None else None
+            if candidates is not None:
+                top_k = min(top_k, len(candidates))
+            if count == 0 or top_k <= 0:
+                return {"matches": []}
+            
+            query = self._normalize(np.asarray(query_vector, dtype=np.float32))
+            if candidates is not None and (self.ann is None or len(candidates) <= self.filter_exact_rows):
+                best, best_scores = self._exact_filtered(vectors, query, count, candidates, top_k)
+            elif self.ann is not None:
+                with self._lock:
+                    best, best_scores = self.ann.search(
+                        query, top_k, nprobe=self.nprobe, vectors=vectors, refine_factor=self.refine_factor,
+                        allowed=allowed
+                    )
+                if candidates is not None and len(best) < top_k:
+                    # Too few passing rows in the probed lists
+                    best, best_scores = self._exact_filtered(vectors, query, count, candidates, top_k)
+            else:
+                scores = vectors.scores(query, count)
+                best = self._top_k(scores, top_k)
+                best_scores = scores[best]
+            if len(best) == 0:
+                return {"matches": []}
+            
+            items = self._fetch_metadata([int(r) for r in best])
+            matches = []
+            for row, score in zip(best, best_scores):
+                if int(row) not in items:
+                    continue  # deleted while the query ran
+                vector_id, metadata = items[int(row)]
+                matches.append({
+                    'id': vector_id,
+                    'score': float(score),
+                    'metadata': json.loads(metadata)
+                })
+            return {"matches": matches}
+        
+        except Exception as e:
+            logger.error(f"Error querying local vector index: {e}")
+            raise
+    
+    def fetch_vectors(self, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Look up stored (normalized) vectors by ID.
+        
+        Args:
+            ids: IDs to fetch; unknown IDs are left out
+            
+        Returns:
+            Mapping of ID to ``{'values', 'metadata'}``
+        """
+        if self._db is None:
+            self.initialize_index()
+        if not ids:
+            return {}
+        with self._lock:
+            rows = self._existing_rows(list(ids))
+            if not rows:
+                return {}
+            items = self._fetch_metadata(list(rows.values()))
+            values = self._vectors[np.array(list(rows.values()))]
+        return {
+            vector_id: {'values': vector, 'metadata': json.loads(items[row][1])}
+            for (vector_id, row), vector in zip(rows.items(), values)
+        }
+    
+    def build_ann_index(
+        self,
+        nlist: int = settings.ann_nlist,
+        pq_m: int = settings.ann_pq_m,
+        train_sample: int = settings.ann_train_sample,
+        chunk: int = 100_000
+    ):
+        """
+        Train an IVF-PQ index over the stored vectors and save it.
+        
+        Args:
+            nlist: Number of inverted lists (rule of thumb: about 4 * sqrt(n))
+            pq_m: Number of PQ sub-quantizers (0 stores no codes, IVF-Flat)
+            train_sample: Maximum number of vectors used for training
+            chunk: Rows added per step, to bound temporary memory
+        """
+        self._check_writable()
+        if self._db is None:
+            self.initialize_index()
+        with self._lock:
+            vectors, count = self._vectors, self.count
+            if count == 0:
+                raise ValueError("Cannot build an ANN index over an empty store")
+            
+            rng = np.random.default_rng(0)
+            sample_rows = np.sort(rng.choice(count, min(train_sample, count), replace=False))
+            
+            ann = IVFPQIndex(self.dimension, nlist=nlist, pq_m=pq_m)
+            logger.info(f"Training IVF-PQ (nlist={nlist}, pq_m={pq_m}) on {len(sample_rows)} vectors...")
+            ann.train(np.asarray(vectors[sample_rows]))
+            for start in range(0, count, chunk):
+                end = min(start + chunk, count)
+                ann.add(np.arange(start, end), np.asarray(vectors[start:end]))
+            
+            ann.save(self._ann_path)
+            self.ann = ann
+            self.index_type = "ivfpq"
+            self._ann_dirty = False
+            logger.info(f"Built IVF-PQ index over {ann.ntotal} vectors")
+    
+    def flush(self):
+        """Save the ANN index if upserts have changed it since the last save."""
+        with self._lock:
+            if self.ann is not None and self._ann_dirty:
+                self.ann.save(self._ann_path)
+                self._ann_dirty = False
@@ -0,0 +1,184 @@
+"""Metadata filters (publication date, CPC class, assignee): stored fields at ingestion, predicates at query time."""
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import json
+import re
+
+# CPC prefixes a filter can name: section ("H"), class ("H04") or subclass ("H04L")
+_CPC_PREFIX = re.compile(r"^[A-HY](\d\d[A-Z]?)?$")
+_CPC_LEVELS = (1, 3, 4)
+_NON_WORD = re.compile(r"[\W_]+")
+
+# Metadata fields holding filterable labels (lists of strings)
+LABEL_FIELDS = ('cpc_classes', 'assignee_keys')
+
+# Caps on the display lists copied into vector metadata
+MAX_CPC_CODES = 30
+MAX_ASSIGNEES = 10
+
+
+def date_key(value: Any) -> int:
+    """Publication date as a YYYYMMDD integer ("2023-01-15", "20230115" or a date); 0 if unknown."""
+    digits = re.sub(r"\D", "", str(value or ""))[:8]
+    return int(digits) if len(digits) == 8 else 0
+
+
+def cpc_prefixes(codes: Iterable[str]) -> List[str]:
+    """Section, class and subclass of each CPC code ("H04L 9/32" -> "H", "H04", "H04L")."""
+    prefixes = set()
+    for code in codes:
+        code = code.replace(" ", "").upper()
+        for length in _CPC_LEVELS:
+            if len(code) >= length and _CPC_PREFIX.match(code[:length]):
+                prefixes.add(code[:length])
+    return sorted(prefixes)
+
+
+def assignee_key(name: str) -> str:
+    """Case- and punctuation-insensitive form of an assignee name ("ACME Corp." -> "acme corp")."""
+    return " ".join(_NON_WORD.sub(" ", name.casefold()).split())
+
+
+def filter_metadata(patent: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    The filterable fields stored with every vector of a patent.
+    
+    ``pub_date`` is numeric so range predicates work in Pinecone; CPC codes
+    are stored as their prefixes (Pinecone has no prefix match), and
+    assignees in normalized form. Empty lists are left out.
+    """
+    fields: Dict[str, Any] = {'pub_date': date_key(patent.get('publication_date'))}
+    cpc_classes = cpc_prefixes(patent.get('cpc') or [])
+    if cpc_classes:
+        fields['cpc_classes'] = cpc_classes
+    assignee_keys = sorted({assignee_key(name) for name in patent.get('assignees') or []} - {""})
+    if assignee_keys:
+        fields['assignee_keys'] = assignee_keys
+    return fields
+
+
+@dataclass(frozen=True)
+class MetadataFilter:
+    """
+    Predicates a search is restricted to; all given conditions must hold.
+    
+    Dates are inclusive YYYYMMDD integers (0 for no bound); patents with no
+    known date fail any date bound. ``cpc``/``assignees`` match patents
+    with at least one of the listed values, ``exclude_*`` drop patents with
+    any of them. Build with ``create``, which validates and normalizes.
+    """
+    published_from: int = 0
+    published_to: int = 0
+    cpc: Tuple[str, ...] = ()
+    exclude_cpc: Tuple[str, ...] = ()
+    assignees: Tuple[str, ...] = ()
+    exclude_assignees: Tuple[str, ...] = ()
+    
+    @classmethod
+    def create(
+        cls,
+        published_from: Any = None,
+        published_to: Any = None,
+        cpc: Iterable[str] = (),
+        exclude_cpc: Iterable[str] = (),
+        assignees: Iterable[str] = (),
+        exclude_assignees: Iterable[str] = ()
+    ) -> Optional["MetadataFilter"]:
+        """
+        Validate and normalize filter values.
+        
+        Returns:
+            The filter, or None if it has no conditions
+            
+        Raises:
+            ValueError: For a CPC value that is not a section, class or
+                subclass, or an empty date range
+        """
+        def cpc_values(values: Iterable[str]) -> Tuple[str, ...]:
+            normalized = sorted({value.replace(" ", "").upper() for value in values})
+            invalid = [value for value in normalized if not _CPC_PREFIX.match(value)]
+            if invalid:
+                raise ValueError(
+                    f"Invalid CPC filter {', '.join(invalid)}: use a section (H), class (H04) or subclass (H04L)"
+                )
+            return tuple(normalized)
+        
+        def assignee_values(values: Iterable[str]) -> Tuple[str, ...]:
+            return tuple(sorted({assignee_key(value) for value in values} - {""}))
+        
+        date_from, date_to = date_key(published_from), date_key(published_to)
+        if date_from and date_to and date_from > date_to:
+            raise ValueError("published_from is after published_to")
+        metadata_filter = cls(
+            published_from=date_from,
+            published_to=date_to,
+            cpc=cpc_values(cpc),
+            exclude_cpc=cpc_values(exclude_cpc),
+            assignees=assignee_values(assignees),
+            exclude_assignees=assignee_values(exclude_assignees)
+        )
+        return None if metadata_filter.is_empty else metadata_filter
+    
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> Optional["MetadataFilter"]:
+        """Inverse of ``to_dict`` (None passes through)."""
+        if not data:
+            return None
+        return cls(**{key: tuple(value) if isinstance(value, list) else value for key, value in data.items()})
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-serializable form, for job payloads."""
+        return {key: list(value) if isinstance(value, tuple) else value for key, value in asdict(self).items()}
+    
+    @property
+    def is_empty(self) -> bool:
+        return self == MetadataFilter()
+    
+    @property
+    def key(self) -> str:
+        """Canonical string form, for cache keys."""
+        return json.dumps(self.to_dict(), sort_keys=True, separators=(",", ":"))
+    
+    def label_conditions(self) -> List[Tuple[str, Tuple[str, ...], Tuple[str, ...]]]:
+        """(metadata field, values to include, values to exclude) for each label field."""
+        return [
+            ('cpc_classes', self.cpc, self.exclude_cpc),
+            ('assignee_keys', self.assignees, self.exclude_assignees)
+        ]
+    
+    def to_pinecone(self) -> Dict[str, Any]:
+        """The filter as a Pinecone metadata filter expression."""
+        clauses: List[Dict[str, Any]] = []
+        if self.published_from or self.published_to:
+            clauses.append({'pub_date': {'$gte': max(self.published_from, 1)}})
+        if self.published_to:
+            clauses.append({'pub_date': {'$lte': self.published_to}})
+        for field, include, exclude in self.label_conditions():
+            if include:
+                clauses.append({field: {'$in': list(include)}})
+            if exclude:
+                clauses.append({field: {'$nin': list(exclude)}})
+        return clauses[0] if len(clauses) == 1 else {'$and': clauses}
+    
+    def matches(self, metadata: Dict[str, Any]) -> bool:
+        """Whether a vector's metadata passes the filter (for results that bypassed the index)."""
+        if self.published_from or self.published_to:
+            pub_date = metadata.get('pub_date') or date_key(metadata.get('publication_date'))
+            if not pub_date or pub_date < self.published_from:
+                return False
+            if self.published_to and pub_date > self.published_to:
+                return False
+        for field, include, exclude in self.label_conditions():
+            values = set(metadata.get(field) or ())
+            if include and values.isdisjoint(include):
+                return False
+            if exclude and not values.isdisjoint(exclude):
+                return False
+        return True
+
+
+def cache_text(invention_idea: str, metadata_filter: Optional[MetadataFilter]) -> str:
+    """The text an analysis is cached under: the idea, scoped by the filter it was retrieved with."""
+    if metadata_filter is None:
+        return invention_idea
+    return f"{invention_idea}\nfilters: {metadata_filter.key}"
@@ -0,0 +1,143 @@
+"""Row-level metadata filter index for the local vector store."""
+from app.services.metadata_filter import LABEL_FIELDS, MetadataFilter, date_key
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import json
+import logging
+import sqlite3
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class MetadataIndex:
+    """
+    Filter columns over the rows of a ``LocalVectorStore``, kept in its SQLite file.
+    
+    - ``items.pub_date``: the publication date as a YYYYMMDD integer, read
+      into one int32 column array for range predicates
+    - ``labels(field, value, row)``: an inverted index of the label fields
+      (CPC prefixes, assignee keys); each value is read as a row array
+    
+    ``mask`` evaluates a filter to a boolean bitmap over the rows by
+    comparing the date column and setting/clearing the rows of each label,
+    so the store only scores rows that pass. The date column and the most
+    recently used label row arrays are cached in memory; any write drops
+    the cache. Callers hold the store's lock around every method.
+    """
+    
+    LABEL_CACHE = 4096
+    
+    def __init__(self, db: sqlite3.Connection):
+        self._db = db
+        self._dates: Optional[np.ndarray] = None
+        self._label_rows: "OrderedDict[Tuple[str, str], np.ndarray]" = OrderedDict()
+    
+    def create(self):
+        """Create the label table and the date column, backfilling dates of an older index."""
+        columns = {name for _, name, *_ in self._db.execute("PRAGMA table_info(items)")}
+        if "pub_date" not in columns:
+            self._db.execute("ALTER TABLE items ADD COLUMN pub_date INTEGER NOT NULL DEFAULT 0")
+            rows = self._db.execute("SELECT row, metadata FROM items").fetchall()
+            if rows:
+                logger.info(f"Backfilling publication dates of {len(rows)} vectors for metadata filters")
+                self._db.executemany(
+                    "UPDATE items SET pub_date = ? WHERE row = ?",
+                    [(date_key(_json_field(metadata, 'publication_date')), row) for row, metadata in rows]
+                )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS labels ("
+            "field TEXT NOT NULL, value TEXT NOT NULL, row INTEGER NOT NULL, "
+            "PRIMARY KEY (field, value, row)) WITHOUT ROWID"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS labels_row ON labels (row)")
+        self._db.commit()
+    
+    def invalidate(self):
+        """Drop cached columns after rows changed."""
+        self._dates = None
+        self._label_rows.clear()
+    
+    def write(self, rows_metadata: List[Tuple[int, Dict[str, Any]]]):
+        """
+        Replace the labels of written rows (their dates are written with the items).
+        
+        Args:
+            rows_metadata: (row, metadata) of each upserted vector
+        """
+        self.invalidate()
+        self._db.executemany("DELETE FROM labels WHERE row = ?", [(row,) for row, _ in rows_metadata])
+        self._db.executemany(
+            "INSERT OR IGNORE INTO labels (field, value, row) VALUES (?, ?, ?)",
+            [
+                (field, value, row)
+                for row, metadata in rows_metadata
+                for field in LABEL_FIELDS
+                for value in metadata.get(field) or ()
+            ]
+        )
+    
+    def move(self, deleted: int, last: int):
+        """Drop the labels of a deleted row and renumber the last row into its slot."""
+        self.invalidate()
+        self._db.execute("DELETE FROM labels WHERE row = ?", (deleted,))
+        if deleted != last:
+            self._db.execute("UPDATE labels SET row = ? WHERE row = ?", (deleted, last))
+    
+    def _date_column(self, count: int) -> np.ndarray:
+        if self._dates is None or len(self._dates) < count:
+            # Rows are dense (deletes move the last row into the gap), so read them in row order
+            self._dates = np.fromiter(
+                (pub_date for (pub_date,) in self._db.execute("SELECT pub_date FROM items ORDER BY row LIMIT ?", (count,))),
+                dtype=np.int32
+            )
+        return self._dates[:count]
+    
+    def _rows(self, field: str, value: str) -> np.ndarray:
+        key = (field, value)
+        rows = self._label_rows.get(key)
+        if rows is None:
+            rows = np.fromiter(
+                (row for (row,) in self._db.execute("SELECT row FROM labels WHERE field = ? AND value = ?", key)),
+                dtype=np.int64
+            )
+            self._label_rows[key] = rows
+            if len(self._label_rows) > self.LABEL_CACHE:
+                self._label_rows.popitem(last=False)
+        else:
+            self._label_rows.move_to_end(key)
+        return rows
+    
+    def mask(self, metadata_filter: MetadataFilter, count: int) -> np.ndarray:
+        """
+        Rows passing the filter, as a boolean array over the first ``count`` rows.
+        
+        Args:
+            metadata_filter: Predicates to evaluate
+            count: Number of rows in the store
+        """
+        mask = np.ones(count, dtype=bool)
+        if metadata_filter.published_from or metadata_filter.published_to:
+            dates = self._date_column(count)
+            mask &= dates >= max(metadata_filter.published_from, 1)
+            if metadata_filter.published_to:
+                mask &= dates <= metadata_filter.published_to
+        for field, include, exclude in metadata_filter.label_conditions():
+            if include:
+                allowed = np.zeros(count, dtype=bool)
+                for value in include:
+                    rows = self._rows(field, value)
+                    allowed[rows[rows < count]] = True
+                mask &= allowed
+            for value in exclude:
+                rows = self._rows(field, value)
+                mask[rows[rows < count]] = False
+        return mask
+
+
+def _json_field(metadata: str, key: str) -> Any:
+    try:
+        return json.loads(metadata).get(key)
+    except (ValueError, AttributeError):
+        return None
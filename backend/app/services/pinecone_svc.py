@@ -1,22 +1,39 @@
 """Pinecone vector database service."""
-from pinecone import Pinecone, ServerlessSpec
 from app.core.config import settings
-from typing import List, Dict, Any
+from app.core.providers import LazyProvider
+from app.services.metadata_filter import MetadataFilter
+from app.services.vector_store import VectorStore
+from typing import List, Dict, Any, Optional
 import logging
+import threading
+
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
 
-class PineconeService:
+class PineconeService(VectorStore):
     """Service for interacting with Pinecone vector database."""
     
     def __init__(self):
+        from pinecone import Pinecone
+        
         self.pc = Pinecone(api_key=settings.pinecone_api_key)
         self.index_name = settings.pinecone_index_name
         self.index = None
-        
+        self._init_lock = threading.Lock()
+    
     def initialize_index(self):
         """Initialize or connect to existing Pinecone index."""
+        with self._init_lock:
+            if self.index is not None:
+                return True
+            return self._connect_index()
+    
+    def _connect_index(self):
+        """Create the index if needed and open a handle to it."""
+        from pinecone import ServerlessSpec
+        
         try:
             # Check if index exists
             existing_indexes = [idx.name for idx in self.pc.list_indexes()]
@@ -36,7 +53,7 @@ class PineconeService:
             self.index = self.pc.Index(self.index_name)
             logger.info(f"Connected to index: {self.index_name}")
             return True
-            
+        
         except Exception as e:
             logger.error(f"Error initializing Pinecone index: {e}")
             raise
@@ -52,21 +69,52 @@ class PineconeService:
             if not self.index:
                 self.initialize_index()
             
+            # The client serializes plain lists; bulk ingestion hands over float32 rows
+            vectors = [
+                {**v, 'values': v['values'].tolist()} if isinstance(v['values'], np.ndarray) else v
+                for v in vectors
+            ]
             self.index.upsert(vectors=vectors)
             logger.info(f"Upserted {len(vectors)} vectors to Pinecone")
-            
+        
         except Exception as e:
             logger.error(f"Error upserting vectors: {e}")
             raise
     
-    def query_similar(self, query_vector: List[float], top_k: int = 5) -> Dict[str, Any]:
+    def delete_vectors(self, ids: List[str]):
+        """
+        Delete vectors from Pinecone.
+        
+        Args:
+            ids: IDs of the vectors to delete
+        """
+        try:
+            if not self.index:
+                self.initialize_index()
+            
+            for i in range(0, len(ids), 1000):
+                self.index.delete(ids=ids[i:i + 1000])
+            logger.info(f"Deleted {len(ids)} vectors from Pinecone")
+        
+        except Exception as e:
+            logger.error(f"Error deleting vectors: {e}")
+            raise
+    
+    def query_similar(
+        self,
+        query_vector: np.ndarray,
+        top_k: int = 5,
+        metadata_filter: Optional[MetadataFilter] = None
+    ) -> Dict[str, Any]:
         """
         Query for similar vectors.
         
         Args:
             query_vector: The embedding vector to search for
             top_k: Number of results to return
-            
+            metadata_filter: Only return vectors whose metadata passes it
+                (sent as a Pinecone metadata filter, applied during the search)
+                
         Returns:
             Query results from Pinecone
         """
@@ -74,18 +122,45 @@ class PineconeService:
             if not self.index:
                 self.initialize_index()
             
+            options = {'filter': metadata_filter.to_pinecone()} if metadata_filter else {}
             results = self.index.query(
-                vector=query_vector,
+                vector=np.asarray(query_vector, dtype=np.float32).tolist(),
                 top_k=top_k,
-                include_metadata=True
+                include_metadata=True,
+                **options
             )
             
             return results
-            
+        
         except Exception as e:
             logger.error(f"Error querying Pinecone: {e}")
             raise
+    
+    def fetch_vectors(self, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Fetch vectors and metadata from Pinecone by ID.
+        
+        Args:
+            ids: IDs to fetch; unknown IDs are left out
+            
+        Returns:
+            Mapping of ID to ``{'values', 'metadata'}``
+        """
+        try:
+            if not self.index:
+                self.initialize_index()
+            
+            fetched = {}
+            for i in range(0, len(ids), 1000):
+                response = self.index.fetch(ids=ids[i:i + 1000])
+                for vector_id, vector in response.vectors.items():
+                    fetched[vector_id] = {'values': vector.values, 'metadata': vector.metadata or {}}
+            return fetched
+        
+        except Exception as e:
+            logger.error(f"Error fetching vectors from Pinecone: {e}")
+            raise
 
 
-# Singleton instance
-pinecone_service = PineconeService()
+# Lazily constructed singleton
+get_pinecone_service = LazyProvider(PineconeService, "Pinecone service")
@@ -0,0 +1,230 @@
+"""Cross-encoder reranking of retrieved patents, under a per-request latency budget."""
+from app.core.config import settings
+from app.core.executors import embedding_executor, run_blocking
+from app.core.providers import LazyProvider
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import hashlib
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def load_cross_encoder(model_name: str = settings.rerank_model_name):
+    """Load a sentence-transformers CrossEncoder on CPU (``predict(pairs, batch_size=...)`` returns scores)."""
+    from sentence_transformers import CrossEncoder
+    return CrossEncoder(model_name, device="cpu", max_length=512)
+
+
+def query_key(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+def candidate_text(match: Dict[str, Any], max_chars: int = settings.rerank_max_chars) -> str:
+    """What the cross-encoder reads for a patent: title, abstract and its best matched claim."""
+    metadata = match.get('metadata', {})
+    parts = [metadata.get('title', ''), metadata.get('abstract', '')]
+    claims = match.get('matched_claims') or []
+    if claims:
+        parts.append(claims[0].get('text', ''))
+    return ". ".join(part for part in parts if part)[:max_chars]
+
+
+class Reranker:
+    """
+    Reorders retrieval candidates by cross-encoder relevance to the idea.
+    
+    Candidates are scored best retrieval rank first, ``batch_size`` pairs per
+    model call. The budget runs from when the request asks for a rerank,
+    so time queued behind embedding batches on the shared pool counts
+    against it. Before each call the reranker checks that the budget leaves
+    room for another batch (judged by the average batch time so far, seeded
+    by ``warmup``); when it does not, the remaining candidates are passed
+    through in retrieval order behind the scored ones, so a slow model
+    degrades ranking quality rather than latency. Scores are cached per
+    (idea hash, patent id), so a repeated or paged query only scores patents
+    it has not seen.
+    
+    The model is loaded on first use (or by ``warmup``). Matches keep their
+    retrieval ``score`` (the fast path's thresholds are calibrated on it)
+    and gain ``rerank_score``.
+    """
+    
+    def __init__(
+        self,
+        model=None,
+        batch_size: int = settings.rerank_batch_size,
+        budget_ms: float = settings.rerank_budget_ms,
+        cache_entries: int = settings.rerank_cache_entries
+    ):
+        self._model = model
+        self.batch_size = batch_size
+        self.budget_ms = budget_ms
+        self.cache_entries = cache_entries
+        self._cache: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._model_lock = threading.Lock()
+        self._batch_seconds = 0.0
+        
+        # Metrics
+        self.queries = 0
+        self.candidates = 0
+        self.scored = 0
+        self.cache_hits = 0
+        self.over_budget = 0
+        self.rerank_seconds = 0.0
+        self.queue_seconds = 0.0
+    
+    @property
+    def model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    logger.info(f"Loading rerank model: {settings.rerank_model_name}")
+                    self._model = load_cross_encoder()
+        return self._model
+    
+    def warmup(self):
+        """
+        Load the model and score one full batch of candidate-length text.
+        
+        The first request then neither pays for loading nor runs a batch
+        without an estimate of how long one takes.
+        """
+        candidate = ("warmup " * (settings.rerank_max_chars // 7))[:settings.rerank_max_chars]
+        self._predict([("warmup", candidate)] * self.batch_size)
+    
+    def _predict(self, pairs: List[Tuple[str, str]]) -> List[float]:
+        start = time.perf_counter()
+        scores = self.model.predict(pairs, batch_size=len(pairs), show_progress_bar=False)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            # Recent batches weigh most: the model's speed shifts with load
+            self._batch_seconds = elapsed if not self._batch_seconds else 0.8 * self._batch_seconds + 0.2 * elapsed
+        return [float(score) for score in scores]
+    
+    def _cached(self, key: str, ids: List[str]) -> Dict[str, float]:
+        with self._lock:
+            found = {}
+            for patent_id in ids:
+                score = self._cache.get((key, patent_id))
+                if score is not None:
+                    self._cache.move_to_end((key, patent_id))
+                    found[patent_id] = score
+            return found
+    
+    def _store(self, key: str, scores: Dict[str, float]):
+        with self._lock:
+            for patent_id, score in scores.items():
+                self._cache[(key, patent_id)] = score
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+    
+    def rerank(
+        self,
+        text: str,
+        results: Dict[str, Any],
+        top_k: int,
+        budget_ms: Optional[float] = None,
+        deadline: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Keep the ``top_k`` most relevant of the retrieved matches.
+        
+        Args:
+            text: The idea the matches were retrieved for
+            results: Query results with a 'matches' list, best first
+            top_k: Number of matches to return
+            budget_ms: Time allowed for scoring (defaults to ``budget_ms``)
+            deadline: ``time.perf_counter()`` by which scoring must end, if the
+                budget started earlier (e.g. before waiting for a worker thread)
+                
+        Returns:
+            Query results with the reordered 'matches', each with a
+            ``rerank_score`` if it was scored; the retrieval order unchanged
+            if the deadline has already passed
+        """
+        budget = (self.budget_ms if budget_ms is None else budget_ms) / 1000
+        if deadline is None:
+            deadline = time.perf_counter() + budget
+        start = deadline - budget
+        queued = time.perf_counter() - start
+        matches = results.get('matches', [])
+        if queued >= budget:
+            with self._lock:
+                self.queries += 1
+                self.candidates += len(matches)
+                self.over_budget += 1
+                self.rerank_seconds += queued
+                self.queue_seconds += queued
+            logger.warning(
+                f"Rerank budget used up waiting {queued * 1000:.0f} ms for a worker; keeping retrieval order"
+            )
+            return {**results, 'matches': matches[:top_k]}
+        
+        key = query_key(text)
+        scores = self._cached(key, [match['id'] for match in matches])
+        cache_hits = len(scores)
+        pending = [match for match in matches if match['id'] not in scores]
+        
+        fresh: Dict[str, float] = {}
+        for offset in range(0, len(pending), self.batch_size):
+            if time.perf_counter() + self._batch_seconds > deadline:
+                break
+            batch = pending[offset:offset + self.batch_size]
+            batch_scores = self._predict([(text, candidate_text(match)) for match in batch])
+            fresh.update((match['id'], score) for match, score in zip(batch, batch_scores))
+        self._store(key, fresh)
+        scores.update(fresh)
+        
+        # Scored candidates by relevance, then the unscored ones in retrieval order
+        scored = sorted((m for m in matches if m['id'] in scores), key=lambda m: scores[m['id']], reverse=True)
+        unscored = [m for m in matches if m['id'] not in scores]
+        reranked = [{**match, 'rerank_score': scores[match['id']]} for match in scored] + unscored
+        
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.queries += 1
+            self.candidates += len(matches)
+            self.scored += len(fresh)
+            self.cache_hits += cache_hits
+            self.over_budget += bool(unscored)
+            self.rerank_seconds += elapsed
+            self.queue_seconds += queued
+        if unscored:
+            logger.warning(
+                f"Rerank budget used up after {elapsed * 1000:.0f} ms ({queued * 1000:.0f} ms queued): "
+                f"{len(unscored)} of {len(matches)} candidates left in retrieval order"
+            )
+        return {**results, 'matches': reranked[:top_k]}
+    
+    async def rerank_async(self, text: str, results: Dict[str, Any], top_k: int) -> Dict[str, Any]:
+        """
+        ``rerank`` on the embedding pool (the cross-encoder is CPU-bound like the embedding model).
+        
+        The budget starts now, before the job waits for a pool thread.
+        """
+        deadline = time.perf_counter() + self.budget_ms / 1000
+        return await run_blocking(embedding_executor, self.rerank, text, results, top_k, None, deadline)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return rerank counters."""
+        with self._lock:
+            return {
+                "enabled": settings.rerank_enabled,
+                "queries": self.queries,
+                "candidates": self.candidates,
+                "scored": self.scored,
+                "cache_hits": self.cache_hits,
+                "cache_entries": len(self._cache),
+                "over_budget": self.over_budget,
+                "avg_batch_ms": round(self._batch_seconds * 1000, 2),
+                "avg_rerank_ms": round(self.rerank_seconds / self.queries * 1000, 2) if self.queries else 0.0,
+                "avg_queue_ms": round(self.queue_seconds / self.queries * 1000, 2) if self.queries else 0.0
+            }
+
+
+# Lazily constructed singleton
+get_reranker = LazyProvider(Reranker, "reranker")
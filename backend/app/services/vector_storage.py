@@ -0,0 +1,143 @@
+"""Memory-mapped vector matrices in float32 or scalar-quantized (float16, int8) form."""
+from typing import Optional, Tuple, Union
+import numpy as np
+import os
+
+# Storage dtype -> (numpy dtype, file suffix)
+STORAGE_DTYPES = {
+    "float32": (np.float32, "f32"),
+    "float16": (np.float16, "f16"),
+    "int8": (np.int8, "i8"),
+}
+
+
+def quantize_int8(matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Symmetric per-vector int8 quantization.
+    
+    Args:
+        matrix: (n, d) float32 vectors
+        
+    Returns:
+        Tuple of (int8 codes, float32 scale per row); a row is approximately
+        ``codes * scale``
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    scales = np.abs(matrix).max(axis=-1, keepdims=True) / np.float32(127.0)
+    scales = np.where(scales == 0, np.float32(1.0), scales)
+    codes = np.rint(matrix / scales).astype(np.int8)
+    return codes, scales[..., 0]
+
+
+class VectorMatrix:
+    """
+    Fixed-capacity (capacity, dimension) matrix stored in a memory-mapped file.
+    
+    Rows go in and come out as float32; on disk they are float32, float16
+    (half the size) or int8 with a float32 scale per row (a quarter of the size,
+    plus 4 bytes). Quantized rows are decoded on read, and ``scores`` decodes
+    in chunks so a scan never materializes the whole matrix as float32.
+    
+    Files: ``<prefix>.<f32|f16|i8>``, plus ``<prefix>.scale`` for int8.
+    
+    With ``read_only`` the files are mapped read-only at their current size:
+    processes mapping the same files share the page cache copy, and writes
+    raise instead of changing what the other processes see.
+    """
+    
+    SCAN_CHUNK = 16384
+    
+    def __init__(self, prefix: str, dimension: int, capacity: int, dtype: str = "float32", read_only: bool = False):
+        if dtype not in STORAGE_DTYPES:
+            raise ValueError(f"Unknown vector storage dtype: {dtype} (expected one of {', '.join(STORAGE_DTYPES)})")
+        self.prefix = prefix
+        self.dimension = dimension
+        self.capacity = 0
+        self.dtype = dtype
+        self.read_only = read_only
+        self._np_dtype, suffix = STORAGE_DTYPES[dtype]
+        self.path = f"{prefix}.{suffix}"
+        self._scale_path = f"{prefix}.scale" if dtype == "int8" else None
+        self._data: Optional[np.memmap] = None
+        self._scales: Optional[np.memmap] = None
+        self.resize(capacity)
+    
+    @property
+    def bytes_per_row(self) -> int:
+        return self.dimension * np.dtype(self._np_dtype).itemsize + (4 if self._scale_path else 0)
+    
+    @property
+    def files(self) -> Tuple[str, ...]:
+        return (self.path, self._scale_path) if self._scale_path else (self.path,)
+    
+    def resize(self, capacity: int):
+        """Grow (or create) the backing files to hold ``capacity`` rows."""
+        self.flush()
+        self._data = self._scales = None
+        mode = "r" if self.read_only else "r+"
+        if not self.read_only:
+            with open(self.path, "ab") as f:
+                f.truncate(capacity * self.dimension * np.dtype(self._np_dtype).itemsize)
+        self._data = np.memmap(self.path, dtype=self._np_dtype, mode=mode, shape=(capacity, self.dimension))
+        if self._scale_path:
+            if not self.read_only:
+                with open(self._scale_path, "ab") as f:
+                    f.truncate(capacity * 4)
+            self._scales = np.memmap(self._scale_path, dtype=np.float32, mode=mode, shape=(capacity,))
+        self.capacity = capacity
+    
+    def __getitem__(self, rows: Union[int, slice, np.ndarray]) -> np.ndarray:
+        if self._np_dtype is np.float32:
+            return self._data[rows]
+        if self._scales is None:
+            return self._data[rows].astype(np.float32)
+        return self._data[rows].astype(np.float32) * self._scales[rows][..., None]
+    
+    def __setitem__(self, rows: Union[int, slice, np.ndarray], values: np.ndarray):
+        if self._scales is not None:
+            self._data[rows], self._scales[rows] = quantize_int8(values)
+        else:
+            self._data[rows] = values
+    
+    def copy_row(self, src: int, dst: int):
+        """Copy a row's stored form (no decode/re-encode round trip)."""
+        self._data[dst] = self._data[src]
+        if self._scales is not None:
+            self._scales[dst] = self._scales[src]
+    
+    def scores(self, query: np.ndarray, count: int) -> np.ndarray:
+        """Inner product of ``query`` with each of the first ``count`` rows."""
+        if self._np_dtype is np.float32:
+            return self._data[:count] @ query
+        out = np.empty(count, dtype=np.float32)
+        for start in range(0, count, self.SCAN_CHUNK):
+            end = min(start + self.SCAN_CHUNK, count)
+            out[start:end] = self._data[start:end].astype(np.float32) @ query
+        if self._scales is not None:
+            out *= self._scales[:count]
+        return out
+    
+    def scores_rows(self, query: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """Inner product of ``query`` with the given rows, gathered in chunks."""
+        out = np.empty(len(rows), dtype=np.float32)
+        for start in range(0, len(rows), self.SCAN_CHUNK):
+            end = min(start + self.SCAN_CHUNK, len(rows))
+            out[start:end] = self[rows[start:end]] @ query
+        return out
+    
+    def flush(self):
+        if self.read_only:
+            return
+        if self._data is not None:
+            self._data.flush()
+        if self._scales is not None:
+            self._scales.flush()
+    
+    @staticmethod
+    def remove_files(prefix: str):
+        """Delete the files of a matrix stored under ``prefix`` in any dtype."""
+        for _, suffix in STORAGE_DTYPES.values():
+            if os.path.exists(f"{prefix}.{suffix}"):
+                os.remove(f"{prefix}.{suffix}")
+        if os.path.exists(f"{prefix}.scale"):
+            os.remove(f"{prefix}.scale")
@@ -0,0 +1,112 @@
+"""Vector store interface shared by the Pinecone and local backends."""
+from abc import ABC, abstractmethod
+from app.core.config import settings, resolve_data_path
+from app.core.executors import io_executor, run_blocking
+from app.core.providers import LazyProvider
+from app.services.metadata_filter import MetadataFilter
+from typing import List, Dict, Any, Optional
+import numpy as np
+
+
+class VectorStore(ABC):
+    """
+    Minimal interface the API and ingestion depend on.
+    
+    ``query_similar`` returns a Pinecone-shaped result: a mapping with a
+    ``matches`` list of ``{'id', 'score', 'metadata'}`` dicts, best first,
+    where ``score`` is cosine similarity. A ``MetadataFilter`` passed to it
+    restricts matches to vectors whose metadata passes (see
+    app/services/metadata_filter.py), evaluated inside the index.
+    """
+    
+    @abstractmethod
+    def initialize_index(self):
+        """Connect to (or create) the index."""
+    
+    @abstractmethod
+    def upsert_vectors(self, vectors: List[Dict[str, Any]]):
+        """
+        Insert or replace vectors.
+        
+        Args:
+            vectors: List of dicts with 'id', 'values' (float32 array or list
+                of floats), and 'metadata'
+        """
+    
+    @abstractmethod
+    def delete_vectors(self, ids: List[str]):
+        """
+        Delete vectors by ID. Unknown IDs are ignored.
+        
+        Args:
+            ids: IDs of the vectors to delete
+        """
+    
+    @abstractmethod
+    def query_similar(
+        self,
+        query_vector: np.ndarray,
+        top_k: int = 5,
+        metadata_filter: Optional[MetadataFilter] = None
+    ) -> Dict[str, Any]:
+        """
+        Query for similar vectors.
+        
+        Args:
+            query_vector: The embedding vector to search for
+            top_k: Number of results to return
+            metadata_filter: Only return vectors whose metadata passes it
+            
+        Returns:
+            Query results with a 'matches' list
+        """
+    
+    def fetch_vectors(self, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Look up stored vectors by ID (used to score patents found by lexical search).
+        
+        Args:
+            ids: IDs to fetch; unknown IDs are left out
+            
+        Returns:
+            Mapping of ID to ``{'values', 'metadata'}``; empty for backends without lookups
+        """
+        return {}
+    
+    def flush(self):
+        """Persist any state buffered in memory. No-op for backends that write through."""
+    
+    async def query_similar_async(
+        self,
+        query_vector: np.ndarray,
+        top_k: int = 5,
+        metadata_filter: Optional[MetadataFilter] = None
+    ) -> Dict[str, Any]:
+        """
+        Query for similar vectors on the shared I/O pool.
+        
+        Args:
+            query_vector: The embedding vector to search for
+            top_k: Number of results to return
+            metadata_filter: Only return vectors whose metadata passes it
+            
+        Returns:
+            Query results with a 'matches' list
+        """
+        return await run_blocking(io_executor, self.query_similar, query_vector, top_k, metadata_filter)
+
+
+def create_vector_store() -> VectorStore:
+    """Build the backend selected by ``settings.vector_store_backend``."""
+    backend = settings.vector_store_backend.lower()
+    if backend == "pinecone":
+        from app.services.pinecone_svc import get_pinecone_service
+        return get_pinecone_service()
+    if backend == "local":
+        from app.services.local_vector_svc import LocalVectorStore
+        return LocalVectorStore(resolve_data_path(settings.local_index_path), read_only=settings.local_index_read_only)
+    raise ValueError(f"Unknown vector store backend: {settings.vector_store_backend}")
+
+
+# Lazily constructed singleton
+get_vector_store = LazyProvider(create_vector_store, "vector store")
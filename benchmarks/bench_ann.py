@@ -0,0 +1,132 @@
+"""
+Recall vs latency of the IVF-PQ index against exact search.
+
+Generates a clustered synthetic corpus (a Gaussian mixture on the unit
+sphere, which resembles sentence embeddings far better than uniform noise),
+computes exact top-k ground truth, then sweeps nprobe and refine_factor and
+reports recall@k and per-query latency for each setting.
+
+Usage:
+    python benchmarks/bench_ann.py --vectors 1000000 --nlist 4096
+"""
+import argparse
+import itertools
+import os
+import sys
+import time
+
+import numpy as np
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.join(os.path.dirname(script_dir), 'backend')
+sys.path.insert(0, backend_dir)
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q)) * 1000
+
+
+def normalize(matrix):
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+
+def make_corpus(rng, n, dimension, clusters, spread, chunk=100_000):
+    centers = normalize(rng.standard_normal((clusters, dimension), dtype=np.float32))
+    corpus = np.empty((n, dimension), dtype=np.float32)
+    for start in range(0, n, chunk):
+        end = min(start + chunk, n)
+        labels = rng.integers(0, clusters, end - start)
+        noise = rng.standard_normal((end - start, dimension), dtype=np.float32) * spread
+        corpus[start:end] = normalize(centers[labels] + noise)
+    return corpus
+
+
+def exact_top_k(corpus, queries, k, chunk=100_000):
+    best_rows = np.empty((len(queries), 0), dtype=np.int64)
+    best_scores = np.empty((len(queries), 0), dtype=np.float32)
+    for start in range(0, len(corpus), chunk):
+        scores = queries @ corpus[start:start + chunk].T
+        rows = np.broadcast_to(np.arange(start, start + scores.shape[1]), scores.shape)
+        best_scores = np.hstack([best_scores, scores])
+        best_rows = np.hstack([best_rows, rows])
+        keep = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+        best_scores = np.take_along_axis(best_scores, keep, axis=1)
+        best_rows = np.take_along_axis(best_rows, keep, axis=1)
+    return best_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--vectors", type=int, default=1_000_000)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=2000, help="Topics in the synthetic corpus")
+    parser.add_argument("--spread", type=float, default=0.06, help="Per-coordinate noise around each topic")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=None, help="Default: about 4 * sqrt(vectors)")
+    parser.add_argument("--pq-m", type=int, default=48)
+    parser.add_argument("--train-sample", type=int, default=100_000)
+    parser.add_argument("--nprobe", default="1,4,8,16,32,64")
+    parser.add_argument("--refine", default="0,4,16")
+    args = parser.parse_args()
+    
+    from app.services.ann_index import IVFPQIndex
+    
+    rng = np.random.default_rng(0)
+    nlist = args.nlist or int(4 * np.sqrt(args.vectors))
+    
+    start = time.perf_counter()
+    corpus = make_corpus(rng, args.vectors, args.dimension, args.clusters, args.spread)
+    # Queries are perturbed corpus points: near, but not identical to, stored documents
+    seeds = corpus[rng.choice(args.vectors, args.queries, replace=False)]
+    queries = normalize(seeds + rng.standard_normal(seeds.shape, dtype=np.float32) * 0.03)
+    truth = exact_top_k(corpus, queries, args.top_k)
+    print(f"corpus + ground truth: {time.perf_counter() - start:.1f}s")
+    
+    exact_latencies = []
+    for q in queries:
+        t0 = time.perf_counter()
+        scores = corpus @ q
+        np.argpartition(-scores, args.top_k - 1)[:args.top_k]
+        exact_latencies.append(time.perf_counter() - t0)
+    
+    index = IVFPQIndex(args.dimension, nlist=nlist, pq_m=args.pq_m)
+    start = time.perf_counter()
+    sample = corpus[np.sort(rng.choice(args.vectors, min(args.train_sample, args.vectors), replace=False))]
+    index.train(sample)
+    train_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    for offset in range(0, args.vectors, 100_000):
+        end = min(offset + 100_000, args.vectors)
+        index.add(np.arange(offset, end), corpus[offset:end])
+    add_seconds = time.perf_counter() - start
+    
+    code_bytes = args.vectors * (args.pq_m + 8)
+    print("=" * 60)
+    print(f"vectors: {args.vectors:,} x {args.dimension}, nlist={index.nlist}, pq_m={args.pq_m}")
+    print(f"train: {train_seconds:.1f}s   add: {add_seconds:.1f}s   "
+          f"codes+ids: {code_bytes / 2**20:,.0f} MiB (raw float32: {args.vectors * args.dimension * 4 / 2**20:,.0f} MiB)")
+    print(f"exact:  recall@{args.top_k}=1.000  p50={percentile_ms(exact_latencies, 50):7.2f} ms  "
+          f"p99={percentile_ms(exact_latencies, 99):7.2f} ms")
+    print("-" * 60)
+    print(f"{'nprobe':>6} {'refine':>6} {'recall@' + str(args.top_k):>10} {'p50 ms':>8} {'p99 ms':>8} {'QPS':>8}")
+    
+    for nprobe, refine in itertools.product(
+        [int(x) for x in args.nprobe.split(",")], [int(x) for x in args.refine.split(",")]
+    ):
+        if not args.pq_m and refine:
+            continue
+        hits, latencies = 0, []
+        for q, expected in zip(queries, truth):
+            t0 = time.perf_counter()
+            rows, _ = index.search(q, args.top_k, nprobe=nprobe, vectors=corpus, refine_factor=refine)
+            latencies.append(time.perf_counter() - t0)
+            hits += len(np.intersect1d(rows, expected))
+        recall = hits / (len(queries) * args.top_k)
+        print(f"{nprobe:>6} {refine:>6} {recall:>10.3f} {percentile_ms(latencies, 50):>8.2f} "
+              f"{percentile_ms(latencies, 99):>8.2f} {len(latencies) / sum(latencies):>8,.0f}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Portfolio screening: N sequential /api/analyze calls vs. one /api/analyze/batch job.
+
+Serves the API with uvicorn on a local port against stub backends and
+measures, for the same N distinct ideas, the total time of N sequential
+/api/analyze calls, and for the batch endpoint the time to the first item
+event and to the done event. Then it resumes the finished job's stream
+from the middle and polls it, to check that every item can be recovered.
+
+Usage:
+    python benchmarks/bench_batch_analysis.py --ideas 100 --llm-latency 0.5 --llm-concurrency 8
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.join(os.path.dirname(script_dir), 'backend')
+sys.path.insert(0, backend_dir)
+
+import stubs  # noqa: E402
+
+
+async def read_events(response):
+    """Yield (event, data) pairs from a server-sent event stream."""
+    event = None
+    async for line in response.aiter_lines():
+        if line.startswith("event: "):
+            event = line[len("event: "):]
+        elif line.startswith("data: "):
+            yield event, json.loads(line[len("data: "):])
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--ideas", type=int, default=100)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--llm-concurrency", type=int, default=8)
+    parser.add_argument("--pinecone-latency", type=float, default=0.03)
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+    
+    stubs.install(pinecone_latency=args.pinecone_latency, llm_latency=args.llm_latency)
+    
+    from fastapi import FastAPI
+    from app.api.routes import router
+    from app.core.config import settings
+    from app.services.batch_analysis import BatchAnalyzer, get_batch_analyzer
+    settings.analysis_cache_enabled = False
+    get_batch_analyzer.override(BatchAnalyzer(llm_concurrency=args.llm_concurrency))
+    
+    app = FastAPI()
+    app.include_router(router, prefix="/api")
+    ideas = [f"Invention disclosure number {i}: a self-cleaning widget variant {i}" for i in range(args.ideas)]
+    
+    import httpx
+    import uvicorn
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=args.port, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=None) as client:
+        start = time.perf_counter()
+        for idea in ideas:
+            response = await client.post("/api/analyze", json={"invention_idea": idea})
+            assert response.status_code == 200, response.text
+        sequential_total = time.perf_counter() - start
+        
+        first_item = job_id = None
+        items = 0
+        start = time.perf_counter()
+        async with client.stream("POST", "/api/analyze/batch", json={"invention_ideas": ideas}) as response:
+            assert response.status_code == 200
+            async for event, data in read_events(response):
+                if event == "job":
+                    job_id = data["job_id"]
+                elif event == "item":
+                    items += 1
+                    if first_item is None:
+                        first_item = time.perf_counter() - start
+        batch_total = time.perf_counter() - start
+        
+        resumed = 0
+        async with client.stream("GET", f"/api/analyze/batch/{job_id}/stream", params={"after": args.ideas // 2}) as response:
+            async for event, _ in read_events(response):
+                resumed += event == "item"
+        polled = (await client.get(f"/api/analyze/batch/{job_id}")).json()
+    
+    server.should_exit = True
+    await serving
+    
+    print("=" * 60)
+    print(f"{args.ideas} ideas, LLM latency {args.llm_latency}s, batch LLM concurrency {args.llm_concurrency}")
+    print(f"sequential /api/analyze:   {sequential_total:8.2f} s total")
+    print(f"/api/analyze/batch:        {batch_total:8.2f} s total, first item after {first_item * 1000:.0f} ms "
+          f"({items} items, {args.ideas / batch_total:.1f} ideas/s)")
+    print(f"resume after {args.ideas // 2}:        {resumed} items replayed; poll: "
+          f"{polled['status']}, {polled['completed']}/{polled['total']} completed, {polled['failed']} failed")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
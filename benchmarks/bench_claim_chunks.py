@@ -0,0 +1,135 @@
+"""
+Memory per patent and query latency of claims-level chunk indexing.
+
+Builds two local vector indexes over the same synthetic patents: one vector
+per patent (title + abstract) and one with up to --claim-chunks claim
+vectors per patent on top, written through the same record builders as
+ingestion. Vectors are random (claim vectors near their patent's), so no
+model is needed. Reports vectors, vector bytes and metadata bytes per
+patent, then times a plain top-k patent query against a chunk query
+aggregated back to patents (ClaimChunkRetriever), for the /analyze top-5
+and the hybrid candidate list, against the configured latency budget.
+
+Usage:
+    python benchmarks/bench_claim_chunks.py --patents 50000 --claim-chunks 10
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.join(os.path.dirname(script_dir), 'backend')
+sys.path.insert(0, backend_dir)
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q)) * 1000
+
+
+def synthetic_patent(rng, i: int, claims: int):
+    words = ["sensor", "housing", "controller", "signal", "module", "layer", "circuit", "valve", "battery", "antenna"]
+    return {
+        "publication_number": f"US-{i:09d}-A1",
+        "title": f"Apparatus {i} with {rng.choice(words)} and {rng.choice(words)}",
+        "abstract": " ".join(rng.choice(words, size=120)),
+        "claims": " ".join(
+            f"{n}. {'A device comprising' if n == 1 else 'The device of claim 1, wherein'} "
+            + " ".join(rng.choice(words, size=int(rng.integers(30, 60)))) + "."
+            for n in range(1, claims + 1)
+        ),
+        "publication_date": "2023-01-01"
+    }
+
+
+def metadata_bytes(path: str) -> int:
+    """Size of the SQLite metadata table of a local index directory."""
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path) if name.startswith("items.sqlite"))
+
+
+def build(path, patents, max_chunks, dimension, rng, batch_size=2000):
+    from app.services.claim_chunks import chunk_to_vector, claim_chunks
+    from app.services.ingestion import patent_to_vector
+    from app.services.local_vector_svc import LocalVectorStore
+    
+    store = LocalVectorStore(path, dimension=dimension)
+    store.initialize_index()
+    for offset in range(0, len(patents), batch_size):
+        records = []
+        for patent in patents[offset:offset + batch_size]:
+            base = rng.standard_normal(dimension).astype(np.float32)
+            records.append(patent_to_vector(patent, base))
+            for chunk in claim_chunks(patent, max_chunks):
+                records.append(chunk_to_vector(patent, chunk, base + rng.standard_normal(dimension).astype(np.float32)))
+        store.upsert_vectors(records)
+    store.flush()
+    return store
+
+
+def time_queries(fn, queries):
+    latencies = []
+    for q in queries:
+        t0 = time.perf_counter()
+        fn(q)
+        latencies.append(time.perf_counter() - t0)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--patents", type=int, default=50_000)
+    parser.add_argument("--claims", type=int, default=20, help="Claims per synthetic patent")
+    parser.add_argument("--claim-chunks", type=int, default=10, help="Claim chunks embedded per patent")
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=100)
+    args = parser.parse_args()
+    
+    from app.core.config import settings
+    from app.services.claim_chunks import ClaimChunkRetriever
+    
+    rng = np.random.default_rng(0)
+    patents = [synthetic_patent(rng, i, args.claims) for i in range(args.patents)]
+    root = tempfile.mkdtemp(prefix="patentguard-chunks-")
+    try:
+        print("=" * 60)
+        print(f"{args.patents:,} patents, {args.claims} claims each, {args.dimension}-d {settings.local_index_dtype} vectors")
+        stores = {}
+        for label, max_chunks in (("patent vectors only", 0), (f"+ up to {args.claim_chunks} claim chunks", args.claim_chunks)):
+            path = os.path.join(root, f"chunks-{max_chunks}")
+            start = time.perf_counter()
+            stores[max_chunks] = store = build(path, patents, max_chunks, args.dimension, rng)
+            vector_bytes = store.count * store._vectors.bytes_per_row  # rows in use, not preallocated capacity
+            print(f"{label}:")
+            print(f"  vectors: {store.count:,} ({store.count / args.patents:.1f} per patent), "
+                  f"built in {time.perf_counter() - start:.1f} s")
+            print(f"  per patent: {vector_bytes / args.patents / 1024:.1f} KiB vectors (scanned per query) + "
+                  f"{metadata_bytes(path) / args.patents / 1024:.1f} KiB metadata (SQLite, read for hits only)")
+        
+        queries = rng.standard_normal((args.queries, args.dimension)).astype(np.float32)
+        plain = stores[0]
+        chunked = stores[args.claim_chunks]
+        retriever = ClaimChunkRetriever()
+        print(f"query latency (budget {retriever.budget_ms:.0f} ms for the chunk query):")
+        for top_k in (5, settings.hybrid_candidates):
+            plain.query_similar(queries[0], top_k=top_k)
+            retriever.query(chunked, queries[0], top_k)
+            runs = (
+                ("patent vectors", time_queries(lambda q: plain.query_similar(q, top_k=top_k), queries)),
+                ("claim chunks", time_queries(lambda q: retriever.query(chunked, q, top_k), queries)),
+            )
+            for name, latencies in runs:
+                print(f"  top-{top_k:<3} {name:<15} p50={percentile_ms(latencies, 50):7.1f} ms  "
+                      f"p95={percentile_ms(latencies, 95):7.1f} ms")
+        stats = retriever.stats()
+        print(f"  chunk queries over budget: {stats['over_budget']}/{stats['queries']}")
+        print("=" * 60)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
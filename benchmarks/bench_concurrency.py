@@ -0,0 +1,106 @@
+"""
+Concurrent throughput of /api/analyze, blocking vs. async execution path.
+
+Runs the API in-process against stub backends (see stubs.py) and fires
+N concurrent analyze requests while probing /api/health. The "blocking"
+route reproduces the old handler, which called the services synchronously
+from inside the async endpoint; the "async" route is the real one.
+
+Usage:
+    python benchmarks/bench_concurrency.py --requests 32 --llm-latency 0.3
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.join(os.path.dirname(script_dir), 'backend')
+sys.path.insert(0, backend_dir)
+
+import stubs  # noqa: E402
+
+
+def build_app(embedding, pinecone, llm):
+    """Create the API app plus a legacy blocking copy of the analyze route."""
+    from fastapi import FastAPI
+    from app.api.routes import router, AnalyzeRequest
+    
+    app = FastAPI()
+    app.include_router(router, prefix="/api")
+    
+    @app.post("/legacy/analyze")
+    async def analyze_blocking(request: AnalyzeRequest):
+        query_embedding = embedding.generate_embedding(request.invention_idea)
+        results = pinecone.query_similar(query_embedding, top_k=5)
+        retrieved = [
+            {'id': m['id'], 'score': m['score'], 'metadata': m.get('metadata', {})}
+            for m in results['matches']
+        ]
+        return llm.analyze_patents(request.invention_idea, retrieved)
+    
+    return app
+
+
+async def run_load(client, path: str, num_requests: int):
+    """Fire num_requests concurrent analyze calls while probing /api/health."""
+    payload = {"invention_idea": "A smart water bottle that tracks hydration levels"}
+    health_latencies = []
+    done = asyncio.Event()
+    
+    async def probe_health():
+        while not done.is_set():
+            start = time.perf_counter()
+            await client.get("/api/health")
+            health_latencies.append(time.perf_counter() - start)
+            await asyncio.sleep(0.01)
+    
+    prober = asyncio.create_task(probe_health())
+    start = time.perf_counter()
+    responses = await asyncio.gather(*[
+        client.post(path, json=payload) for _ in range(num_requests)
+    ])
+    elapsed = time.perf_counter() - start
+    done.set()
+    await prober
+    
+    failures = sum(1 for r in responses if r.status_code != 200)
+    return elapsed, failures, health_latencies
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--embedding-latency", type=float, default=0.005)
+    parser.add_argument("--pinecone-latency", type=float, default=0.03)
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    args = parser.parse_args()
+    
+    embedding, pinecone, llm = stubs.install(
+        args.embedding_latency, args.pinecone_latency, args.llm_latency
+    )
+    app = build_app(embedding, pinecone, llm)
+    
+    # Every request sends the same text; measure the pipeline, not the cache
+    from app.core.config import settings
+    settings.analysis_cache_enabled = False
+    
+    import httpx
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        print("=" * 60)
+        print(f"Concurrent /analyze requests: {args.requests}")
+        print("=" * 60)
+        for label, path in (("blocking", "/legacy/analyze"), ("async", "/api/analyze")):
+            elapsed, failures, health = await run_load(client, path, args.requests)
+            worst_health = max(health) * 1000 if health else float("nan")
+            median_health = statistics.median(health) * 1000 if health else float("nan")
+            print(f"{label:>9}: {elapsed:7.2f}s total  {args.requests / elapsed:7.1f} req/s  "
+                  f"failures={failures}  health p50={median_health:.1f}ms max={worst_health:.1f}ms "
+                  f"(probes={len(health)})")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
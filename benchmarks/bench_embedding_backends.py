@@ -0,0 +1,103 @@
+"""
+Latency, throughput and accuracy of each embedding inference backend.
+
+For every backend (torch, torch-int8, onnx, onnx-int8) this loads the model
+the way the API does, then measures:
+- load time (ONNX backends export once on first use; run twice to see the
+  steady-state load)
+- single-query latency, as in /api/analyze (one short invention idea)
+- batch throughput, as in ingestion (patent title + abstract, batches of 64)
+- cosine agreement with the full-precision reference on the same texts, and
+  how often the top-10 neighbours of each text within the corpus match
+
+Needs sentence-transformers, plus onnxruntime for the ONNX backends.
+
+Usage:
+    python benchmarks/bench_embedding_backends.py --backends torch,torch-int8,onnx,onnx-int8
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.join(os.path.dirname(script_dir), 'backend')
+sys.path.insert(0, backend_dir)
+
+from bench_embedding_workers import synthetic_patents  # noqa: E402
+
+IDEA = ("A smart flower pot that waters itself using a soil moisture sensor and "
+        "notifies a mobile app over Bluetooth when the reservoir is empty.")
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q)) * 1000
+
+
+def normalize(matrix):
+    return matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+
+def neighbour_overlap(candidate, reference, k=10):
+    """Mean overlap of each text's top-k neighbours (within the corpus) under both models."""
+    cand_top = np.argsort(-(candidate @ candidate.T), axis=1)[:, 1:k + 1]
+    ref_top = np.argsort(-(reference @ reference.T), axis=1)[:, 1:k + 1]
+    return float(np.mean([len(np.intersect1d(c, r)) / k for c, r in zip(cand_top, ref_top)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--backends", default="torch,torch-int8,onnx,onnx-int8")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--patents", type=int, default=2048)
+    parser.add_argument("--batch-size", type=int, default=64)
+    args = parser.parse_args()
+    
+    from app.services.embedding_backends import load_embedding_model
+    
+    texts = synthetic_patents(args.patents)
+    reference_vectors = None
+    
+    print("=" * 60)
+    print(f"{os.cpu_count()} CPUs, {args.queries} single queries, {args.patents} patents in batches of {args.batch_size}")
+    print("-" * 60)
+    print(f"{'backend':<11} {'load s':>7} {'q p50 ms':>9} {'q p95 ms':>9} {'batch/s':>9} "
+          f"{'cos mean':>9} {'cos min':>8} {'top10':>6}")
+    
+    for backend in args.backends.split(","):
+        start = time.perf_counter()
+        model = load_embedding_model(backend)
+        load_seconds = time.perf_counter() - start
+        model.encode(IDEA, convert_to_tensor=False)
+        
+        latencies = []
+        for _ in range(args.queries):
+            t0 = time.perf_counter()
+            model.encode(IDEA, convert_to_tensor=False)
+            latencies.append(time.perf_counter() - t0)
+        
+        start = time.perf_counter()
+        vectors = np.asarray(model.encode(texts, batch_size=args.batch_size, convert_to_tensor=False), dtype=np.float32)
+        throughput = len(texts) / (time.perf_counter() - start)
+        vectors = normalize(vectors)
+        
+        if reference_vectors is None:
+            if backend != "torch":
+                reference_vectors = normalize(np.asarray(
+                    load_embedding_model("torch").encode(texts, batch_size=args.batch_size), dtype=np.float32
+                ))
+            else:
+                reference_vectors = vectors
+        cosines = (vectors * reference_vectors).sum(axis=1)
+        overlap = neighbour_overlap(vectors, reference_vectors)
+        
+        print(f"{backend:<11} {load_seconds:>7.1f} {percentile_ms(latencies, 50):>9.2f} "
+              f"{percentile_ms(latencies, 95):>9.2f} {throughput:>9.1f} {cosines.mean():>9.4f} "
+              f"{cosines.min():>8.4f} {overlap:>6.3f}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
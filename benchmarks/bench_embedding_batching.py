@@ -0,0 +1,62 @@
+"""
+Embedding throughput with and without request micro-batching.
+
+Fires N concurrent single-text embed calls at the EmbeddingBatcher against a
+stub model whose encode cost is a fixed per-call overhead plus a small
+per-text cost (see stubs.py), first with batching disabled and then enabled.
+
+Usage:
+    python benchmarks/bench_embedding_batching.py --requests 256 --window-ms 5
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.join(os.path.dirname(script_dir), 'backend')
+sys.path.insert(0, backend_dir)
+
+import stubs  # noqa: E402
+
+
+async def run(batcher, num_requests: int) -> float:
+    """Return wall time for num_requests concurrent embed calls."""
+    start = time.perf_counter()
+    await asyncio.gather(*[batcher.embed(f"invention idea {i}") for i in range(num_requests)])
+    return time.perf_counter() - start
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--requests", type=int, default=256)
+    parser.add_argument("--window-ms", type=float, default=5.0)
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--call-overhead", type=float, default=0.01)
+    parser.add_argument("--per-item", type=float, default=0.0005)
+    args = parser.parse_args()
+    
+    embedding, _, _ = stubs.install(embedding_latency=args.call_overhead)
+    embedding.per_item = args.per_item
+    
+    from app.core.config import settings
+    from app.services.embedding_batcher import EmbeddingBatcher
+    
+    print("=" * 60)
+    print(f"Concurrent embed calls: {args.requests}")
+    print("=" * 60)
+    for enabled in (False, True):
+        settings.embedding_batching_enabled = enabled
+        batcher = EmbeddingBatcher(
+            service=embedding,
+            batch_window_ms=args.window_ms,
+            max_batch_size=args.max_batch_size
+        )
+        elapsed = await run(batcher, args.requests)
+        label = "batched" if enabled else "unbatched"
+        print(f"{label:>10}: {elapsed:6.2f}s  {args.requests / elapsed:8.1f} embeds/s  {batcher.stats()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
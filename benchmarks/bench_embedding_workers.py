@@ -0,0 +1,109 @@
+"""
+Ingestion embedding throughput with 1..N worker processes.
+
+Embeds a fixed set of synthetic patent texts through EmbeddingProcessPool
+with an increasing number of workers and reports patents/sec and speedup
+over one worker, plus the in-process baseline (one model, all threads).
+Batches are dispatched from as many threads as there are workers, the same
+way the ingestion pipeline drives the pool.
+
+Uses the real SentenceTransformer model by default (CPU only). --fake swaps
+in a CPU-bound stand-in so the scaling can be measured without the model.
+
+Usage:
+    python benchmarks/bench_embedding_workers.py --max-workers 8 --patents 4096
+"""
+import argparse
+import functools
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.join(os.path.dirname(script_dir), 'backend')
+sys.path.insert(0, backend_dir)
+
+import stubs  # noqa: E402
+
+WORDS = ("sensor wireless battery housing signal module controller circuit device "
+         "method portable optical layer substrate valve fluid display network").split()
+
+
+def synthetic_patents(n):
+    texts = []
+    for i in range(n):
+        words = [WORDS[(i * 7 + j * 3) % len(WORDS)] for j in range(60 + i % 80)]
+        texts.append(f"Patent {i}: " + " ".join(words))
+    return texts
+
+
+def run_pool(texts, workers, threads, batch_size, encode_batch_size, model_factory):
+    from app.services.embedding_pool import EmbeddingProcessPool
+    
+    start = time.perf_counter()
+    with EmbeddingProcessPool(
+        workers=workers,
+        threads_per_worker=threads,
+        encode_batch_size=encode_batch_size,
+        model_factory=model_factory
+    ) as pool:
+        startup = time.perf_counter() - start
+        batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as dispatch:
+            results = list(dispatch.map(pool.generate_embeddings, batches))
+        elapsed = time.perf_counter() - start
+    assert sum(len(r) for r in results) == len(texts)
+    return startup, elapsed
+
+
+def run_in_process(texts, batch_size, encode_batch_size, model_factory):
+    model = model_factory()
+    model.encode(["warmup"], batch_size=1, convert_to_numpy=True)
+    start = time.perf_counter()
+    for i in range(0, len(texts), batch_size):
+        model.encode(texts[i:i + batch_size], batch_size=encode_batch_size, convert_to_numpy=True)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--patents", type=int, default=4096)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count())
+    parser.add_argument("--threads-per-worker", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=256, help="Texts per pool request")
+    parser.add_argument("--encode-batch-size", type=int, default=64, help="Texts per model forward pass")
+    parser.add_argument("--fake", action="store_true", help="Use a CPU-bound stand-in instead of the model")
+    args = parser.parse_args()
+    
+    if args.fake:
+        model_factory = functools.partial(stubs.CPUBoundEncoder)
+    else:
+        from app.services.embedding_backends import load_embedding_model
+        model_factory = load_embedding_model
+    
+    texts = synthetic_patents(args.patents)
+    
+    print("=" * 60)
+    print(f"{args.patents} patents, {os.cpu_count()} CPUs, model: {'fake' if args.fake else 'SentenceTransformer'}")
+    baseline = run_in_process(texts, args.batch_size, args.encode_batch_size, model_factory)
+    print(f"in-process (default threads): {args.patents / baseline:8.1f} patents/s")
+    print("-" * 60)
+    print(f"{'workers':>7} {'startup s':>10} {'patents/s':>10} {'speedup':>8}")
+    
+    single = None
+    workers = 1
+    while workers <= args.max_workers:
+        startup, elapsed = run_pool(
+            texts, workers, args.threads_per_worker, args.batch_size, args.encode_batch_size, model_factory
+        )
+        rate = args.patents / elapsed
+        single = single or rate
+        print(f"{workers:>7} {startup:>10.1f} {rate:>10.1f} {rate / single:>7.2f}x")
+        workers *= 2
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
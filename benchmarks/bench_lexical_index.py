@@ -0,0 +1,124 @@
+"""
+Build size and query latency of the BM25 lexical index on a synthetic corpus.
+
+Generates N documents of 50-80 words drawn from a Zipf-distributed
+vocabulary (like real text: a few very common terms, a long tail of rare
+ones), indexes them through LexicalIndex.add_documents in a temporary
+directory, then times top-k queries with MaxScore pruning against
+exhaustive scoring of every posting, and checks both return the same
+documents. Short queries are a few keywords; long ones are the size of an
+invention description after stopword removal. No network services are used.
+
+Usage:
+    python benchmarks/bench_lexical_index.py --docs 1000000 --queries 200
+    python benchmarks/bench_lexical_index.py --docs 1000000 --optimize
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.join(os.path.dirname(script_dir), 'backend')
+sys.path.insert(0, backend_dir)
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q)) * 1000
+
+
+def zipf_terms(rng, vocabulary: int, size: int, exponent: float) -> np.ndarray:
+    """Term ids with P(rank r) proportional to 1 / r**exponent."""
+    weights = 1.0 / np.arange(1, vocabulary + 1) ** exponent
+    return rng.choice(vocabulary, size=size, p=weights / weights.sum())
+
+
+def time_queries(index, queries, top_k, prune):
+    results, latencies = [], []
+    for query in queries:
+        t0 = time.perf_counter()
+        results.append(index.search(query, top_k, prune=prune))
+        latencies.append(time.perf_counter() - t0)
+    return results, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--docs", type=int, default=1_000_000)
+    parser.add_argument("--vocabulary", type=int, default=200_000)
+    parser.add_argument("--zipf", type=float, default=1.05)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=50)
+    parser.add_argument("--optimize", action="store_true", help="Merge into one segment before querying")
+    parser.add_argument("--keep", help="Build the index in this directory and keep it")
+    args = parser.parse_args()
+    
+    from app.services.lexical_index import LexicalIndex
+    
+    path = args.keep or tempfile.mkdtemp(prefix="patentguard-lexical-")
+    rng = np.random.default_rng(0)
+    index = LexicalIndex(path)
+    
+    start = time.perf_counter()
+    for offset in range(0, args.docs, args.batch_size):
+        n = min(args.batch_size, args.docs - offset)
+        lengths = rng.integers(50, 81, size=n)
+        words = zipf_terms(rng, args.vocabulary, int(lengths.sum()), args.zipf)
+        bounds = np.r_[0, np.cumsum(lengths)]
+        index.add_documents([
+            {
+                "publication_number": f"US-{offset + i:09d}",
+                "title": "",
+                "abstract": " ".join(f"w{w}" for w in words[bounds[i]:bounds[i + 1]]),
+                "claims": ""
+            }
+            for i in range(n)
+        ])
+    index.flush()
+    build_seconds = time.perf_counter() - start
+    if args.optimize:
+        t0 = time.perf_counter()
+        index.optimize()
+        optimize_seconds = time.perf_counter() - t0
+    index.close()
+    
+    # Query from a fresh reader, as the API does
+    reader = LexicalIndex(path)
+    stats = reader.stats()
+    
+    def make_queries(terms):
+        return [" ".join(f"w{w}" for w in zipf_terms(rng, args.vocabulary, terms, args.zipf)) for _ in range(args.queries)]
+    
+    print("=" * 60)
+    print(f"documents: {stats['documents']:,}  segments: {stats['segments']}  postings: {stats['postings']:,}")
+    print(f"index size: {stats['bytes'] / 2**20:,.0f} MiB  ({stats['bytes'] / stats['postings']:.2f} bytes/posting)")
+    print(f"build: {build_seconds:8.1f} s  ({args.docs / build_seconds:,.0f} docs/s)")
+    if args.optimize:
+        print(f"optimize (merge to one segment): {optimize_seconds:.1f} s")
+    for label, terms in (("short (4 terms)", 4), ("long (32 terms)", 32)):
+        queries = make_queries(terms)
+        reader.search(queries[0], args.top_k)  # fault pages in
+        pruned, pruned_latencies = time_queries(reader, queries, args.top_k, prune=True)
+        exhaustive, exhaustive_latencies = time_queries(reader, queries, args.top_k, prune=False)
+        exact = sum(
+            len(a) == len(b) and np.allclose([s for _, s in a], [s for _, s in b], rtol=1e-4)
+            for a, b in zip(pruned, exhaustive)
+        )
+        print(f"{label}, top-{args.top_k}:")
+        for name, latencies in (("MaxScore", pruned_latencies), ("exhaustive", exhaustive_latencies)):
+            print(f"  {name:<11} p50={percentile_ms(latencies, 50):8.2f} ms  p95={percentile_ms(latencies, 95):8.2f} ms  "
+                  f"({len(latencies) / sum(latencies):,.0f} QPS)")
+        print(f"  same top-{args.top_k} scores: {exact}/{len(queries)}")
+    print("=" * 60)
+    
+    if not args.keep:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Burst of LLM calls against a rate-limited, flaky fake Groq server.
+
+Starts benchmarks/fake_llm_server.py on a local port with a requests-per-
+minute quota and injected 5xx errors, then sends a burst of concurrent
+analyze_patents_async calls through LLMService twice: with a bare transport
+(no rate limiter, no retries, as before) and with the resilient one (token
+bucket matched to the quota, jittered backoff, deadline). Reports successes,
+failures and latency percentiles for each, then takes the server down to
+show the circuit breaker failing calls fast.
+
+Usage:
+    python benchmarks/bench_llm_transport.py --burst 80 --rpm 60 --error-rate 0.1
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.join(os.path.dirname(script_dir), 'backend')
+sys.path.insert(0, backend_dir)
+sys.path.insert(0, script_dir)
+
+import numpy as np  # noqa: E402
+
+PATENTS = [
+    {
+        "id": f"US-STUB-{i:04d}-A1",
+        "score": 0.9 - i * 0.05,
+        "metadata": {
+            "publication_number": f"US-STUB-{i:04d}-A1",
+            "title": f"Stub patent {i}",
+            "abstract": "A stub abstract used for load testing."
+        }
+    }
+    for i in range(5)
+]
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q)) * 1000 if samples else float("nan")
+
+
+async def burst(service, count: int):
+    """Fire ``count`` concurrent analyses; return (latencies of successes, error type counts)."""
+    from app.services.llm_transport import LLMUnavailableError
+    
+    async def one(i):
+        start = time.perf_counter()
+        try:
+            await service.analyze_patents_async(f"A smart water bottle, variant {i}", PATENTS)
+            return time.perf_counter() - start, None
+        except LLMUnavailableError:
+            return time.perf_counter() - start, "unavailable (503)"
+        except Exception as e:
+            return time.perf_counter() - start, f"{type(e).__name__} (500)"
+    
+    results = await asyncio.gather(*[one(i) for i in range(count)])
+    latencies = [seconds for seconds, error in results if error is None]
+    errors = {}
+    for seconds, error in results:
+        if error is not None:
+            errors[error] = errors.get(error, 0) + 1
+    return latencies, errors, max(seconds for seconds, _ in results)
+
+
+def report(name, latencies, errors, wall, server_stats):
+    print(f"{name}")
+    print(f"  succeeded:       {len(latencies)}")
+    for error, count in sorted(errors.items()):
+        print(f"  {error + ':':<17}{count}")
+    print(f"  p50 / p95:       {percentile_ms(latencies, 50):8.0f} / {percentile_ms(latencies, 95):8.0f} ms")
+    print(f"  burst wall time: {wall:8.1f} s")
+    print(f"  server saw:      {server_stats['requests']} requests, {server_stats['rate_limited']} x 429, "
+          f"{server_stats['errors']} x 5xx")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--burst", type=int, default=80)
+    parser.add_argument("--rpm", type=int, default=60, help="Fake server quota")
+    parser.add_argument("--error-rate", type=float, default=0.1)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--deadline", type=float, default=60.0)
+    parser.add_argument("--port", type=int, default=8091)
+    args = parser.parse_args()
+    
+    import httpx
+    import uvicorn
+    from fake_llm_server import create_app
+    from app.services.llm_svc import LLMService
+    from app.services.llm_transport import LLMTransport
+    
+    base_url = f"http://127.0.0.1:{args.port}"
+    
+    async def serve():
+        server = uvicorn.Server(uvicorn.Config(
+            create_app(latency=args.latency, error_rate=args.error_rate, rpm=args.rpm),
+            host="127.0.0.1", port=args.port, log_level="warning"
+        ))
+        task = asyncio.create_task(server.serve())
+        while not server.started:
+            await asyncio.sleep(0.01)
+        return server, task
+    
+    async def server_stats():
+        async with httpx.AsyncClient(base_url=base_url) as client:
+            return (await client.get("/admin/stats")).json()
+    
+    print("=" * 60)
+    server, task = await serve()
+    bare = LLMService(LLMTransport(
+        api_key="fake", base_url=base_url, requests_per_minute=0, tokens_per_minute=0,
+        max_retries=0, deadline=args.deadline, breaker_failures=10 ** 9
+    ))
+    latencies, errors, wall = await burst(bare, args.burst)
+    report("Bare transport (no limiter, no retries)", latencies, errors, wall, await server_stats())
+    server.should_exit = True
+    await task
+    
+    # Fresh server, so the quota window starts over
+    server, task = await serve()
+    resilient = LLMService(LLMTransport(
+        api_key="fake", base_url=base_url, requests_per_minute=args.rpm, tokens_per_minute=0,
+        deadline=args.deadline
+    ))
+    latencies, errors, wall = await burst(resilient, args.burst)
+    report("Resilient transport (token bucket, backoff, deadline)", latencies, errors, wall, await server_stats())
+    print(f"  transport:       {resilient.transport.stats()}")
+    
+    # Provider outage: the breaker opens and later calls fail without waiting
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        await client.post("/admin/down", params={"down": True})
+    outage = LLMService(LLMTransport(
+        api_key="fake", base_url=base_url, requests_per_minute=0, tokens_per_minute=0,
+        deadline=args.deadline, breaker_failures=5, backoff_base=0.05
+    ))
+    latencies, errors, wall = await burst(outage, 20)
+    print("Provider down (20 calls)")
+    for error, count in sorted(errors.items()):
+        print(f"  {error + ':':<17}{count}")
+    print(f"  all failed in:   {wall:8.2f} s")
+    print(f"  transport:       {outage.transport.stats()}")
+    server.should_exit = True
+    await task
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,80 @@
+"""
+Build and query latency of the local memory-mapped vector index.
+
+Generates N random unit vectors (384-d by default), upserts them into a
+LocalVectorStore in a temporary directory, then times exact top-k queries.
+No network services are used.
+
+Usage:
+    python benchmarks/bench_local_index.py --vectors 1000000 --queries 200
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.join(os.path.dirname(script_dir), 'backend')
+sys.path.insert(0, backend_dir)
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--vectors", type=int, default=1_000_000)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--keep", help="Build the index in this directory and keep it")
+    args = parser.parse_args()
+    
+    from app.services.local_vector_svc import LocalVectorStore
+    
+    path = args.keep or tempfile.mkdtemp(prefix="patentguard-index-")
+    rng = np.random.default_rng(0)
+    store = LocalVectorStore(path, dimension=args.dimension)
+    store.initialize_index()
+    
+    start = time.perf_counter()
+    for offset in range(0, args.vectors, args.batch_size):
+        n = min(args.batch_size, args.vectors - offset)
+        block = rng.standard_normal((n, args.dimension), dtype=np.float32)
+        store.upsert_vectors([
+            {'id': f"US-{offset + i:09d}", 'values': block[i], 'metadata': {'publication_number': f"US-{offset + i:09d}"}}
+            for i in range(n)
+        ])
+    build_seconds = time.perf_counter() - start
+    
+    queries = rng.standard_normal((args.queries, args.dimension), dtype=np.float32)
+    store.query_similar(queries[0], top_k=args.top_k)  # fault pages in
+    latencies = []
+    for q in queries:
+        t0 = time.perf_counter()
+        store.query_similar(q, top_k=args.top_k)
+        latencies.append(time.perf_counter() - t0)
+    
+    probe = store.query_similar(store._vectors[123], top_k=1)["matches"][0]["id"]
+    
+    print("=" * 60)
+    print(f"vectors: {store.count:,} x {args.dimension}  ({store.count * args.dimension * 4 / 2**20:,.0f} MiB)")
+    print(f"build:   {build_seconds:8.2f} s  ({store.count / build_seconds:,.0f} vectors/s)")
+    print(f"query top-{args.top_k}: p50={percentile_ms(latencies, 50):.2f} ms  "
+          f"p95={percentile_ms(latencies, 95):.2f} ms  p99={percentile_ms(latencies, 99):.2f} ms  "
+          f"({len(latencies) / sum(latencies):,.0f} QPS)")
+    print(f"self-lookup sanity check: {'ok' if probe == 'US-000000123' else 'FAILED: ' + probe}")
+    print("=" * 60)
+    
+    if not args.keep:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Filtered top-k latency of the local vector store at different selectivities.
+
+Builds a local index of synthetic patents (random vectors; publication
+dates spread over 20 years, Zipf-distributed CPC subclasses and assignees)
+through the ingestion record builder, so every vector carries the filter
+fields. For filters ranging from "nearly everything" to "a few hundred
+patents" it reports the fraction of rows passing, the time to evaluate the
+filter bitmap, and top-k latency with the filter pushed down, next to the
+post-filter alternative (unfiltered top-N, then drop non-matching hits) and
+how many of the k results that alternative actually returns. Recall is
+measured against exact filtered scoring (random vectors have no cluster
+structure, so this is a worst case for IVF-PQ). No network services are
+used.
+
+Usage:
+    python benchmarks/bench_metadata_filter.py --patents 200000
+    python benchmarks/bench_metadata_filter.py --patents 200000 --ann
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.join(os.path.dirname(script_dir), 'backend')
+sys.path.insert(0, backend_dir)
+
+SECTIONS = "ABCDEFGH"
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q)) * 1000
+
+
+def zipf_choice(rng, n: int, size: int, exponent: float = 1.1) -> np.ndarray:
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return rng.choice(n, size=size, p=weights / weights.sum())
+
+
+def synthetic_patents(rng, count: int, subclasses: int, assignees: int):
+    """Patents with 1-3 CPC codes and one assignee each; subclass 0 and assignee 0 are the most common."""
+    subclass_names = [
+        f"{SECTIONS[i % len(SECTIONS)]}{(i // len(SECTIONS)) % 100:02d}{chr(ord('A') + i % 26)}"
+        for i in range(subclasses)
+    ]
+    days = rng.integers(0, 20 * 365, size=count)
+    codes = zipf_choice(rng, subclasses, count * 3)
+    owners = zipf_choice(rng, assignees, count)
+    dates = np.datetime64("2005-01-01") + days
+    return [
+        {
+            "publication_number": f"US-{i:09d}-A1",
+            "title": f"Synthetic patent {i}",
+            "abstract": "",
+            "publication_date": str(dates[i]).replace("-", ""),
+            "cpc": [f"{subclass_names[c]}{n}/00" for n, c in enumerate(codes[3 * i:3 * i + 1 + i % 3])],
+            "assignees": [f"Assignee {owners[i]} Inc."]
+        }
+        for i in range(count)
+    ], subclass_names
+
+
+def build(path, patents, dimension, rng, batch_size=5000):
+    from app.services.ingestion import patent_to_vector
+    from app.services.local_vector_svc import LocalVectorStore
+    
+    store = LocalVectorStore(path, dimension=dimension)
+    store.initialize_index()
+    for offset in range(0, len(patents), batch_size):
+        batch = patents[offset:offset + batch_size]
+        vectors = rng.standard_normal((len(batch), dimension)).astype(np.float32)
+        store.upsert_vectors([patent_to_vector(p, v) for p, v in zip(batch, vectors)])
+    return store
+
+
+def time_queries(fn, queries):
+    results, latencies = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        results.append(fn(q))
+        latencies.append(time.perf_counter() - t0)
+    return results, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--patents", type=int, default=200_000)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--subclasses", type=int, default=600)
+    parser.add_argument("--assignees", type=int, default=20_000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--post-filter-n", type=int, default=50,
+                        help="Unfiltered candidates fetched by the post-filter baseline")
+    parser.add_argument("--ann", action="store_true", help="Build an IVF-PQ index and query through it")
+    args = parser.parse_args()
+    
+    from app.core.config import settings
+    from app.services.metadata_filter import MetadataFilter
+    
+    rng = np.random.default_rng(0)
+    patents, subclass_names = synthetic_patents(rng, args.patents, args.subclasses, args.assignees)
+    path = tempfile.mkdtemp(prefix="patentguard-filter-")
+    try:
+        start = time.perf_counter()
+        store = build(path, patents, args.dimension, rng)
+        build_seconds = time.perf_counter() - start
+        if args.ann:
+            store.build_ann_index(nlist=int(4 * np.sqrt(args.patents)), train_sample=min(args.patents, 50_000))
+        
+        filters = [
+            ("exclude top assignee", MetadataFilter.create(exclude_assignees=["Assignee 0 Inc"])),
+            ("published 2015+", MetadataFilter.create(published_from="2015-01-01")),
+            (f"CPC section {SECTIONS[0]}", MetadataFilter.create(cpc=[SECTIONS[0]])),
+            ("published 2023+", MetadataFilter.create(published_from="2023-01-01")),
+            (f"CPC {subclass_names[5]}", MetadataFilter.create(cpc=[subclass_names[5]])),
+            (f"CPC {subclass_names[40]}, 2020+",
+             MetadataFilter.create(cpc=[subclass_names[40]], published_from="2020-01-01")),
+            ("one mid-size assignee", MetadataFilter.create(assignees=["Assignee 50 Inc"])),
+        ]
+        queries = rng.standard_normal((args.queries, args.dimension)).astype(np.float32)
+        mode = "IVF-PQ" if args.ann else "exact"
+        
+        print("=" * 60)
+        print(f"{args.patents:,} patents, {args.dimension}-d float32, {mode} search, top-{args.top_k}, "
+              f"exact scoring up to {settings.filter_exact_rows:,} passing rows")
+        print(f"build (vectors + metadata + filter index): {build_seconds:.1f} s")
+        store.query_similar(queries[0], args.top_k)
+        _, unfiltered = time_queries(lambda q: store.query_similar(q, args.top_k), queries)
+        print(f"no filter: p50={percentile_ms(unfiltered, 50):7.1f} ms  p95={percentile_ms(unfiltered, 95):7.1f} ms")
+        for label, metadata_filter in filters:
+            store._metadata.invalidate()
+            t0 = time.perf_counter()
+            mask = store._metadata.mask(metadata_filter, store.count)
+            cold = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            store._metadata.mask(metadata_filter, store.count)
+            warm = time.perf_counter() - t0
+            passing = np.flatnonzero(mask)
+            
+            pushed, pushed_latencies = time_queries(
+                lambda q: store.query_similar(q, args.top_k, metadata_filter), queries
+            )
+            post, post_latencies = time_queries(
+                lambda q: [
+                    m for m in store.query_similar(q, args.post_filter_n)['matches']
+                    if metadata_filter.matches(m['metadata'])
+                ][:args.top_k],
+                queries
+            )
+            recall = []
+            for q, result in zip(queries, pushed):
+                rows, _ = store._exact_filtered(
+                    store._vectors, store._normalize(q), store.count, passing, min(args.top_k, len(passing))
+                )
+                expected = {v for v, _ in store._fetch_metadata([int(r) for r in rows]).values()}
+                recall.append(len(expected & {m['id'] for m in result['matches']}) / max(len(expected), 1))
+            
+            print(f"{label} ({len(passing) / store.count:.2%} of rows pass, {len(passing):,}):")
+            print(f"  bitmap: {cold * 1000:.1f} ms cold, {warm * 1000:.2f} ms cached")
+            print(f"  pushed down: p50={percentile_ms(pushed_latencies, 50):7.1f} ms  "
+                  f"p95={percentile_ms(pushed_latencies, 95):7.1f} ms  recall@{args.top_k}: {np.mean(recall):.2f}")
+            print(f"  post-filter top-{args.post_filter_n}: p50={percentile_ms(post_latencies, 50):7.1f} ms  "
+                  f"results returned: {np.mean([len(r) for r in post]):.1f}/{args.top_k} on average")
+        print("=" * 60)
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
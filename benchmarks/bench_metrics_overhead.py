@@ -0,0 +1,141 @@
+"""
+Cost of the Prometheus instrumentation on the request path.
+
+Times the recording primitives (counter increment, histogram observation,
+stage timer, gauge inc/dec) with metrics enabled and disabled, then runs
+/api/analyze in process with zero-latency stub services and the real
+LLMService on a zero-latency StubLLMTransport, so every
+instrumented stage (HTTP middleware, embed, vector query, prompt build, LLM
+call, JSON parse) is exercised and nothing else dominates the request time.
+Metrics are switched on and off in alternating blocks to cancel drift.
+Finally times rendering /metrics. No network services are used.
+
+Usage:
+    python benchmarks/bench_metrics_overhead.py --requests 2000
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+import timeit
+
+import numpy as np
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.join(os.path.dirname(script_dir), 'backend')
+sys.path.insert(0, backend_dir)
+sys.path.insert(0, script_dir)
+
+IDEAS = [
+    "A smart water bottle that tracks hydration and reminds the user to drink",
+    "Solar panel cleaning robot that crawls along the panel edges",
+    "Bicycle helmet with integrated turn signals controlled from the handlebar",
+    "Self-heating lunch box powered by a rechargeable battery",
+]
+
+
+def percentile_us(samples, q):
+    return float(np.percentile(samples, q)) * 1e6
+
+
+def ns_per_op(stmt, number: int) -> float:
+    return min(timeit.repeat(stmt, number=number, repeat=5)) / number * 1e9
+
+
+def bench_primitives(number: int):
+    from app.core import metrics
+    
+    counter = metrics.UPSTREAM_ERRORS.labels("bench")
+    histogram = metrics.STAGE_SECONDS.labels("bench")
+    gauge = metrics.LLM_IN_FLIGHT
+    
+    def timed():
+        with histogram.time():
+            pass
+    
+    def in_flight():
+        gauge.inc()
+        gauge.dec()
+    
+    cases = [
+        ("counter.inc()", counter.inc),
+        ("histogram.observe(x)", lambda: histogram.observe(0.042)),
+        ("with histogram.time()", timed),
+        ("gauge.inc(); gauge.dec()", in_flight),
+        ("metric.labels(...) lookup", lambda: metrics.STAGE_SECONDS.labels("bench")),
+    ]
+    baseline = ns_per_op(lambda: None, number)
+    print(f"recording primitives (ns/op, minus {baseline:.0f} ns for an empty call):")
+    for label, stmt in cases:
+        results = []
+        for enabled in (True, False):
+            metrics.set_metrics_enabled(enabled)
+            results.append(ns_per_op(stmt, number) - baseline)
+        metrics.set_metrics_enabled(True)
+        print(f"  {label:<28} enabled {results[0]:6.0f}   disabled {results[1]:6.0f}")
+
+
+async def bench_requests(requests: int, blocks: int):
+    import httpx
+    from app.core import metrics
+    from app.main import app
+    
+    latencies = {True: [], False: []}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for i in range(50):
+            response = await client.post("/api/analyze", json={"invention_idea": IDEAS[i % len(IDEAS)]})
+            response.raise_for_status()
+        per_block = max(requests // (2 * blocks), 1)
+        for block in range(2 * blocks):
+            enabled = block % 2 == 0
+            metrics.set_metrics_enabled(enabled)
+            for i in range(per_block):
+                t0 = time.perf_counter()
+                response = await client.post("/api/analyze", json={"invention_idea": IDEAS[i % len(IDEAS)]})
+                latencies[enabled].append(time.perf_counter() - t0)
+                response.raise_for_status()
+        metrics.set_metrics_enabled(True)
+        
+        t0 = time.perf_counter()
+        response = await client.get("/metrics")
+        scrape_ms = (time.perf_counter() - t0) * 1000
+        render = timeit.repeat(metrics.REGISTRY.render, number=20, repeat=3)
+    
+    print(f"/api/analyze in process, sequential, {len(latencies[True])} requests per mode:")
+    for enabled in (True, False):
+        samples = latencies[enabled]
+        print(f"  metrics {'on ' if enabled else 'off'}: mean={np.mean(samples) * 1e6:7.0f} us  "
+              f"p50={percentile_us(samples, 50):7.0f} us  p95={percentile_us(samples, 95):7.0f} us")
+    on, off = np.median(latencies[True]), np.median(latencies[False])
+    print(f"  overhead: {(on - off) * 1e6:+.0f} us per request ({(on - off) / off:+.1%} of the p50)")
+    print(f"/metrics: {len(response.text.splitlines())} lines, {len(response.content) / 1024:.1f} KiB, "
+          f"render {min(render) / 20 * 1000:.2f} ms, scrape over ASGI {scrape_ms:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--requests", type=int, default=2000, help="Measured /api/analyze requests (both modes)")
+    parser.add_argument("--blocks", type=int, default=10, help="On/off block pairs the requests are split into")
+    parser.add_argument("--number", type=int, default=200_000, help="Calls per primitive timing")
+    args = parser.parse_args()
+    
+    import stubs
+    from app.core.config import settings
+    
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger().setLevel(logging.WARNING)
+    settings.analysis_cache_enabled = False
+    settings.fast_path_enabled = False
+    settings.hybrid_search_enabled = False
+    stubs.install(embedding_latency=0, pinecone_latency=0, llm_latency=0, real_llm=True)
+    
+    print("=" * 60)
+    bench_primitives(args.number)
+    asyncio.run(bench_requests(args.requests, args.blocks))
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Cross-encoder rerank cost against candidate count, batch size and latency budget.
+
+Reranks synthetic patent candidates (title + abstract, as retrieval
+returns them) for a set of ideas through the Reranker service and reports,
+per candidate count: latency with a cold score cache (a new idea each
+call) and warm (the same idea again, all scores cached), and model
+throughput per batch size. It then reruns the largest candidate count
+under budgets below its cold latency to show how much of the list gets
+scored before the budget cuts reranking short.
+
+Uses a CPU-bound stand-in for the cross-encoder by default (no model
+download); --real-model loads RERANK_MODEL_NAME with sentence-transformers.
+
+Usage:
+    python benchmarks/bench_rerank.py --candidates 10,25,50,100
+    python benchmarks/bench_rerank.py --real-model --candidates 10,25,50,100
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.join(os.path.dirname(script_dir), 'backend')
+sys.path.insert(0, backend_dir)
+
+import stubs  # noqa: E402
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q)) * 1000
+
+
+def candidate_results(patents, count: int):
+    """A retrieval result of ``count`` patents, best first, shaped like a vector store query result."""
+    from app.services.ingestion import patent_to_vector
+    
+    return {'matches': [
+        {**patent_to_vector(patent, None), 'score': 0.9 - i * 0.001}
+        for i, patent in enumerate(patents[:count])
+    ]}
+
+
+def time_reranks(reranker, ideas, results, top_k: int, budget_ms=None):
+    latencies, scored = [], [reranker.scored]
+    for idea in ideas:
+        t0 = time.perf_counter()
+        reranker.rerank(idea, results, top_k, budget_ms=budget_ms)
+        latencies.append(time.perf_counter() - t0)
+        scored.append(reranker.scored)
+    return latencies, np.diff(scored)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--candidates", default="10,25,50,100", help="Comma-separated candidate counts")
+    parser.add_argument("--batch-sizes", default="4,16,32,64", help="Comma-separated batch sizes")
+    parser.add_argument("--queries", type=int, default=20, help="Ideas reranked per setting")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--real-model", action="store_true", help="Use the configured CrossEncoder model")
+    args = parser.parse_args()
+    
+    from app.core.config import settings
+    from app.services.reranker import Reranker, load_cross_encoder
+    
+    logging.basicConfig(level=logging.ERROR)
+    counts = [int(n) for n in args.candidates.split(",")]
+    batch_sizes = [int(n) for n in args.batch_sizes.split(",")]
+    model = load_cross_encoder() if args.real_model else stubs.CPUBoundCrossEncoder()
+    patents = [p for page in stubs.StubBigQueryService(num_patents=max(counts), latency=0).iter_patent_pages() for p in page]
+    words = stubs.WORDS
+    ideas = [
+        " ".join(words[(q * 5 + j * 3) % len(words)] for j in range(25)) + f" (idea {q})"
+        for q in range(args.queries * (len(counts) + len(batch_sizes) + 4))
+    ]
+    fresh = iter(ideas)
+    
+    def next_ideas():
+        return [next(fresh) for _ in range(args.queries)]
+    
+    reranker = Reranker(model=model, budget_ms=float("inf"))
+    reranker.warmup()
+    
+    print("=" * 60)
+    print(f"model: {settings.rerank_model_name if args.real_model else 'CPU-bound stand-in'}, "
+          f"batch size {settings.rerank_batch_size}, top-{args.top_k} kept")
+    print("latency by candidate count (no budget):")
+    cold_p50 = {}
+    for count in counts:
+        results = candidate_results(patents, count)
+        batch_ideas = next_ideas()
+        cold, _ = time_reranks(reranker, batch_ideas, results, args.top_k)
+        warm, _ = time_reranks(reranker, batch_ideas, results, args.top_k)
+        cold_p50[count] = percentile_ms(cold, 50)
+        print(f"  {count:4d} candidates: cold p50={cold_p50[count]:7.1f} ms  p95={percentile_ms(cold, 95):7.1f} ms  "
+              f"({cold_p50[count] / count:.2f} ms/candidate)   cached p50={percentile_ms(warm, 50):6.2f} ms")
+    
+    largest = max(counts)
+    results = candidate_results(patents, largest)
+    print(f"throughput by batch size ({largest} candidates):")
+    for batch_size in batch_sizes:
+        sized = Reranker(model=model, batch_size=batch_size, budget_ms=float("inf"))
+        sized.warmup()
+        latencies, _ = time_reranks(sized, next_ideas(), results, args.top_k)
+        print(f"  batch {batch_size:3d}: p50={percentile_ms(latencies, 50):7.1f} ms  "
+              f"{largest / np.median(latencies):7.0f} pairs/s")
+    
+    print(f"latency budget ({largest} candidates, batch size {settings.rerank_batch_size}):")
+    for fraction in (1.5, 0.75, 0.5, 0.25):
+        budget = cold_p50[largest] * fraction
+        latencies, scored = time_reranks(reranker, next_ideas(), results, args.top_k, budget_ms=budget)
+        print(f"  budget {budget:7.1f} ms: p50={percentile_ms(latencies, 50):7.1f} ms  "
+              f"p95={percentile_ms(latencies, 95):7.1f} ms  scored {np.mean(scored):5.1f}/{largest} on average")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
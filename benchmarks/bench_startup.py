@@ -0,0 +1,101 @@
+"""
+Cold-start timings for the API.
+
+Measures, each in a fresh interpreter:
+1. How long ``import app.main`` takes (median of several runs)
+2. How long until a uvicorn process answers /api/health
+3. How long until /api/ready reports every component warm, with the
+   per-component warmup times it reports
+
+Needs the real backend dependencies and .env for step 3 to reach "ready";
+without them the failed components are reported instead.
+
+Usage:
+    python benchmarks/bench_startup.py --repeats 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.join(os.path.dirname(script_dir), 'backend')
+
+
+def time_import(repeats: int) -> float:
+    """Median wall time of importing the app in a fresh interpreter."""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "import app.main"], cwd=backend_dir, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def get_json(url: str):
+    """Return (status, body) or (None, None) if the server isn't up yet."""
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+    except (urllib.error.URLError, ConnectionError):
+        return None, None
+
+
+def time_server(port: int, timeout: float):
+    """Start uvicorn and time /api/health and /api/ready."""
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=backend_dir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    health_at = ready_at = None
+    ready_body = None
+    try:
+        while time.perf_counter() - start < timeout:
+            if health_at is None:
+                status, _ = get_json(f"http://127.0.0.1:{port}/api/health")
+                if status == 200:
+                    health_at = time.perf_counter() - start
+            else:
+                status, ready_body = get_json(f"http://127.0.0.1:{port}/api/ready")
+                pending = [c for c in ready_body["components"].values() if c["status"] == "pending"]
+                if status == 200 or not pending:
+                    ready_at = time.perf_counter() - start
+                    break
+            time.sleep(0.02)
+    finally:
+        server.terminate()
+        server.wait()
+    return health_at, ready_at, ready_body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+    
+    print("=" * 60)
+    print(f"import app.main (median of {args.repeats}): {time_import(args.repeats) * 1000:8.1f} ms")
+    
+    health_at, ready_at, body = time_server(args.port, args.timeout)
+    print(f"first /api/health 200:            {health_at * 1000 if health_at else float('nan'):8.1f} ms")
+    print(f"warmup finished:                  {ready_at * 1000 if ready_at else float('nan'):8.1f} ms "
+          f"(ready={body['ready'] if body else None})")
+    for name, component in (body or {}).get("components", {}).items():
+        detail = f"  error: {component['error']}" if component.get("error") else ""
+        print(f"  {name:<16} {component['status']:<8} {component.get('seconds', float('nan')):7.2f}s{detail}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
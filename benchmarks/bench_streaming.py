@@ -0,0 +1,76 @@
+"""
+Time to first result: /api/analyze vs. /api/analyze/stream.
+
+Serves the API with uvicorn on a local port (the in-process ASGI transport
+buffers whole responses, which would hide streaming) against stub backends
+and measures, for the
+streaming endpoint, when the retrieved_patents event, the first LLM token,
+the risk_level event and the final analysis arrive, compared with the total
+latency of the blocking /api/analyze call.
+
+Usage:
+    python benchmarks/bench_streaming.py --llm-latency 2.0
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.join(os.path.dirname(script_dir), 'backend')
+sys.path.insert(0, backend_dir)
+
+import stubs  # noqa: E402
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--llm-latency", type=float, default=2.0)
+    parser.add_argument("--pinecone-latency", type=float, default=0.03)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    
+    stubs.install(pinecone_latency=args.pinecone_latency, llm_latency=args.llm_latency)
+    
+    from fastapi import FastAPI
+    from app.api.routes import router
+    from app.core.config import settings
+    settings.analysis_cache_enabled = False
+    
+    app = FastAPI()
+    app.include_router(router, prefix="/api")
+    payload = {"invention_idea": "A smart water bottle that tracks hydration levels"}
+    
+    import httpx
+    import uvicorn
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=args.port, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=None) as client:
+        start = time.perf_counter()
+        response = await client.post("/api/analyze", json=payload)
+        blocking_total = time.perf_counter() - start
+        assert response.status_code == 200, response.text
+        
+        first_seen = {}
+        start = time.perf_counter()
+        async with client.stream("POST", "/api/analyze/stream", json=payload) as response:
+            async for line in response.aiter_lines():
+                if line.startswith("event: "):
+                    first_seen.setdefault(line[len("event: "):], time.perf_counter() - start)
+    
+    server.should_exit = True
+    await serving
+    
+    print("=" * 60)
+    print(f"/api/analyze total:            {blocking_total * 1000:8.1f} ms")
+    for event in ("retrieved_patents", "token", "risk_level", "analysis"):
+        print(f"/api/analyze/stream {event + ':':<18}{first_seen.get(event, float('nan')) * 1000:8.1f} ms")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,342 @@
+"""
+Benchmark suite: micro-benchmarks of each pipeline stage and an /api/analyze load test.
+
+Runs without network services or API keys: Pinecone, Groq and BigQuery are
+replaced by the stubs in stubs.py (configurable latency and error rate),
+embeddings by a CPU-bound stand-in unless --real-model is given. Sections:
+
+- embedding: encode one text and a batch, embedding cache hits, and the
+  latency the micro-batcher adds to a lone request (its batching window)
+- retrieval: exact top-k over a local index of synthetic patents, with and
+  without a metadata filter, BM25 search and hybrid fusion
+- prompt: packing retrieved patents into the LLM prompt and parsing the
+  JSON completion
+- ingest: patents/s through the ingestion pipeline from a stub BigQuery
+  source into a local index
+- load: closed-loop load on /api/analyze (in process with the real
+  LLMService on a stub transport, or --url for a running server),
+  reporting p50/p95/p99 latency, requests/s and errors
+
+Results are printed and, with --output, written as JSON; compare two runs
+with compare_results.py.
+
+Usage:
+    python benchmarks/bench_suite.py --output results/baseline.json
+    python benchmarks/bench_suite.py --only load --concurrency 32 --llm-latency 0.5 --error-rate 0.02
+    python benchmarks/bench_suite.py --only load --url http://localhost:8000 --output results/server.json
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.join(os.path.dirname(script_dir), 'backend')
+sys.path.insert(0, backend_dir)
+
+import stubs  # noqa: E402
+
+SECTIONS = ("embedding", "retrieval", "prompt", "ingest", "load")
+
+IDEAS = [
+    "A smart water bottle that tracks hydration and reminds the user to drink",
+    "Solar panel cleaning robot that crawls along the panel edges using suction",
+    "Bicycle helmet with integrated turn signals controlled from the handlebar",
+    "Self-heating lunch box powered by a rechargeable battery and a thermal layer",
+    "Wireless soil moisture sensor network that schedules irrigation valves",
+    "Noise cancelling window insert with a membrane actuator and microphone array",
+]
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q)) * 1000
+
+
+class Results:
+    """Named measurements, each with a unit and whether lower values are better."""
+    
+    def __init__(self):
+        self.metrics = {}
+    
+    def add(self, name: str, value: float, unit: str = "ms", lower_is_better: bool = True):
+        self.metrics[name] = {"value": round(float(value), 4), "unit": unit, "lower_is_better": lower_is_better}
+        print(f"  {name:<38} {value:12.3f} {unit}")
+    
+    def add_latencies(self, name: str, samples, quantiles=(50, 95)):
+        for q in quantiles:
+            self.add(f"{name}.p{q}", percentile_ms(samples, q))
+
+
+def time_calls(fn, iterations: int, warmup: int = 3):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def synthetic_patents(count: int):
+    """Patents from the stub BigQuery source (deterministic), without network latency."""
+    source = stubs.StubBigQueryService(num_patents=count, latency=0, claims_per_patent=3)
+    return [patent for page in source.iter_patent_pages(page_size=5000) for patent in page]
+
+
+def bench_embedding(results: Results, args, workdir: str):
+    from app.services.embedding_batcher import EmbeddingBatcher
+    from app.services.embedding_cache import EmbeddingCache
+    
+    if args.real_model:
+        from app.services.embedding_backends import load_embedding_model
+        model = load_embedding_model()
+    else:
+        model = stubs.CPUBoundEncoder()
+    
+    def encode(texts):
+        return np.asarray(model.encode(texts, convert_to_tensor=False), dtype=np.float32)
+    
+    texts = [f"{IDEAS[i % len(IDEAS)]} variant {i}" for i in range(32)]
+    results.add_latencies("embedding.encode_1", time_calls(lambda: encode(texts[:1]), args.iterations))
+    results.add_latencies("embedding.encode_32", time_calls(lambda: encode(texts), max(args.iterations // 4, 5)))
+    
+    cache = EmbeddingCache(os.path.join(workdir, "embedding_cache"), dimension=encode(texts[:1]).shape[1])
+    cache.embed(texts, encode)
+    results.add_latencies("embedding.cache_hit_32", time_calls(lambda: cache.embed(texts, encode), args.iterations))
+    
+    async def batched():
+        batcher = EmbeddingBatcher(service=stubs.StubEmbeddingService(latency=0, per_item=0))
+        samples = []
+        for i in range(args.iterations):
+            t0 = time.perf_counter()
+            await batcher.embed(texts[i % len(texts)])
+            samples.append(time.perf_counter() - t0)
+        return samples
+    
+    results.add_latencies("embedding.batcher_lone_request", asyncio.run(batched()))
+
+
+def bench_retrieval(results: Results, args, workdir: str):
+    from app.services.hybrid_search import fuse_results
+    from app.services.ingestion import patent_to_vector
+    from app.services.lexical_index import LexicalIndex
+    from app.services.local_vector_svc import LocalVectorStore
+    from app.services.metadata_filter import MetadataFilter
+    
+    rng = np.random.default_rng(0)
+    patents = synthetic_patents(args.index_patents)
+    store = LocalVectorStore(os.path.join(workdir, "local_index"), dimension=stubs.EMBEDDING_DIMENSION)
+    store.initialize_index()
+    lexical = LexicalIndex(os.path.join(workdir, "lexical_index"))
+    for offset in range(0, len(patents), 5000):
+        batch = patents[offset:offset + 5000]
+        vectors = rng.standard_normal((len(batch), stubs.EMBEDDING_DIMENSION)).astype(np.float32)
+        store.upsert_vectors([patent_to_vector(p, v) for p, v in zip(batch, vectors)])
+        lexical.add_documents(batch)
+    store.flush()
+    lexical.flush()
+    
+    queries = rng.standard_normal((args.iterations, stubs.EMBEDDING_DIMENSION)).astype(np.float32)
+    texts = [IDEAS[i % len(IDEAS)] for i in range(args.iterations)]
+    recent = MetadataFilter.create(published_from=patents[len(patents) // 10]["publication_date"])
+    
+    def each(fn):
+        index = iter(range(10 ** 9))
+        return lambda: fn(next(index) % args.iterations)
+    
+    print(f"  ({len(patents):,} patents, {stubs.EMBEDDING_DIMENSION}-d vectors)")
+    results.add_latencies("retrieval.vector_top5", time_calls(each(lambda i: store.query_similar(queries[i], 5)), args.iterations))
+    results.add_latencies("retrieval.vector_top50", time_calls(each(lambda i: store.query_similar(queries[i], 50)), args.iterations))
+    results.add_latencies("retrieval.vector_top5_filtered", time_calls(
+        each(lambda i: store.query_similar(queries[i], 5, recent)), args.iterations
+    ))
+    results.add_latencies("retrieval.bm25_top50", time_calls(each(lambda i: lexical.search(texts[i], 50)), args.iterations))
+    
+    vector_results = store.query_similar(queries[0], 50)
+    lexical_results = lexical.search(texts[0], 50)
+    results.add_latencies("retrieval.hybrid_fuse", time_calls(
+        lambda: fuse_results(queries[0], vector_results, lexical_results, store, 5), args.iterations
+    ))
+    lexical.close()
+
+
+def bench_prompt(results: Results, args):
+    from app.core.json_stream import extract_json_object
+    from app.services.hybrid_search import retrieved_patent
+    from app.services.ingestion import patent_to_vector
+    from app.services.llm_svc import LLMService
+    
+    transport = stubs.StubLLMTransport(latency=0)
+    llm = LLMService(transport=transport)
+    patents = synthetic_patents(50)
+    retrieved = [
+        retrieved_patent({**patent_to_vector(p, None), 'score': 0.9 - i * 0.01})
+        for i, p in enumerate(patents)
+    ]
+    idea = " ".join(IDEAS)
+    results.add_latencies("prompt.build_5", time_calls(lambda: llm._build_messages(idea, retrieved[:5]), args.iterations))
+    results.add_latencies("prompt.build_50", time_calls(lambda: llm._build_messages(idea, retrieved), args.iterations))
+    fenced = f"Here is the analysis:\n```json\n{transport.content}\n```"
+    results.add_latencies("prompt.parse_json", time_calls(lambda: extract_json_object(fenced), args.iterations))
+
+
+def bench_ingest(results: Results, args, workdir: str):
+    from app.services.ingestion import BigQueryPatentSource, IngestionPipeline
+    from app.services.lexical_index import LexicalIndex
+    from app.services.local_vector_svc import LocalVectorStore
+    
+    store = LocalVectorStore(os.path.join(workdir, "ingest_index"), dimension=stubs.EMBEDDING_DIMENSION)
+    store.initialize_index()
+    lexical = LexicalIndex(os.path.join(workdir, "ingest_lexical"))
+    source = BigQueryPatentSource(
+        stubs.StubBigQueryService(num_patents=args.ingest_patents, latency=args.bigquery_latency),
+        page_size=1000
+    )
+    pipeline = IngestionPipeline(
+        source, stubs.StubEmbeddingService(), store, lexical_index=lexical, log_interval=3600
+    )
+    summary = pipeline.run()
+    lexical.close()
+    results.add("ingest.patents_per_s", summary["ingested"] / summary["seconds"], "patents/s",
+                lower_is_better=False)
+
+
+async def run_load(client, requests: int, concurrency: int):
+    """Closed loop: ``concurrency`` clients each send their next request as soon as the last one returns."""
+    latencies, statuses = [], {}
+    counter = iter(range(requests))
+    
+    async def worker():
+        for i in counter:
+            payload = {"invention_idea": f"{IDEAS[i % len(IDEAS)]} (request {i})"}
+            t0 = time.perf_counter()
+            try:
+                response = await client.post("/api/analyze", json=payload)
+                status = response.status_code
+            except Exception as e:
+                status = type(e).__name__
+            if status == 200:
+                latencies.append(time.perf_counter() - t0)
+            statuses[status] = statuses.get(status, 0) + 1
+    
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return latencies, statuses, time.perf_counter() - start
+
+
+async def bench_load(results: Results, args):
+    import httpx
+    
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=None, limits=httpx.Limits(max_connections=args.concurrency))
+    else:
+        from app.core.config import settings
+        from app.main import app
+        
+        stubs.install(args.embedding_latency, args.pinecone_latency, args.llm_latency, args.error_rate, real_llm=True)
+        settings.analysis_cache_enabled = False
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None)
+    
+    async with client:
+        await run_load(client, min(args.concurrency, args.load_requests), args.concurrency)
+        latencies, statuses, elapsed = await run_load(client, args.load_requests, args.concurrency)
+    
+    target = args.url or f"in process, stub latencies embed={args.embedding_latency}s " \
+                         f"vector={args.pinecone_latency}s llm={args.llm_latency}s"
+    print(f"  ({args.load_requests} requests, concurrency {args.concurrency}, {target})")
+    print(f"  statuses: {dict(sorted((str(k), v) for k, v in statuses.items()))}")
+    if latencies:
+        results.add_latencies("load.analyze_latency", latencies, quantiles=(50, 95, 99))
+    results.add("load.analyze_rps", len(latencies) / elapsed, "req/s", lower_is_better=False)
+    results.add("load.analyze_error_rate", 1 - len(latencies) / args.load_requests, "fraction")
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=script_dir, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--only", default=",".join(SECTIONS), help=f"Comma-separated sections ({', '.join(SECTIONS)})")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--iterations", type=int, default=200, help="Timed calls per micro-benchmark")
+    parser.add_argument("--real-model", action="store_true", help="Embed with the configured model instead of a stand-in")
+    parser.add_argument("--index-patents", type=int, default=20_000, help="Patents in the retrieval index")
+    parser.add_argument("--ingest-patents", type=int, default=5_000)
+    parser.add_argument("--bigquery-latency", type=float, default=0.05, help="Seconds per stub BigQuery page")
+    parser.add_argument("--load-requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--embedding-latency", type=float, default=0.005)
+    parser.add_argument("--pinecone-latency", type=float, default=0.03)
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of stub vector/LLM calls that fail")
+    parser.add_argument("--url", help="Load test a running server instead of the in-process app")
+    args = parser.parse_args()
+    
+    sections = [name.strip() for name in args.only.split(",") if name.strip()]
+    unknown = set(sections) - set(SECTIONS)
+    if unknown:
+        parser.error(f"unknown sections: {', '.join(sorted(unknown))}")
+    
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger().setLevel(logging.WARNING)
+    
+    results = Results()
+    workdir = tempfile.mkdtemp(prefix="patentguard-suite-")
+    started = time.perf_counter()
+    try:
+        print("=" * 60)
+        for section in sections:
+            print(f"{section}:")
+            if section == "embedding":
+                bench_embedding(results, args, workdir)
+            elif section == "retrieval":
+                bench_retrieval(results, args, workdir)
+            elif section == "prompt":
+                bench_prompt(results, args)
+            elif section == "ingest":
+                bench_ingest(results, args, workdir)
+            elif section == "load":
+                asyncio.run(bench_load(results, args))
+        print(f"finished in {time.perf_counter() - started:.1f} s")
+        print("=" * 60)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    
+    if args.output:
+        report = {
+            "meta": {
+                "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+                "git_revision": git_revision(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "encoder": "model" if args.real_model else "stand-in",
+                "args": vars(args)
+            },
+            "results": results.metrics
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {len(results.metrics)} results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
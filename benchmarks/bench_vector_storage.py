@@ -0,0 +1,103 @@
+"""
+Memory and recall cost of float16 / int8 vector storage.
+
+Three measurements:
+- wire format: Python heap used to hold a batch of embeddings as nested
+  lists of floats (the old ``.tolist()`` path) vs. one float32 array
+- local index: bytes per vector, exact-scan latency and recall@k against
+  float32 ground truth for each ``LOCAL_INDEX_DTYPE``, on the clustered
+  synthetic corpus from bench_ann.py
+- embedding cache: cosine between a stored and a returned embedding for
+  each ``EMBEDDING_CACHE_DTYPE``
+
+Usage:
+    python benchmarks/bench_vector_storage.py --vectors 200000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.join(os.path.dirname(script_dir), 'backend')
+sys.path.insert(0, backend_dir)
+
+from bench_ann import exact_top_k, make_corpus, normalize, percentile_ms  # noqa: E402
+
+DTYPES = ("float32", "float16", "int8")
+
+
+def heap_bytes(build):
+    tracemalloc.start()
+    value = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del value
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--vectors", type=int, default=200_000)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=2000)
+    parser.add_argument("--spread", type=float, default=0.06)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--batch", type=int, default=10_000, help="Embeddings held for the wire-format comparison")
+    args = parser.parse_args()
+    
+    from app.services.vector_storage import VectorMatrix
+    
+    rng = np.random.default_rng(0)
+    corpus = make_corpus(rng, args.vectors, args.dimension, args.clusters, args.spread)
+    seeds = corpus[rng.choice(args.vectors, args.queries, replace=False)]
+    queries = normalize(seeds + rng.standard_normal(seeds.shape, dtype=np.float32) * 0.03)
+    truth = exact_top_k(corpus, queries, args.top_k)
+    
+    batch = corpus[:args.batch]
+    as_lists = heap_bytes(lambda: batch.tolist())
+    as_array = heap_bytes(lambda: batch.copy())
+    
+    print("=" * 60)
+    print(f"wire format, {args.batch:,} x {args.dimension} embeddings:")
+    print(f"  List[List[float]]: {as_lists / 2**20:8.1f} MiB ({as_lists / batch.size:.1f} B/float)")
+    print(f"  float32 ndarray:   {as_array / 2**20:8.1f} MiB ({as_array / batch.size:.1f} B/float)")
+    print("-" * 60)
+    print(f"local index, {args.vectors:,} vectors, exact search, {args.queries} queries")
+    print(f"{'dtype':<8} {'B/vector':>9} {'MiB':>8} {'recall@' + str(args.top_k):>10} {'p50 ms':>8} {'p99 ms':>8} {'min cos':>8}")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        for dtype in DTYPES:
+            matrix = VectorMatrix(os.path.join(tmp, dtype), args.dimension, args.vectors, dtype)
+            for start in range(0, args.vectors, 100_000):
+                matrix[start:start + 100_000] = corpus[start:start + 100_000]
+            matrix.flush()
+            
+            hits, latencies = 0, []
+            for q, expected in zip(queries, truth):
+                t0 = time.perf_counter()
+                scores = matrix.scores(q, args.vectors)
+                rows = np.argpartition(-scores, args.top_k - 1)[:args.top_k]
+                latencies.append(time.perf_counter() - t0)
+                hits += len(np.intersect1d(rows, expected))
+            
+            # Round-trip fidelity: what a cache hit returns vs. what was stored
+            sample = corpus[:10_000]
+            decoded = normalize(matrix[:10_000])
+            min_cosine = float((decoded * sample).sum(axis=1).min())
+            size = sum(os.path.getsize(path) for path in matrix.files)
+            
+            print(f"{dtype:<8} {matrix.bytes_per_row:>9} {size / 2**20:>8.1f} "
+                  f"{hits / (len(queries) * args.top_k):>10.3f} {percentile_ms(latencies, 50):>8.2f} "
+                  f"{percentile_ms(latencies, 99):>8.2f} {min_cosine:>8.5f}")
+            del matrix
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
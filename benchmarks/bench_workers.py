@@ -0,0 +1,203 @@
+"""
+Memory per worker and throughput of the pre-fork server against worker count.
+
+Starts app.server.PreforkServer with each worker count on a synthetic local
+index (memory-mapped vectors plus a BM25 index over the same patents), a
+CPU-bound stand-in embedding model holding --model-mb of weights and a stub
+LLM with fixed latency, once with the model and indexes preloaded before the
+fork and once with each worker loading its own. After a closed-loop
+/api/analyze load it reads /proc/<pid>/smaps_rollup of the parent and the
+workers and reports, per worker, RSS, PSS (each shared page split between
+the processes mapping it, so the PSS sum is the real footprint) and private
+memory, plus the total PSS and the requests/s and latency of the load.
+
+Linux only (reads /proc). Throughput can only scale up to the number of
+cores; the core count is printed with the results.
+
+Usage:
+    python benchmarks/bench_workers.py --workers 1,2,4 --index-patents 100000 --model-mb 90
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+import numpy as np
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.join(os.path.dirname(script_dir), 'backend')
+sys.path.insert(0, backend_dir)
+
+import stubs  # noqa: E402
+from bench_suite import percentile_ms, run_load  # noqa: E402
+
+# One weight matrix of the stand-in model at 384 dimensions
+LAYER_MB = stubs.EMBEDDING_DIMENSION * stubs.EMBEDDING_DIMENSION * 4 / 2 ** 20
+
+
+def build_index(workdir: str, patents: int):
+    """A local vector index and lexical index over synthetic patents, as ingestion writes them."""
+    from app.services.ingestion import patent_to_vector
+    from app.services.lexical_index import LexicalIndex
+    from app.services.local_vector_svc import LocalVectorStore
+    
+    rng = np.random.default_rng(0)
+    store = LocalVectorStore(os.path.join(workdir, "local_index"), dimension=stubs.EMBEDDING_DIMENSION)
+    store.initialize_index()
+    lexical = LexicalIndex(os.path.join(workdir, "lexical_index"))
+    source = stubs.StubBigQueryService(num_patents=patents, latency=0)
+    for page in source.iter_patent_pages(page_size=5000):
+        vectors = rng.standard_normal((len(page), stubs.EMBEDDING_DIMENSION)).astype(np.float32)
+        store.upsert_vectors([patent_to_vector(p, v) for p, v in zip(page, vectors)])
+        lexical.add_documents(page)
+    store.flush()
+    store.close()
+    lexical.flush()
+    lexical.close()
+
+
+def serve(args):
+    """Server process: configure the stand-ins and run the pre-fork server until terminated."""
+    from app.core.config import settings
+    from app.server import PreforkServer
+    from app.services.embedding_svc import EmbeddingService, get_embedding_service
+    from app.services.llm_svc import get_llm_service
+    
+    logging.basicConfig(level=logging.WARNING)
+    settings.vector_store_backend = "local"
+    settings.local_index_path = os.path.join(args.serve, "local_index")
+    settings.lexical_index_path = os.path.join(args.serve, "lexical_index")
+    settings.embedding_cache_path = os.path.join(args.serve, "embedding_cache")
+    settings.analysis_cache_enabled = False
+    settings.fast_path_enabled = False
+    settings.job_workers = 0
+    layers = max(1, round(args.model_mb / LAYER_MB))
+    
+    def load_model(index=None, workers=None):
+        get_embedding_service.override(EmbeddingService(model=stubs.CPUBoundEncoder(layers=layers)))
+    
+    get_llm_service.override(stubs.StubLLMService(args.llm_latency))
+    if not args.no_preload:
+        load_model()
+    PreforkServer(
+        app="app.main:app", workers=args.serve_workers, host="127.0.0.1", port=args.port,
+        preload=not args.no_preload, post_fork=load_model if args.no_preload else None
+    ).run()
+
+
+def ready(url: str) -> bool:
+    try:
+        with urllib.request.urlopen(f"{url}/api/ready", timeout=2) as response:
+            return response.status == 200
+    except (urllib.error.URLError, ConnectionError):
+        return False
+
+
+def memory(pid: int):
+    """(RSS, PSS, private) of a process in MiB, from smaps_rollup."""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return fields["Rss"], fields["Pss"], fields["Private_Clean"] + fields["Private_Dirty"]
+
+
+def children(pid: int):
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(child) for child in f.read().split()]
+
+
+def run_server(args, workdir: str, workers: int, preload: bool):
+    """Start a server, load it, and return (memory per process, load results)."""
+    import httpx
+    
+    command = [sys.executable, os.path.abspath(__file__), "--serve", workdir, "--serve-workers", str(workers),
+               "--port", str(args.port), "--model-mb", str(args.model_mb), "--llm-latency", str(args.llm_latency)]
+    if not preload:
+        command.append("--no-preload")
+    server = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{args.port}"
+    try:
+        # Every worker answers /api/ready only once its own warmup is done
+        deadline, streak = time.monotonic() + args.timeout, 0
+        while streak < 5 * workers:
+            if time.monotonic() > deadline or server.poll() is not None:
+                raise RuntimeError(f"Server with {workers} workers did not become ready")
+            streak = streak + 1 if ready(url) else 0
+            if not streak:
+                time.sleep(0.1)
+        
+        async def load():
+            limits = httpx.Limits(max_connections=args.concurrency)
+            async with httpx.AsyncClient(base_url=url, timeout=None, limits=limits) as client:
+                await run_load(client, args.concurrency * 4, args.concurrency)
+                return await run_load(client, args.requests, args.concurrency)
+        
+        latencies, statuses, elapsed = asyncio.run(load())
+        worker_pids = children(server.pid)
+        return memory(server.pid), [memory(pid) for pid in worker_pids], (latencies, statuses, elapsed)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated worker counts")
+    parser.add_argument("--index-patents", type=int, default=100_000, help="Patents in the local indexes")
+    parser.add_argument("--model-mb", type=float, default=90, help="Weights held by the stand-in embedding model")
+    parser.add_argument("--requests", type=int, default=300, help="Measured /api/analyze requests per run")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Seconds per stub LLM completion")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds to wait for a server to be ready")
+    parser.add_argument("--serve", help=argparse.SUPPRESS)
+    parser.add_argument("--serve-workers", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--no-preload", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.serve:
+        serve(args)
+        return
+    
+    logging.basicConfig(level=logging.WARNING)
+    worker_counts = [int(n) for n in args.workers.split(",")]
+    workdir = tempfile.mkdtemp(prefix="patentguard-workers-")
+    try:
+        start = time.perf_counter()
+        build_index(workdir, args.index_patents)
+        index_mb = sum(
+            os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(workdir) for name in names
+        ) / 2 ** 20
+        print("=" * 60)
+        print(f"{args.index_patents:,} patents, indexes {index_mb:.0f} MiB on disk (built in "
+              f"{time.perf_counter() - start:.0f} s), stand-in model {args.model_mb:.0f} MiB, "
+              f"{os.cpu_count()} CPUs, concurrency {args.concurrency}, LLM stub {args.llm_latency * 1000:.0f} ms")
+        for preload in (True, False):
+            print(f"models and indexes loaded {'before fork (preload)' if preload else 'in each worker'}:")
+            for workers in worker_counts:
+                parent, per_worker, (latencies, statuses, elapsed) = run_server(args, workdir, workers, preload)
+                rss, pss, private = (np.mean([m[i] for m in per_worker]) for i in range(3))
+                total_pss = parent[1] + sum(m[1] for m in per_worker)
+                rps = len(latencies) / elapsed
+                print(f"  {workers} workers: per worker RSS {rss:6.0f} MiB  PSS {pss:6.0f} MiB  private {private:6.0f} MiB"
+                      f" | parent RSS {parent[0]:5.0f} MiB | total PSS {total_pss:6.0f} MiB")
+                print(f"  {' ' * len(str(workers))}          {rps:6.1f} req/s  p50={percentile_ms(latencies, 50):6.1f} ms  "
+                      f"p95={percentile_ms(latencies, 95):6.1f} ms  statuses {json.dumps(statuses)}")
+        print("=" * 60)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
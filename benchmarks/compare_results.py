@@ -0,0 +1,101 @@
+"""
+Compare two bench_suite.py result files and flag regressions.
+
+Prints every measurement present in both runs with its relative change,
+marking changes beyond --threshold in the bad direction (slower latency,
+lower throughput) as regressions and in the good direction as
+improvements. Warns when the runs differ in machine or suite settings,
+since their numbers are then not directly comparable. Exits with status 1
+if any regression was found, so it can gate CI.
+
+Usage:
+    python benchmarks/compare_results.py results/baseline.json results/candidate.json --threshold 0.1
+"""
+import argparse
+import json
+import sys
+
+# Run settings that change what the numbers mean, overall and per suite section
+COMPARABLE_META = ("cpu_count", "platform", "python", "encoder")
+SECTION_ARGS = {
+    "embedding": ("iterations", "real_model"),
+    "retrieval": ("iterations", "index_patents"),
+    "prompt": ("iterations",),
+    "ingest": ("ingest_patents", "bigquery_latency"),
+    "load": (
+        "load_requests", "concurrency", "embedding_latency", "pinecone_latency", "llm_latency", "error_rate", "url"
+    ),
+}
+
+
+def load(path: str):
+    with open(path) as f:
+        return json.load(f)
+
+
+def mismatches(baseline, candidate):
+    """(setting, baseline value, candidate value) for settings that differ and matter to both runs."""
+    base_meta, cand_meta = baseline.get("meta", {}), candidate.get("meta", {})
+    found = [
+        (key, base_meta.get(key), cand_meta.get(key))
+        for key in COMPARABLE_META if base_meta.get(key) != cand_meta.get(key)
+    ]
+    sections = {name.split(".")[0] for name in set(baseline["results"]) & set(candidate["results"])}
+    keys = sorted({key for section in sections for key in SECTION_ARGS.get(section, ())})
+    base_args, cand_args = base_meta.get("args", {}), cand_meta.get("args", {})
+    found += [
+        (f"--{key.replace('_', '-')}", base_args.get(key), cand_args.get(key))
+        for key in keys if base_args.get(key) != cand_args.get(key)
+    ]
+    return found
+
+
+def compare(baseline, candidate, threshold: float):
+    """(name, baseline value, candidate value, unit, relative change, verdict) per shared measurement."""
+    rows = []
+    base_results, cand_results = baseline["results"], candidate["results"]
+    for name in sorted(set(base_results) & set(cand_results)):
+        base, cand = base_results[name], cand_results[name]
+        if base["value"] == 0:
+            change = 0.0 if cand["value"] == 0 else float("inf")
+        else:
+            change = (cand["value"] - base["value"]) / abs(base["value"])
+        worse = change if base.get("lower_is_better", True) else -change
+        verdict = "REGRESSION" if worse > threshold else "improved" if worse < -threshold else ""
+        rows.append((name, base["value"], cand["value"], base["unit"], change, verdict))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("baseline", help="Results JSON of the reference run")
+    parser.add_argument("candidate", help="Results JSON of the run to check")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative change treated as significant")
+    args = parser.parse_args()
+    
+    baseline, candidate = load(args.baseline), load(args.candidate)
+    print("=" * 60)
+    print(f"baseline:  {args.baseline} ({baseline['meta'].get('git_revision') or 'unknown revision'}, "
+          f"{baseline['meta'].get('timestamp')})")
+    print(f"candidate: {args.candidate} ({candidate['meta'].get('git_revision') or 'unknown revision'}, "
+          f"{candidate['meta'].get('timestamp')})")
+    for key, base, cand in mismatches(baseline, candidate):
+        print(f"warning: {key} differs ({base} vs {cand}); results may not be comparable")
+    
+    rows = compare(baseline, candidate, args.threshold)
+    width = max((len(row[0]) for row in rows), default=10)
+    for name, base, cand, unit, change, verdict in rows:
+        print(f"{name:<{width}} {base:12.3f} -> {cand:12.3f} {unit:<10} {change:+8.1%}  {verdict}")
+    only = sorted(set(baseline["results"]) ^ set(candidate["results"]))
+    if only:
+        print(f"not in both runs: {', '.join(only)}")
+    
+    regressions = [row for row in rows if row[5] == "REGRESSION"]
+    print(f"{len(regressions)} regression(s), "
+          f"{sum(row[5] == 'improved' for row in rows)} improvement(s) beyond {args.threshold:.0%}")
+    print("=" * 60)
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
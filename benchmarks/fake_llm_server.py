@@ -0,0 +1,175 @@
+"""
+Fake Groq (OpenAI-compatible) chat completions server for load tests.
+
+Serves POST /openai/v1/chat/completions, streaming or not, with a JSON
+analysis as the completion. Latency, output speed, injected 5xx errors and
+a requests-per-minute quota (answered with 429 and Retry-After, as Groq
+does) are configurable, so the LLM transport's rate limiting, retries and
+circuit breaker can be exercised without an API key or quota.
+
+Usage:
+    python benchmarks/fake_llm_server.py --port 8090 --rpm 60 --error-rate 0.1
+    LLM_BASE_URL=http://127.0.0.1:8090 uvicorn app.main:app
+"""
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+COMPLETION = json.dumps({
+    "risk_level": "Medium",
+    "analysis": "The idea overlaps with the retrieved patents in its sensing approach, "
+                "but the combination with hydration tracking appears to be new.",
+    "conflicting_patents": ["US-STUB-0000-A1"],
+    "recommendations": "Focus the claims on the novel combination."
+})
+
+
+class _Quota:
+    """Fixed one-minute window request counter, like the provider's quota."""
+    
+    def __init__(self, per_minute: int):
+        self.per_minute = per_minute
+        self._window = 0
+        self._count = 0
+        self._lock = threading.Lock()
+    
+    def take(self) -> float:
+        """Count a request; return 0 if it is allowed, else seconds until the window resets."""
+        if self.per_minute <= 0:
+            return 0.0
+        now = time.time()
+        with self._lock:
+            window = int(now // 60)
+            if window != self._window:
+                self._window, self._count = window, 0
+            if self._count >= self.per_minute:
+                return 60 - now % 60
+            self._count += 1
+            return 0.0
+
+
+def create_app(
+    latency: float = 0.5,
+    tokens_per_second: float = 200.0,
+    error_rate: float = 0.0,
+    rpm: int = 0,
+    down: bool = False
+) -> FastAPI:
+    """
+    Build the fake server.
+    
+    Args:
+        latency: Seconds before the first token
+        tokens_per_second: Output speed (about 4 characters per token)
+        error_rate: Fraction of requests answered with a 500 or 503
+        rpm: Requests accepted per minute before answering 429 (0 = unlimited)
+        down: Answer every request with 503 (toggle with POST /admin/down)
+    """
+    app = FastAPI()
+    quota = _Quota(rpm)
+    state = {"down": down, "requests": 0, "rate_limited": 0, "errors": 0, "in_flight": 0, "max_in_flight": 0}
+    tokens = [COMPLETION[i:i + 4] for i in range(0, len(COMPLETION), 4)]
+    
+    def usage(body):
+        prompt = sum(len(m.get("content", "")) for m in body.get("messages", [])) // 4
+        return {"prompt_tokens": prompt, "completion_tokens": len(tokens), "total_tokens": prompt + len(tokens)}
+    
+    def chunk(completion_id, model, delta, finish_reason=None, **extra):
+        return "data: " + json.dumps({
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            **extra
+        }) + "\n\n"
+    
+    @app.post("/openai/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        state["requests"] += 1
+        if state["down"] or random.random() < error_rate:
+            state["errors"] += 1
+            return JSONResponse(status_code=random.choice([500, 503]), content={"error": {"message": "injected failure"}})
+        wait = quota.take()
+        if wait:
+            state["rate_limited"] += 1
+            return JSONResponse(
+                status_code=429,
+                content={"error": {"message": "Rate limit reached", "type": "tokens", "code": "rate_limit_exceeded"}},
+                headers={"retry-after": str(max(int(wait), 1))}
+            )
+        
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        model = body.get("model", "fake")
+        state["in_flight"] += 1
+        state["max_in_flight"] = max(state["max_in_flight"], state["in_flight"])
+        
+        if body.get("stream"):
+            async def events():
+                try:
+                    await asyncio.sleep(latency)
+                    yield chunk(completion_id, model, {"role": "assistant", "content": ""})
+                    for token in tokens:
+                        await asyncio.sleep(1 / tokens_per_second)
+                        yield chunk(completion_id, model, {"content": token})
+                    yield chunk(completion_id, model, {}, "stop", x_groq={"id": completion_id, "usage": usage(body)})
+                    yield "data: [DONE]\n\n"
+                finally:
+                    state["in_flight"] -= 1
+            return StreamingResponse(events(), media_type="text/event-stream")
+        
+        try:
+            await asyncio.sleep(latency + len(tokens) / tokens_per_second)
+        finally:
+            state["in_flight"] -= 1
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": COMPLETION},
+                "finish_reason": "stop",
+                "logprobs": None
+            }],
+            "usage": usage(body)
+        }
+    
+    @app.post("/admin/down")
+    async def set_down(down: bool = True):
+        state["down"] = down
+        return state
+    
+    @app.get("/admin/stats")
+    async def stats():
+        return state
+    
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rpm", type=int, default=0)
+    args = parser.parse_args()
+    
+    import uvicorn
+    app = create_app(args.latency, args.tokens_per_second, args.error_rate, args.rpm)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,404 @@
+"""
+Local stand-ins for the embedding, Pinecone, Groq and BigQuery services.
+
+Each stub sleeps for a configurable time instead of doing real work, so the
+benchmarks measure how the API schedules requests rather than how fast the
+model or the network happen to be. The network stubs also fail a
+configurable fraction of calls (``error_rate``, reproducible per seed) the
+way the real service fails. ``install()`` overrides the service providers,
+so no model is loaded and no API keys are needed.
+"""
+import asyncio
+import json
+import random
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+EMBEDDING_DIMENSION = 384
+
+WORDS = ("sensor wireless battery housing signal module controller circuit device method portable "
+         "optical layer substrate valve fluid display network antenna coil membrane actuator").split()
+
+
+class FaultInjector:
+    """Decides, reproducibly, which calls of a stub fail."""
+    
+    def __init__(self, error_rate: float = 0.0, seed: int = 0):
+        self.error_rate = error_rate
+        self.injected = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+    
+    def should_fail(self) -> bool:
+        if not self.error_rate:
+            return False
+        with self._lock:
+            fail = self._random.random() < self.error_rate
+            self.injected += fail
+        return fail
+
+
+class StubEmbeddingService:
+    """
+    Pretends to run SentenceTransformer.encode (CPU-bound, blocking).
+    
+    Every encode call pays a fixed ``latency`` plus ``per_item`` seconds for
+    each text, which mirrors how batching amortises the per-call overhead.
+    """
+    
+    def __init__(self, latency: float = 0.005, per_item: float = 0.0005):
+        self.latency = latency
+        self.per_item = per_item
+    
+    def warmup(self):
+        time.sleep(self.latency)
+    
+    def generate_embedding(self, text: str) -> np.ndarray:
+        time.sleep(self.latency + self.per_item)
+        return np.full(EMBEDDING_DIMENSION, len(text) % 7, dtype=np.float32)
+    
+    def generate_embeddings(self, texts: List[str]) -> np.ndarray:
+        time.sleep(self.latency + self.per_item * len(texts))
+        return np.array([[len(t) % 7] * EMBEDDING_DIMENSION for t in texts], dtype=np.float32)
+    
+    async def generate_embedding_async(self, text: str) -> np.ndarray:
+        from app.core.executors import embedding_executor, run_blocking
+        return await run_blocking(embedding_executor, self.generate_embedding, text)
+    
+    async def generate_embeddings_async(self, texts: List[str]) -> np.ndarray:
+        from app.core.executors import embedding_executor, run_blocking
+        return await run_blocking(embedding_executor, self.generate_embeddings, texts)
+
+
+class CPUBoundEncoder:
+    """
+    Stand-in for a SentenceTransformer model that burns real CPU.
+    
+    Each text costs ``work`` rounds of float32 matrix products, so throughput
+    scales with cores the way a real model does. Used where the benchmark is
+    about process scaling rather than sleeping. With ``layers`` > 1 the
+    rounds cycle through that many distinct weight matrices (0.56 MiB each
+    at 384 dimensions), so the stand-in can hold as much memory as a real
+    model's weights.
+    """
+    
+    def __init__(self, work: int = 40, dimension: int = EMBEDDING_DIMENSION, layers: int = 1):
+        self.work = work
+        rng = np.random.default_rng(0)
+        self.layers = [rng.standard_normal((dimension, dimension), dtype=np.float32) / dimension for _ in range(layers)]
+        self.weights = self.layers[0]
+    
+    def encode(self, texts, batch_size: int = 32, convert_to_numpy: bool = True, **kwargs):
+        if isinstance(texts, str):
+            return self.encode([texts], batch_size)[0]
+        out = np.empty((len(texts), self.weights.shape[0]), dtype=np.float32)
+        for start in range(0, len(texts), batch_size):
+            chunk = texts[start:start + batch_size]
+            state = np.array([[len(t) % 97] * self.weights.shape[0] for t in chunk], dtype=np.float32)
+            for i in range(self.work):
+                state = np.tanh(state @ self.layers[i % len(self.layers)])
+            out[start:start + len(chunk)] = state
+        return out
+
+
+class CPUBoundCrossEncoder:
+    """
+    Stand-in for a sentence-transformers CrossEncoder that burns real CPU.
+    
+    ``predict`` costs a fixed ``call_overhead`` of matrix work per call plus
+    ``work`` rounds per pair, like a transformer forward pass over a padded
+    batch, and scores a pair by the word overlap of its two texts, so
+    reranking with it does reorder candidates.
+    """
+    
+    def __init__(self, work: int = 30, call_overhead: int = 20, dimension: int = EMBEDDING_DIMENSION):
+        self.work = work
+        self.call_overhead = call_overhead
+        self.weights = np.random.default_rng(1).standard_normal((dimension, dimension), dtype=np.float32) / dimension
+    
+    def predict(self, pairs, batch_size: int = 32, show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        state = np.ones((1, self.weights.shape[0]), dtype=np.float32)
+        for _ in range(self.call_overhead):
+            state = np.tanh(state @ self.weights)
+        state = np.ones((len(pairs), self.weights.shape[0]), dtype=np.float32)
+        for _ in range(self.work):
+            state = np.tanh(state @ self.weights)
+        scores = []
+        for query, passage in pairs:
+            query_words, passage_words = set(query.lower().split()), set(passage.lower().split())
+            scores.append(len(query_words & passage_words) / (len(query_words) or 1))
+        return np.array(scores, dtype=np.float32)
+
+
+class StubPineconeService:
+    """Pretends to be a Pinecone index reached over the network."""
+    
+    def __init__(self, latency: float = 0.03, num_matches: int = 5, error_rate: float = 0.0):
+        self.latency = latency
+        self.num_matches = num_matches
+        self.index = object()
+        self.faults = FaultInjector(error_rate, seed=1)
+    
+    def initialize_index(self):
+        return True
+    
+    def upsert_vectors(self, vectors: List[Dict[str, Any]]):
+        time.sleep(self.latency)
+    
+    def query_similar(self, query_vector: np.ndarray, top_k: int = 5, metadata_filter=None) -> Dict[str, Any]:
+        time.sleep(self.latency)
+        if self.faults.should_fail():
+            raise ConnectionError("Injected Pinecone failure: connection reset by peer")
+        matches = [
+            {
+                "id": f"US-STUB-{i:04d}-A1",
+                "score": 0.9 - i * 0.05,
+                "metadata": {
+                    "publication_number": f"US-STUB-{i:04d}-A1",
+                    "title": f"Stub patent {i}",
+                    "abstract": "A stub abstract used for load testing.",
+                    "publication_date": "20230101",
+                    "pub_date": 20230101
+                }
+            }
+            for i in range(min(top_k, self.num_matches))
+        ]
+        if metadata_filter is not None:
+            matches = [match for match in matches if metadata_filter.matches(match["metadata"])]
+        return {"matches": matches}
+    
+    async def query_similar_async(self, query_vector: np.ndarray, top_k: int = 5, metadata_filter=None) -> Dict[str, Any]:
+        from app.core.executors import io_executor, run_blocking
+        return await run_blocking(io_executor, self.query_similar, query_vector, top_k, metadata_filter)
+    
+    def fetch_vectors(self, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        return {}
+
+
+class StubLLMService:
+    """Pretends to be a Groq chat completion (slow network call)."""
+    
+    def __init__(self, latency: float = 0.3, error_rate: float = 0.0):
+        self.latency = latency
+        self.faults = FaultInjector(error_rate, seed=2)
+    
+    def stats(self) -> Dict[str, Any]:
+        return {"requests": 0, "stub": True}
+    
+    def _check(self):
+        from app.services.llm_transport import LLMUnavailableError
+        
+        if self.faults.should_fail():
+            raise LLMUnavailableError("Injected LLM failure: retries exhausted", retry_after=1.0)
+    
+    def _result(self, retrieved_patents: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return {
+            "risk_level": "Medium",
+            "analysis": "Stub analysis.",
+            "conflicting_patents": [p["id"] for p in retrieved_patents[:2]],
+            "recommendations": "Stub recommendations."
+        }
+    
+    def analyze_patents(self, user_idea: str, retrieved_patents: List[Dict[str, Any]]) -> Dict[str, Any]:
+        time.sleep(self.latency)
+        self._check()
+        return self._result(retrieved_patents)
+    
+    async def analyze_patents_async(self, user_idea: str, retrieved_patents: List[Dict[str, Any]]) -> Dict[str, Any]:
+        await asyncio.sleep(self.latency)
+        self._check()
+        return self._result(retrieved_patents)
+    
+    async def analyze_patents_stream(self, user_idea: str, retrieved_patents: List[Dict[str, Any]]):
+        """Spread ``latency`` evenly over the tokens of the JSON result."""
+        from app.core.json_stream import IncrementalJSONExtractor
+        
+        self._check()
+        text = json.dumps(self._result(retrieved_patents))
+        tokens = [text[i:i + 4] for i in range(0, len(text), 4)]
+        extractor = IncrementalJSONExtractor()
+        for token in tokens:
+            await asyncio.sleep(self.latency / len(tokens))
+            yield "token", token
+            for field in extractor.feed(token):
+                yield "field", field
+        yield "analysis", extractor.result
+
+
+class StubLLMTransport:
+    """
+    Pretends to be the LLMTransport behind the real LLMService (Groq over HTTP).
+    
+    Put under an ``LLMService`` so prompt packing, usage accounting and
+    response parsing run as in production and only the network is faked.
+    Every completion is the same JSON analysis of ``completion_tokens``
+    (roughly 4 characters each); failed calls raise ``LLMUnavailableError``,
+    as the real transport does once its retries are exhausted.
+    """
+    
+    def __init__(self, latency: float = 0.3, error_rate: float = 0.0, completion_tokens: int = 200):
+        self.latency = latency
+        self.faults = FaultInjector(error_rate, seed=3)
+        self.calls = 0
+        self.content = json.dumps({
+            "risk_level": "Medium",
+            "analysis": " ".join(WORDS[i % len(WORDS)] for i in range(completion_tokens * 4 // 7)),
+            "conflicting_patents": ["US-STUB-0000-A1", "US-STUB-0001-A1"],
+            "recommendations": "Stub recommendations."
+        })
+        self.completion_tokens = completion_tokens
+    
+    def _check(self):
+        from app.services.llm_transport import LLMUnavailableError
+        
+        self.calls += 1
+        if self.faults.should_fail():
+            raise LLMUnavailableError("Injected LLM failure: retries exhausted", retry_after=1.0)
+    
+    def _completion(self, params: Dict[str, Any]) -> Any:
+        prompt_chars = sum(len(message["content"]) for message in params.get("messages", []))
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=self.content), finish_reason="stop")],
+            usage=SimpleNamespace(prompt_tokens=prompt_chars // 4, completion_tokens=self.completion_tokens)
+        )
+    
+    def create(self, estimated_tokens: int, **params: Any) -> Any:
+        time.sleep(self.latency)
+        self._check()
+        return self._completion(params)
+    
+    async def create_async(self, estimated_tokens: int, **params: Any) -> Any:
+        await asyncio.sleep(self.latency)
+        self._check()
+        return self._completion(params)
+    
+    async def stream_async(self, estimated_tokens: int, **params: Any) -> Iterator[Any]:
+        """Spread ``latency`` evenly over 16-character chunks of the completion."""
+        self._check()
+        chunks = [self.content[i:i + 16] for i in range(0, len(self.content), 16)]
+        for n, text in enumerate(chunks):
+            await asyncio.sleep(self.latency / len(chunks))
+            last = n == len(chunks) - 1
+            yield SimpleNamespace(
+                choices=[SimpleNamespace(delta=SimpleNamespace(content=text), finish_reason="stop" if last else None)],
+                usage=self._completion(params).usage if last else None
+            )
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "retries": 0,
+            "rate_limited": 0,
+            "failures": self.faults.injected,
+            "circuit": "closed"
+        }
+
+
+class StubBigQueryService:
+    """
+    Pretends to be BigQueryService over the public patents dataset.
+    
+    Serves ``num_patents`` synthetic US patents (title, abstract, claims,
+    CPC codes and assignees, deterministic per position) newest first,
+    sleeping ``latency`` per page as a query result page would. With
+    ``error_rate`` a page fails mid-stream, as a dropped BigQuery
+    connection does, so ingestion resume can be exercised.
+    """
+    
+    def __init__(self, num_patents: int = 10_000, latency: float = 0.2, error_rate: float = 0.0,
+                 claims_per_patent: int = 10):
+        self.num_patents = num_patents
+        self.latency = latency
+        self.claims_per_patent = claims_per_patent
+        self.faults = FaultInjector(error_rate, seed=4)
+        self.client = object()
+    
+    def _patent(self, position: int) -> Dict[str, Any]:
+        rng = random.Random(position)
+        
+        def text(words: int) -> str:
+            return " ".join(rng.choice(WORDS) for _ in range(words))
+        
+        # 20 patents per day, newest first; numbers descend within a day
+        day = np.datetime64("2024-12-31") - np.timedelta64(position // 20, "D")
+        return {
+            "publication_number": f"US-{99_999_999 - position:08d}-B2",
+            "title": f"{text(3).capitalize()} {position}",
+            "abstract": text(rng.randint(80, 160)),
+            "claims": " ".join(
+                f"{n}. {'A device comprising' if n == 1 else 'The device of claim 1, wherein'} {text(rng.randint(20, 60))}."
+                for n in range(1, self.claims_per_patent + 1)
+            ),
+            "publication_date": str(day).replace("-", ""),
+            "cpc": [f"{rng.choice('ABGH')}{rng.randint(1, 99):02d}{rng.choice('BCFKLN')}{rng.randint(1, 40)}/00"
+                    for _ in range(rng.randint(1, 3))],
+            "assignees": [f"Stub Assignee {rng.randint(0, 500)} Inc."]
+        }
+    
+    def fetch_recent_patents(self, limit: int = 50) -> List[Dict[str, Any]]:
+        return [patent for page in self.iter_patent_pages(limit=limit) for patent in page]
+    
+    def iter_patent_pages(
+        self,
+        limit: Optional[int] = None,
+        page_size: int = 1000,
+        after: Optional[Dict[str, str]] = None,
+        since: int = 0
+    ) -> Iterator[List[Dict[str, Any]]]:
+        start = 99_999_999 - int(after["publication_number"].split("-")[1]) + 1 if after else 0
+        end = self.num_patents if limit is None else min(self.num_patents, start + limit)
+        for offset in range(start, end, page_size):
+            time.sleep(self.latency)
+            if self.faults.should_fail():
+                raise ConnectionError("Injected BigQuery failure: result stream interrupted")
+            page = [self._patent(position) for position in range(offset, min(offset + page_size, end))]
+            page = [patent for patent in page if int(patent["publication_date"]) >= since]
+            if page:
+                yield page
+            if len(page) < min(page_size, end - offset):
+                return
+
+
+def install(
+    embedding_latency: float = 0.005,
+    pinecone_latency: float = 0.03,
+    llm_latency: float = 0.3,
+    error_rate: float = 0.0,
+    real_llm: bool = False
+):
+    """
+    Point the service providers at stub instances.
+    
+    Args:
+        embedding_latency: Seconds per embedding call
+        pinecone_latency: Seconds per vector store call
+        llm_latency: Seconds per LLM completion
+        error_rate: Fraction of vector store and LLM calls that fail
+        real_llm: Run the real LLMService on a StubLLMTransport (prompt
+            packing and response parsing included) instead of StubLLMService
+            
+    Returns:
+        Tuple of (embedding, pinecone, llm) stub instances
+    """
+    from app.services.bigquery_svc import get_bigquery_service
+    from app.services.embedding_svc import get_embedding_service
+    from app.services.vector_store import get_vector_store
+    from app.services.llm_svc import LLMService, get_llm_service
+    
+    embedding = StubEmbeddingService(embedding_latency)
+    pinecone = StubPineconeService(pinecone_latency, error_rate=error_rate)
+    if real_llm:
+        llm = LLMService(transport=StubLLMTransport(llm_latency, error_rate=error_rate))
+    else:
+        llm = StubLLMService(llm_latency, error_rate=error_rate)
+    
+    get_embedding_service.override(embedding)
+    get_vector_store.override(pinecone)
+    get_llm_service.override(llm)
+    get_bigquery_service.override(StubBigQueryService())
+    
+    return embedding, pinecone, llm
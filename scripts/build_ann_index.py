@@ -0,0 +1,55 @@
+"""
+Build the approximate (IVF-PQ) index for the local vector store.
+
+Run after ingestion, then set LOCAL_INDEX_TYPE=ivfpq. Later upserts are
+added to the trained index incrementally; rebuild when the collection
+has grown substantially so the lists stay balanced.
+
+Usage:
+    python scripts/build_ann_index.py --nlist 4096 --pq-m 48
+"""
+import argparse
+import sys
+import os
+import time
+
+# Add parent directory to path for imports
+script_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(script_dir)
+backend_dir = os.path.join(parent_dir, 'backend')
+sys.path.insert(0, backend_dir)
+
+from app.services.local_vector_svc import LocalVectorStore
+from app.core.config import settings, resolve_data_path
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the IVF-PQ index for the local vector store")
+    parser.add_argument("--path", default=resolve_data_path(settings.local_index_path))
+    parser.add_argument("--nlist", type=int, default=settings.ann_nlist)
+    parser.add_argument("--pq-m", type=int, default=settings.ann_pq_m,
+                        help="PQ sub-quantizers (must divide the dimension; 0 for IVF-Flat)")
+    parser.add_argument("--train-sample", type=int, default=settings.ann_train_sample)
+    args = parser.parse_args()
+    
+    store = LocalVectorStore(args.path, index_type="exact")
+    store.initialize_index()
+    
+    start = time.perf_counter()
+    store.build_ann_index(nlist=args.nlist, pq_m=args.pq_m, train_sample=args.train_sample)
+    
+    logger.info("=" * 60)
+    logger.info(f"Built IVF-PQ index over {store.count} vectors in {time.perf_counter() - start:.1f}s")
+    logger.info("Set LOCAL_INDEX_TYPE=ivfpq to serve queries from it")
+    logger.info("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,26 @@
 """
 Patent Data Ingestion Script
-Fetches patents from Google BigQuery and uploads them to Pinecone.
+Fetches patents from Google BigQuery (or a local JSONL/Parquet file) and
+uploads them to the vector store (Pinecone, or the local index when
+VECTOR_STORE_BACKEND=local).
+
+Patents stream through fetch -> embed -> upsert in batches. Progress is
+checkpointed after every upsert; re-running after a crash resumes there.
+A manifest of what was ingested (content hash and model version per
+patent) means later runs only embed new or changed patents. With
+HYBRID_SEARCH_ENABLED, patents are also added to the local BM25 index.
+With --claim-chunks N (or CLAIM_CHUNKS_PER_PATENT) up to N claims per
+patent are embedded as extra vectors; changing N re-embeds every patent.
+
+Usage:
+    python scripts/ingest_patents.py --limit 100000
+    python scripts/ingest_patents.py --source patents.jsonl
+    python scripts/ingest_patents.py --limit 1000000 --workers 4 --embed-batch-size 256
+    python scripts/ingest_patents.py --limit 0 --since-last-run
+    python scripts/ingest_patents.py --source snapshot.jsonl --prune
+    python scripts/ingest_patents.py --limit 100000 --claim-chunks 10
 """
+import argparse
 import sys
 import os
 
@@ -11,10 +30,18 @@ parent_dir = os.path.dirname(script_dir)
 backend_dir = os.path.join(parent_dir, 'backend')
 sys.path.insert(0, backend_dir)
 
-from app.services.bigquery_svc import bigquery_service
-from app.services.pinecone_svc import pinecone_service
-from app.services.embedding_svc import embedding_service
-from app.core.config import settings
+from app.services.bigquery_svc import get_bigquery_service
+from app.services.vector_store import get_vector_store
+from app.services.lexical_index import get_lexical_index
+from app.services.embedding_svc import get_embedding_service, embedding_model_version
+from app.services.embedding_pool import EmbeddingProcessPool
+from app.services.embedding_cache import get_embedding_cache
+from app.services.ingestion import (
+    BigQueryPatentSource, IngestionCheckpoint, IngestionManifest, IngestionPipeline, IterablePatentSource,
+    open_patent_source
+)
+from app.services.metadata_filter import date_key
+from app.core.config import settings, resolve_data_path
 import logging
 
 logging.basicConfig(
@@ -60,80 +87,158 @@ def get_sample_patents():
     ]
 
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Ingest patents into the vector store")
+    parser.add_argument("--source", help="Local .jsonl or .parquet file to ingest instead of BigQuery")
+    parser.add_argument("--sample", action="store_true", help="Ingest the built-in sample patents")
+    parser.add_argument("--limit", type=int, default=50, help="Maximum patents to fetch from BigQuery (0 for no limit)")
+    parser.add_argument("--page-size", type=int, default=settings.ingest_page_size)
+    parser.add_argument("--embed-batch-size", type=int, default=settings.ingest_embed_batch_size)
+    parser.add_argument("--upsert-batch-size", type=int, default=settings.ingest_upsert_batch_size)
+    parser.add_argument("--workers", type=int, default=settings.ingest_embed_workers,
+                        help="Embedding worker processes (0 embeds in this process)")
+    parser.add_argument("--threads-per-worker", type=int, default=settings.ingest_embed_threads_per_worker)
+    parser.add_argument("--checkpoint", default=resolve_data_path(settings.ingest_checkpoint_path))
+    parser.add_argument("--restart", action="store_true", help="Ignore any checkpoint and start from the beginning")
+    parser.add_argument("--manifest", default=resolve_data_path(settings.ingest_manifest_path))
+    parser.add_argument("--full-refresh", action="store_true",
+                        help="Re-embed and upsert every patent, even if unchanged since the last run")
+    parser.add_argument("--since-last-run", action="store_true",
+                        help="Only fetch from BigQuery publications on or after the last run's newest publication_date "
+                             "(with --limit 0)")
+    parser.add_argument("--claim-chunks", type=int, default=settings.claim_chunks_per_patent,
+                        help="Claims embedded per patent as extra vectors (0 embeds title and abstract only); "
+                             "set CLAIM_CHUNKS_PER_PATENT to the same value for the API")
+    parser.add_argument("--prune", action="store_true",
+                        help="Delete patents the source no longer contains (the source must be a full snapshot)")
+    args = parser.parse_args()
+    if args.prune and (args.since_last_run or (not args.source and not args.sample and args.limit)):
+        parser.error("--prune needs a full snapshot: use it with --source/--sample, or --limit 0 without --since-last-run")
+    if args.since_last_run and (args.source or args.sample or args.limit):
+        # BigQuery returns the newest publications first, so a limited fetch
+        # would skip the oldest ones since the last run for good
+        parser.error("--since-last-run fetches everything since the last run from BigQuery: use it with --limit 0")
+    return args
+
+
+def since_date(manifest: IngestionManifest, since_last_run: bool) -> int:
+    """Earliest BigQuery publication_date to fetch (YYYYMMDD)."""
+    high_water = manifest.high_water() if since_last_run else None
+    if not high_water:
+        return settings.bigquery_min_publication_date
+    # Same-day publications may have arrived after the last run; the manifest
+    # skips the ones already ingested
+    return date_key(high_water) or settings.bigquery_min_publication_date
+
+
 def main():
     """Main ingestion process."""
+    args = parse_args()
     try:
         logger.info("=" * 60)
         logger.info("Starting Patent Ingestion Process")
         logger.info("=" * 60)
         
-        # Step 1: Initialize Pinecone
-        logger.info("\n[1/4] Initializing Pinecone...")
-        pinecone_service.initialize_index()
-        logger.info("✓ Pinecone initialized")
+        vector_store = get_vector_store()
         
-        # Step 2: Fetch patents from BigQuery or use sample data
-        logger.info("\n[2/4] Fetching patents...")
+        # Step 1: Initialize the vector store
+        logger.info(f"\n[1/3] Initializing vector store ({settings.vector_store_backend})...")
+        vector_store.initialize_index()
+        logger.info("✓ Vector store initialized")
         
-        if bigquery_service.client:
-            logger.info("Using BigQuery for patent data...")
-            patents = bigquery_service.fetch_recent_patents(limit=50)
-        else:
-            logger.warning("BigQuery not available. Using sample patent data...")
-            patents = get_sample_patents()
-        
-        logger.info(f"✓ Fetched {len(patents)} patents")
-        
-        if not patents:
-            logger.error("No patents available. Exiting.")
-            return
-        
-        # Step 3: Generate embeddings
-        logger.info("\n[3/4] Generating embeddings...")
-        vectors_to_upsert = []
+        # Step 2: Choose the patent source
+        logger.info("\n[2/3] Opening patent source...")
+        manifest = IngestionManifest(args.manifest, include_claims=args.claim_chunks > 0)
         
-        for i, patent in enumerate(patents):
-            # Combine title and abstract for embedding
-            text_to_embed = f"{patent['title']} {patent['abstract']}"
-            
-            # Generate embedding
-            embedding = embedding_service.generate_embedding(text_to_embed)
-            
-            # Prepare vector for Pinecone
-            vector = {
-                'id': patent['publication_number'],
-                'values': embedding,
-                'metadata': {
-                    'publication_number': patent['publication_number'],
-                    'title': patent['title'][:500],  # Limit metadata size
-                    'abstract': patent['abstract'][:1000],
-                    'publication_date': patent['publication_date']
-                }
-            }
-            vectors_to_upsert.append(vector)
-            
-            if (i + 1) % 10 == 0:
-                logger.info(f"  Processed {i + 1}/{len(patents)} patents...")
+        if args.source:
+            logger.info(f"Using local file: {args.source}")
+            source = open_patent_source(args.source, page_size=args.page_size)
+        elif args.sample:
+            logger.info("Using sample patent data...")
+            source = IterablePatentSource(get_sample_patents(), name="sample", page_size=args.page_size)
+        else:
+            bigquery_service = get_bigquery_service()
+            if bigquery_service.client:
+                since = since_date(manifest, args.since_last_run)
+                logger.info(f"Using BigQuery for patent data (publication_date >= {since})...")
+                source = BigQueryPatentSource(
+                    bigquery_service, limit=args.limit or None, page_size=args.page_size, since=since
+                )
+            else:
+                logger.warning("BigQuery not available. Using sample patent data...")
+                source = IterablePatentSource(get_sample_patents(), name="sample", page_size=args.page_size)
         
-        logger.info(f"✓ Generated {len(vectors_to_upsert)} embeddings")
+        checkpoint = IngestionCheckpoint(args.checkpoint)
+        if args.restart:
+            checkpoint.clear()
         
-        # Step 4: Upload to Pinecone
-        logger.info("\n[4/4] Uploading to Pinecone...")
-        batch_size = 100
-        for i in range(0, len(vectors_to_upsert), batch_size):
-            batch = vectors_to_upsert[i:i + batch_size]
-            pinecone_service.upsert_vectors(batch)
-            logger.info(f"  Uploaded batch {i//batch_size + 1}")
+        lexical_index = get_lexical_index() if settings.hybrid_search_enabled else None
+        if lexical_index is not None and lexical_index.num_docs == 0 and len(manifest) and not args.full_refresh:
+            logger.warning(
+                "The lexical index is empty but patents were ingested before; unchanged patents are skipped, "
+                "so re-run with --full-refresh to index them for hybrid search"
+            )
         
-        logger.info("✓ All vectors uploaded to Pinecone")
+        # Step 3: Fetch, embed and upload as a streaming pipeline
+        logger.info("\n[3/3] Fetching, embedding and uploading patents...")
+        if args.workers > 0:
+            logger.info(f"Starting {args.workers} embedding worker processes...")
+            embedder = EmbeddingProcessPool(
+                workers=args.workers,
+                threads_per_worker=args.threads_per_worker,
+                cache=get_embedding_cache() if settings.embedding_cache_enabled else None
+            )
+        else:
+            embedder = get_embedding_service()
+        try:
+            pipeline = IngestionPipeline(
+                source,
+                embedder,
+                vector_store,
+                checkpoint=checkpoint,
+                manifest=manifest,
+                skip_unchanged=not args.full_refresh,
+                # The chunk count is part of what a patent's vectors are, so changing it re-embeds
+                model_version=embedding_model_version() + (f"+claims{args.claim_chunks}" if args.claim_chunks else ""),
+                prune=args.prune,
+                embed_batch_size=args.embed_batch_size,
+                upsert_batch_size=args.upsert_batch_size,
+                embed_concurrency=max(args.workers, 1),
+                lexical_index=lexical_index,
+                claim_chunks=args.claim_chunks
+            )
+            summary = pipeline.run()
+        finally:
+            if lexical_index is not None:
+                lexical_index.close()
+            if args.workers > 0:
+                embedder.close()
+            manifest.close()
+            if get_embedding_cache.initialized:
+                get_embedding_cache().flush()
+                logger.info(f"Embedding cache: {get_embedding_cache().stats()}")
         
         logger.info("\n" + "=" * 60)
         logger.info("INGESTION COMPLETE!")
-        logger.info(f"Total patents ingested: {len(patents)}")
+        logger.info(f"Total patents ingested: {summary['ingested']}")
+        if args.claim_chunks and summary['ingested']:
+            logger.info(
+                f"Vectors upserted: {summary['vectors']} ({summary['vectors'] / summary['ingested']:.1f} per patent, "
+                f"claim chunks included)"
+            )
+        logger.info(f"Unchanged (skipped): {summary['skipped']}")
+        if args.prune:
+            logger.info(f"Withdrawn (deleted): {summary['deleted']}")
+        if summary['resumed_from']:
+            logger.info(f"(resumed after {summary['resumed_from']} patents from an earlier run)")
+        logger.info(f"Elapsed: {summary['seconds']:.1f}s")
+        if lexical_index is not None:
+            logger.info(f"Lexical index: {lexical_index.stats()}")
         logger.info("=" * 60)
-        
+    
     except Exception as e:
         logger.error(f"\n❌ Error during ingestion: {e}")
+        logger.info(f"Progress is saved in {args.checkpoint}; re-run to resume")
         raise
 
 